@@ -9,6 +9,7 @@ import re
 
 from django.conf import settings
 from django.utils.translation import ugettext as _
+from pymongo import ASCENDING
 
 from biz.djangoapps.util import datetime_utils
 from biz.djangoapps.util.mongo_utils import BizStore, DEFAULT_DATETIME
@@ -43,6 +44,19 @@ class AchievementStoreBase(BizStore):
     COLUMN_TYPE__PERCENT = 'percent'
     VALUE__NOT_ATTEMPTED = u'―'  # U+2015
 
+    # Note: Batches replace all documents of a contract and a course as a new generation
+    USE_GENERATION = True
+
+    # Note: Indexes are created by cleanup_biz_store_generations command
+    KEY_INDEX_COLUMNS = [
+        FIELD_CONTRACT_ID,
+        FIELD_COURSE_ID,
+        FIELD_DOCUMENT_TYPE,
+        BizStore.FIELD_GENERATION,
+        BizStore.FIELD_GENERATION_KEY,
+        '{}.{}'.format(BizStore.FIELD_INACTIVE_GENERATIONS, BizStore.FIELD_DEACTIVATED),
+    ]
+
     def __init__(self, store_config, contract_id, course_id):
         """
         Set initial information
@@ -54,12 +68,7 @@ class AchievementStoreBase(BizStore):
             self.FIELD_CONTRACT_ID: contract_id,
             self.FIELD_COURSE_ID: course_id,
         }
-        key_index_columns = [
-            self.FIELD_CONTRACT_ID,
-            self.FIELD_COURSE_ID,
-            self.FIELD_DOCUMENT_TYPE,
-        ]
-        super(AchievementStoreBase, self).__init__(store_config, key_conditions, key_index_columns)
+        super(AchievementStoreBase, self).__init__(store_config, key_conditions, list(self.KEY_INDEX_COLUMNS))
 
     def get_column_document(self):
         """
@@ -110,6 +119,97 @@ class AchievementStoreBase(BizStore):
         ]
         return self.get_document(conditions=conditions, excludes=excludes)
 
+    def _get_common_record_conditions(self, usernames=[], excluded_usernames=[], student_status=None,
+                                      search_conditions=[], search_logic='AND'):
+        """
+        Get conditions of record documents which are common to stores
+
+        :param usernames: [username...]
+        :param excluded_usernames: [username...]
+        :param student_status: str
+        :param search_conditions: [{'field':str, 'operator':str, 'value':str},...] (text search of w2ui toolbar)
+        :param search_logic: 'AND' or 'OR'
+        :return: dict of conditions
+        """
+        conditions = {
+            self.FIELD_DOCUMENT_TYPE: self.FIELD_DOCUMENT_TYPE__RECORD,
+        }
+
+        # Username condition
+        if len(usernames) != 0 or len(excluded_usernames) != 0:
+            conditions[_(self.FIELD_USERNAME)] = {}
+            if len(usernames) != 0:
+                conditions[_(self.FIELD_USERNAME)]['$in'] = usernames
+            if len(excluded_usernames) != 0:
+                conditions[_(self.FIELD_USERNAME)]['$nin'] = excluded_usernames
+
+        # Student status
+        if student_status:
+            conditions[_(self.FIELD_STUDENT_STATUS)] = student_status
+
+        # Text search conditions
+        search_queries = []
+        for condition in search_conditions:
+            if condition['operator'] == 'is':
+                pattern = u'^{}$'.format(re.escape(condition['value']))
+            elif condition['operator'] == 'begins':
+                pattern = u'^{}'.format(re.escape(condition['value']))
+            elif condition['operator'] == 'ends':
+                pattern = u'{}$'.format(re.escape(condition['value']))
+            else:
+                pattern = re.escape(condition['value'])
+            search_queries.append({condition['field']: {'$regex': pattern, '$options': 'i'}})
+        if search_queries:
+            conditions['$or' if search_logic == 'OR' else '$and'] = search_queries
+
+        return conditions
+
+    def _get_records_for_w2ui(self, column_document, conditions, offset=0, limit=0, sort_column=None, sort=ASCENDING,
+                              iterate=False):
+        """
+        Get record documents which are formatted for w2ui grid
+
+        :param column_document: a document for column
+        :param conditions: conditions of record documents
+        :param offset: Offset to documents
+        :param limit: Limit to documents
+        :param sort_column: column name to sort (sorted by stored order if it is not a column)
+        :param sort: Sorting method
+        :param iterate: if True, return a generator which reads documents from a cursor lazily
+        :return: list (or generator) of record documents
+        """
+        get_documents = self.iter_documents if iterate else self.get_documents
+        excludes = [
+            self.FIELD_ID,
+            self.FIELD_CONTRACT_ID,
+            self.FIELD_COURSE_ID,
+        ]
+        if sort_column in column_document:
+            # Note: Sort by _id additionally to paginate documents which have the same value stably
+            record_documents = get_documents(
+                conditions=conditions, excludes=excludes, offset=offset, limit=limit,
+                sort_column=[(sort_column, sort), (self.FIELD_ID, ASCENDING)], sort=None)
+        else:
+            record_documents = get_documents(conditions=conditions, excludes=excludes, offset=offset, limit=limit)
+
+        record_documents = self._format_records_for_w2ui(column_document, record_documents, start=offset + 1)
+        return record_documents if iterate else list(record_documents)
+
+    def _format_records_for_w2ui(self, column_document, record_documents, start=1):
+        for i, record_document in enumerate(record_documents, start=start):
+            # Note: w2ui needs 'recid' for each record
+            record_document['recid'] = i
+            for k, v in record_document.iteritems():
+                column_type = column_document.get(k)
+                if column_type == self.COLUMN_TYPE__DATE and isinstance(v, datetime):
+                    if v == DEFAULT_DATETIME:
+                        # Note: This value is used to define the type for 'date' (used only in score status)
+                        record_document[k] = None
+                    else:
+                        # Note: Format to date string with timezone which can be parsed in w2ui
+                        record_document[k] = datetime_utils.format_for_w2ui(v)
+            yield record_document
+
 
 class ScoreStore(AchievementStoreBase):
     """
@@ -208,7 +308,9 @@ class ScoreStore(AchievementStoreBase):
         return column_document.items()
 
     def get_data_for_w2ui(self, total_condition=None, section_conditions=[], usernames=[],
-                          student_status=None, certificate_status=None, offset=0, limit=0):
+                          student_status=None, certificate_status=None, offset=0, limit=0,
+                          excluded_usernames=[], search_conditions=[], search_logic='AND',
+                          sort_column=None, sort=ASCENDING, iterate=False):
         """
         :param total_condition: {'from':int, 'to':int, 'no': bool}
         :param section_conditions: [{'name':str, 'from':int, 'to':int, 'no': bool},...]
@@ -217,6 +319,12 @@ class ScoreStore(AchievementStoreBase):
         :param certificate_status: str
         :param offset: Offset to documents
         :param limit: Limit to documents (A limit() value of 0 (i.e. .limit(0)) is equivalent to setting no limit.)
+        :param excluded_usernames: [username...]
+        :param search_conditions: [{'field':str, 'operator':str, 'value':str},...]
+        :param search_logic: 'AND' or 'OR'
+        :param sort_column: column name to sort
+        :param sort: Sorting method
+        :param iterate: if True, records are returned as a generator which reads documents from a cursor lazily
         :return: data for w2ui grid
             e.g.)
             [
@@ -243,9 +351,36 @@ class ScoreStore(AchievementStoreBase):
         # Note: json.dumps() of views.py converts OrderedDict into dict (it's orderless!), so items() here.
         columns = column_document.items()
 
-        conditions = {
-            self.FIELD_DOCUMENT_TYPE: self.FIELD_DOCUMENT_TYPE__RECORD,
-        }
+        conditions = self._get_record_conditions(
+            total_condition=total_condition, section_conditions=section_conditions, usernames=usernames,
+            student_status=student_status, certificate_status=certificate_status,
+            excluded_usernames=excluded_usernames, search_conditions=search_conditions, search_logic=search_logic)
+        record_documents = self._get_records_for_w2ui(
+            column_document, conditions, offset=offset, limit=limit, sort_column=sort_column, sort=sort,
+            iterate=iterate)
+
+        return columns, record_documents
+
+    def get_record_count(self, total_condition=None, section_conditions=[], usernames=[],
+                         student_status=None, certificate_status=None,
+                         excluded_usernames=[], search_conditions=[], search_logic='AND'):
+        """
+        Get the count of record documents which match the conditions (see get_data_for_w2ui)
+
+        :return: count of record documents
+        """
+        conditions = self._get_record_conditions(
+            total_condition=total_condition, section_conditions=section_conditions, usernames=usernames,
+            student_status=student_status, certificate_status=certificate_status,
+            excluded_usernames=excluded_usernames, search_conditions=search_conditions, search_logic=search_logic)
+        return self.get_count(conditions)
+
+    def _get_record_conditions(self, total_condition=None, section_conditions=[], usernames=[],
+                               student_status=None, certificate_status=None,
+                               excluded_usernames=[], search_conditions=[], search_logic='AND'):
+        conditions = self._get_common_record_conditions(
+            usernames=usernames, excluded_usernames=excluded_usernames, student_status=student_status,
+            search_conditions=search_conditions, search_logic=search_logic)
 
         # Total score condition
         if total_condition:
@@ -269,39 +404,11 @@ class ScoreStore(AchievementStoreBase):
                 if condition['to']:
                     conditions[condition['name']]['$lte'] = int(condition['to']) / 100.0
 
-        # Username condition
-        if len(usernames) != 0:
-            conditions[_(self.FIELD_USERNAME)] = {'$in': usernames}
-
-        # Student status
-        if student_status:
-            conditions[_(self.FIELD_STUDENT_STATUS)] = student_status
-
         # Certificate status
         if certificate_status:
             conditions[_(self.FIELD_CERTIFICATE_STATUS)] = certificate_status
 
-        excludes = [
-            self.FIELD_ID,
-            self.FIELD_CONTRACT_ID,
-            self.FIELD_COURSE_ID,
-        ]
-        record_documents = self.get_documents(conditions=conditions, excludes=excludes, offset=offset, limit=limit)
-
-        for i, record_document in enumerate(record_documents, start=1):
-            # Note: w2ui needs 'recid' for each record
-            record_document['recid'] = i
-            for k, v in record_document.iteritems():
-                column_type = column_document.get(k)
-                if column_type == self.COLUMN_TYPE__DATE and isinstance(v, datetime):
-                    if v == DEFAULT_DATETIME:
-                        # Note: This value is used to define the type for 'date' (used only in score status)
-                        record_document[k] = None
-                    else:
-                        # Note: Format to date string with timezone which can be parsed in w2ui
-                        record_document[k] = datetime_utils.format_for_w2ui(v)
-
-        return columns, record_documents
+        return conditions
 
 
 class PlaybackStore(AchievementStoreBase):
@@ -358,7 +465,9 @@ class PlaybackStore(AchievementStoreBase):
         return column_document.items()
 
     def get_data_for_w2ui(self, total_condition=None, section_conditions=[], usernames=[],
-                          student_status=None, offset=0, limit=0):
+                          student_status=None, offset=0, limit=0,
+                          excluded_usernames=[], search_conditions=[], search_logic='AND',
+                          sort_column=None, sort=ASCENDING, iterate=False):
         """
         :param total_condition: {'from':int, 'to':int, 'no': bool}
         :param section_conditions: [{'name':str, 'from':int, 'to':int, 'no': bool},...]
@@ -366,6 +475,12 @@ class PlaybackStore(AchievementStoreBase):
         :param student_status: str
         :param offset: Offset to documents
         :param limit: Limit to documents (A limit() value of 0 (i.e. .limit(0)) is equivalent to setting no limit.)
+        :param excluded_usernames: [username...]
+        :param search_conditions: [{'field':str, 'operator':str, 'value':str},...]
+        :param search_logic: 'AND' or 'OR'
+        :param sort_column: column name to sort
+        :param sort: Sorting method
+        :param iterate: if True, records are returned as a generator which reads documents from a cursor lazily
         :return: data for w2ui grid
             e.g.)
             [
@@ -392,9 +507,34 @@ class PlaybackStore(AchievementStoreBase):
         # Note: json.dumps() of views.py converts OrderedDict into dict (it's orderless!), so items() here.
         columns = column_document.items()
 
-        conditions = {
-            self.FIELD_DOCUMENT_TYPE: self.FIELD_DOCUMENT_TYPE__RECORD,
-        }
+        conditions = self._get_record_conditions(
+            total_condition=total_condition, section_conditions=section_conditions, usernames=usernames,
+            student_status=student_status, excluded_usernames=excluded_usernames,
+            search_conditions=search_conditions, search_logic=search_logic)
+        record_documents = self._get_records_for_w2ui(
+            column_document, conditions, offset=offset, limit=limit, sort_column=sort_column, sort=sort,
+            iterate=iterate)
+
+        return columns, record_documents
+
+    def get_record_count(self, total_condition=None, section_conditions=[], usernames=[],
+                         student_status=None, excluded_usernames=[], search_conditions=[], search_logic='AND'):
+        """
+        Get the count of record documents which match the conditions (see get_data_for_w2ui)
+
+        :return: count of record documents
+        """
+        conditions = self._get_record_conditions(
+            total_condition=total_condition, section_conditions=section_conditions, usernames=usernames,
+            student_status=student_status, excluded_usernames=excluded_usernames,
+            search_conditions=search_conditions, search_logic=search_logic)
+        return self.get_count(conditions)
+
+    def _get_record_conditions(self, total_condition=None, section_conditions=[], usernames=[],
+                               student_status=None, excluded_usernames=[], search_conditions=[], search_logic='AND'):
+        conditions = self._get_common_record_conditions(
+            usernames=usernames, excluded_usernames=excluded_usernames, student_status=student_status,
+            search_conditions=search_conditions, search_logic=search_logic)
 
         # Total score condition
         if total_condition:
@@ -418,32 +558,4 @@ class PlaybackStore(AchievementStoreBase):
                 if condition['to'] is not None:
                     conditions[condition['name']]['$lte'] = condition['to']
 
-        # Username condition
-        if len(usernames) != 0:
-            conditions[_(self.FIELD_USERNAME)] = {'$in': usernames}
-
-        # Student status
-        if student_status:
-            conditions[_(self.FIELD_STUDENT_STATUS)] = student_status
-
-        excludes = [
-            self.FIELD_ID,
-            self.FIELD_CONTRACT_ID,
-            self.FIELD_COURSE_ID,
-        ]
-        record_documents = self.get_documents(conditions=conditions, excludes=excludes, offset=offset, limit=limit)
-
-        for i, record_document in enumerate(record_documents, start=1):
-            # Note: w2ui needs 'recid' for each record
-            record_document['recid'] = i
-            for k, v in record_document.iteritems():
-                column_type = column_document.get(k)
-                if column_type == self.COLUMN_TYPE__DATE and isinstance(v, datetime):
-                    if v == DEFAULT_DATETIME:
-                        # Note: This value is used to define the type for 'date' (used only in score status)
-                        record_document[k] = None
-                    else:
-                        # Note: Format to date string with timezone which can be parsed in w2ui
-                        record_document[k] = datetime_utils.format_for_w2ui(v)
-
-        return columns, record_documents
+        return conditions
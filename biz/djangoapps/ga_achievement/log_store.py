@@ -2,10 +2,16 @@
 Get a course situation data from the MongoDB.
 Processed into w2ui data and csv data.
 """
+import logging
+from datetime import datetime
+
 from django.conf import settings
+from pymongo import ASCENDING
 
 from biz.djangoapps.util.mongo_utils import BizStore
 
+log = logging.getLogger(__name__)
+
 
 class PlaybackLogStore(BizStore):
     """
@@ -51,22 +57,179 @@ class PlaybackLogStore(BizStore):
         """
         return self.aggregate(self.FIELD_VERTICAL_ID, self.FIELD_DURATION)
 
-    def aggregate_duration_by_vertical_and_target(self):
+    def has_duplicate_record(self):
+        return self.has_duplicate([self.FIELD_COURSE_ID, self.FIELD_VERTICAL_ID, self.FIELD_TARGET_ID, self.FIELD_CREATED_AT])
+
+    def iter_duration_by_course_vertical_and_target(self):
+        """
+        Aggregate the amount of duration by grouping course id, vertical id and target id
+
+        Note: The result is fetched from a cursor by batches, not to page through it by $skip and $limit.
+
+        :return: generator of dict which has course id, vertical id, target id and duration
         """
-        Aggregate the amount of duration by grouping vertical id and target id
+        key_field_names = [self.FIELD_COURSE_ID, self.FIELD_VERTICAL_ID, self.FIELD_TARGET_ID]
+        try:
+            for record in self._collection.aggregate([
+                {'$match': self._get_key_conditions()},
+                {'$group': {
+                    '_id': {key: '${}'.format(key) for key in key_field_names},
+                    self.FIELD_DURATION: {'$sum': '${}'.format(self.FIELD_DURATION)},
+                }},
+            ], allowDiskUse=True, cursor={}):
+                document = record['_id']
+                document[self.FIELD_DURATION] = record[self.FIELD_DURATION]
+                yield document
+        except Exception as e:
+            log.error("Error occurred while processing aggregate to MongoDB: %s" % e)
+            raise
+
+
+class PlaybackLogSummaryStore(BizStore):
+    """
+    A data store that deals with the cumulative duration of playback log records
+    by course id, vertical id and target id
+
+    This is updated by the delta of each day when import_playback_log is executed,
+    so that the playback batch does not need to aggregate the whole history of playback log.
+
+    Note: The state of the summary is kept in a document whose _id is STATE_ID. The summary can be used only if
+          its state is STATE_BUILT, that is, it has been built from the whole history and no update has been
+          interrupted since then (e.g. an error occurred between subtracting and adding the delta of a day).
+    """
+
+    FIELD_ID = '_id'
+    FIELD_COURSE_ID = 'course_id'
+    FIELD_TARGET_ID = 'target_id'
+    FIELD_VERTICAL_ID = 'vertical_id'
+    FIELD_DURATION = 'duration'
+    FIELD_STATE = 'state'
+    FIELD_MODIFIED = 'modified'
+
+    KEY_FIELD_NAMES = [FIELD_COURSE_ID, FIELD_VERTICAL_ID, FIELD_TARGET_ID]
+
+    STATE_ID = 'summary_state'
+    STATE_BUILT = 'built'
+    STATE_UPDATING = 'updating'
+
+    def __init__(self, course_id=None):
+        """
+        Set initial information
+
+        :param course_id: course id
+        """
+        key_conditions = {}
+        if course_id:
+            key_conditions[self.FIELD_COURSE_ID] = course_id
+
+        super(PlaybackLogSummaryStore, self).__init__(
+            settings.BIZ_MONGO['playback_log_summary'], key_conditions, self.KEY_FIELD_NAMES)
+
+    def ensure_indexes(self, index_columns=None):
+        """
+        Add Index (and the compound index of the key fields to find a summary document to be incremented)
+        """
+        indexes = super(PlaybackLogSummaryStore, self).ensure_indexes(index_columns)
+        try:
+            indexes.append(self._collection.create_index([(key, ASCENDING) for key in self.KEY_FIELD_NAMES]))
+            return indexes
+        except Exception as e:
+            log.error("Error occurred while ensure indexes MongoDB: %s" % e)
+            raise
+
+    def _get_state(self):
+        try:
+            document = self._collection.find_one({self.FIELD_ID: self.STATE_ID})
+        except Exception as e:
+            log.error("Error occurred while find state MongoDB: %s" % e)
+            raise
+        return document[self.FIELD_STATE] if document else None
+
+    def _set_state(self, state):
+        try:
+            self._collection.update(
+                {self.FIELD_ID: self.STATE_ID},
+                {'$set': {self.FIELD_STATE: state, self.FIELD_MODIFIED: datetime.utcnow()}},
+                upsert=True,
+            )
+        except Exception as e:
+            log.error("Error occurred while update state MongoDB: %s" % e)
+            raise
+
+    def is_built(self):
+        """
+        Return whether the summary can be used
+
+        :return: False if the summary has never been built or an update of it has been interrupted
+        """
+        return self._get_state() == self.STATE_BUILT
+
+    def begin_update(self):
+        """
+        Mark the summary as being updated, before adding durations of a day to it
+        """
+        self.ensure_indexes()
+        self._set_state(self.STATE_UPDATING)
+
+    def end_update(self):
+        """
+        Mark the summary as built, after adding durations of a day to it
+        """
+        self._set_state(self.STATE_BUILT)
+
+    def add_durations(self, playback_logs, sign=1):
+        """
+        Add the durations of playback log records to the summary
+
+        Note: Call begin_update() before and end_update() after this.
+
+        :param playback_logs: iterable of playback log documents
+        :param sign: 1 to add, or -1 to subtract
+        """
+        chunk = []
+        for playback_log in playback_logs:
+            summary = {key: playback_log[key] for key in self.KEY_FIELD_NAMES}
+            summary[self.FIELD_DURATION] = sign * playback_log[PlaybackLogStore.FIELD_DURATION]
+            chunk.append(summary)
+            if len(chunk) >= settings.BIZ_STORE_INSERT_CHUNK_SIZE:
+                self.increment_documents(chunk, self.KEY_FIELD_NAMES, self.FIELD_DURATION)
+                chunk = []
+        self.increment_documents(chunk, self.KEY_FIELD_NAMES, self.FIELD_DURATION)
+
+    def rebuild(self):
+        """
+        Rebuild the summary of all courses from the whole history of playback log
+
+        :return: record count of the summary
+        """
+        if self._key_conditions:
+            raise ValueError("The summary can be rebuilt only for all courses.")
+        self.begin_update()
+        self.remove_documents(conditions={self.FIELD_ID: {'$ne': self.STATE_ID}})
+        count = 0
+        chunk = []
+        for summary in PlaybackLogStore().iter_duration_by_course_vertical_and_target():
+            chunk.append(summary)
+            count += 1
+            if len(chunk) >= settings.BIZ_STORE_INSERT_CHUNK_SIZE:
+                self.set_documents(chunk)
+                chunk = []
+        if chunk:
+            self.set_documents(chunk)
+        self.end_update()
+        return count
+
+    def get_duration_by_vertical_and_target(self):
+        """
+        Get the amount of duration by vertical id and target id
 
         :return: summary dict
             e.g.)
             {
                 u'bc023973d2bce92f0ee4368e1ceae671f2ad071ae0e92e5a9e8b2a224460e689@86bcaab2af78478e8a1b5f05dd5b5378': 100.0,
-                u'ca42767fa83addcb9f88274fd326bbef4f480b10d77310afae7f967d23bfed5b@2cecf75ed74c4cb6a80f264b7020b490': 200.0,
-                u'20ef8b87fc7c29ccdb5e530bd246a82cdc8328aded830f771ffb0794c0193bc9@bd4ffeb869ba437683dc754685eb1ce1': 300.0,
             }
         """
-        return self.aggregate_sum(
-            [self.FIELD_VERTICAL_ID, self.FIELD_TARGET_ID],
-            self.FIELD_DURATION,
-        )
-
-    def has_duplicate_record(self):
-        return self.has_duplicate([self.FIELD_COURSE_ID, self.FIELD_VERTICAL_ID, self.FIELD_TARGET_ID, self.FIELD_CREATED_AT])
+        return {
+            self.FIELD_DELIMITER.join([document[self.FIELD_VERTICAL_ID], document[self.FIELD_TARGET_ID]]): document[self.FIELD_DURATION]
+            for document in self.iter_documents(conditions={self.FIELD_ID: {'$ne': self.STATE_ID}})
+        }
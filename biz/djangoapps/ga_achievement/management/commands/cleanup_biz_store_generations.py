@@ -0,0 +1,68 @@
+"""
+Management command to remove documents of expired generations of ScoreStore and PlaybackStore.
+"""
+import logging
+from datetime import timedelta
+from optparse import make_option
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from biz.djangoapps.ga_achievement.achievement_store import AchievementStoreBase
+from biz.djangoapps.util.decorators import handle_command_exception
+from biz.djangoapps.util.mongo_utils import BizStore
+
+log = logging.getLogger(__name__)
+
+STORE_CONFIG_NAMES = ['score', 'playback']
+
+
+class Command(BaseCommand):
+    """
+    Create indexes of ScoreStore and PlaybackStore, and remove documents of generations
+    which were deactivated by update_biz_score_status or update_biz_playback_status more than grace hours ago.
+    """
+    help = """
+    Usage: python manage.py lms --settings=aws cleanup_biz_store_generations [--debug] [--grace_hours=<grace_hours>]
+    """
+
+    option_list = BaseCommand.option_list + (
+        make_option('--debug',
+                    default=False,
+                    action='store_true',
+                    help='Use debug log'),
+        make_option('--grace_hours',
+                    default=None,
+                    action='store',
+                    help='Hours to keep documents of deactivated generations (default: BIZ_STORE_GENERATION_GRACE_HOURS)'),
+    )
+
+    @handle_command_exception(settings.BIZ_CLEANUP_STORE_GENERATIONS_COMMAND_OUTPUT)
+    def handle(self, *args, **options):
+        if len(args) > 0:
+            raise CommandError("This command requires no arguments.")
+
+        debug = options.get('debug')
+        if debug:
+            stream = logging.StreamHandler(self.stdout)
+            log.addHandler(stream)
+            log.setLevel(logging.DEBUG)
+
+        grace_hours = options.get('grace_hours')
+        if grace_hours is None:
+            grace_hours = settings.BIZ_STORE_GENERATION_GRACE_HOURS
+        try:
+            grace_hours = int(grace_hours)
+        except ValueError:
+            raise CommandError("grace_hours should be an integer.")
+        if grace_hours < 0:
+            raise CommandError("grace_hours should not be negative.")
+        log.debug(u"grace_hours={}".format(grace_hours))
+
+        for store_config_name in STORE_CONFIG_NAMES:
+            # Note: Documents of all contracts and courses are dealt with, so no key conditions are specified.
+            store = BizStore(settings.BIZ_MONGO[store_config_name], key_index_columns=AchievementStoreBase.KEY_INDEX_COLUMNS)
+            # Note: create_index does nothing if the index already exists
+            store.ensure_indexes()
+            removed_count = store.remove_expired_generations(timedelta(hours=grace_hours))
+            log.info(u"Removed {} expired generations of {}.".format(removed_count, store_config_name))
@@ -1,9 +1,13 @@
 import csv
+import heapq
 import logging
 import re
-import StringIO
+import tempfile
+import time
 import urlparse
 from datetime import datetime, timedelta
+from itertools import groupby
+from operator import itemgetter
 from optparse import make_option
 
 from django.conf import settings
@@ -11,16 +15,119 @@ from django.core.management.base import BaseCommand, CommandError
 
 from biz.djangoapps.util import datetime_utils
 from biz.djangoapps.util.decorators import handle_command_exception
-from biz.djangoapps.ga_achievement.log_store import PlaybackLogStore
+from biz.djangoapps.ga_achievement.log_store import PlaybackLogStore, PlaybackLogSummaryStore
 from openedx.core.djangoapps.ga_operation.utils import open_bucket_from_s3
 
 log = logging.getLogger(__name__)
 
+# Size of bytes to read from S3 at once
+READ_CHUNK_SIZE = 1024 * 1024
+
+
+def _iter_key_lines(key):
+    """
+    Read the S3 key incrementally and yield lines, not to load the whole csv-file on memory
+
+    :param key: boto.s3.key.Key object
+    :return: generator of lines (each line includes its line terminator)
+    """
+    remainder = ''
+    while True:
+        chunk = key.read(READ_CHUNK_SIZE)
+        if not chunk:
+            break
+        lines = (remainder + chunk).splitlines(True)
+        # Note: The last line may continue to the next chunk (also '\r' may be followed by '\n')
+        remainder = lines.pop() if not lines[-1].endswith('\n') else ''
+        for line in lines:
+            yield line
+    if remainder:
+        yield remainder
+
+
+class _DurationAggregator(object):
+    """
+    Aggregate durations by (target_id, course_id, vertical_id) with bounded memory
+
+    When the number of keys on memory exceeds max_keys, the partial aggregate is spilled to a temporary file
+    sorted by the key, and the spilled files are merged when finished.
+    """
+
+    def __init__(self, max_keys):
+        self.max_keys = max_keys
+        self._durations = {}
+        self._spill_files = []
+        self._merged_file = None
+        self._count = None
+        self.spill_count = 0
+
+    def add(self, key, duration):
+        """
+        :param key: tuple of (target_id, course_id, vertical_id)
+        :param duration: seconds
+        """
+        self._durations[key] = self._durations.get(key, 0) + duration
+        if len(self._durations) >= self.max_keys:
+            self._spill()
+
+    def _spill(self):
+        spill_file = tempfile.TemporaryFile()
+        writer = csv.writer(spill_file)
+        for key in sorted(self._durations):
+            writer.writerow(list(key) + [self._durations[key]])
+        spill_file.seek(0)
+        self._spill_files.append(spill_file)
+        self.spill_count += 1
+        self._durations = {}
+
+    @staticmethod
+    def _read_file(spill_file):
+        for row in csv.reader(spill_file):
+            yield tuple(row[:3]), int(row[3])
+
+    def finish(self):
+        """
+        Merge spilled files if needed
+
+        :return: number of aggregated records
+        """
+        if self._spill_files:
+            if self._durations:
+                self._spill()
+            self._merged_file = tempfile.TemporaryFile()
+            writer = csv.writer(self._merged_file)
+            self._count = 0
+            merged = heapq.merge(*[self._read_file(f) for f in self._spill_files])
+            for key, items in groupby(merged, key=itemgetter(0)):
+                writer.writerow(list(key) + [sum(duration for __, duration in items)])
+                self._count += 1
+            self._merged_file.seek(0)
+            self.close_spill_files()
+        else:
+            self._count = len(self._durations)
+        return self._count
+
+    def __iter__(self):
+        if self._merged_file is not None:
+            return self._read_file(self._merged_file)
+        return self._durations.iteritems()
+
+    def close_spill_files(self):
+        for spill_file in self._spill_files:
+            spill_file.close()
+        self._spill_files = []
+
+    def close(self):
+        self.close_spill_files()
+        if self._merged_file is not None:
+            self._merged_file.close()
+            self._merged_file = None
+
 
 class Command(BaseCommand):
 
     help = """
-    Usage: python manage.py lms --settings=aws import_playback_log [--target_date=<yyyymmdd>]
+    Usage: python manage.py lms --settings=aws import_playback_log [--target_date=<yyyymmdd>] [--rebuild_summary]
     """
 
     option_list = BaseCommand.option_list + (
@@ -28,6 +135,10 @@ class Command(BaseCommand):
                     default=None,
                     action='store',
                     help="Import csv-data on yesterday, option target_date for specific date(format:'yyyymmdd')."),
+        make_option('--rebuild_summary',
+                    default=False,
+                    action='store_true',
+                    help="Rebuild the summary of playback log from the whole history after importing."),
     )
 
     @handle_command_exception(settings.BIZ_IMPORT_PLAYBACK_LOG_COMMAND_OUTPUT)
@@ -49,12 +160,6 @@ class Command(BaseCommand):
             target_date.strftime('%Y/%m/%d'),
             target_date.strftime('%Y%m%d')
         )
-        def _get_csv_data_as_string():
-            with open_bucket_from_s3(bucket_name) as bucket:
-                key = bucket.get_key(key_path)
-                if key is None:
-                    raise Exception("Command import_playback_log can not find csv-file [{}/{}].".format(bucket_name, key_path))
-                return key.get_contents_as_string()
 
         def _validate_and_get_duration(duration):
             # Validate format duration(HH:MM:SS) to get total seconds.
@@ -65,62 +170,105 @@ class Command(BaseCommand):
         def _validate_and_get_url_parameter(url_parameter):
             # Validate to have required all parameter keys, and get values.
             parameter = urlparse.parse_qs(url_parameter)
-            return {k: parameter[k][0] for k in PARAMETER_KEYS} if all([k in parameter for k in PARAMETER_KEYS]) else None
+            return tuple(parameter[k][0] for k in PARAMETER_KEYS) if all([k in parameter for k in PARAMETER_KEYS]) else None
 
         COL_INDEX_DURATION = 2
         COL_INDEX_URL_PARAMETER = 5
 
-        aggregate_data = {}
-        skip_row_count = 0
-        reader = csv.reader(StringIO.StringIO(_get_csv_data_as_string()))
-        for row in reader:
-            # Skip first line.
-            if reader.line_num <= 1:
-                continue
-            duration = _validate_and_get_duration(row[COL_INDEX_DURATION])
-            row_data = _validate_and_get_url_parameter(row[COL_INDEX_URL_PARAMETER])
-            if duration == 0 or row_data is None:
-                skip_row_count += 1
-                continue
-            # Make unique-key(temporary) of target_id, course_id and vertical_id to calculate duration.
-            _key = PlaybackLogStore.FIELD_DELIMITER.join([row_data[key] for key in PARAMETER_KEYS])
-            if _key in aggregate_data:
-                aggregate_data[_key][PlaybackLogStore.FIELD_DURATION] += duration
-            else:
-                aggregate_data[_key] = {
-                    PlaybackLogStore.FIELD_COURSE_ID: row_data[PlaybackLogStore.FIELD_COURSE_ID],
-                    PlaybackLogStore.FIELD_VERTICAL_ID: row_data[PlaybackLogStore.FIELD_VERTICAL_ID],
-                    PlaybackLogStore.FIELD_TARGET_ID: row_data[PlaybackLogStore.FIELD_TARGET_ID],
-                    PlaybackLogStore.FIELD_DURATION: duration,
-                    PlaybackLogStore.FIELD_CREATED_AT: target_date,
-                }
+        aggregator = _DurationAggregator(settings.BIZ_IMPORT_PLAYBACK_LOG_MAX_AGGREGATE_KEYS)
+        try:
+            skip_row_count = 0
+            read_start = time.time()
+            with open_bucket_from_s3(bucket_name) as bucket:
+                key = bucket.get_key(key_path)
+                if key is None:
+                    raise Exception("Command import_playback_log can not find csv-file [{}/{}].".format(bucket_name, key_path))
+                try:
+                    reader = csv.reader(_iter_key_lines(key))
+                    for row in reader:
+                        # Skip first line.
+                        if reader.line_num <= 1:
+                            continue
+                        duration = _validate_and_get_duration(row[COL_INDEX_DURATION])
+                        row_key = _validate_and_get_url_parameter(row[COL_INDEX_URL_PARAMETER])
+                        if duration == 0 or row_key is None:
+                            skip_row_count += 1
+                            continue
+                        aggregator.add(row_key, duration)
+                    line_count = reader.line_num
+                finally:
+                    key.close()
 
-        len_aggregate_data = len(aggregate_data)
-        log.info("Command import_playback_log get data from [{}/{}], record count({}), skip row count({}).".format(
-            bucket_name, key_path, len_aggregate_data, skip_row_count))
+            len_aggregate_data = aggregator.finish()
+            read_elapsed = time.time() - read_start
+            log.info("Command import_playback_log get data from [{}/{}], record count({}), skip row count({}).".format(
+                bucket_name, key_path, len_aggregate_data, skip_row_count))
+            log.info("Command import_playback_log read {} lines in {:.3f} sec ({:.1f} lines/sec), spill count({}).".format(
+                line_count, read_elapsed, line_count / read_elapsed if read_elapsed else 0, aggregator.spill_count))
 
-        playback_log = PlaybackLogStore(created_at=target_date)
+            playback_log = PlaybackLogStore(created_at=target_date)
+            playback_log_summary = PlaybackLogSummaryStore()
+            rebuild_summary = options.get('rebuild_summary')
+            if not rebuild_summary and not playback_log_summary.is_built():
+                # Note: The delta of a day can not be applied to the summary which has never been built
+                #       or whose previous update has been interrupted.
+                log.warning("Command import_playback_log found the summary of playback log is not built, so rebuild it.")
+                rebuild_summary = True
 
-        playback_log.remove_documents()
-        playback_log_count = playback_log.get_count()
-        if playback_log_count > 0:
-            raise Exception("Command import_playback_log can not remove mongo records of {}, record count({}).".format(
-                target_date, playback_log_count))
+            if not rebuild_summary:
+                # Note: If an error occurs before end_update(), the summary is rebuilt next time.
+                playback_log_summary.begin_update()
+                # Subtract records imported previously for the target date from the summary
+                playback_log_summary.add_durations(playback_log.iter_documents(), sign=-1)
+            playback_log.remove_documents()
+            playback_log_count = playback_log.get_count()
+            if playback_log_count > 0:
+                raise Exception("Command import_playback_log can not remove mongo records of {}, record count({}).".format(
+                    target_date, playback_log_count))
 
-        log.info("Command import_playback_log removed mongo records of {}.".format(target_date))
+            log.info("Command import_playback_log removed mongo records of {}.".format(target_date))
 
-        if len_aggregate_data:
-            playback_log.set_documents(aggregate_data.values())
+            if len_aggregate_data:
+                write_start = time.time()
+                chunk = []
+                for (target_id, course_id, vertical_id), duration in aggregator:
+                    chunk.append({
+                        PlaybackLogStore.FIELD_COURSE_ID: course_id,
+                        PlaybackLogStore.FIELD_VERTICAL_ID: vertical_id,
+                        PlaybackLogStore.FIELD_TARGET_ID: target_id,
+                        PlaybackLogStore.FIELD_DURATION: duration,
+                        PlaybackLogStore.FIELD_CREATED_AT: target_date,
+                    })
+                    if len(chunk) >= settings.BIZ_STORE_INSERT_CHUNK_SIZE:
+                        playback_log.set_documents(chunk)
+                        chunk = []
+                if chunk:
+                    playback_log.set_documents(chunk)
+                write_elapsed = time.time() - write_start
+                log.info("Command import_playback_log wrote {} records in {:.3f} sec ({:.1f} records/sec).".format(
+                    len_aggregate_data, write_elapsed, len_aggregate_data / write_elapsed if write_elapsed else 0))
 
-            playback_log_count = playback_log.get_count()
-            if playback_log_count == len_aggregate_data:
-                log.info("Command import_playback_log stored mongo records of {}, record count({}).".format(
-                    target_date, playback_log_count))
-            else:
-                raise Exception("Command import_playback_log can not store mongo records of {}, record count({}), store count({}).".format(
-                    target_date, len_aggregate_data, playback_log_count))
+                playback_log_count = playback_log.get_count()
+                if playback_log_count == len_aggregate_data:
+                    log.info("Command import_playback_log stored mongo records of {}, record count({}).".format(
+                        target_date, playback_log_count))
+                else:
+                    raise Exception("Command import_playback_log can not store mongo records of {}, record count({}), store count({}).".format(
+                        target_date, len_aggregate_data, playback_log_count))
+
+                if playback_log.has_duplicate_record():
+                    raise Exception("Duplicated documents are detected in playback_log.")
 
-            if playback_log.has_duplicate_record():
-                raise Exception("Duplicated documents are detected in playback_log.")
+                if not rebuild_summary:
+                    playback_log_summary.add_durations(playback_log.iter_documents())
+
+            if rebuild_summary:
+                summary_count = playback_log_summary.rebuild()
+                log.info("Command import_playback_log rebuilt summary of playback log, record count({}).".format(summary_count))
+            else:
+                playback_log_summary.end_update()
+                log.info("Command import_playback_log updated summary of playback log for {}.".format(target_date))
+        finally:
+            aggregator.close()
 
         log.info("Command import_playback_log finished for {}.".format(target_date))
@@ -0,0 +1,53 @@
+"""
+Tests for cleanup_biz_store_generations command
+"""
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test.utils import override_settings
+
+from biz.djangoapps.ga_achievement.achievement_store import PlaybackStore, ScoreStore
+from biz.djangoapps.ga_achievement.management.commands import cleanup_biz_store_generations
+from biz.djangoapps.util.tests.testcase import BizStoreTestBase
+
+
+class CleanupBizStoreGenerationsTest(BizStoreTestBase):
+
+    def setUp(self):
+        super(CleanupBizStoreGenerationsTest, self).setUp()
+        self.command = cleanup_biz_store_generations.Command()
+
+    def _replace_twice(self, store_class):
+        store = store_class(1, 'course-v1:org+course+run')
+        first_generation = store.set_generation_documents([{'contract_id': 1, 'course_id': 'course-v1:org+course+run'}])
+        store.activate_generation(first_generation)
+        second_generation = store.set_generation_documents([{'contract_id': 1, 'course_id': 'course-v1:org+course+run'}])
+        store.activate_generation(second_generation)
+        return store, first_generation, second_generation
+
+    def test_invalid_grace_hours(self):
+        with self.assertRaisesRegexp(CommandError, "grace_hours should be an integer."):
+            self.command.handle._original(self.command, grace_hours='a')
+        with self.assertRaisesRegexp(CommandError, "grace_hours should not be negative."):
+            self.command.handle._original(self.command, grace_hours='-1')
+
+    def test_within_grace_hours(self):
+        store, first_generation, second_generation = self._replace_twice(ScoreStore)
+
+        call_command('cleanup_biz_store_generations', grace_hours=1)
+
+        self.assertEqual(1, store.get_generation_count(first_generation))
+        self.assertEqual(1, store.get_generation_count(second_generation))
+
+    @override_settings(BIZ_STORE_GENERATION_GRACE_HOURS=0)
+    def test_expired(self):
+        stores = [self._replace_twice(store_class) for store_class in [ScoreStore, PlaybackStore]]
+
+        call_command('cleanup_biz_store_generations')
+
+        for store, first_generation, second_generation in stores:
+            self.assertEqual(0, store.get_generation_count(first_generation))
+            self.assertEqual(1, store.get_generation_count(second_generation))
+            self.assertIn(
+                '{}_1'.format(ScoreStore.FIELD_GENERATION_KEY),
+                store._collection.index_information(),  # pylint: disable=protected-access
+            )
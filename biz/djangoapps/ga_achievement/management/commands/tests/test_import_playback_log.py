@@ -8,7 +8,7 @@ from django.core.management.base import CommandError
 from django.test import TestCase
 from django.test.utils import override_settings
 
-from biz.djangoapps.ga_achievement.log_store import PlaybackLogStore
+from biz.djangoapps.ga_achievement.log_store import PlaybackLogStore, PlaybackLogSummaryStore
 from biz.djangoapps.ga_achievement.management.commands import import_playback_log
 from biz.djangoapps.util.tests.testcase import BizStoreTestBase
 
@@ -52,6 +52,12 @@ class ImportPlaybackLogTest(BizStoreTestBase):
         self.mock_decorators_log = patcher_decorators_log.start()
         self.addCleanup(patcher_decorators_log.stop)
 
+    def _set_csv_data(self, mock_open_bucket_from_s3, lines, read_size=None):
+        data = "\n".join(lines)
+        read_size = read_size or len(data) or 1
+        chunks = [data[i:i + read_size] for i in range(0, len(data), read_size)]
+        mock_open_bucket_from_s3.return_value.__enter__.return_value.get_key.return_value.read.side_effect = chunks + ['']
+
     @patch('biz.djangoapps.ga_achievement.management.commands.import_playback_log.open_bucket_from_s3')
     def test_no_csv_file(self, mock_open_bucket_from_s3):
         mock_open_bucket_from_s3.return_value.__enter__.return_value.get_key.return_value = None
@@ -63,7 +69,7 @@ class ImportPlaybackLogTest(BizStoreTestBase):
 
     @patch('biz.djangoapps.ga_achievement.management.commands.import_playback_log.open_bucket_from_s3')
     def test_no_csv_data(self, mock_open_bucket_from_s3):
-        mock_open_bucket_from_s3.return_value.__enter__.return_value.get_key.return_value.get_contents_as_string.return_value = "\n".join([
+        self._set_csv_data(mock_open_bucket_from_s3, [
             'skip-first-line',
         ])
         call_command('import_playback_log', target_date='20180404')
@@ -78,7 +84,7 @@ class ImportPlaybackLogTest(BizStoreTestBase):
 
     @patch('biz.djangoapps.ga_achievement.management.commands.import_playback_log.open_bucket_from_s3')
     def test_one_data(self, mock_open_bucket_from_s3):
-        mock_open_bucket_from_s3.return_value.__enter__.return_value.get_key.return_value.get_contents_as_string.return_value = "\n".join([
+        self._set_csv_data(mock_open_bucket_from_s3, [
             'skip-first-line',
             'col-0,col-1,00:00:01,col-3,col-4,course_id=course-id&target_id=target-id&vertical_id=vertical-id',
         ])
@@ -97,7 +103,7 @@ class ImportPlaybackLogTest(BizStoreTestBase):
     @patch('biz.djangoapps.ga_achievement.management.commands.import_playback_log.datetime_utils.timezone_yesterday')
     def test_one_data_yesterday(self, mock_timezone_yesterday, mock_open_bucket_from_s3):
         mock_timezone_yesterday.return_value.strftime.return_value = '20180404'
-        mock_open_bucket_from_s3.return_value.__enter__.return_value.get_key.return_value.get_contents_as_string.return_value = "\n".join([
+        self._set_csv_data(mock_open_bucket_from_s3, [
             'skip-first-line',
             'col-0,col-1,00:00:01,col-3,col-4,course_id=course-id&target_id=target-id&vertical_id=vertical-id',
         ])
@@ -114,7 +120,7 @@ class ImportPlaybackLogTest(BizStoreTestBase):
 
     @patch('biz.djangoapps.ga_achievement.management.commands.import_playback_log.open_bucket_from_s3')
     def test_skip_data(self, mock_open_bucket_from_s3):
-        mock_open_bucket_from_s3.return_value.__enter__.return_value.get_key.return_value.get_contents_as_string.return_value = "\n".join([
+        self._set_csv_data(mock_open_bucket_from_s3, [
             'skip-first-line',
             'col-0,col-1,col-2,col-3,col-4,course_id=course-id&target_id=target-id&vertical_id=vertical-id',
             'col-0,col-1,00:00:00,col-3,col-4,course_id=course-id&target_id=target-id&vertical_id=vertical-id',
@@ -135,7 +141,7 @@ class ImportPlaybackLogTest(BizStoreTestBase):
 
     @patch('biz.djangoapps.ga_achievement.management.commands.import_playback_log.open_bucket_from_s3')
     def test_merge_data(self, mock_open_bucket_from_s3):
-        mock_open_bucket_from_s3.return_value.__enter__.return_value.get_key.return_value.get_contents_as_string.return_value = "\n".join([
+        self._set_csv_data(mock_open_bucket_from_s3, [
             'skip-first-line',
             'col-0,col-1,00:00:01,col-3,col-4,course_id=course-id&target_id=target-id&vertical_id=vertical-id',
             'col-0,col-1,00:00:02,col-3,col-4,course_id=course-id&target_id=target-id&vertical_id=vertical-id',
@@ -153,7 +159,7 @@ class ImportPlaybackLogTest(BizStoreTestBase):
 
     @patch('biz.djangoapps.ga_achievement.management.commands.import_playback_log.open_bucket_from_s3')
     def test_calc_duration(self, mock_open_bucket_from_s3):
-        mock_open_bucket_from_s3.return_value.__enter__.return_value.get_key.return_value.get_contents_as_string.return_value = "\n".join([
+        self._set_csv_data(mock_open_bucket_from_s3, [
             'skip-first-line',
             'col-0,col-1,01:01:01,col-3,col-4,course_id=course-id&target_id=target-id&vertical_id=vertical-id',
             'col-0,col-1,10:10:10,col-3,col-4,course_id=course-id&target_id=target-id&vertical_id=vertical-id',
@@ -175,7 +181,7 @@ class ImportPlaybackLogTest(BizStoreTestBase):
 
     @patch('biz.djangoapps.ga_achievement.management.commands.import_playback_log.open_bucket_from_s3')
     def test_can_not_remove(self, mock_open_bucket_from_s3):
-        mock_open_bucket_from_s3.return_value.__enter__.return_value.get_key.return_value.get_contents_as_string.return_value = "\n".join([
+        self._set_csv_data(mock_open_bucket_from_s3, [
             'skip-first-line',
             'col-0,col-1,00:00:01,col-3,col-4,course_id=course-id&target_id=target-id&vertical_id=vertical-id',
         ])
@@ -190,7 +196,7 @@ class ImportPlaybackLogTest(BizStoreTestBase):
 
     @patch('biz.djangoapps.ga_achievement.management.commands.import_playback_log.open_bucket_from_s3')
     def test_can_not_store(self, mock_open_bucket_from_s3):
-        mock_open_bucket_from_s3.return_value.__enter__.return_value.get_key.return_value.get_contents_as_string.return_value = "\n".join([
+        self._set_csv_data(mock_open_bucket_from_s3, [
             'skip-first-line',
             'col-0,col-1,00:00:01,col-3,col-4,course_id=course-id&target_id=target-id&vertical_id=vertical-id',
         ])
@@ -206,7 +212,7 @@ class ImportPlaybackLogTest(BizStoreTestBase):
 
     @patch('biz.djangoapps.ga_achievement.management.commands.import_playback_log.open_bucket_from_s3')
     def test_has_duplicate(self, mock_open_bucket_from_s3):
-        mock_open_bucket_from_s3.return_value.__enter__.return_value.get_key.return_value.get_contents_as_string.return_value = "\n".join([
+        self._set_csv_data(mock_open_bucket_from_s3, [
             'skip-first-line',
             'col-0,col-1,00:00:01,col-3,col-4,course_id=course-id&target_id=target-id&vertical_id=vertical-id',
         ])
@@ -220,3 +226,116 @@ class ImportPlaybackLogTest(BizStoreTestBase):
 
         self.assertEqual(1, self.mock_decorators_log.info.call_count)
         self.assertEqual(1, self.mock_decorators_log.error.call_count)
+
+    @override_settings(BIZ_IMPORT_PLAYBACK_LOG_MAX_AGGREGATE_KEYS=2, BIZ_STORE_INSERT_CHUNK_SIZE=2)
+    @patch('biz.djangoapps.ga_achievement.management.commands.import_playback_log.open_bucket_from_s3')
+    def test_spill_and_chunked_store(self, mock_open_bucket_from_s3):
+        # Note: Read in small chunks to split lines across chunks
+        self._set_csv_data(mock_open_bucket_from_s3, [
+            'skip-first-line',
+            'col-0,col-1,00:00:01,col-3,col-4,course_id=course-id&target_id=target-id-1&vertical_id=vertical-id',
+            'col-0,col-1,00:00:02,col-3,col-4,course_id=course-id&target_id=target-id-2&vertical_id=vertical-id',
+            'col-0,col-1,00:00:03,col-3,col-4,course_id=course-id&target_id=target-id-3&vertical_id=vertical-id',
+            'col-0,col-1,00:00:04,col-3,col-4,course_id=course-id&target_id=target-id-1&vertical_id=vertical-id',
+            'col-0,col-1,00:00:05,col-3,col-4,course_id=course-id&target_id=target-id-3&vertical_id=vertical-id',
+        ], read_size=7)
+        with patch('biz.djangoapps.ga_achievement.management.commands.import_playback_log.PlaybackLogStore.set_documents') as mock_set_documents, \
+                patch('biz.djangoapps.ga_achievement.management.commands.import_playback_log.PlaybackLogStore.get_count', side_effect=[0, 3]):
+            call_command('import_playback_log', target_date='20180404')
+
+        self.mock_log.info.assert_any_call('Command import_playback_log get data from [playback-log-bucket/playbacklog/2018/04/04/mv_play_log_20180404.csv], record count(3), skip row count(0).')
+        self.mock_log.info.assert_any_call('Command import_playback_log stored mongo records of 2018-04-04 00:00:00, record count(3).')
+        self.assertEqual(0, self.mock_decorators_log.error.call_count)
+
+        self.assertEqual(2, mock_set_documents.call_count)
+        stored = [document for args, __ in mock_set_documents.call_args_list for document in args[0]]
+        self.assertEqual(
+            [('target-id-1', 5), ('target-id-2', 2), ('target-id-3', 8)],
+            [(d[PlaybackLogStore.FIELD_TARGET_ID], d[PlaybackLogStore.FIELD_DURATION]) for d in stored]
+        )
+
+    @patch('biz.djangoapps.ga_achievement.management.commands.import_playback_log.open_bucket_from_s3')
+    def test_update_summary(self, mock_open_bucket_from_s3):
+        self._set_csv_data(mock_open_bucket_from_s3, [
+            'skip-first-line',
+            'col-0,col-1,00:00:01,col-3,col-4,course_id=course-id&target_id=target-id-1&vertical_id=vertical-id',
+            'col-0,col-1,00:00:02,col-3,col-4,course_id=course-id&target_id=target-id-2&vertical_id=vertical-id',
+        ])
+        call_command('import_playback_log', target_date='20180404')
+        self._set_csv_data(mock_open_bucket_from_s3, [
+            'skip-first-line',
+            'col-0,col-1,00:00:10,col-3,col-4,course_id=course-id&target_id=target-id-1&vertical_id=vertical-id',
+        ])
+        call_command('import_playback_log', target_date='20180405')
+        self.assertEqual({
+            'vertical-id___target-id-1': 11,
+            'vertical-id___target-id-2': 2,
+        }, PlaybackLogSummaryStore('course-id').get_duration_by_vertical_and_target())
+
+        # Import again for the same date
+        self._set_csv_data(mock_open_bucket_from_s3, [
+            'skip-first-line',
+            'col-0,col-1,00:00:05,col-3,col-4,course_id=course-id&target_id=target-id-1&vertical_id=vertical-id',
+        ])
+        call_command('import_playback_log', target_date='20180404')
+        self.assertEqual({
+            'vertical-id___target-id-1': 15,
+            'vertical-id___target-id-2': 0,
+        }, PlaybackLogSummaryStore('course-id').get_duration_by_vertical_and_target())
+
+        self.mock_log.info.assert_any_call('Command import_playback_log updated summary of playback log for 2018-04-04 00:00:00.')
+        self.assertEqual(0, self.mock_decorators_log.error.call_count)
+
+    @patch('biz.djangoapps.ga_achievement.management.commands.import_playback_log.open_bucket_from_s3')
+    def test_update_summary_interrupted(self, mock_open_bucket_from_s3):
+        self._set_csv_data(mock_open_bucket_from_s3, [
+            'skip-first-line',
+            'col-0,col-1,00:00:01,col-3,col-4,course_id=course-id&target_id=target-id-1&vertical_id=vertical-id',
+        ])
+        call_command('import_playback_log', target_date='20180404')
+        self._set_csv_data(mock_open_bucket_from_s3, [
+            'skip-first-line',
+            'col-0,col-1,00:00:10,col-3,col-4,course_id=course-id&target_id=target-id-1&vertical_id=vertical-id',
+        ])
+        with patch.object(PlaybackLogStore, 'has_duplicate_record', side_effect=Exception()):
+            call_command('import_playback_log', target_date='20180405')
+        self.assertFalse(PlaybackLogSummaryStore().is_built())
+
+        # The summary is rebuilt instead of being updated incrementally
+        self._set_csv_data(mock_open_bucket_from_s3, [
+            'skip-first-line',
+            'col-0,col-1,00:00:05,col-3,col-4,course_id=course-id&target_id=target-id-1&vertical_id=vertical-id',
+        ])
+        call_command('import_playback_log', target_date='20180406')
+        self.assertTrue(PlaybackLogSummaryStore().is_built())
+        self.assertEqual({
+            'vertical-id___target-id-1': 16,
+        }, PlaybackLogSummaryStore('course-id').get_duration_by_vertical_and_target())
+        self.mock_log.warning.assert_any_call(
+            "Command import_playback_log found the summary of playback log is not built, so rebuild it.")
+
+    @patch('biz.djangoapps.ga_achievement.management.commands.import_playback_log.open_bucket_from_s3')
+    def test_rebuild_summary(self, mock_open_bucket_from_s3):
+        PlaybackLogStore().set_documents([{
+            PlaybackLogStore.FIELD_COURSE_ID: 'course-id',
+            PlaybackLogStore.FIELD_VERTICAL_ID: 'vertical-id',
+            PlaybackLogStore.FIELD_TARGET_ID: 'target-id',
+            PlaybackLogStore.FIELD_DURATION: 100,
+            PlaybackLogStore.FIELD_CREATED_AT: datetime.strptime('20180403', '%Y%m%d'),
+        }])
+        self._set_csv_data(mock_open_bucket_from_s3, [
+            'skip-first-line',
+            'col-0,col-1,00:00:01,col-3,col-4,course_id=course-id&target_id=target-id&vertical_id=vertical-id',
+            'col-0,col-1,00:00:02,col-3,col-4,course_id=other-course-id&target_id=target-id&vertical_id=vertical-id',
+        ])
+        call_command('import_playback_log', target_date='20180404', rebuild_summary=True)
+
+        self.mock_log.info.assert_any_call('Command import_playback_log rebuilt summary of playback log, record count(2).')
+        self.assertEqual(
+            {'vertical-id___target-id': 101},
+            PlaybackLogSummaryStore('course-id').get_duration_by_vertical_and_target()
+        )
+        self.assertEqual(
+            {'vertical-id___target-id': 2},
+            PlaybackLogSummaryStore('other-course-id').get_duration_by_vertical_and_target()
+        )
@@ -18,6 +18,7 @@ from django.test import TestCase
 from django.test.utils import override_settings
 
 from biz.djangoapps.ga_achievement.achievement_store import PlaybackStore
+from biz.djangoapps.ga_achievement.log_store import PlaybackLogStore, PlaybackLogSummaryStore
 from biz.djangoapps.ga_achievement.management.commands import update_biz_playback_status
 from biz.djangoapps.ga_achievement.management.commands.update_biz_playback_status import (
     TargetVertical, GroupedTargetVerticals, get_grouped_target_verticals
@@ -226,7 +227,7 @@ class UpdateBizPlaybackStatusTest(BizStoreTestBase, ModuleStoreTestCase, LoginEn
         )
 
         # Setup mock
-        patcher_aggregate = patch.object(update_biz_playback_status.PlaybackLogStore, 'aggregate_sum')
+        patcher_aggregate = patch.object(update_biz_playback_status.PlaybackLogSummaryStore, 'get_duration_by_vertical_and_target')
         self.mock_aggregate = patcher_aggregate.start()
         self.mock_aggregate.return_value = {}
         self.addCleanup(patcher_aggregate.stop)
@@ -235,6 +236,9 @@ class UpdateBizPlaybackStatusTest(BizStoreTestBase, ModuleStoreTestCase, LoginEn
         self.mock_log = patcher_log.start()
         self.addCleanup(patcher_log.stop)
 
+        # Note: The summary of playback log is regarded as built by import_playback_log
+        PlaybackLogSummaryStore().end_update()
+
     def _profile(self, user):
         UserProfileFactory.create(user=user, name='profile_name')
 
@@ -662,6 +666,25 @@ class UpdateBizPlaybackStatusTest(BizStoreTestBase, ModuleStoreTestCase, LoginEn
         self.assert_finished(100, self.multiple_courses_contract, self.single_spoc_video_course)
         self.assert_finished(100, self.multiple_courses_contract, self.multiple_spoc_video_course)
 
+    def test_rebuild_summary_if_not_built(self):
+        PlaybackLogStore().set_documents([{
+            PlaybackLogStore.FIELD_COURSE_ID: unicode(self.single_spoc_video_course.id),
+            PlaybackLogStore.FIELD_VERTICAL_ID: 'vertical-id',
+            PlaybackLogStore.FIELD_TARGET_ID: 'target-id',
+            PlaybackLogStore.FIELD_DURATION: 100,
+            PlaybackLogStore.FIELD_CREATED_AT: datetime(2018, 4, 4),
+        }])
+        # An update of the summary has been interrupted
+        PlaybackLogSummaryStore().begin_update()
+        self._register_contract(self.single_spoc_video_contract, self.user)
+
+        call_command('update_biz_playback_status', self.single_spoc_video_contract.id)
+
+        self.assertTrue(PlaybackLogSummaryStore().is_built())
+        self.mock_log.warning.assert_any_call(u"Summary of playback log is not built, so rebuild it.")
+        self.mock_log.info.assert_any_call(u"Rebuilt summary of playback log, record count(1).")
+        self.assert_finished(1, self.single_spoc_video_contract, self.single_spoc_video_course)
+
     def test_course_does_not_exist(self):
 
         not_exist_course_id = CourseKey.from_string('course-v1:not+exist+course')
@@ -726,13 +749,6 @@ class UpdateBizPlaybackStatusTest(BizStoreTestBase, ModuleStoreTestCase, LoginEn
 
         call_command('update_biz_playback_status', self.multiple_courses_contract.id)
 
-        self.mock_log.info.assert_any_call(
-            u'Removed PlaybackStore records. contract_id={} course_id={}'.format(
-                self.multiple_courses_contract.id, self.single_spoc_video_course.id))
-        self.mock_log.info.assert_any_call(
-            u'Removed PlaybackStore records. contract_id={} course_id={}'.format(
-                self.multiple_courses_contract.id, self.multiple_spoc_video_course.id))
-
         self.mock_log.info.assert_any_call(
             u'Stored PlaybackStore record count(100). contract_id={} course_id={}'.format(
                 self.multiple_courses_contract.id, self.single_spoc_video_course.id))
@@ -743,92 +759,54 @@ class UpdateBizPlaybackStatusTest(BizStoreTestBase, ModuleStoreTestCase, LoginEn
         PlaybackBatchStatus.objects.get(contract=self.multiple_courses_contract, course_id=self.single_spoc_video_course.id, status=BATCH_STATUS_FINISHED, student_count=100)
         PlaybackBatchStatus.objects.get(contract=self.multiple_courses_contract, course_id=self.multiple_spoc_video_course.id, status=BATCH_STATUS_FINISHED, student_count=100)
 
-    @override_settings(
-        MAX_RETRY_REMOVE_DOCUMENTS=3,
-        SLEEP_RETRY_REMOVE_DOCUMENTS=3,
-        MAX_RETRY_SET_DOCUMENTS=3,
-        SLEEP_RETRY_SET_DOCUMENTS=3,
-    )
-    @patch('biz.djangoapps.ga_achievement.management.commands.update_biz_playback_status.time.sleep')
-    def test_error_log_can_not_remove_documents(self, mock_time_sleep):
-        for var in range(0, 50):
-            user = UserFactory.create()
-            self._input_contract(self.multiple_courses_contract, user)
-        for var in range(0, 50):
+    def test_replace_generation(self):
+        for var in range(0, 3):
             user = UserFactory.create()
             self._register_contract(self.multiple_courses_contract, user, additional_value=ADDITIONAL_SETTINGS_VALUE)
 
-        with patch('biz.djangoapps.ga_achievement.management.commands.update_biz_playback_status.PlaybackStore.get_count', return_value=100):
-            call_command('update_biz_playback_status', self.multiple_courses_contract.id)
-
-        for i in range(3):
-            self.mock_log.warning.assert_any_call(
-                u'Can not remove(try:{},sleep:3) PlaybackStore record count(100). contract_id={} course_id={}'.format(
-                    i + 1, self.multiple_courses_contract.id, self.single_spoc_video_course.id))
-        for i in range(3):
-            self.mock_log.warning.assert_any_call(
-                u'Can not remove(try:{},sleep:3) PlaybackStore record count(100). contract_id={} course_id={}'.format(
-                    i + 1, self.multiple_courses_contract.id, self.multiple_spoc_video_course.id))
-
-        self.assertEqual(6, mock_time_sleep.call_count)
-        mock_time_sleep.assert_any_call(3)
+        call_command('update_biz_playback_status', self.multiple_courses_contract.id)
+        store = PlaybackStore(self.multiple_courses_contract.id, unicode(self.single_spoc_video_course.id))
+        first_generation = store.get_active_generation()
+        first_count = store.get_count()
+        self.assertIsNotNone(first_generation)
 
-        self.mock_log.exception.assert_any_call(
-            u'Unexpected error occurred: Can not remove PlaybackStore record count(100). contract_id={} course_id={}'.format(
-                self.multiple_courses_contract.id, self.single_spoc_video_course.id))
-        self.mock_log.exception.assert_any_call(
-            u'Unexpected error occurred: Can not remove PlaybackStore record count(100). contract_id={} course_id={}'.format(
-                self.multiple_courses_contract.id, self.multiple_spoc_video_course.id))
+        call_command('update_biz_playback_status', self.multiple_courses_contract.id)
+        store = PlaybackStore(self.multiple_courses_contract.id, unicode(self.single_spoc_video_course.id))
+        self.assertNotEqual(first_generation, store.get_active_generation())
+        self.assertEqual(first_count, store.get_count())
+        # Documents of the previous generation are kept for readers which still see it
+        self.assertEqual(first_count, store.get_generation_count(first_generation))
 
-        PlaybackBatchStatus.objects.get(contract=self.multiple_courses_contract, course_id=self.single_spoc_video_course.id, status=BATCH_STATUS_ERROR, student_count=None)
-        PlaybackBatchStatus.objects.get(contract=self.multiple_courses_contract, course_id=self.multiple_spoc_video_course.id, status=BATCH_STATUS_ERROR, student_count=None)
+        call_command('cleanup_biz_store_generations', grace_hours=0)
+        self.assertEqual(0, store.get_generation_count(first_generation))
+        self.assertEqual(first_count, PlaybackStore(self.multiple_courses_contract.id, unicode(self.single_spoc_video_course.id)).get_count())
 
-    @override_settings(
-        MAX_RETRY_REMOVE_DOCUMENTS=3,
-        SLEEP_RETRY_REMOVE_DOCUMENTS=0,
-        MAX_RETRY_SET_DOCUMENTS=3,
-        SLEEP_RETRY_SET_DOCUMENTS=0,
-    )
-    @patch('biz.djangoapps.ga_achievement.management.commands.update_biz_playback_status.time.sleep')
-    def test_error_log_can_not_set_documents(self, mock_time_sleep):
+    def test_error_log_can_not_set_documents(self):
         for var in range(0, 50):
             user = UserFactory.create()
             self._input_contract(self.multiple_courses_contract, user)
         for var in range(0, 50):
             user = UserFactory.create()
             self._register_contract(self.multiple_courses_contract, user, additional_value=ADDITIONAL_SETTINGS_VALUE)
+        call_command('update_biz_playback_status', self.multiple_courses_contract.id)
+        stored_counts = [PlaybackStore(self.multiple_courses_contract.id, unicode(course.id)).get_count() for course in [self.single_spoc_video_course, self.multiple_spoc_video_course]]
 
-        with patch('biz.djangoapps.ga_achievement.management.commands.update_biz_playback_status.PlaybackStore.get_count', return_value=0):
+        with patch('biz.djangoapps.ga_achievement.management.commands.update_biz_playback_status.PlaybackStore.get_generation_count', return_value=0):
             call_command('update_biz_playback_status', self.multiple_courses_contract.id)
 
-        self.mock_log.info.assert_any_call(
-            u'Removed PlaybackStore records. contract_id={} course_id={}'.format(
-                self.multiple_courses_contract.id, self.single_spoc_video_course.id))
-        self.mock_log.info.assert_any_call(
-            u'Removed PlaybackStore records. contract_id={} course_id={}'.format(
-                self.multiple_courses_contract.id, self.multiple_spoc_video_course.id))
-
-        for i in range(3):
-            self.mock_log.warning.assert_any_call(
-                u'Can not store(try:{},sleep:0) PlaybackStore record count(-1) does not match Contract Register record count(100) or records count(100). contract_id={} course_id={}'.format(
-                    i + 1, self.multiple_courses_contract.id, self.single_spoc_video_course.id))
-        for i in range(3):
-            self.mock_log.warning.assert_any_call(
-                u'Can not store(try:{},sleep:0) PlaybackStore record count(-1) does not match Contract Register record count(100) or records count(100). contract_id={} course_id={}'.format(
-                    i + 1, self.multiple_courses_contract.id, self.multiple_spoc_video_course.id))
-
-        mock_time_sleep.assert_not_called()
-
         self.mock_log.exception.assert_any_call(
-            u'Unexpected error occurred: PlaybackStore record count(-1) does not match Contract Register record count(100) or records count(100). contract_id={} course_id={}'.format(
+            u'Unexpected error occurred: PlaybackStore record count(0) does not match Contract Register record count(100) or records count(100). contract_id={} course_id={}'.format(
                 self.multiple_courses_contract.id, self.single_spoc_video_course.id))
         self.mock_log.exception.assert_any_call(
-            u'Unexpected error occurred: PlaybackStore record count(-1) does not match Contract Register record count(100) or records count(100). contract_id={} course_id={}'.format(
+            u'Unexpected error occurred: PlaybackStore record count(0) does not match Contract Register record count(100) or records count(100). contract_id={} course_id={}'.format(
                 self.multiple_courses_contract.id, self.multiple_spoc_video_course.id))
 
         PlaybackBatchStatus.objects.get(contract=self.multiple_courses_contract, course_id=self.single_spoc_video_course.id, status=BATCH_STATUS_ERROR, student_count=None)
         PlaybackBatchStatus.objects.get(contract=self.multiple_courses_contract, course_id=self.multiple_spoc_video_course.id, status=BATCH_STATUS_ERROR, student_count=None)
 
+        # Records stored by the previous batch are still visible
+        self.assertEqual(stored_counts, [PlaybackStore(self.multiple_courses_contract.id, unicode(course.id)).get_count() for course in [self.single_spoc_video_course, self.multiple_spoc_video_course]])
+
 
 class TestGroupedTargetVerticals(ModuleStoreTestCase):
     """
@@ -25,6 +25,7 @@ from biz.djangoapps.ga_achievement.management.commands.update_biz_score_status i
 from biz.djangoapps.ga_achievement.models import ScoreBatchStatus, BATCH_STATUS_STARTED, BATCH_STATUS_FINISHED, BATCH_STATUS_ERROR
 from biz.djangoapps.ga_achievement.tests.factories import ScoreBatchStatusFactory
 from biz.djangoapps.ga_contract.tests.factories import ContractAuthFactory
+from biz.djangoapps.ga_invitation.models import AdditionalInfoSetting, ContractRegister
 from biz.djangoapps.ga_login.tests.factories import BizUserFactory
 from biz.djangoapps.util.decorators import ExitWithWarning
 from biz.djangoapps.util.tests.testcase import BizStoreTestBase
@@ -32,6 +33,7 @@ from certificates.models import CertificateStatuses, GeneratedCertificate
 from certificates.tests.factories import GeneratedCertificateFactory
 from courseware import grades
 from courseware.grades import _Score
+from courseware.tests.factories import StudentModuleFactory
 from courseware.tests.helpers import LoginEnrollmentTestCase
 from opaque_keys.edx.keys import CourseKey
 from student.models import CourseEnrollment
@@ -63,6 +65,23 @@ DEFAULT_KEY = [
 BlockInfo = namedtuple('BlockInfo', 'block_id, category, fields, sub_tree')
 
 
+class _SerialPool(object):
+    """
+    A fake of multiprocessing.Pool which runs tasks in the same process
+    """
+    def __init__(self, processes, initializer=None):
+        pass
+
+    def apply_async(self, func, args):
+        return update_biz_score_status._Result(func(*args))
+
+    def close(self):
+        pass
+
+    def join(self):
+        pass
+
+
 class TestArgParsing(TestCase):
     """
     Tests for parsing arguments of the `update_biz_score_status` command
@@ -108,6 +127,16 @@ class TestArgParsing(TestCase):
         with self.assertRaisesRegexp(CommandError, errstring):
             self.command.handle._original(self.command, 1, 2)
 
+    def test_invalid_workers(self):
+        errstring = "workers and chunk_size should be specified as positive integers."
+        with self.assertRaisesRegexp(CommandError, errstring):
+            self.command.handle._original(self.command, workers=0)
+
+    def test_invalid_chunk_size(self):
+        errstring = "workers and chunk_size should be specified as positive integers."
+        with self.assertRaisesRegexp(CommandError, errstring):
+            self.command.handle._original(self.command, chunk_size=0)
+
     def test_invalid_contract_id(self):
         """
         Tests for the case when invalid contract_id is specified
@@ -858,7 +887,7 @@ class UpdateBizScoreStatusTest(BizStoreTestBase, ModuleStoreTestCase, LoginEnrol
         self._input_contract(another_contract, self.user)
 
         with patch(
-                'biz.djangoapps.ga_achievement.management.commands.update_biz_score_status.ScoreStore.remove_documents',
+                'biz.djangoapps.ga_achievement.management.commands.update_biz_score_status.ScoreStore.set_generation_documents',
                 side_effect=Exception()):
             call_command('update_biz_score_status')
 
@@ -899,6 +928,111 @@ class UpdateBizScoreStatusTest(BizStoreTestBase, ModuleStoreTestCase, LoginEnrol
         self.assert_finished(1, self.contract, self.course1)
         self.assert_finished(1, self.contract, self.course2)
 
+    def test_incremental_without_finished_status(self):
+        self._register_contract(self.contract, self.user)
+
+        call_command('update_biz_score_status', incremental=True)
+
+        self.assert_finished(1, self.contract, self.course1)
+        self.assert_finished(1, self.contract, self.course2)
+        self.assertEquals(self.mock_grade.call_count, 2)
+        self.mock_log.info.assert_any_call(
+            u'Cannot update ScoreStore incrementally, so update all records. contract_id={} course_id={}'.format(
+                self.contract.id, self.course1.id))
+
+    def test_incremental(self):
+        self._register_contract(self.contract, self.user)
+        changed_user = UserFactory.create()
+        self._register_contract(self.contract, changed_user)
+        unregistered_user = UserFactory.create()
+        self._register_contract(self.contract, unregistered_user)
+        call_command('update_biz_score_status', self.contract.id)
+        self.assertEquals(self.mock_grade.call_count, 6)
+
+        self.mock_grade.reset_mock()
+        StudentModuleFactory.create(student=changed_user, course_id=self.course1.id)
+        ContractRegister.objects.filter(contract=self.contract, user=unregistered_user).delete()
+
+        call_command('update_biz_score_status', self.contract.id, incremental=True)
+
+        # Only the user who made progress in course1 is regraded
+        self.assertEquals(self.mock_grade.call_count, 1)
+        self.assertEquals(self.mock_grade.call_args[0][0], changed_user)
+        for course in [self.course1, self.course2]:
+            self.assertEquals(ScoreBatchStatus.objects.filter(
+                contract=self.contract, course_id=course.id, status=BATCH_STATUS_FINISHED, student_count=2).count(), 1)
+            score_store = ScoreStore(self.contract.id, unicode(course.id))
+            self.assertEquals(score_store.get_count(), 3)
+            self.assertIsNone(score_store.get_record_document_by_username(unregistered_user.username))
+
+    def test_incremental_changed_attributes(self):
+        self._register_contract(self.contract, self.user, additional_value=ADDITIONAL_SETTINGS_VALUE)
+        email_changed_user = UserFactory.create()
+        self._register_contract(self.contract, email_changed_user, additional_value=ADDITIONAL_SETTINGS_VALUE)
+        additional_info_changed_user = UserFactory.create()
+        self._register_contract(self.contract, additional_info_changed_user, additional_value=ADDITIONAL_SETTINGS_VALUE)
+        call_command('update_biz_score_status', self.contract.id)
+
+        self.mock_grade.reset_mock()
+        email_changed_user.email = 'changed_{}'.format(email_changed_user.email)
+        email_changed_user.save()
+        # Note: Update the value of existing setting as AdditionalInfoSetting.set_value does
+        setting = AdditionalInfoSetting.objects.filter(
+            contract=self.contract, user=additional_info_changed_user, display_name=ADDITIONAL_DISPLAY_NAME1).get()
+        setting.value = 'changed_value'
+        setting.save()
+
+        call_command('update_biz_score_status', self.contract.id, incremental=True)
+
+        # Only the users whose attributes have changed are regraded for each course
+        self.assertEquals(self.mock_grade.call_count, 4)
+        self.assertItemsEqual(
+            [email_changed_user, additional_info_changed_user] * 2,
+            [call_args[0][0] for call_args in self.mock_grade.call_args_list])
+        for course in [self.course1, self.course2]:
+            score_store = ScoreStore(self.contract.id, unicode(course.id))
+            self.assertEquals(
+                score_store.get_record_document_by_username(email_changed_user.username)[ScoreStore.FIELD_EMAIL],
+                email_changed_user.email)
+            self.assertEquals(
+                score_store.get_record_document_by_username(additional_info_changed_user.username)[
+                    u"{}{}{}".format(ScoreStore.FIELD_ADDITIONAL_INFO, ScoreStore.FIELD_DELIMITER, ADDITIONAL_DISPLAY_NAME1)],
+                'changed_value')
+
+    @patch('biz.djangoapps.ga_achievement.management.commands.update_biz_score_status.db.connections.close_all')
+    @patch('biz.djangoapps.ga_achievement.management.commands.update_biz_score_status.Pool', new=_SerialPool)
+    def test_workers(self, mock_close_all):
+        self.addCleanup(update_biz_score_status._worker_courses.clear)
+        users = [UserFactory.create() for __ in range(3)]
+        for user in users:
+            self._register_contract(self.contract, user)
+
+        call_command('update_biz_score_status', self.contract.id, workers=2, chunk_size=2)
+
+        mock_close_all.assert_called_once_with()
+        for course in [self.course1, self.course2]:
+            column_list, record_list = self.assert_finished(3, self.contract, course)
+            self.assert_column_list(column_list, self.contract, course)
+            self.assertEquals(
+                [user.username for user in users],
+                [record[ScoreStore.FIELD_USERNAME] for record in record_list]
+            )
+        self.assertEquals(self.mock_grade.call_count, 6)
+
+    @patch('biz.djangoapps.ga_achievement.management.commands.update_biz_score_status.db.connections.close_all')
+    @patch('biz.djangoapps.ga_achievement.management.commands.update_biz_score_status.Pool', new=_SerialPool)
+    def test_workers_error(self, mock_close_all):
+        self.addCleanup(update_biz_score_status._worker_courses.clear)
+        self._register_contract(self.contract, self.user)
+
+        with patch(
+                'biz.djangoapps.ga_achievement.management.commands.update_biz_score_status.get_record',
+                side_effect=Exception()):
+            call_command('update_biz_score_status', self.contract.id, workers=2)
+
+        self.assert_error(self.contract, self.course1.id)
+        self.assert_error(self.contract, self.course2.id)
+
     def test_success_log(self):
         for var in range(0, 50):
             user = UserFactory.create()
@@ -909,13 +1043,6 @@ class UpdateBizScoreStatusTest(BizStoreTestBase, ModuleStoreTestCase, LoginEnrol
 
         call_command('update_biz_score_status', self.contract.id)
 
-        self.mock_log.info.assert_any_call(
-            u'Removed ScoreStore records. contract_id={} course_id={}'.format(
-                self.contract.id, self.course1.id))
-        self.mock_log.info.assert_any_call(
-            u'Removed ScoreStore records. contract_id={} course_id={}'.format(
-                self.contract.id, self.course2.id))
-
         self.mock_log.info.assert_any_call(
             u'Stored ScoreStore record count(100). contract_id={} course_id={}'.format(
                 self.contract.id, self.course1.id))
@@ -926,92 +1053,54 @@ class UpdateBizScoreStatusTest(BizStoreTestBase, ModuleStoreTestCase, LoginEnrol
         ScoreBatchStatus.objects.get(contract=self.contract, course_id=self.course1.id, status=BATCH_STATUS_FINISHED, student_count=100)
         ScoreBatchStatus.objects.get(contract=self.contract, course_id=self.course2.id, status=BATCH_STATUS_FINISHED, student_count=100)
 
-    @override_settings(
-        MAX_RETRY_REMOVE_DOCUMENTS=3,
-        SLEEP_RETRY_REMOVE_DOCUMENTS=3,
-        MAX_RETRY_SET_DOCUMENTS=3,
-        SLEEP_RETRY_SET_DOCUMENTS=3,
-    )
-    @patch('biz.djangoapps.ga_achievement.management.commands.update_biz_score_status.time.sleep')
-    def test_error_log_can_not_remove_documents(self, mock_time_sleep):
-        for var in range(0, 50):
-            user = UserFactory.create()
-            self._input_contract(self.contract, user)
-        for var in range(0, 50):
+    def test_replace_generation(self):
+        for var in range(0, 3):
             user = UserFactory.create()
             self._register_contract(self.contract, user, additional_value=ADDITIONAL_SETTINGS_VALUE)
 
-        with patch('biz.djangoapps.ga_achievement.management.commands.update_biz_score_status.ScoreStore.get_count', return_value=100):
-            call_command('update_biz_score_status', self.contract.id)
-
-        for i in range(3):
-            self.mock_log.warning.assert_any_call(
-                u'Can not remove(try:{},sleep:3) ScoreStore record count(100). contract_id={} course_id={}'.format(
-                    i + 1, self.contract.id, self.course1.id))
-        for i in range(3):
-            self.mock_log.warning.assert_any_call(
-                u'Can not remove(try:{},sleep:3) ScoreStore record count(100). contract_id={} course_id={}'.format(
-                    i + 1, self.contract.id, self.course2.id))
-
-        self.assertEqual(6, mock_time_sleep.call_count)
-        mock_time_sleep.assert_any_call(3)
+        call_command('update_biz_score_status', self.contract.id)
+        store = ScoreStore(self.contract.id, unicode(self.course1.id))
+        first_generation = store.get_active_generation()
+        first_count = store.get_count()
+        self.assertIsNotNone(first_generation)
 
-        self.mock_log.exception.assert_any_call(
-            u'Unexpected error occurred: Can not remove ScoreStore record count(100). contract_id={} course_id={}'.format(
-                self.contract.id, self.course1.id))
-        self.mock_log.exception.assert_any_call(
-            u'Unexpected error occurred: Can not remove ScoreStore record count(100). contract_id={} course_id={}'.format(
-                self.contract.id, self.course2.id))
+        call_command('update_biz_score_status', self.contract.id)
+        store = ScoreStore(self.contract.id, unicode(self.course1.id))
+        self.assertNotEqual(first_generation, store.get_active_generation())
+        self.assertEqual(first_count, store.get_count())
+        # Documents of the previous generation are kept for readers which still see it
+        self.assertEqual(first_count, store.get_generation_count(first_generation))
 
-        ScoreBatchStatus.objects.get(contract=self.contract, course_id=self.course1.id, status=BATCH_STATUS_ERROR, student_count=None)
-        ScoreBatchStatus.objects.get(contract=self.contract, course_id=self.course2.id, status=BATCH_STATUS_ERROR, student_count=None)
+        call_command('cleanup_biz_store_generations', grace_hours=0)
+        self.assertEqual(0, store.get_generation_count(first_generation))
+        self.assertEqual(first_count, ScoreStore(self.contract.id, unicode(self.course1.id)).get_count())
 
-    @override_settings(
-        MAX_RETRY_REMOVE_DOCUMENTS=3,
-        SLEEP_RETRY_REMOVE_DOCUMENTS=0,
-        MAX_RETRY_SET_DOCUMENTS=3,
-        SLEEP_RETRY_SET_DOCUMENTS=0,
-    )
-    @patch('biz.djangoapps.ga_achievement.management.commands.update_biz_score_status.time.sleep')
-    def test_error_log_can_not_set_documents(self, mock_time_sleep):
+    def test_error_log_can_not_set_documents(self):
         for var in range(0, 50):
             user = UserFactory.create()
             self._input_contract(self.contract, user)
         for var in range(0, 50):
             user = UserFactory.create()
             self._register_contract(self.contract, user, additional_value=ADDITIONAL_SETTINGS_VALUE)
+        call_command('update_biz_score_status', self.contract.id)
+        stored_counts = [ScoreStore(self.contract.id, unicode(course.id)).get_count() for course in [self.course1, self.course2]]
 
-        with patch('biz.djangoapps.ga_achievement.management.commands.update_biz_score_status.ScoreStore.get_count', return_value=0):
+        with patch('biz.djangoapps.ga_achievement.management.commands.update_biz_score_status.ScoreStore.get_generation_count', return_value=0):
             call_command('update_biz_score_status', self.contract.id)
 
-        self.mock_log.info.assert_any_call(
-            u'Removed ScoreStore records. contract_id={} course_id={}'.format(
-                self.contract.id, self.course1.id))
-        self.mock_log.info.assert_any_call(
-            u'Removed ScoreStore records. contract_id={} course_id={}'.format(
-                self.contract.id, self.course2.id))
-
-        for i in range(3):
-            self.mock_log.warning.assert_any_call(
-                u'Can not store(try:{},sleep:0) ScoreStore record count(-1) does not match Contract Register record count(100) or records count(100). contract_id={} course_id={}'.format(
-                    i + 1, self.contract.id, self.course1.id))
-        for i in range(3):
-            self.mock_log.warning.assert_any_call(
-                u'Can not store(try:{},sleep:0) ScoreStore record count(-1) does not match Contract Register record count(100) or records count(100). contract_id={} course_id={}'.format(
-                    i + 1, self.contract.id, self.course2.id))
-
-        mock_time_sleep.assert_not_called()
-
         self.mock_log.exception.assert_any_call(
-            u'Unexpected error occurred: ScoreStore record count(-1) does not match Contract Register record count(100) or records count(100). contract_id={} course_id={}'.format(
+            u'Unexpected error occurred: ScoreStore record count(0) does not match Contract Register record count(100) or records count(100). contract_id={} course_id={}'.format(
                 self.contract.id, self.course1.id))
         self.mock_log.exception.assert_any_call(
-            u'Unexpected error occurred: ScoreStore record count(-1) does not match Contract Register record count(100) or records count(100). contract_id={} course_id={}'.format(
+            u'Unexpected error occurred: ScoreStore record count(0) does not match Contract Register record count(100) or records count(100). contract_id={} course_id={}'.format(
                 self.contract.id, self.course2.id))
 
         ScoreBatchStatus.objects.get(contract=self.contract, course_id=self.course1.id, status=BATCH_STATUS_ERROR, student_count=None)
         ScoreBatchStatus.objects.get(contract=self.contract, course_id=self.course2.id, status=BATCH_STATUS_ERROR, student_count=None)
 
+        # Records stored by the previous batch are still visible
+        self.assertEqual(stored_counts, [ScoreStore(self.contract.id, unicode(course.id)).get_count() for course in [self.course1, self.course2]])
+
 
 class TestGroupedTargetSections(ModuleStoreTestCase):
     """
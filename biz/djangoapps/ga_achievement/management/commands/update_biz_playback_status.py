@@ -3,7 +3,6 @@ Management command to generate a list of playback summary
 for all biz students who registered any SPOC course.
 """
 import logging
-import time
 from collections import defaultdict, OrderedDict
 from optparse import make_option
 
@@ -13,14 +12,15 @@ from django.utils import translation
 from django.utils.translation import ugettext as _
 
 from biz.djangoapps.ga_achievement.achievement_store import PlaybackStore
-from biz.djangoapps.ga_achievement.log_store import PlaybackLogStore
+from biz.djangoapps.ga_achievement.log_store import PlaybackLogSummaryStore
 from biz.djangoapps.ga_achievement.models import PlaybackBatchStatus
+from biz.djangoapps.ga_achievement.prefetch import RecordDataPrefetcher
 from biz.djangoapps.ga_contract.models import Contract, AdditionalInfo, ContractAuth
-from biz.djangoapps.ga_invitation.models import ContractRegister, AdditionalInfoSetting
+from biz.djangoapps.ga_invitation.models import ContractRegister
 from biz.djangoapps.util.decorators import handle_command_exception, ExitWithWarning
 from biz.djangoapps.util.hash_utils import to_target_id
 from openedx.core.djangoapps.ga_self_paced import api as self_paced_api
-from student.models import UserStanding, CourseEnrollment
+from student.models import UserStanding
 from xmodule.modulestore.django import modulestore
 from xmodule.vertical_block import VerticalBlock
 
@@ -94,6 +94,20 @@ def get_grouped_target_verticals(course):
     return grouped_target_verticals
 
 
+def ensure_playback_log_summary():
+    """
+    Build the summary of playback log from the whole history if it can not be used
+
+    Note: The summary is updated by import_playback_log incrementally, so it can not be used if it has never been
+          built (e.g. import_playback_log --rebuild_summary has not been executed) or an update of it has been interrupted.
+    """
+    playback_log_summary = PlaybackLogSummaryStore()
+    if not playback_log_summary.is_built():
+        log.warning(u"Summary of playback log is not built, so rebuild it.")
+        summary_count = playback_log_summary.rebuild()
+        log.info(u"Rebuilt summary of playback log, record count({}).".format(summary_count))
+
+
 class Command(BaseCommand):
     """
     Generate a list of playback summary for all biz students who registered any SPOC course.
@@ -153,6 +167,7 @@ class Command(BaseCommand):
             contracts = Contract.objects.enabled(days_after=-1).all().exclude(id__in=exclude_ids).order_by('id')
         log.debug(u"contract_ids=[{}]".format(','.join([str(contract.id) for contract in contracts])))
 
+        summary_checked = False
         error_flag = False
         for contract in contracts:
             # Check if batch process for the contract has not yet started today
@@ -186,8 +201,12 @@ class Command(BaseCommand):
                     if not course:
                         raise CourseDoesNotExist()
 
-                    # Get duration summary from playback log store
-                    duration_summary = PlaybackLogStore(unicode_course_key).aggregate_duration_by_vertical_and_target()
+                    if not summary_checked:
+                        ensure_playback_log_summary()
+                        summary_checked = True
+
+                    # Get duration summary from playback log summary store
+                    duration_summary = PlaybackLogSummaryStore(unicode_course_key).get_duration_by_vertical_and_target()
 
                     # Get target verticals from course
                     grouped_target_verticals = get_grouped_target_verticals(course)
@@ -223,10 +242,11 @@ class Command(BaseCommand):
 
                     # Records
                     records = []
+                    prefetcher = RecordDataPrefetcher(contract.id, course_key)
                     for contract_register in q_contract_register.select_related('user__standing', 'user__profile'):
                         user = contract_register.user
                         # Student Status
-                        course_enrollment = CourseEnrollment.get_enrollment(user, course_key)
+                        course_enrollment = prefetcher.get_enrollment(user.id)
                         if hasattr(user, 'standing') and user.standing \
                             and user.standing.account_status == UserStanding.ACCOUNT_DISABLED:
                             student_status = _(PlaybackStore.FIELD_STUDENT_STATUS__DISABLED)
@@ -246,8 +266,7 @@ class Command(BaseCommand):
                         record[PlaybackStore.FIELD_DOCUMENT_TYPE] = PlaybackStore.FIELD_DOCUMENT_TYPE__RECORD
                         # Only in the case of a contract using login code, setting processing of data is performed.
                         if use_contract_auth:
-                            record[_(PlaybackStore.FIELD_LOGIN_CODE)] = contract_register.user.bizuser.login_code \
-                                if hasattr(contract_register.user, 'bizuser') else None
+                            record[_(PlaybackStore.FIELD_LOGIN_CODE)] = prefetcher.get_login_code(user.id)
                         record[_(PlaybackStore.FIELD_FULL_NAME)] = user.profile.name \
                             if hasattr(user, 'profile') and user.profile else None
                         record[_(PlaybackStore.FIELD_USERNAME)] = user.username
@@ -256,8 +275,8 @@ class Command(BaseCommand):
                             record[u'{}{}{}'.format(
                                 _(PlaybackStore.FIELD_ADDITIONAL_INFO),
                                 PlaybackStore.FIELD_DELIMITER,
-                                additional_info.display_name)] = AdditionalInfoSetting.get_value_by_display_name(
-                                    user, contract.id, additional_info.display_name)
+                                additional_info.display_name)] = prefetcher.get_additional_info_value(
+                                    user.id, additional_info.display_name)
                         record[_(PlaybackStore.FIELD_STUDENT_STATUS)] = student_status
                         if grouped_target_verticals.keys():
                             # Note: Set dummy value here to keep its order
@@ -286,48 +305,22 @@ class Command(BaseCommand):
 
                     playback_store = PlaybackStore(contract.id, unicode_course_key)
 
-                    for i in range(settings.MAX_RETRY_SET_DOCUMENTS + 1):
-                        for j in range(settings.MAX_RETRY_REMOVE_DOCUMENTS + 1):
-                            playback_store.remove_documents()
-
-                            # Confirm remove_documents.
-                            count_playback_store = playback_store.get_count()
-                            if count_playback_store == 0:
-                                log.info(u"Removed PlaybackStore records. contract_id={} course_id={}".format(
-                                    contract.id, unicode_course_key))
-                                break;
-
-                            if j >= settings.MAX_RETRY_REMOVE_DOCUMENTS:
-                                raise Exception(u"Can not remove PlaybackStore record count({}). contract_id={} course_id={}".format(
-                                    count_playback_store, contract.id, unicode_course_key))
-
-                            log.warning(u"Can not remove(try:{},sleep:{}) PlaybackStore record count({}). contract_id={} course_id={}".format(
-                                j + 1, settings.SLEEP_RETRY_REMOVE_DOCUMENTS, count_playback_store, contract.id, unicode_course_key))
-                            if settings.SLEEP_RETRY_REMOVE_DOCUMENTS:
-                                time.sleep(settings.SLEEP_RETRY_REMOVE_DOCUMENTS)
-
-                        len_records = len(records)
-                        if len_records == 0:
-                            break;
-
-                        playback_store.set_documents([column])
-                        playback_store.set_documents(records)
-
-                        # Confirm set_documents. (compare with record count without column)
-                        count_playback_store = playback_store.get_count() - 1
-                        if count_playback_store == count_contract_register == len_records:
-                            log.info(u"Stored PlaybackStore record count({}). contract_id={} course_id={}".format(
-                                count_playback_store, contract.id, unicode_course_key))
-                            break;
-
-                        if i >= settings.MAX_RETRY_SET_DOCUMENTS:
-                            raise Exception(u"PlaybackStore record count({}) does not match Contract Register record count({}) or records count({}). contract_id={} course_id={}".format(
-                                count_playback_store, count_contract_register, len_records, contract.id, unicode_course_key))
-
-                        log.warning(u"Can not store(try:{},sleep:{}) PlaybackStore record count({}) does not match Contract Register record count({}) or records count({}). contract_id={} course_id={}".format(
-                            i + 1, settings.SLEEP_RETRY_SET_DOCUMENTS, count_playback_store, count_contract_register, len_records, contract.id, unicode_course_key))
-                        if settings.SLEEP_RETRY_SET_DOCUMENTS:
-                            time.sleep(settings.SLEEP_RETRY_SET_DOCUMENTS)
+                    len_records = len(records)
+                    generation = playback_store.set_generation_documents([column] + records if records else [])
+
+                    # Confirm set_generation_documents. (compare with record count without column)
+                    count_playback_store = max(playback_store.get_generation_count(generation) - 1, 0)
+                    if not count_playback_store == count_contract_register == len_records:
+                        playback_store.remove_generation(generation)
+                        raise Exception(u"PlaybackStore record count({}) does not match Contract Register record count({}) or records count({}). contract_id={} course_id={}".format(
+                            count_playback_store, count_contract_register, len_records, contract.id, unicode_course_key))
+
+                    playback_store.activate_generation(generation)
+                    log.info(u"Stored PlaybackStore record count({}). contract_id={} course_id={}".format(
+                        count_playback_store, contract.id, unicode_course_key))
+
+                    # Note: Documents of the previous generation are removed by cleanup_biz_store_generations command
+                    #       after a grace period, because readers may still be reading them.
 
                 except CourseDoesNotExist:
                     log.warning(u"This course does not exist in modulestore. course_id={}".format(unicode_course_key))
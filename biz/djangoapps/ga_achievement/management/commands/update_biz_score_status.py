@@ -7,28 +7,36 @@ import logging
 import time
 from collections import defaultdict, OrderedDict
 from mock import patch
+from multiprocessing import Pool
 from optparse import make_option
 
+from django import db
 from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
-from django.test.client import RequestFactory
 from django.utils import translation
 from django.utils.translation import ugettext as _
 
 from biz.djangoapps.ga_achievement.achievement_store import ScoreStore
 from biz.djangoapps.ga_achievement.models import ScoreBatchStatus
+from biz.djangoapps.ga_achievement.prefetch import RecordDataPrefetcher
 from biz.djangoapps.ga_contract.models import Contract, ContractAuth, AdditionalInfo
 from biz.djangoapps.ga_invitation.models import ContractRegister, AdditionalInfoSetting
 from biz.djangoapps.util.decorators import handle_command_exception, ExitWithWarning
 from certificates.models import CertificateStatuses, GeneratedCertificate
 from courseware import grades
+from courseware.models import StudentModule
+from opaque_keys.edx.keys import CourseKey
 from openedx.core.djangoapps.ga_self_paced import api as self_paced_api
-from student.models import UserStanding, CourseEnrollment
-from xmodule.modulestore.django import modulestore
+from student.models import AnonymousUserId, UserStanding, CourseEnrollment
+from submissions.models import Score
+from xmodule.contentstore import django as contentstore_django
+from xmodule.modulestore.django import clear_existing_modulestores, modulestore
 from xmodule.seq_module import SequenceDescriptor
 
 log = logging.getLogger(__name__)
 
+DEFAULT_CHUNK_SIZE = 500
+
 
 class CourseDoesNotExist(Exception):
     """
@@ -123,12 +131,475 @@ def get_grouped_target_sections(course):
     return grouped_target_sections
 
 
+def get_changed_user_ids(contract_id, course_key, since):
+    """
+    Get ids of users whose score-related data has changed since the specified datetime
+
+    :param contract_id: Contract id
+    :param course_key: CourseKey
+    :param since: datetime
+    :return: set of user id
+    """
+    # Course progress
+    user_ids = set(StudentModule.objects.filter(
+        course_id=course_key, modified__gte=since).values_list('student_id', flat=True))
+    anonymous_user_ids = Score.objects.filter(
+        student_item__course_id=unicode(course_key), created_at__gte=since).values_list('student_item__student_id', flat=True)
+    if anonymous_user_ids:
+        user_ids.update(AnonymousUserId.objects.filter(
+            course_id=course_key, anonymous_user_id__in=set(anonymous_user_ids)).values_list('user_id', flat=True))
+    # Enrollment and certificate
+    user_ids.update(CourseEnrollment.history.filter(
+        course_id=course_key, history_date__gte=since).values_list('user_id', flat=True))
+    user_ids.update(GeneratedCertificate.objects.filter(
+        course_id=course_key, modified_date__gte=since).values_list('user_id', flat=True))
+    # Contract register and user's attributes
+    user_ids.update(ContractRegister.objects.filter(
+        contract_id=contract_id, modified__gte=since).values_list('user_id', flat=True))
+    user_ids.update(AdditionalInfoSetting.objects.filter(
+        contract_id=contract_id, modified__gte=since).values_list('user_id', flat=True))
+    user_ids.update(UserStanding.objects.filter(
+        user__contractregister__contract_id=contract_id,
+        standing_last_changed_at__gte=since).values_list('user_id', flat=True))
+    return user_ids
+
+
+def get_user_ids_with_changed_attributes(score_store, contract_registers, use_contract_auth, prefetcher):
+    """
+    Get ids of users whose attributes in the stored records (full name, username, email and login code)
+    differ from the current ones
+
+    Note: These attributes do not have the modified datetime, so they are compared with the stored records.
+          Users whose records have not been stored (e.g. username has changed) are also included.
+
+    :param score_store: ScoreStore object
+    :param contract_registers: list of ContractRegister object
+    :param use_contract_auth: whether the contract uses login code
+    :param prefetcher: RecordDataPrefetcher object for all users registered with the contract
+    :return: set of user id
+    """
+    field_names = [_(ScoreStore.FIELD_FULL_NAME), _(ScoreStore.FIELD_USERNAME), _(ScoreStore.FIELD_EMAIL)]
+    if use_contract_auth:
+        field_names.append(_(ScoreStore.FIELD_LOGIN_CODE))
+    stored_attributes = {
+        document[_(ScoreStore.FIELD_USERNAME)]: tuple(document.get(field_name) for field_name in field_names)
+        for document in score_store.iter_documents(
+            conditions={ScoreStore.FIELD_DOCUMENT_TYPE: ScoreStore.FIELD_DOCUMENT_TYPE__RECORD})
+    }
+    user_ids = set()
+    for contract_register in contract_registers:
+        user = contract_register.user
+        attributes = (
+            user.profile.name if hasattr(user, 'profile') and user.profile else None,
+            user.username,
+            user.email,
+        )
+        if use_contract_auth:
+            attributes += (prefetcher.get_login_code(user.id),)
+        if stored_attributes.get(user.username) != attributes:
+            user_ids.add(user.id)
+    return user_ids
+
+
+def can_update_incrementally(score_store, course, column):
+    """
+    Return whether the stored records can be updated only for changed users
+
+    Note: Student status of self-paced course changes over time (Expired), and records should be
+          rebuilt entirely when the column (sections, additional info and so on) has changed.
+
+    :param score_store: ScoreStore object
+    :param course: course descriptor
+    :param column: column document to be stored
+    :return: True if the stored records can be updated incrementally
+    """
+    if course.self_paced:
+        return False
+    stored_column = score_store.get_document(
+        conditions={ScoreStore.FIELD_DOCUMENT_TYPE: ScoreStore.FIELD_DOCUMENT_TYPE__COLUMN})
+    return stored_column is not None and stored_column.items() == column.items()
+
+
+def get_records(contract, course, contract_registers, grouped_target_sections, use_contract_auth, additional_infos,
+                prefetcher):
+    """
+    Get record documents of the users for ScoreStore, grading all the users at once
+
+    :param contract: Contract object
+    :param course: course descriptor
+    :param contract_registers: list of ContractRegister object
+    :param grouped_target_sections: GroupedTargetSections object
+    :param use_contract_auth: whether the contract uses login code
+    :param additional_infos: list of AdditionalInfo object
+    :param prefetcher: RecordDataPrefetcher object
+    :return: list of OrderedDict
+    """
+    start = time.clock()
+    with patch('courseware.grades.log.info'):
+        grade_summaries = {
+            user.id: grade_summary
+            for user, grade_summary, __ in grades.iterate_grades_for(
+                course, [contract_register.user for contract_register in contract_registers])
+        }
+    end = time.clock()
+    log.debug(u"Processed time for grades.iterate_grades_for ... {:.2f}s ({} users)".format(
+        end - start, len(contract_registers)))
+    return [
+        get_record(
+            contract, course, contract_register, grouped_target_sections, use_contract_auth, additional_infos,
+            prefetcher, grade_summaries.get(contract_register.user_id, {}))
+        for contract_register in contract_registers
+    ]
+
+
+def get_record(contract, course, contract_register, grouped_target_sections, use_contract_auth, additional_infos,
+               prefetcher, grade_summary):
+    """
+    Get a record document of the user for ScoreStore
+
+    :param contract: Contract object
+    :param course: course descriptor
+    :param contract_register: ContractRegister object
+    :param grouped_target_sections: GroupedTargetSections object
+    :param use_contract_auth: whether the contract uses login code
+    :param additional_infos: list of AdditionalInfo object
+    :param prefetcher: RecordDataPrefetcher object
+    :param grade_summary: grade summary of the user (empty if the user could not be graded)
+    :return: OrderedDict
+    """
+    user = contract_register.user
+    course_key = course.id
+    # Student Status
+    course_enrollment = prefetcher.get_enrollment(user.id)
+    if hasattr(user, 'standing') and user.standing \
+        and user.standing.account_status == UserStanding.ACCOUNT_DISABLED:
+        student_status = _(ScoreStore.FIELD_STUDENT_STATUS__DISABLED)
+    elif not course_enrollment:
+        student_status = _(ScoreStore.FIELD_STUDENT_STATUS__NOT_ENROLLED)
+    elif self_paced_api.is_course_closed(course_enrollment):
+        student_status = _(ScoreStore.FIELD_STUDENT_STATUS__EXPIRED)
+    elif course_enrollment.is_active:
+        student_status = _(ScoreStore.FIELD_STUDENT_STATUS__ENROLLED)
+    else:
+        student_status = _(ScoreStore.FIELD_STUDENT_STATUS__UNENROLLED)
+
+    # Certificate Status
+    generated_certificate = prefetcher.get_certificate(user.id)
+    if generated_certificate and generated_certificate.status == CertificateStatuses.downloadable:
+        certificate_status = _(ScoreStore.FIELD_CERTIFICATE_STATUS__DOWNLOADABLE)
+    else:
+        certificate_status = _(ScoreStore.FIELD_CERTIFICATE_STATUS__UNPUBLISHED)
+
+    # Records
+    record = OrderedDict()
+    record[ScoreStore.FIELD_CONTRACT_ID] = contract.id
+    record[ScoreStore.FIELD_COURSE_ID] = unicode(course_key)
+    record[ScoreStore.FIELD_DOCUMENT_TYPE] = ScoreStore.FIELD_DOCUMENT_TYPE__RECORD
+    # Only in the case of a contract using login code, setting processing of data is performed.
+    if use_contract_auth:
+        record[_(ScoreStore.FIELD_LOGIN_CODE)] = prefetcher.get_login_code(user.id)
+    record[_(ScoreStore.FIELD_FULL_NAME)] = user.profile.name if hasattr(user, 'profile') and user.profile else None
+    record[_(ScoreStore.FIELD_USERNAME)] = user.username
+    record[_(ScoreStore.FIELD_EMAIL)] = user.email
+    for additional_info in additional_infos:
+        record[u'{}{}{}'.format(
+            _(ScoreStore.FIELD_ADDITIONAL_INFO),
+            ScoreStore.FIELD_DELIMITER,
+            additional_info.display_name)] = prefetcher.get_additional_info_value(user.id, additional_info.display_name)
+    record[_(ScoreStore.FIELD_STUDENT_STATUS)] = student_status
+    record[_(ScoreStore.FIELD_CERTIFICATE_STATUS)] = certificate_status
+    record[_(ScoreStore.FIELD_ENROLL_DATE)] = course_enrollment.created if course_enrollment else None
+    # Add Expire Date only if course is self-paced
+    if course.self_paced:
+        record[_(ScoreStore.FIELD_EXPIRE_DATE)] = self_paced_api.get_course_end_date(course_enrollment)
+    record[_(ScoreStore.FIELD_CERTIFICATE_ISSUE_DATE)] = generated_certificate.created_date \
+        if generated_certificate else None
+    # Note: Set dummy value here to keep its order
+    record[_(ScoreStore.FIELD_TOTAL_SCORE)] = None
+    score_calculator = ScoreCalculator(grade_summary)
+    for target_section in grouped_target_sections.target_sections:
+        earned, possible, is_attempted = score_calculator.get_section_score(target_section.module_id)
+        if possible == 0:
+            weighted_score = 0
+        else:
+            weighted_score = float(earned) / float(possible)
+        # Note: Set '―'(U+2015) if user has not submitted any problem in the section (#1816)
+        # Note: In case where any problem.whole_point_addition is set to enabled,
+        #       is_attempted can be False, so 'earned > 0' is needed. (#1917)
+        record[target_section.column_name] = weighted_score \
+            if is_attempted or earned > 0 else ScoreStore.VALUE__NOT_ATTEMPTED
+    record[_(ScoreStore.FIELD_TOTAL_SCORE)] = score_calculator.get_total_score()
+    return record
+
+
+def get_column(contract, course, grouped_target_sections, use_contract_auth, additional_infos):
+    """
+    Get a column document for ScoreStore
+
+    :param contract: Contract object
+    :param course: course descriptor
+    :param grouped_target_sections: GroupedTargetSections object
+    :param use_contract_auth: whether the contract uses login code
+    :param additional_infos: list of AdditionalInfo object
+    :return: OrderedDict
+    """
+    column = OrderedDict()
+    column[ScoreStore.FIELD_CONTRACT_ID] = contract.id
+    column[ScoreStore.FIELD_COURSE_ID] = unicode(course.id)
+    column[ScoreStore.FIELD_DOCUMENT_TYPE] = ScoreStore.FIELD_DOCUMENT_TYPE__COLUMN
+    if use_contract_auth:
+        column[_(ScoreStore.FIELD_LOGIN_CODE)] = ScoreStore.COLUMN_TYPE__TEXT
+    column[_(ScoreStore.FIELD_FULL_NAME)] = ScoreStore.COLUMN_TYPE__TEXT
+    column[_(ScoreStore.FIELD_USERNAME)] = ScoreStore.COLUMN_TYPE__TEXT
+    column[_(ScoreStore.FIELD_EMAIL)] = ScoreStore.COLUMN_TYPE__TEXT
+    for additional_info in additional_infos:
+        column[u'{}{}{}'.format(
+            _(ScoreStore.FIELD_ADDITIONAL_INFO),
+            ScoreStore.FIELD_DELIMITER,
+            additional_info.display_name)] = ScoreStore.COLUMN_TYPE__TEXT
+    column[_(ScoreStore.FIELD_STUDENT_STATUS)] = ScoreStore.COLUMN_TYPE__TEXT
+    column[_(ScoreStore.FIELD_CERTIFICATE_STATUS)] = ScoreStore.COLUMN_TYPE__TEXT
+    column[_(ScoreStore.FIELD_ENROLL_DATE)] = ScoreStore.COLUMN_TYPE__DATE
+    if course.self_paced:
+        column[_(ScoreStore.FIELD_EXPIRE_DATE)] = ScoreStore.COLUMN_TYPE__DATE
+    column[_(ScoreStore.FIELD_CERTIFICATE_ISSUE_DATE)] = ScoreStore.COLUMN_TYPE__DATE
+    column[_(ScoreStore.FIELD_TOTAL_SCORE)] = ScoreStore.COLUMN_TYPE__PERCENT
+    for target_section in grouped_target_sections.target_sections:
+        column[target_section.column_name] = ScoreStore.COLUMN_TYPE__PERCENT
+        log.debug(u"column_name={}".format(target_section.column_name))
+    return column
+
+
+# Course and its target sections which have been loaded in the worker process
+_worker_courses = {}
+
+
+def init_worker():
+    """
+    Initialize a worker process of the pool
+
+    Note: Connections of the modulestore and the contentstore are created lazily, so clear the ones
+          inherited from the parent process to make each worker have its own connections.
+    """
+    # Note: BaseCommand translations are deactivated by default, so activate here
+    translation.activate(settings.LANGUAGE_CODE)
+    clear_existing_modulestores()
+    contentstore_django._CONTENTSTORE.clear()  # pylint: disable=protected-access
+
+
+def get_records_in_worker(contract_id, course_id, contract_register_ids, use_contract_auth):
+    """
+    Get record documents of the specified users in the worker process
+
+    :param contract_id: Contract id
+    :param course_id: unicode of CourseKey
+    :param contract_register_ids: list of ContractRegister id
+    :param use_contract_auth: whether the contract uses login code
+    :return: list of OrderedDict
+    """
+    if course_id not in _worker_courses:
+        # Note: Keep only the latest course not to hold many course trees in the worker process
+        _worker_courses.clear()
+        course = modulestore().get_course(CourseKey.from_string(course_id))
+        if not course:
+            raise CourseDoesNotExist()
+        _worker_courses[course_id] = (course, get_grouped_target_sections(course))
+    course, grouped_target_sections = _worker_courses[course_id]
+
+    contract = Contract.objects.get(pk=contract_id)
+    additional_infos = AdditionalInfo.find_by_contract_id(contract_id)
+    contract_registers = list(ContractRegister.objects.filter(
+        id__in=contract_register_ids).select_related('user__standing', 'user__profile').order_by('id'))
+    prefetcher = RecordDataPrefetcher(
+        contract_id, course.id, [contract_register.user_id for contract_register in contract_registers])
+    return get_records(
+        contract, course, contract_registers, grouped_target_sections, use_contract_auth, additional_infos,
+        prefetcher)
+
+
+class _Result(object):
+    """
+    Records which have been got in the same process (compatible with multiprocessing.pool.AsyncResult)
+    """
+    def __init__(self, value):
+        self._value = value
+
+    def get(self):
+        return self._value
+
+
+class ScoreBatchUnit(object):
+    """
+    Batch process for a contract and a course
+    """
+    def __init__(self, contract, course_key, q_contract_register, use_contract_auth, additional_infos):
+        self.contract = contract
+        self.course_key = course_key
+        self.unicode_course_key = unicode(course_key)
+        self.q_contract_register = q_contract_register
+        self.count_contract_register = q_contract_register.count()
+        self.use_contract_auth = use_contract_auth
+        self.additional_infos = additional_infos
+        self.column = None
+        self.score_store = None
+        # Note: usernames of all registered users are set only if records are updated incrementally
+        self.usernames = None
+        self.results = []
+        self.failed = False
+        self.error_flag = False
+
+    def start(self, incremental, pool=None, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Save started status and start to get records
+
+        :param incremental: whether to update records only for changed users
+        :param pool: multiprocessing.Pool object (None if records are got in this process)
+        :param chunk_size: number of users to be graded in a task of the pool
+        """
+        try:
+            log.info(
+                u"Command update_biz_score_status for contract({}) and course({}) is now processing...".format(
+                    self.contract.id, self.unicode_course_key))
+            # Note: Get the last successful batch before saving today's status
+            last_started = ScoreBatchStatus.get_last_finished_started_time(
+                self.contract.id, self.course_key) if incremental else None
+            ScoreBatchStatus.save_for_started(self.contract.id, self.course_key)
+
+            # Check if course exists in modulestore
+            course = modulestore().get_course(self.course_key)
+            if not course:
+                raise CourseDoesNotExist()
+
+            # Get target sections from course
+            grouped_target_sections = get_grouped_target_sections(course)
+
+            # Column
+            self.column = get_column(
+                self.contract, course, grouped_target_sections, self.use_contract_auth, self.additional_infos)
+
+            self.score_store = ScoreStore(self.contract.id, self.unicode_course_key)
+
+            contract_registers = self.q_contract_register.select_related('user__standing', 'user__profile')
+            if last_started is not None and can_update_incrementally(self.score_store, course, self.column):
+                # Only for users whose score-related data has changed since the last batch
+                contract_registers = list(contract_registers)
+                changed_user_ids = get_changed_user_ids(self.contract.id, self.course_key, last_started)
+                changed_user_ids.update(get_user_ids_with_changed_attributes(
+                    self.score_store, contract_registers, self.use_contract_auth,
+                    RecordDataPrefetcher(self.contract.id, self.course_key)))
+                log.info(u"Found {} changed users since {}. contract_id={} course_id={}".format(
+                    len(changed_user_ids), last_started, self.contract.id, self.unicode_course_key))
+                self.usernames = []
+                target_contract_registers = []
+                for contract_register in contract_registers:
+                    self.usernames.append(contract_register.user.username)
+                    if contract_register.user_id in changed_user_ids:
+                        target_contract_registers.append(contract_register)
+            else:
+                if incremental:
+                    log.info(u"Cannot update ScoreStore incrementally, so update all records. contract_id={} course_id={}".format(
+                        self.contract.id, self.unicode_course_key))
+                target_contract_registers = list(contract_registers)
+
+            # Records
+            if pool is None:
+                prefetcher = RecordDataPrefetcher(
+                    self.contract.id, self.course_key,
+                    None if self.usernames is None else [
+                        contract_register.user_id for contract_register in target_contract_registers]
+                )
+            for i in range(0, len(target_contract_registers), chunk_size):
+                chunk = target_contract_registers[i:i + chunk_size]
+                if pool is None:
+                    self.results.append(_Result(get_records(
+                        self.contract, course, chunk, grouped_target_sections,
+                        self.use_contract_auth, self.additional_infos, prefetcher)))
+                else:
+                    self.results.append(pool.apply_async(get_records_in_worker, (
+                        self.contract.id, self.unicode_course_key,
+                        [contract_register.id for contract_register in chunk], self.use_contract_auth,
+                    )))
+        except Exception as ex:
+            self._save_for_error(ex)
+
+    def finish(self):
+        """
+        Wait for records and store them, then save finished status
+        """
+        if self.failed:
+            return
+        try:
+            records = []
+            for result in self.results:
+                records.extend(result.get())
+
+            if self.usernames is not None:
+                student_count = self._update_records(records)
+            else:
+                student_count = self._replace_records(records)
+        except Exception as ex:
+            self._save_for_error(ex)
+        else:
+            ScoreBatchStatus.save_for_finished(self.contract.id, self.course_key, student_count)
+
+    def _update_records(self, records):
+        """
+        Upsert records of changed users and remove records of unregistered users
+        """
+        self.score_store.upsert_documents(records, [_(ScoreStore.FIELD_USERNAME)])
+        # Remove records of users who are no longer registered with the contract
+        self.score_store.remove_documents(conditions={
+            ScoreStore.FIELD_DOCUMENT_TYPE: ScoreStore.FIELD_DOCUMENT_TYPE__RECORD,
+            _(ScoreStore.FIELD_USERNAME): {'$nin': self.usernames},
+        })
+
+        # Confirm upsert_documents. (compare with record count without column)
+        count_score_store = self.score_store.get_count() - 1
+        if count_score_store != self.count_contract_register:
+            raise Exception(u"ScoreStore record count({}) does not match Contract Register record count({}). contract_id={} course_id={}".format(
+                count_score_store, self.count_contract_register, self.contract.id, self.unicode_course_key))
+        log.info(u"Updated ScoreStore record count({}). contract_id={} course_id={}".format(
+            len(records), self.contract.id, self.unicode_course_key))
+        return count_score_store
+
+    def _replace_records(self, records):
+        """
+        Store the specified records as a new generation and switch readers to it
+        """
+        len_records = len(records)
+        generation = self.score_store.set_generation_documents([self.column] + records if records else [])
+
+        # Confirm set_generation_documents. (compare with record count without column)
+        count_score_store = max(self.score_store.get_generation_count(generation) - 1, 0)
+        if not count_score_store == self.count_contract_register == len_records:
+            self.score_store.remove_generation(generation)
+            raise Exception(u"ScoreStore record count({}) does not match Contract Register record count({}) or records count({}). contract_id={} course_id={}".format(
+                count_score_store, self.count_contract_register, len_records, self.contract.id, self.unicode_course_key))
+
+        self.score_store.activate_generation(generation)
+        log.info(u"Stored ScoreStore record count({}). contract_id={} course_id={}".format(
+            count_score_store, self.contract.id, self.unicode_course_key))
+
+        # Note: Documents of the previous generation are removed by cleanup_biz_store_generations command
+        #       after a grace period, because readers may still be reading them.
+        return len_records
+
+    def _save_for_error(self, ex):
+        self.failed = True
+        if isinstance(ex, CourseDoesNotExist):
+            log.warning(u"This course does not exist in modulestore. course_id={}".format(self.unicode_course_key))
+        else:
+            self.error_flag = True
+            log.exception(u"Unexpected error occurred: {}".format(ex))
+        ScoreBatchStatus.save_for_error(self.contract.id, self.course_key)
+
+
 class Command(BaseCommand):
     """
     Generate a list of grade summary for all biz students who registered any SPOC course.
     """
     help = """
-    Usage: python manage.py lms --settings=aws update_biz_score_status [--debug] [--force] [--excludes=<exclude_ids>|<contract_id>]
+    Usage: python manage.py lms --settings=aws update_biz_score_status [--debug] [--force] [--incremental] [--workers=<workers>] [--chunk-size=<chunk_size>] [--excludes=<exclude_ids>|<contract_id>]
     """
 
     option_list = BaseCommand.option_list + (
@@ -144,6 +615,21 @@ class Command(BaseCommand):
                     default=None,
                     action='store',
                     help='Specify contract ids to exclude as comma-delimited integers (like 1 or 1,2)'),
+        make_option('--incremental',
+                    default=False,
+                    action='store_true',
+                    help='Regrade only users whose score-related data has changed since the last successful batch'),
+        make_option('--workers',
+                    default=1,
+                    type='int',
+                    action='store',
+                    help='Number of worker processes to grade users (1 means grading in this process)'),
+        make_option('--chunk-size',
+                    dest='chunk_size',
+                    default=DEFAULT_CHUNK_SIZE,
+                    type='int',
+                    action='store',
+                    help='Number of users to be graded in a task of the worker processes'),
     )
 
     @handle_command_exception(settings.BIZ_SET_SCORE_COMMAND_OUTPUT)
@@ -157,6 +643,11 @@ class Command(BaseCommand):
             log.addHandler(stream)
             log.setLevel(logging.DEBUG)
         force = options.get('force')
+        incremental = options.get('incremental')
+        workers = options.get('workers', 1)
+        chunk_size = options.get('chunk_size', DEFAULT_CHUNK_SIZE)
+        if workers < 1 or chunk_size < 1:
+            raise CommandError("workers and chunk_size should be specified as positive integers.")
         exclude_ids = options.get('excludes') or []
         if exclude_ids:
             try:
@@ -182,209 +673,59 @@ class Command(BaseCommand):
             contracts = Contract.objects.enabled(days_after=-1).all().exclude(id__in=exclude_ids).order_by('id')
         log.debug(u"contract_ids=[{}]".format(','.join([str(contract.id) for contract in contracts])))
 
+        pool = None
+        if workers > 1:
+            # Note: Close DB connections so that worker processes do not share them with this process
+            db.connections.close_all()
+            pool = Pool(workers, initializer=init_worker)
+
         error_flag = False
-        for contract in contracts:
-            # Check if batch process for the contract has not yet started today
-            if ScoreBatchStatus.exists_today(contract.id):
-                if force:
-                    log.warning(
-                        u"Command update_biz_score_status for contract({}) has already started today, but force to start.".format(
-                            contract.id))
-                else:
-                    log.warning(
-                        u"Command update_biz_score_status for contract({}) has already started today, so skip.".format(
-                            contract.id))
-                    continue
-
-            q_contract_register = ContractRegister.find_input_and_register_by_contract(contract.id)
-            count_contract_register = q_contract_register.count()
-
-            for contract_detail in contract.details.all():
-                try:
-                    course_key = contract_detail.course_id
-                    unicode_course_key = unicode(course_key)
-                    log.info(
-                        u"Command update_biz_score_status for contract({}) and course({}) is now processing...".format(
-                            contract.id, unicode_course_key))
-                    ScoreBatchStatus.save_for_started(contract.id, course_key)
-
-                    # Check if course exists in modulestore
-                    course = modulestore().get_course(course_key)
-                    if not course:
-                        raise CourseDoesNotExist()
-
-                    # Get target sections from course
-                    grouped_target_sections = get_grouped_target_sections(course)
-
-                    # Column
-                    column = OrderedDict()
-                    column[ScoreStore.FIELD_CONTRACT_ID] = contract.id
-                    column[ScoreStore.FIELD_COURSE_ID] = unicode_course_key
-                    column[ScoreStore.FIELD_DOCUMENT_TYPE] = ScoreStore.FIELD_DOCUMENT_TYPE__COLUMN
-                    if ContractAuth.objects.filter(contract_id=contract.id).exists():
-                        column[_(ScoreStore.FIELD_LOGIN_CODE)] = ScoreStore.COLUMN_TYPE__TEXT
-                    column[_(ScoreStore.FIELD_FULL_NAME)] = ScoreStore.COLUMN_TYPE__TEXT
-                    column[_(ScoreStore.FIELD_USERNAME)] = ScoreStore.COLUMN_TYPE__TEXT
-                    column[_(ScoreStore.FIELD_EMAIL)] = ScoreStore.COLUMN_TYPE__TEXT
-                    additional_infos = AdditionalInfo.find_by_contract_id(contract.id)
-                    for additional_info in additional_infos:
-                        column[u'{}{}{}'.format(
-                            _(ScoreStore.FIELD_ADDITIONAL_INFO),
-                            ScoreStore.FIELD_DELIMITER,
-                            additional_info.display_name)] = ScoreStore.COLUMN_TYPE__TEXT
-                    column[_(ScoreStore.FIELD_STUDENT_STATUS)] = ScoreStore.COLUMN_TYPE__TEXT
-                    column[_(ScoreStore.FIELD_CERTIFICATE_STATUS)] = ScoreStore.COLUMN_TYPE__TEXT
-                    column[_(ScoreStore.FIELD_ENROLL_DATE)] = ScoreStore.COLUMN_TYPE__DATE
-                    if course.self_paced:
-                        column[_(ScoreStore.FIELD_EXPIRE_DATE)] = ScoreStore.COLUMN_TYPE__DATE
-                    column[_(ScoreStore.FIELD_CERTIFICATE_ISSUE_DATE)] = ScoreStore.COLUMN_TYPE__DATE
-                    column[_(ScoreStore.FIELD_TOTAL_SCORE)] = ScoreStore.COLUMN_TYPE__PERCENT
-                    for target_section in grouped_target_sections.target_sections:
-                        column[target_section.column_name] = ScoreStore.COLUMN_TYPE__PERCENT
-                        log.debug(u"column_name={}".format(target_section.column_name))
-
-                    # Records
-                    records = []
-                    for contract_register in q_contract_register.select_related('user__standing', 'user__profile'):
-                        user = contract_register.user
-                        # Student Status
-                        course_enrollment = CourseEnrollment.get_enrollment(user, course_key)
-                        if hasattr(user, 'standing') and user.standing \
-                            and user.standing.account_status == UserStanding.ACCOUNT_DISABLED:
-                            student_status = _(ScoreStore.FIELD_STUDENT_STATUS__DISABLED)
-                        elif not course_enrollment:
-                            student_status = _(ScoreStore.FIELD_STUDENT_STATUS__NOT_ENROLLED)
-                        elif self_paced_api.is_course_closed(course_enrollment):
-                            student_status = _(ScoreStore.FIELD_STUDENT_STATUS__EXPIRED)
-                        elif course_enrollment.is_active:
-                            student_status = _(ScoreStore.FIELD_STUDENT_STATUS__ENROLLED)
-                        else:
-                            student_status = _(ScoreStore.FIELD_STUDENT_STATUS__UNENROLLED)
-
-                        # Certificate Status
-                        generated_certificate = GeneratedCertificate.certificate_for_student(user, course_key)
-                        if generated_certificate and generated_certificate.status == CertificateStatuses.downloadable:
-                            certificate_status = _(ScoreStore.FIELD_CERTIFICATE_STATUS__DOWNLOADABLE)
-                        else:
-                            certificate_status = _(ScoreStore.FIELD_CERTIFICATE_STATUS__UNPUBLISHED)
-
-                        # Records
-                        record = OrderedDict()
-                        record[ScoreStore.FIELD_CONTRACT_ID] = contract.id
-                        record[ScoreStore.FIELD_COURSE_ID] = unicode_course_key
-                        record[ScoreStore.FIELD_DOCUMENT_TYPE] = ScoreStore.FIELD_DOCUMENT_TYPE__RECORD
-                        # Only in the case of a contract using login code, setting processing of data is performed.
-                        if ContractAuth.objects.filter(contract_id=contract.id).exists():
-                            record[_(ScoreStore.FIELD_LOGIN_CODE)] = contract_register.user.bizuser.login_code \
-                                if hasattr(contract_register.user, 'bizuser') else None
-                        record[_(ScoreStore.FIELD_FULL_NAME)] = user.profile.name \
-                            if hasattr(user, 'profile') and user.profile else None
-                        record[_(ScoreStore.FIELD_USERNAME)] = user.username
-                        record[_(ScoreStore.FIELD_EMAIL)] = user.email
-                        additional_infos = AdditionalInfo.find_by_contract_id(contract.id)
-                        for additional_info in additional_infos:
-                            record[u'{}{}{}'.format(
-                                _(ScoreStore.FIELD_ADDITIONAL_INFO),
-                                ScoreStore.FIELD_DELIMITER,
-                                additional_info.display_name)] = AdditionalInfoSetting.get_value_by_display_name(
-                                    user, contract.id, additional_info.display_name)
-                        record[_(ScoreStore.FIELD_STUDENT_STATUS)] = student_status
-                        record[_(ScoreStore.FIELD_CERTIFICATE_STATUS)] = certificate_status
-                        record[_(ScoreStore.FIELD_ENROLL_DATE)] = course_enrollment.created if course_enrollment else None
-                        # Add Expire Date only if course is self-paced
-                        if course.self_paced:
-                            record[_(ScoreStore.FIELD_EXPIRE_DATE)] = self_paced_api.get_course_end_date(course_enrollment)
-                        record[_(ScoreStore.FIELD_CERTIFICATE_ISSUE_DATE)] = generated_certificate.created_date \
-                            if generated_certificate else None
-                        # Note: Set dummy value here to keep its order
-                        record[_(ScoreStore.FIELD_TOTAL_SCORE)] = None
-                        score_calculator = ScoreCalculator(course, user)
-                        for target_section in grouped_target_sections.target_sections:
-                            earned, possible, is_attempted = score_calculator.get_section_score(
-                                target_section.module_id)
-                            if possible == 0:
-                                weighted_score = 0
-                            else:
-                                weighted_score = float(earned) / float(possible)
-                            # Note: Set '―'(U+2015) if user has not submitted any problem in the section (#1816)
-                            # Note: In case where any problem.whole_point_addition is set to enabled,
-                            #       is_attempted can be False, so 'earned > 0' is needed. (#1917)
-                            record[target_section.column_name] = weighted_score \
-                                if is_attempted or earned > 0 else ScoreStore.VALUE__NOT_ATTEMPTED
-                        record[_(ScoreStore.FIELD_TOTAL_SCORE)] = score_calculator.get_total_score()
-                        records.append(record)
-
-                    score_store = ScoreStore(contract.id, unicode_course_key)
-
-                    for i in range(settings.MAX_RETRY_SET_DOCUMENTS + 1):
-                        for j in range(settings.MAX_RETRY_REMOVE_DOCUMENTS + 1):
-                            score_store.remove_documents()
-
-                            # Confirm remove_documents.
-                            count_score_store = score_store.get_count()
-                            if count_score_store == 0:
-                                log.info(u"Removed ScoreStore records. contract_id={} course_id={}".format(
-                                    contract.id, unicode_course_key))
-                                break;
-
-                            if j >= settings.MAX_RETRY_REMOVE_DOCUMENTS:
-                                raise Exception(u"Can not remove ScoreStore record count({}). contract_id={} course_id={}".format(
-                                    count_score_store, contract.id, unicode_course_key))
-
-                            log.warning(u"Can not remove(try:{},sleep:{}) ScoreStore record count({}). contract_id={} course_id={}".format(
-                                j + 1, settings.SLEEP_RETRY_REMOVE_DOCUMENTS, count_score_store, contract.id, unicode_course_key))
-                            if settings.SLEEP_RETRY_REMOVE_DOCUMENTS:
-                                time.sleep(settings.SLEEP_RETRY_REMOVE_DOCUMENTS)
-
-                        len_records = len(records)
-                        if len_records == 0:
-                            break;
-
-                        score_store.set_documents([column])
-                        score_store.set_documents(records)
-
-                        # Confirm set_documents. (compare with record count without column)
-                        count_score_store = score_store.get_count() - 1
-                        if count_score_store == count_contract_register == len_records:
-                            log.info(u"Stored ScoreStore record count({}). contract_id={} course_id={}".format(
-                                count_score_store, contract.id, unicode_course_key))
-                            break;
-
-                        if i >= settings.MAX_RETRY_SET_DOCUMENTS:
-                            raise Exception(u"ScoreStore record count({}) does not match Contract Register record count({}) or records count({}). contract_id={} course_id={}".format(
-                                count_score_store, count_contract_register, len_records, contract.id, unicode_course_key))
-
-                        log.warning(u"Can not store(try:{},sleep:{}) ScoreStore record count({}) does not match Contract Register record count({}) or records count({}). contract_id={} course_id={}".format(
-                            i + 1, settings.SLEEP_RETRY_SET_DOCUMENTS, count_score_store, count_contract_register, len_records, contract.id, unicode_course_key))
-                        if settings.SLEEP_RETRY_SET_DOCUMENTS:
-                            time.sleep(settings.SLEEP_RETRY_SET_DOCUMENTS)
-
-                except CourseDoesNotExist:
-                    log.warning(u"This course does not exist in modulestore. course_id={}".format(unicode_course_key))
-                    ScoreBatchStatus.save_for_error(contract.id, course_key)
-                except Exception as ex:
-                    error_flag = True
-                    log.exception(u"Unexpected error occurred: {}".format(ex))
-                    ScoreBatchStatus.save_for_error(contract.id, course_key)
-                else:
-                    ScoreBatchStatus.save_for_finished(contract.id, course_key, len(records))
+        units = []
+        try:
+            for contract in contracts:
+                # Check if batch process for the contract has not yet started today
+                if ScoreBatchStatus.exists_today(contract.id):
+                    if force:
+                        log.warning(
+                            u"Command update_biz_score_status for contract({}) has already started today, but force to start.".format(
+                                contract.id))
+                    else:
+                        log.warning(
+                            u"Command update_biz_score_status for contract({}) has already started today, so skip.".format(
+                                contract.id))
+                        continue
+
+                q_contract_register = ContractRegister.find_input_and_register_by_contract(contract.id)
+
+                # Save the existence of ContractAuth object
+                use_contract_auth = ContractAuth.objects.filter(contract_id=contract.id).exists()
+                additional_infos = AdditionalInfo.find_by_contract_id(contract.id)
+
+                for contract_detail in contract.details.all():
+                    unit = ScoreBatchUnit(
+                        contract, contract_detail.course_id, q_contract_register, use_contract_auth, additional_infos)
+                    unit.start(incremental, pool, chunk_size)
+                    units.append(unit)
+                    # Note: Keep at most as many units in progress as workers not to hold too many records
+                    while len(units) >= workers:
+                        unit = units.pop(0)
+                        unit.finish()
+                        error_flag = error_flag or unit.error_flag
+            for unit in units:
+                unit.finish()
+                error_flag = error_flag or unit.error_flag
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
 
         if error_flag:
             raise CommandError("Error occurred while handling update_biz_score_status command.")
 
 
 class ScoreCalculator(object):
-    def __init__(self, course, user):
-        request = RequestFactory().get('/')
-        try:
-            start = time.clock()
-            with patch('courseware.grades.log.info'):
-                self.grade_summary = grades.grade(user, request, course)
-            end = time.clock()
-            log.debug(u"Processed time for grades.grade ... {:.2f}s".format(end - start))
-        except Exception as e:
-            log.warning(u"Cannot get grade_summary. {}".format(e))
-            self.grade_summary = {}
+    def __init__(self, grade_summary):
+        self.grade_summary = grade_summary
 
     def get_section_score(self, module_id):
         earned = 0
@@ -47,6 +47,30 @@ class CourseBatchStatusBase(models.Model):
         else:
             return None
 
+    @classmethod
+    def get_last_finished_started_time(cls, contract_id, course_id):
+        """
+        Get the datetime when the last successfully finished batch process has started
+
+        :param contract_id: Contract id
+        :param course_id: CourseKey
+        :return: datetime, or None if no batch process has successfully finished
+        """
+        finished = cls.objects.filter(
+            contract_id=contract_id,
+            course_id=course_id,
+            status=BATCH_STATUS_FINISHED,
+        ).order_by('-created', '-id').first()
+        if finished is None:
+            return None
+        started = cls.objects.filter(
+            contract_id=contract_id,
+            course_id=course_id,
+            status=BATCH_STATUS_STARTED,
+            created__lte=finished.created,
+        ).order_by('-created', '-id').first()
+        return started.created if started else finished.created
+
     @classmethod
     def exists_today(cls, contract_id):
         """
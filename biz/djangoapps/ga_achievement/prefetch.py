@@ -0,0 +1,114 @@
+"""
+Prefetch data of users to build records of the achievement batches
+"""
+from biz.djangoapps.ga_invitation.models import AdditionalInfoSetting
+from biz.djangoapps.ga_login.models import BizUser
+from certificates.models import GeneratedCertificate
+from openedx.core.djangoapps.content.course_overviews.models import CourseOverview
+from student.models import CourseEnrollment
+
+# Max number of user ids in an IN-list of a query
+USER_IDS_CHUNK_SIZE = 1000
+
+
+class RecordDataPrefetcher(object):
+    """
+    Load data of users registered with a contract for a course by a few set-based queries,
+    so that the number of queries does not grow with the number of users.
+
+    Each kind of data is loaded at the first access.
+    """
+
+    def __init__(self, contract_id, course_key, user_ids=None):
+        """
+        :param contract_id: Contract id
+        :param course_key: CourseKey
+        :param user_ids: ids of target users (None means all users registered with the contract)
+        """
+        self.contract_id = contract_id
+        self.course_key = course_key
+        self.user_ids = None if user_ids is None else list(user_ids)
+        self._enrollments = None
+        self._certificates = None
+        self._login_codes = None
+        self._additional_info_values = None
+
+    def _find(self, queryset, contract_lookup='user__contractregister__contract_id'):
+        """
+        Filter the queryset by target users
+
+        :param queryset: QuerySet of a model which has `user` field
+        :param contract_lookup: lookup to filter the queryset by the contract
+        :return: generator of objects for target users
+        """
+        if self.user_ids is None:
+            # Note: Join with ContractRegister instead of using a large IN-list
+            for obj in queryset.filter(**{contract_lookup: self.contract_id}):
+                yield obj
+        else:
+            for i in range(0, len(self.user_ids), USER_IDS_CHUNK_SIZE):
+                for obj in queryset.filter(user_id__in=self.user_ids[i:i + USER_IDS_CHUNK_SIZE]):
+                    yield obj
+
+    def get_enrollment(self, user_id):
+        """
+        Get CourseEnrollment of the user (same as CourseEnrollment.get_enrollment)
+
+        :param user_id: User id
+        :return: CourseEnrollment object or None
+        """
+        if self._enrollments is None:
+            try:
+                course_overview = CourseOverview.get_from_id(self.course_key)
+            except (CourseOverview.DoesNotExist, IOError):
+                course_overview = None
+            self._enrollments = {}
+            for enrollment in self._find(CourseEnrollment.objects.filter(course_id=self.course_key)):
+                # Note: Share CourseOverview among enrollments not to load it for each enrollment
+                enrollment._course_overview = course_overview  # pylint: disable=protected-access
+                self._enrollments[enrollment.user_id] = enrollment
+        return self._enrollments.get(user_id)
+
+    def get_certificate(self, user_id):
+        """
+        Get GeneratedCertificate of the user (same as GeneratedCertificate.certificate_for_student)
+
+        :param user_id: User id
+        :return: GeneratedCertificate object or None
+        """
+        if self._certificates is None:
+            self._certificates = {
+                certificate.user_id: certificate
+                for certificate in self._find(GeneratedCertificate.objects.filter(course_id=self.course_key))
+            }
+        return self._certificates.get(user_id)
+
+    def get_login_code(self, user_id):
+        """
+        Get login code of the user
+
+        :param user_id: User id
+        :return: login code or None if the user is not a BizUser
+        """
+        if self._login_codes is None:
+            self._login_codes = {
+                biz_user.user_id: biz_user.login_code
+                for biz_user in self._find(BizUser.objects.all())
+            }
+        return self._login_codes.get(user_id)
+
+    def get_additional_info_value(self, user_id, display_name):
+        """
+        Get value of the additional info (same as AdditionalInfoSetting.get_value_by_display_name)
+
+        :param user_id: User id
+        :param display_name: display name of AdditionalInfo
+        :return: value or None if not exists
+        """
+        if self._additional_info_values is None:
+            self._additional_info_values = {
+                (setting.user_id, setting.display_name): setting.value
+                for setting in self._find(
+                    AdditionalInfoSetting.objects.filter(contract_id=self.contract_id), contract_lookup='contract_id')
+            }
+        return self._additional_info_values.get((user_id, display_name))
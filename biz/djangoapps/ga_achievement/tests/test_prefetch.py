@@ -0,0 +1,72 @@
+"""
+Tests for prefetch
+"""
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from biz.djangoapps.ga_achievement.prefetch import RecordDataPrefetcher
+from biz.djangoapps.ga_login.tests.factories import BizUserFactory
+from biz.djangoapps.util.tests.testcase import BizTestBase
+from certificates.models import CertificateStatuses
+from certificates.tests.factories import GeneratedCertificateFactory
+from openedx.core.djangoapps.content.course_overviews.models import CourseOverview
+from student.models import CourseEnrollment
+from student.tests.factories import UserFactory
+from xmodule.modulestore.tests.django_utils import ModuleStoreTestCase
+from xmodule.modulestore.tests.factories import CourseFactory
+
+
+class RecordDataPrefetcherTest(BizTestBase, ModuleStoreTestCase):
+
+    def setUp(self):
+        super(RecordDataPrefetcherTest, self).setUp()
+        self.course = CourseFactory.create(org=self.gacco_organization.org_code, number='course', run='run')
+        self.contract = self._create_contract(
+            detail_courses=[self.course],
+            additional_display_names=['test_number', 'test_section'],
+        )
+        self.users = [UserFactory.create() for __ in range(3)]
+        for user in self.users:
+            self._register_contract(self.contract, user, additional_value='value')
+            BizUserFactory.create(user=user, login_code='code_{}'.format(user.id))
+            GeneratedCertificateFactory.create(
+                user=user, course_id=self.course.id, status=CertificateStatuses.downloadable)
+        # Users who are not registered with the contract
+        self.other_user = UserFactory.create()
+        CourseEnrollment.enroll(self.other_user, self.course.id)
+        BizUserFactory.create(user=self.other_user, login_code='other_code')
+        # Note: Create CourseOverview in advance not to count queries to create it
+        CourseOverview.get_from_id(self.course.id)
+
+    def _assert_prefetched(self, prefetcher, users):
+        for user in users:
+            self.assertEqual(prefetcher.get_enrollment(user.id), CourseEnrollment.get_enrollment(user, self.course.id))
+            self.assertEqual(prefetcher.get_certificate(user.id).status, CertificateStatuses.downloadable)
+            self.assertEqual(prefetcher.get_login_code(user.id), 'code_{}'.format(user.id))
+            self.assertEqual(prefetcher.get_additional_info_value(user.id, 'test_number'), 'test_number_value')
+            self.assertIsNone(prefetcher.get_additional_info_value(user.id, 'not_exist'))
+
+    def test_all_users(self):
+        prefetcher = RecordDataPrefetcher(self.contract.id, self.course.id)
+        self._assert_prefetched(prefetcher, self.users)
+        self.assertIsNone(prefetcher.get_enrollment(self.other_user.id))
+        self.assertIsNone(prefetcher.get_login_code(self.other_user.id))
+
+    def test_specified_users(self):
+        prefetcher = RecordDataPrefetcher(self.contract.id, self.course.id, [self.users[0].id])
+        self._assert_prefetched(prefetcher, self.users[:1])
+        self.assertIsNone(prefetcher.get_enrollment(self.users[1].id))
+        self.assertIsNone(prefetcher.get_certificate(self.users[1].id))
+
+    def _count_queries(self, users):
+        prefetcher = RecordDataPrefetcher(self.contract.id, self.course.id)
+        with CaptureQueriesContext(connection) as queries:
+            for user in users:
+                prefetcher.get_enrollment(user.id)
+                prefetcher.get_certificate(user.id)
+                prefetcher.get_login_code(user.id)
+                prefetcher.get_additional_info_value(user.id, 'test_number')
+        return len(queries)
+
+    def test_num_queries_does_not_grow_with_users(self):
+        self.assertEqual(self._count_queries(self.users[:1]), self._count_queries(self.users))
@@ -38,9 +38,6 @@ class ScoreViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
     def _index_view(self):
         return reverse('biz:achievement:score')
 
-    def _ajax_view(self):
-        return reverse('biz:achievement:score_search_ajax')
-
     def _download_csv_view(self):
         return reverse('biz:achievement:score_download_csv')
 
@@ -495,7 +492,9 @@ class ScoreViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
         self.assertEqual(render_to_response_args[1]['group_list'], [])
         self._assert_student_status(render_to_response_args[1]['student_status'])
         self.assertEqual(render_to_response_args[1]['score_section_names'], ['SECTIONS'])
-        self._assert_record_data(render_to_response_args[1]['score_records'])
+        self.assertNotIn('score_records', render_to_response_args[1])
+        response_data = json.loads(self._post_records_ajax(manager, {}).content)
+        self._assert_record_data(json.dumps(response_data['records']))
 
     def test_index_views_manager(self):
         status = 'Finished'
@@ -529,7 +528,9 @@ class ScoreViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
         self.assertEqual(render_to_response_args[1]['group_list'], [])
         self._assert_student_status(render_to_response_args[1]['student_status'])
         self.assertEqual(render_to_response_args[1]['score_section_names'], ['SECTIONS'])
-        self.assertEqual('[]', render_to_response_args[1]['score_records'])
+        self.assertNotIn('score_records', render_to_response_args[1])
+        response_data = json.loads(self._post_records_ajax(manager, {}).content)
+        self.assertEqual([], response_data['records'])
 
     def test_index_views_status_none(self):
         self._setup()
@@ -556,7 +557,9 @@ class ScoreViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
         self.assertEqual(render_to_response_args[1]['group_list'], [])
         self._assert_student_status(render_to_response_args[1]['student_status'])
         self.assertEqual(render_to_response_args[1]['score_section_names'], ['SECTIONS'])
-        self._assert_record_data(render_to_response_args[1]['score_records'])
+        self.assertNotIn('score_records', render_to_response_args[1])
+        response_data = json.loads(self._post_records_ajax(manager, {}).content)
+        self._assert_record_data(json.dumps(response_data['records']))
 
     def test_index_views_member(self):
         status = 'Finished'
@@ -592,7 +595,9 @@ class ScoreViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
             (u'G02-01-02', 2, u'G2-1-2'), (u'G02-02', 6, u'G2-2')])
         self._assert_student_status(render_to_response_args[1]['student_status'])
         self.assertEqual(render_to_response_args[1]['score_section_names'], ['SECTIONS'])
-        self._assert_record_data_member(render_to_response_args[1]['score_records'])
+        self.assertNotIn('score_records', render_to_response_args[1])
+        response_data = json.loads(self._post_records_ajax(manager, {}).content)
+        self._assert_record_data_member(json.dumps(response_data['records']))
 
     def test_index_views_member_manager(self):
         status = 'Finished'
@@ -630,7 +635,9 @@ class ScoreViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
                          [(u'G01-01', 3, u'G1-1'), (u'G01-01-01', 8, u'G1-1-1'), (u'G01-01-02', 7, u'G1-1-2')])
         self._assert_student_status(render_to_response_args[1]['student_status'])
         self.assertEqual(render_to_response_args[1]['score_section_names'], ['SECTIONS'])
-        self.assertEqual('[]', render_to_response_args[1]['score_records'])
+        self.assertNotIn('score_records', render_to_response_args[1])
+        response_data = json.loads(self._post_records_ajax(manager_manager, {}).content)
+        self.assertEqual([], response_data['records'])
 
     def test_search_ajax(self):
         status = 'Finished'
@@ -657,7 +664,7 @@ class ScoreViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
             post_value['certificate_status'] = ''
             post_value['offset'] = '0'
             post_value['group_code'] = ''
-            response = self.client.post(self._ajax_view(), post_value)
+            response = self.client.post(self._records_ajax_view(), post_value)
 
         self.assertEqual(200, response.status_code)
         response_data = json.loads(response.content)
@@ -688,7 +695,7 @@ class ScoreViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
             post_value['certificate_status'] = ''
             post_value['offset'] = '0'
             post_value['group_code'] = ''
-            response = self.client.post(self._ajax_view(), post_value)
+            response = self.client.post(self._records_ajax_view(), post_value)
 
         self.assertEqual(200, response.status_code)
         response_data = json.loads(response.content)
@@ -720,7 +727,7 @@ class ScoreViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
             post_value['certificate_status'] = ''
             post_value['offset'] = '0'
             post_value['group_code'] = ''
-            response = self.client.post(self._ajax_view(), post_value)
+            response = self.client.post(self._records_ajax_view(), post_value)
 
         self.assertEqual(200, response.status_code)
         response_data = json.loads(response.content)
@@ -751,7 +758,7 @@ class ScoreViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
             post_value['certificate_status'] = ScoreStore.FIELD_CERTIFICATE_STATUS__DOWNLOADABLE
             post_value['offset'] = '0'
             post_value['group_code'] = ''
-            response = self.client.post(self._ajax_view(), post_value)
+            response = self.client.post(self._records_ajax_view(), post_value)
 
         self.assertEqual(200, response.status_code)
         response_data = json.loads(response.content)
@@ -782,7 +789,7 @@ class ScoreViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
             post_value['certificate_status'] = ''
             post_value['offset'] = '0'
             post_value['group_code'] = ''
-            response = self.client.post(self._ajax_view(), post_value)
+            response = self.client.post(self._records_ajax_view(), post_value)
 
         self.assertEqual(200, response.status_code)
         response_data = json.loads(response.content)
@@ -814,7 +821,7 @@ class ScoreViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
             post_value['certificate_status'] = ''
             post_value['offset'] = '0'
             post_value['group_code'] = ''
-            response = self.client.post(self._ajax_view(), post_value)
+            response = self.client.post(self._records_ajax_view(), post_value)
 
         self.assertEqual(200, response.status_code)
         response_data = json.loads(response.content)
@@ -845,7 +852,7 @@ class ScoreViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
             post_value['certificate_status'] = ''
             post_value['offset'] = '0.1'
             post_value['group_code'] = ''
-            response = self.client.post(self._ajax_view(), post_value)
+            response = self.client.post(self._records_ajax_view(), post_value)
 
         self.assertEqual(400, response.status_code)
 
@@ -879,7 +886,7 @@ class ScoreViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
             post_value['certificate_status'] = ''
             post_value['offset'] = '0'
             post_value['group_code'] = ''
-            response = self.client.post(self._ajax_view(), post_value)
+            response = self.client.post(self._records_ajax_view(), post_value)
 
         self.assertEqual(200, response.status_code)
         response_data = json.loads(response.content)
@@ -911,7 +918,7 @@ class ScoreViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
             post_value['certificate_status'] = ''
             post_value['offset'] = '0'
             post_value['group_code'] = '1234'
-            response = self.client.post(self._ajax_view(), post_value)
+            response = self.client.post(self._records_ajax_view(), post_value)
 
         self.assertEqual(200, response.status_code)
         response_data = json.loads(response.content)
@@ -940,7 +947,7 @@ class ScoreViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
             post_value['certificate_status'] = ''
             post_value['offset'] = '0'
             post_value['group_code'] = ''
-            response = self.client.post(self._ajax_view(), post_value)
+            response = self.client.post(self._records_ajax_view(), post_value)
 
         self.assertEqual(200, response.status_code)
         response_data = json.loads(response.content)
@@ -967,7 +974,7 @@ class ScoreViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
             post_value['certificate_status'] = ''
             post_value['offset'] = '0'
             post_value['group_code'] = '1234'
-            response = self.client.post(self._ajax_view(), post_value)
+            response = self.client.post(self._records_ajax_view(), post_value)
 
         self.assertEqual(200, response.status_code)
         response_data = json.loads(response.content)
@@ -994,7 +1001,7 @@ class ScoreViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
             post_value['certificate_status'] = ''
             post_value['offset'] = '0'
             post_value['group_code'] = '1234'
-            response = self.client.post(self._ajax_view(), post_value)
+            response = self.client.post(self._records_ajax_view(), post_value)
 
         self.assertEqual(200, response.status_code)
         response_data = json.loads(response.content)
@@ -1024,7 +1031,7 @@ class ScoreViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
             post_value['certificate_status'] = ''
             post_value['offset'] = '0'
             post_value['group_code'] = ''
-            response = self.client.post(self._ajax_view(), post_value)
+            response = self.client.post(self._records_ajax_view(), post_value)
 
         self.assertEqual(200, response.status_code)
         response_data = json.loads(response.content)
@@ -1051,12 +1058,99 @@ class ScoreViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
             post_value['certificate_status'] = ''
             post_value['offset'] = '0'
             post_value['group_code'] = ''
-            response = self.client.post(self._ajax_view(), post_value)
+            response = self.client.post(self._records_ajax_view(), post_value)
 
         self.assertEqual(200, response.status_code)
         response_data = json.loads(response.content)
         self.assertEqual('success', response_data['status'])
 
+    def _records_ajax_view(self):
+        return reverse('biz:achievement:score_records_ajax')
+
+    def _post_records_ajax(self, manager, param):
+        post_value = self._create_param_search_ajax()
+        post_value.update(param)
+        with self.skip_check_course_selection(current_manager=manager, current_organization=self.org_a,
+                                              current_contract=self.contract, current_course=self.course):
+            return self.client.post(self._records_ajax_view(), post_value)
+
+    def test_records_ajax(self):
+        self._setup(record_count=5)
+        self.overview.extra.is_status_managed = False
+        self.overview.extra.save()
+        manager = self._create_manager(org=self.org_a, user=self.user, created=self.gacco_organization,
+                                       permissions=[self.director_permission])
+
+        response = self._post_records_ajax(manager, {
+            'offset': 1,
+            'limit': 2,
+            'sort[0][field]': ScoreStore.FIELD_FULL_NAME,
+            'sort[0][direction]': 'desc',
+        })
+
+        self.assertEqual(200, response.status_code)
+        response_data = json.loads(response.content)
+        self.assertEqual('success', response_data['status'])
+        self.assertEqual(5, response_data['total'])
+        self.assertEqual(['TEST3', 'TEST2'], [r[ScoreStore.FIELD_USERNAME] for r in response_data['records']])
+        self.assertEqual([2, 3], [r['recid'] for r in response_data['records']])
+
+    def test_records_ajax_score_condition(self):
+        self._setup(record_count=3)
+        self.overview.extra.is_status_managed = False
+        self.overview.extra.save()
+        manager = self._create_manager(org=self.org_a, user=self.user, created=self.gacco_organization,
+                                       permissions=[self.director_permission])
+
+        response = self._post_records_ajax(manager, {
+            'detail_condition_score_name_1': 'SECTIONS',
+            'certificate_status': ScoreStore.FIELD_CERTIFICATE_STATUS__DOWNLOADABLE,
+            'search[0][field]': ScoreStore.FIELD_USERNAME,
+            'search[0][operator]': 'is',
+            'search[0][value]': 'test1',
+        })
+
+        self.assertEqual(200, response.status_code)
+        response_data = json.loads(response.content)
+        self.assertEqual(1, response_data['total'])
+        self.assertEqual(['TEST1'], [r[ScoreStore.FIELD_USERNAME] for r in response_data['records']])
+
+    def test_records_ajax_member_condition(self):
+        self._setup_and_user_create(record_count=2)
+        self._create_achievement_data(suffix='not_member')
+        self.overview.extra.is_status_managed = False
+        self.overview.extra.save()
+        manager = self._create_manager(org=self.org_a, user=self.user, created=self.gacco_organization,
+                                       permissions=[self.director_permission])
+
+        response = self._post_records_ajax(manager, {})
+        self.assertEqual(3, json.loads(response.content)['total'])
+
+        response = self._post_records_ajax(manager, {
+            'detail_condition_member_name_1': 'org1',
+            'detail_condition_member_1': 'org',
+        })
+        response_data = json.loads(response.content)
+        self.assertEqual(2, response_data['total'])
+        self.assertEqual(['org1', 'org1'], [r['Organization1'] for r in response_data['records']])
+
+        response = self._post_records_ajax(manager, {
+            'detail_condition_member_name_1': 'org1',
+            'detail_condition_member_1': 'abc',
+        })
+        response_data = json.loads(response.content)
+        self.assertEqual(0, response_data['total'])
+        self.assertEqual([], response_data['records'])
+
+    def test_records_ajax_invalid_limit(self):
+        self._setup()
+        manager = self._create_manager(org=self.org_a, user=self.user, created=self.gacco_organization,
+                                       permissions=[self.director_permission])
+
+        response = self._post_records_ajax(manager, {'limit': 0})
+
+        self.assertEqual(400, response.status_code)
+
     def test_download_csv(self):
         status = 'Finished'
 
@@ -1234,6 +1328,29 @@ class ScoreViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
             self._get_csv_file_name(datetime_utils.to_jst(self.utc_datetime_update).strftime('%Y-%m-%d-%H%M'))
         ))
 
+    def test_download_csv_streaming(self):
+        self._setup_and_user_create(record_count=3)
+        self._create_achievement_data(suffix='not_member')
+        self.overview.extra.is_status_managed = False
+        self.overview.extra.save()
+
+        manager = self._create_manager(org=self.org_a, user=self.user, created=self.gacco_organization,
+                                       permissions=[self.director_permission])
+
+        with patch('biz.djangoapps.ga_achievement.views.MEMBER_MERGE_BATCH_SIZE', 2), \
+                self.skip_check_course_selection(current_manager=manager, current_organization=self.org_a,
+                                                 current_contract=self.contract, current_course=self.course):
+            response = self.client.post(self._download_csv_view(), {'encode': 'false'})
+            self.assertTrue(response.streaming)
+            lines = ''.join(response.streaming_content).decode('cp932').splitlines()
+
+        self.assertEqual(200, response.status_code)
+        # header and 4 records
+        self.assertEqual(5, len(lines))
+        self.assertIn('"Organization Groups"', lines[0])
+        self.assertEqual(3, len([line for line in lines[1:] if '"org1"' in line]))
+        self.assertIn('"TESTnot_member"', lines[4])
+
     def test_download_searched_csv(self):
         status = 'Finished'
 
@@ -1287,7 +1404,9 @@ class ScoreViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
         self.assertEqual(render_to_response_args[1]['group_list'], [])
         self._assert_student_status(render_to_response_args[1]['student_status'])
         self.assertEqual(render_to_response_args[1]['score_section_names'], ['SECTIONS'])
-        self._assert_record_data_status_true(render_to_response_args[1]['score_records'])
+        self.assertNotIn('score_records', render_to_response_args[1])
+        response_data = json.loads(self._post_records_ajax(manager, {}).content)
+        self._assert_record_data_status_true(json.dumps(response_data['records']))
 
     def test_index_views_manager_is_status_true(self):
         status = 'Finished'
@@ -1321,7 +1440,9 @@ class ScoreViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
         self.assertEqual(render_to_response_args[1]['group_list'], [])
         self._assert_student_status(render_to_response_args[1]['student_status'])
         self.assertEqual(render_to_response_args[1]['score_section_names'], ['SECTIONS'])
-        self.assertEqual('[]', render_to_response_args[1]['score_records'])
+        self.assertNotIn('score_records', render_to_response_args[1])
+        response_data = json.loads(self._post_records_ajax(manager, {}).content)
+        self.assertEqual([], response_data['records'])
 
     def test_index_views_status_none_is_status_true(self):
         self._setup()
@@ -1348,7 +1469,9 @@ class ScoreViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
         self.assertEqual(render_to_response_args[1]['group_list'], [])
         self._assert_student_status(render_to_response_args[1]['student_status'])
         self.assertEqual(render_to_response_args[1]['score_section_names'], ['SECTIONS'])
-        self._assert_record_data_status_true(render_to_response_args[1]['score_records'])
+        self.assertNotIn('score_records', render_to_response_args[1])
+        response_data = json.loads(self._post_records_ajax(manager, {}).content)
+        self._assert_record_data_status_true(json.dumps(response_data['records']))
 
     def test_index_views_member_is_status_true(self):
         status = 'Finished'
@@ -1384,7 +1507,9 @@ class ScoreViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
             (u'G02-01-02', 2, u'G2-1-2'), (u'G02-02', 6, u'G2-2')])
         self._assert_student_status(render_to_response_args[1]['student_status'])
         self.assertEqual(render_to_response_args[1]['score_section_names'], ['SECTIONS'])
-        self._assert_record_data_member_status_true(render_to_response_args[1]['score_records'])
+        self.assertNotIn('score_records', render_to_response_args[1])
+        response_data = json.loads(self._post_records_ajax(manager, {}).content)
+        self._assert_record_data_member_status_true(json.dumps(response_data['records']))
 
     def test_index_views_member_manager_is_status_true(self):
         status = 'Finished'
@@ -1422,7 +1547,9 @@ class ScoreViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
                          [(u'G01-01', 3, u'G1-1'), (u'G01-01-01', 8, u'G1-1-1'), (u'G01-01-02', 7, u'G1-1-2')])
         self._assert_student_status(render_to_response_args[1]['student_status'])
         self.assertEqual(render_to_response_args[1]['score_section_names'], ['SECTIONS'])
-        self.assertEqual('[]', render_to_response_args[1]['score_records'])
+        self.assertNotIn('score_records', render_to_response_args[1])
+        response_data = json.loads(self._post_records_ajax(manager_manager, {}).content)
+        self.assertEqual([], response_data['records'])
 
     def test_search_ajax_is_status_true(self):
         status = 'Finished'
@@ -1450,7 +1577,7 @@ class ScoreViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
             post_value['certificate_status'] = ''
             post_value['offset'] = '0'
             post_value['group_code'] = ''
-            response = self.client.post(self._ajax_view(), post_value)
+            response = self.client.post(self._records_ajax_view(), post_value)
 
         self.assertEqual(200, response.status_code)
         response_data = json.loads(response.content)
@@ -1482,7 +1609,7 @@ class ScoreViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
             post_value['certificate_status'] = ''
             post_value['offset'] = '0'
             post_value['group_code'] = ''
-            response = self.client.post(self._ajax_view(), post_value)
+            response = self.client.post(self._records_ajax_view(), post_value)
 
         self.assertEqual(200, response.status_code)
         response_data = json.loads(response.content)
@@ -1515,7 +1642,7 @@ class ScoreViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
             post_value['certificate_status'] = ''
             post_value['offset'] = '0'
             post_value['group_code'] = ''
-            response = self.client.post(self._ajax_view(), post_value)
+            response = self.client.post(self._records_ajax_view(), post_value)
 
         self.assertEqual(200, response.status_code)
         response_data = json.loads(response.content)
@@ -1547,7 +1674,7 @@ class ScoreViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
             post_value['certificate_status'] = ScoreStore.FIELD_CERTIFICATE_STATUS__DOWNLOADABLE
             post_value['offset'] = '0'
             post_value['group_code'] = ''
-            response = self.client.post(self._ajax_view(), post_value)
+            response = self.client.post(self._records_ajax_view(), post_value)
 
         self.assertEqual(200, response.status_code)
         response_data = json.loads(response.content)
@@ -1579,7 +1706,7 @@ class ScoreViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
             post_value['certificate_status'] = ''
             post_value['offset'] = '0'
             post_value['group_code'] = ''
-            response = self.client.post(self._ajax_view(), post_value)
+            response = self.client.post(self._records_ajax_view(), post_value)
 
         self.assertEqual(200, response.status_code)
         response_data = json.loads(response.content)
@@ -1612,7 +1739,7 @@ class ScoreViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
             post_value['certificate_status'] = ''
             post_value['offset'] = '0'
             post_value['group_code'] = ''
-            response = self.client.post(self._ajax_view(), post_value)
+            response = self.client.post(self._records_ajax_view(), post_value)
 
         self.assertEqual(200, response.status_code)
         response_data = json.loads(response.content)
@@ -1644,7 +1771,7 @@ class ScoreViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
             post_value['certificate_status'] = ''
             post_value['offset'] = '0.1'
             post_value['group_code'] = ''
-            response = self.client.post(self._ajax_view(), post_value)
+            response = self.client.post(self._records_ajax_view(), post_value)
 
         self.assertEqual(400, response.status_code)
 
@@ -1679,7 +1806,7 @@ class ScoreViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
             post_value['certificate_status'] = ''
             post_value['offset'] = '0'
             post_value['group_code'] = ''
-            response = self.client.post(self._ajax_view(), post_value)
+            response = self.client.post(self._records_ajax_view(), post_value)
 
         self.assertEqual(200, response.status_code)
         response_data = json.loads(response.content)
@@ -1712,7 +1839,7 @@ class ScoreViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
             post_value['certificate_status'] = ''
             post_value['offset'] = '0'
             post_value['group_code'] = '1234'
-            response = self.client.post(self._ajax_view(), post_value)
+            response = self.client.post(self._records_ajax_view(), post_value)
 
         self.assertEqual(200, response.status_code)
         response_data = json.loads(response.content)
@@ -1742,7 +1869,7 @@ class ScoreViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
             post_value['certificate_status'] = ''
             post_value['offset'] = '0'
             post_value['group_code'] = ''
-            response = self.client.post(self._ajax_view(), post_value)
+            response = self.client.post(self._records_ajax_view(), post_value)
 
         self.assertEqual(200, response.status_code)
         response_data = json.loads(response.content)
@@ -1770,7 +1897,7 @@ class ScoreViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
             post_value['certificate_status'] = ''
             post_value['offset'] = '0'
             post_value['group_code'] = '1234'
-            response = self.client.post(self._ajax_view(), post_value)
+            response = self.client.post(self._records_ajax_view(), post_value)
 
         self.assertEqual(200, response.status_code)
         response_data = json.loads(response.content)
@@ -1798,7 +1925,7 @@ class ScoreViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
             post_value['certificate_status'] = ''
             post_value['offset'] = '0'
             post_value['group_code'] = '1234'
-            response = self.client.post(self._ajax_view(), post_value)
+            response = self.client.post(self._records_ajax_view(), post_value)
 
         self.assertEqual(200, response.status_code)
         response_data = json.loads(response.content)
@@ -1829,7 +1956,7 @@ class ScoreViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
             post_value['certificate_status'] = ''
             post_value['offset'] = '0'
             post_value['group_code'] = ''
-            response = self.client.post(self._ajax_view(), post_value)
+            response = self.client.post(self._records_ajax_view(), post_value)
 
         self.assertEqual(200, response.status_code)
         response_data = json.loads(response.content)
@@ -1857,7 +1984,7 @@ class ScoreViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
             post_value['certificate_status'] = ''
             post_value['offset'] = '0'
             post_value['group_code'] = ''
-            response = self.client.post(self._ajax_view(), post_value)
+            response = self.client.post(self._records_ajax_view(), post_value)
 
         self.assertEqual(200, response.status_code)
         response_data = json.loads(response.content)
@@ -2069,9 +2196,6 @@ class PlaybackViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
     def _index_view(self):
         return reverse('biz:achievement:playback')
 
-    def _ajax_view(self):
-        return reverse('biz:achievement:playback_search_ajax')
-
     def _download_csv_view(self):
         return reverse('biz:achievement:playback_download_csv')
 
@@ -2518,7 +2642,9 @@ class PlaybackViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
                                   datetime_utils.to_jst(self.utc_datetime_update).strftime('%Y/%m/%d %H:%M'))
         self.assertEqual(render_to_response_args[1]['update_status'], status)
         self._assert_column_data(render_to_response_args[1]['playback_columns'])
-        self._assert_record_data(render_to_response_args[1]['playback_records'])
+        self.assertNotIn('playback_records', render_to_response_args[1])
+        response_data = json.loads(self._post_records_ajax(manager, {}).content)
+        self._assert_record_data(json.dumps(response_data['records']))
         self._assert_status_list(render_to_response_args[1]['status_list'])
         self._assert_member_org_item_list(render_to_response_args[1]['member_org_item_list'])
         self.assertEqual(render_to_response_args[1]['group_list'], [])
@@ -2578,7 +2704,9 @@ class PlaybackViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
         self._assert_record_count(render_to_response_args[1]['update_datetime'], '')
         self.assertEqual(render_to_response_args[1]['update_status'], '')
         self._assert_column_data(render_to_response_args[1]['playback_columns'])
-        self._assert_record_data(render_to_response_args[1]['playback_records'])
+        self.assertNotIn('playback_records', render_to_response_args[1])
+        response_data = json.loads(self._post_records_ajax(manager, {}).content)
+        self._assert_record_data(json.dumps(response_data['records']))
         self._assert_status_list(render_to_response_args[1]['status_list'])
         self._assert_member_org_item_list(render_to_response_args[1]['member_org_item_list'])
         self.assertEqual(render_to_response_args[1]['group_list'], [])
@@ -2612,7 +2740,9 @@ class PlaybackViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
         self.assertEqual(render_to_response_args[1]['update_status'], status)
         self._assert_column_data(render_to_response_args[1]['playback_columns'])
         self._assert_status_list(render_to_response_args[1]['status_list'])
-        self._assert_record_data_member(render_to_response_args[1]['playback_records'])
+        self.assertNotIn('playback_records', render_to_response_args[1])
+        response_data = json.loads(self._post_records_ajax(manager, {}).content)
+        self._assert_record_data_member(json.dumps(response_data['records']))
         self._assert_member_org_item_list(render_to_response_args[1]['member_org_item_list'])
         self.assertEqual(render_to_response_args[1]['group_list'], [
             (u'G01', 9, u'G1'), (u'G01-01', 3, u'G1-1'), (u'G01-01-01', 8, u'G1-1-1'), (u'G01-01-02', 7, u'G1-1-2'),
@@ -2682,7 +2812,7 @@ class PlaybackViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
             post_value['detail_condition_playback_no_1'] = ''
             post_value['offset'] = '0'
             post_value['group_code'] = ''
-            response = self.client.post(self._ajax_view(), post_value)
+            response = self.client.post(self._records_ajax_view(), post_value)
 
         self.assertEqual(200, response.status_code)
         response_data = json.loads(response.content)
@@ -2712,7 +2842,7 @@ class PlaybackViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
             post_value['detail_condition_playback_no_1'] = ''
             post_value['offset'] = '0'
             post_value['group_code'] = ''
-            response = self.client.post(self._ajax_view(), post_value)
+            response = self.client.post(self._records_ajax_view(), post_value)
 
         self.assertEqual(200, response.status_code)
         response_data = json.loads(response.content)
@@ -2743,7 +2873,7 @@ class PlaybackViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
             post_value['detail_condition_playback_no_1'] = ''
             post_value['offset'] = '0'
             post_value['group_code'] = ''
-            response = self.client.post(self._ajax_view(), post_value)
+            response = self.client.post(self._records_ajax_view(), post_value)
 
         self.assertEqual(200, response.status_code)
         response_data = json.loads(response.content)
@@ -2773,7 +2903,7 @@ class PlaybackViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
             post_value['detail_condition_playback_no_1'] = ''
             post_value['offset'] = '0'
             post_value['group_code'] = ''
-            response = self.client.post(self._ajax_view(), post_value)
+            response = self.client.post(self._records_ajax_view(), post_value)
 
         self.assertEqual(200, response.status_code)
         response_data = json.loads(response.content)
@@ -2804,7 +2934,7 @@ class PlaybackViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
             post_value['detail_condition_playback_no_1'] = ''
             post_value['offset'] = '0'
             post_value['group_code'] = ''
-            response = self.client.post(self._ajax_view(), post_value)
+            response = self.client.post(self._records_ajax_view(), post_value)
 
         self.assertEqual(200, response.status_code)
         response_data = json.loads(response.content)
@@ -2834,7 +2964,7 @@ class PlaybackViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
             post_value['detail_condition_playback_no_1'] = ''
             post_value['offset'] = '0.1'
             post_value['group_code'] = ''
-            response = self.client.post(self._ajax_view(), post_value)
+            response = self.client.post(self._records_ajax_view(), post_value)
 
         self.assertEqual(400, response.status_code)
 
@@ -2867,7 +2997,7 @@ class PlaybackViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
             post_value['detail_condition_member_2'] = 'org1'
             post_value['offset'] = '0'
             post_value['group_code'] = ''
-            response = self.client.post(self._ajax_view(), post_value)
+            response = self.client.post(self._records_ajax_view(), post_value)
 
         self.assertEqual(200, response.status_code)
         response_data = json.loads(response.content)
@@ -2898,7 +3028,7 @@ class PlaybackViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
             post_value['detail_condition_playback_no_1'] = ''
             post_value['offset'] = '0'
             post_value['group_code'] = '1234'
-            response = self.client.post(self._ajax_view(), post_value)
+            response = self.client.post(self._records_ajax_view(), post_value)
 
         self.assertEqual(200, response.status_code)
         response_data = json.loads(response.content)
@@ -2926,7 +3056,7 @@ class PlaybackViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
             post_value['total_playback_time_to'] = ''
             post_value['offset'] = '0'
             post_value['group_code'] = ''
-            response = self.client.post(self._ajax_view(), post_value)
+            response = self.client.post(self._records_ajax_view(), post_value)
 
         self.assertEqual(200, response.status_code)
         response_data = json.loads(response.content)
@@ -2952,7 +3082,7 @@ class PlaybackViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
             post_value['total_playback_time_to'] = ''
             post_value['offset'] = '0'
             post_value['group_code'] = '1234'
-            response = self.client.post(self._ajax_view(), post_value)
+            response = self.client.post(self._records_ajax_view(), post_value)
 
         self.assertEqual(200, response.status_code)
         response_data = json.loads(response.content)
@@ -2978,7 +3108,7 @@ class PlaybackViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
             post_value['total_playback_time_to'] = ''
             post_value['offset'] = '0'
             post_value['group_code'] = '1234'
-            response = self.client.post(self._ajax_view(), post_value)
+            response = self.client.post(self._records_ajax_view(), post_value)
 
         self.assertEqual(200, response.status_code)
         response_data = json.loads(response.content)
@@ -3007,7 +3137,7 @@ class PlaybackViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
             post_value['detail_condition_member_1'] = ''
             post_value['offset'] = '0'
             post_value['group_code'] = ''
-            response = self.client.post(self._ajax_view(), post_value)
+            response = self.client.post(self._records_ajax_view(), post_value)
 
         self.assertEqual(200, response.status_code)
         response_data = json.loads(response.content)
@@ -3033,12 +3163,101 @@ class PlaybackViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
             post_value['total_playback_time_to'] = ''
             post_value['offset'] = '0'
             post_value['group_code'] = ''
-            response = self.client.post(self._ajax_view(), post_value)
+            response = self.client.post(self._records_ajax_view(), post_value)
 
         self.assertEqual(200, response.status_code)
         response_data = json.loads(response.content)
         self.assertEqual('success', response_data['status'])
 
+    def _records_ajax_view(self):
+        return reverse('biz:achievement:playback_records_ajax')
+
+    def _post_records_ajax(self, manager, param):
+        post_value = self._create_param_search_ajax()
+        post_value.update(param)
+        with self.skip_check_course_selection(current_manager=manager, current_organization=self.org_a,
+                                              current_contract=self.contract, current_course=self.course):
+            return self.client.post(self._records_ajax_view(), post_value)
+
+    def test_records_ajax(self):
+        self._setup(record_count=5)
+        self.overview.extra.is_status_managed = False
+        self.overview.extra.save()
+        manager = self._create_manager(org=self.org_a, user=self.user, created=self.gacco_organization,
+                                       permissions=[self.director_permission])
+
+        response = self._post_records_ajax(manager, {
+            'offset': 1,
+            'limit': 2,
+            'sort[0][field]': PlaybackStore.FIELD_FULL_NAME,
+            'sort[0][direction]': 'desc',
+        })
+
+        self.assertEqual(200, response.status_code)
+        response_data = json.loads(response.content)
+        self.assertEqual('success', response_data['status'])
+        self.assertEqual(5, response_data['total'])
+        self.assertEqual(['TEST3', 'TEST2'], [r[PlaybackStore.FIELD_USERNAME] for r in response_data['records']])
+        self.assertEqual([2, 3], [r['recid'] for r in response_data['records']])
+
+    def test_records_ajax_playback_condition(self):
+        self._setup(record_count=3)
+        self.overview.extra.is_status_managed = False
+        self.overview.extra.save()
+        manager = self._create_manager(org=self.org_a, user=self.user, created=self.gacco_organization,
+                                       permissions=[self.director_permission])
+
+        response = self._post_records_ajax(manager, {
+            'total_playback_time_to': '1',
+        })
+        self.assertEqual(0, json.loads(response.content)['total'])
+
+        response = self._post_records_ajax(manager, {
+            'total_playback_time_from': '1',
+            'search[0][field]': PlaybackStore.FIELD_USERNAME,
+            'search[0][operator]': 'is',
+            'search[0][value]': 'test1',
+        })
+        response_data = json.loads(response.content)
+        self.assertEqual(1, response_data['total'])
+        self.assertEqual(['TEST1'], [r[PlaybackStore.FIELD_USERNAME] for r in response_data['records']])
+
+    def test_records_ajax_member_condition(self):
+        self._setup_and_user_create(record_count=2)
+        self._create_achievement_data(suffix='not_member')
+        self.overview.extra.is_status_managed = False
+        self.overview.extra.save()
+        manager = self._create_manager(org=self.org_a, user=self.user, created=self.gacco_organization,
+                                       permissions=[self.director_permission])
+
+        response = self._post_records_ajax(manager, {})
+        self.assertEqual(3, json.loads(response.content)['total'])
+
+        response = self._post_records_ajax(manager, {
+            'detail_condition_member_name_1': 'org1',
+            'detail_condition_member_1': 'org',
+        })
+        response_data = json.loads(response.content)
+        self.assertEqual(2, response_data['total'])
+        self.assertEqual(['org1', 'org1'], [r['Organization1'] for r in response_data['records']])
+
+        response = self._post_records_ajax(manager, {
+            'detail_condition_member_name_1': 'org1',
+            'detail_condition_member_1': 'abc',
+        })
+        response_data = json.loads(response.content)
+        self.assertEqual(0, response_data['total'])
+        self.assertEqual([], response_data['records'])
+
+    def test_records_ajax_invalid_limit(self):
+        self._setup()
+        manager = self._create_manager(org=self.org_a, user=self.user, created=self.gacco_organization,
+                                       permissions=[self.director_permission])
+
+        response = self._post_records_ajax(manager, {'limit': 0})
+
+        self.assertEqual(400, response.status_code)
+
     def test_download_csv(self):
         status = 'Finished'
 
@@ -3212,6 +3431,29 @@ class PlaybackViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
             self._get_csv_file_name(datetime_utils.to_jst(self.utc_datetime_update).strftime('%Y-%m-%d-%H%M'))
         ))
 
+    def test_download_csv_streaming(self):
+        self._setup_and_user_create(record_count=3)
+        self._create_achievement_data(suffix='not_member')
+        self.overview.extra.is_status_managed = False
+        self.overview.extra.save()
+
+        manager = self._create_manager(org=self.org_a, user=self.user, created=self.gacco_organization,
+                                       permissions=[self.director_permission])
+
+        with patch('biz.djangoapps.ga_achievement.views.MEMBER_MERGE_BATCH_SIZE', 2), \
+                self.skip_check_course_selection(current_manager=manager, current_organization=self.org_a,
+                                                 current_contract=self.contract, current_course=self.course):
+            response = self.client.post(self._download_csv_view(), {'encode': 'false'})
+            self.assertTrue(response.streaming)
+            lines = ''.join(response.streaming_content).decode('cp932').splitlines()
+
+        self.assertEqual(200, response.status_code)
+        # header and 4 records
+        self.assertEqual(5, len(lines))
+        self.assertIn('"Organization Groups"', lines[0])
+        self.assertEqual(3, len([line for line in lines[1:] if '"org1"' in line]))
+        self.assertIn('"TESTnot_member"', lines[4])
+
     def test_download_searched_csv(self):
         status = 'Finished'
 
@@ -3260,7 +3502,9 @@ class PlaybackViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
                                   datetime_utils.to_jst(self.utc_datetime_update).strftime('%Y/%m/%d %H:%M'))
         self.assertEqual(render_to_response_args[1]['update_status'], status)
         self._assert_column_data_status_true(render_to_response_args[1]['playback_columns'])
-        self._assert_record_data_status_true(render_to_response_args[1]['playback_records'])
+        self.assertNotIn('playback_records', render_to_response_args[1])
+        response_data = json.loads(self._post_records_ajax(manager, {}).content)
+        self._assert_record_data_status_true(json.dumps(response_data['records']))
         self._assert_status_list(render_to_response_args[1]['status_list'])
         self._assert_member_org_item_list(render_to_response_args[1]['member_org_item_list'])
         self.assertEqual(render_to_response_args[1]['group_list'], [])
@@ -3320,7 +3564,9 @@ class PlaybackViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
         self._assert_record_count(render_to_response_args[1]['update_datetime'], '')
         self.assertEqual(render_to_response_args[1]['update_status'], '')
         self._assert_column_data_status_true(render_to_response_args[1]['playback_columns'])
-        self._assert_record_data_status_true(render_to_response_args[1]['playback_records'])
+        self.assertNotIn('playback_records', render_to_response_args[1])
+        response_data = json.loads(self._post_records_ajax(manager, {}).content)
+        self._assert_record_data_status_true(json.dumps(response_data['records']))
         self._assert_status_list(render_to_response_args[1]['status_list'])
         self._assert_member_org_item_list(render_to_response_args[1]['member_org_item_list'])
         self.assertEqual(render_to_response_args[1]['group_list'], [])
@@ -3354,7 +3600,9 @@ class PlaybackViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
         self.assertEqual(render_to_response_args[1]['update_status'], status)
         self._assert_column_data_status_true(render_to_response_args[1]['playback_columns'])
         self._assert_status_list(render_to_response_args[1]['status_list'])
-        self._assert_record_data_member_status_true(render_to_response_args[1]['playback_records'])
+        self.assertNotIn('playback_records', render_to_response_args[1])
+        response_data = json.loads(self._post_records_ajax(manager, {}).content)
+        self._assert_record_data_member_status_true(json.dumps(response_data['records']))
         self._assert_member_org_item_list(render_to_response_args[1]['member_org_item_list'])
         self.assertEqual(render_to_response_args[1]['group_list'], [
             (u'G01', 9, u'G1'), (u'G01-01', 3, u'G1-1'), (u'G01-01-01', 8, u'G1-1-1'), (u'G01-01-02', 7, u'G1-1-2'),
@@ -3425,7 +3673,7 @@ class PlaybackViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
             post_value['detail_condition_playback_no_1'] = ''
             post_value['offset'] = '0'
             post_value['group_code'] = ''
-            response = self.client.post(self._ajax_view(), post_value)
+            response = self.client.post(self._records_ajax_view(), post_value)
 
         self.assertEqual(200, response.status_code)
         response_data = json.loads(response.content)
@@ -3456,7 +3704,7 @@ class PlaybackViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
             post_value['detail_condition_playback_no_1'] = ''
             post_value['offset'] = '0'
             post_value['group_code'] = ''
-            response = self.client.post(self._ajax_view(), post_value)
+            response = self.client.post(self._records_ajax_view(), post_value)
 
         self.assertEqual(200, response.status_code)
         response_data = json.loads(response.content)
@@ -3488,7 +3736,7 @@ class PlaybackViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
             post_value['detail_condition_playback_no_1'] = ''
             post_value['offset'] = '0'
             post_value['group_code'] = ''
-            response = self.client.post(self._ajax_view(), post_value)
+            response = self.client.post(self._records_ajax_view(), post_value)
 
         self.assertEqual(200, response.status_code)
         response_data = json.loads(response.content)
@@ -3519,7 +3767,7 @@ class PlaybackViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
             post_value['detail_condition_playback_no_1'] = ''
             post_value['offset'] = '0'
             post_value['group_code'] = ''
-            response = self.client.post(self._ajax_view(), post_value)
+            response = self.client.post(self._records_ajax_view(), post_value)
 
         self.assertEqual(200, response.status_code)
         response_data = json.loads(response.content)
@@ -3551,7 +3799,7 @@ class PlaybackViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
             post_value['detail_condition_playback_no_1'] = ''
             post_value['offset'] = '0'
             post_value['group_code'] = ''
-            response = self.client.post(self._ajax_view(), post_value)
+            response = self.client.post(self._records_ajax_view(), post_value)
 
         self.assertEqual(200, response.status_code)
         response_data = json.loads(response.content)
@@ -3582,7 +3830,7 @@ class PlaybackViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
             post_value['detail_condition_playback_no_1'] = ''
             post_value['offset'] = '0.1'
             post_value['group_code'] = ''
-            response = self.client.post(self._ajax_view(), post_value)
+            response = self.client.post(self._records_ajax_view(), post_value)
 
         self.assertEqual(400, response.status_code)
 
@@ -3616,7 +3864,7 @@ class PlaybackViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
             post_value['detail_condition_member_2'] = 'org1'
             post_value['offset'] = '0'
             post_value['group_code'] = ''
-            response = self.client.post(self._ajax_view(), post_value)
+            response = self.client.post(self._records_ajax_view(), post_value)
 
         self.assertEqual(200, response.status_code)
         response_data = json.loads(response.content)
@@ -3648,7 +3896,7 @@ class PlaybackViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
             post_value['detail_condition_playback_no_1'] = ''
             post_value['offset'] = '0'
             post_value['group_code'] = '1234'
-            response = self.client.post(self._ajax_view(), post_value)
+            response = self.client.post(self._records_ajax_view(), post_value)
 
         self.assertEqual(200, response.status_code)
         response_data = json.loads(response.content)
@@ -3677,7 +3925,7 @@ class PlaybackViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
             post_value['total_playback_time_to'] = ''
             post_value['offset'] = '0'
             post_value['group_code'] = ''
-            response = self.client.post(self._ajax_view(), post_value)
+            response = self.client.post(self._records_ajax_view(), post_value)
 
         self.assertEqual(200, response.status_code)
         response_data = json.loads(response.content)
@@ -3704,7 +3952,7 @@ class PlaybackViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
             post_value['total_playback_time_to'] = ''
             post_value['offset'] = '0'
             post_value['group_code'] = '1234'
-            response = self.client.post(self._ajax_view(), post_value)
+            response = self.client.post(self._records_ajax_view(), post_value)
 
         self.assertEqual(200, response.status_code)
         response_data = json.loads(response.content)
@@ -3731,7 +3979,7 @@ class PlaybackViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
             post_value['total_playback_time_to'] = ''
             post_value['offset'] = '0'
             post_value['group_code'] = '1234'
-            response = self.client.post(self._ajax_view(), post_value)
+            response = self.client.post(self._records_ajax_view(), post_value)
 
         self.assertEqual(200, response.status_code)
         response_data = json.loads(response.content)
@@ -3761,7 +4009,7 @@ class PlaybackViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
             post_value['detail_condition_member_1'] = ''
             post_value['offset'] = '0'
             post_value['group_code'] = ''
-            response = self.client.post(self._ajax_view(), post_value)
+            response = self.client.post(self._records_ajax_view(), post_value)
 
         self.assertEqual(200, response.status_code)
         response_data = json.loads(response.content)
@@ -3788,7 +4036,7 @@ class PlaybackViewTest(BizStoreTestBase, BizViewTestBase, ModuleStoreTestCase):
             post_value['total_playback_time_to'] = ''
             post_value['offset'] = '0'
             post_value['group_code'] = ''
-            response = self.client.post(self._ajax_view(), post_value)
+            response = self.client.post(self._records_ajax_view(), post_value)
 
         self.assertEqual(200, response.status_code)
         response_data = json.loads(response.content)
@@ -10,6 +10,6 @@ urlpatterns = patterns(
     url(r'^score_download_csv$', 'score_download_csv', name='score_download_csv'),
     url(r'^playback$', 'playback', name='playback'),
     url(r'^playback_download_csv$', 'playback_download_csv', name='playback_download_csv'),
-    url(r'^score_search_ajax$', 'score_search_ajax', name='score_search_ajax'),
-    url(r'^playback_search_ajax$', 'playback_search_ajax', name='playback_search_ajax'),
+    url(r'^score_records_ajax$', 'score_records_ajax', name='score_records_ajax'),
+    url(r'^playback_records_ajax$', 'playback_records_ajax', name='playback_records_ajax'),
 )
@@ -7,6 +7,7 @@ import logging
 import numbers
 from collections import OrderedDict
 from datetime import datetime
+from itertools import islice
 from string import Template
 
 from django.conf import settings
@@ -14,8 +15,9 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
 from django.utils.translation import ugettext as _
 from django.views.decorators.http import require_GET, require_POST
+from pymongo import ASCENDING, DESCENDING
 
-from biz.djangoapps.ga_achievement.achievement_store import PlaybackStore, ScoreStore
+from biz.djangoapps.ga_achievement.achievement_store import AchievementStoreBase, PlaybackStore, ScoreStore
 from biz.djangoapps.ga_achievement.models import PlaybackBatchStatus, ScoreBatchStatus
 from biz.djangoapps.ga_invitation.models import STATUS as CONTRACT_REGISTER_STATUS
 from biz.djangoapps.gx_org_group.models import Group
@@ -23,7 +25,8 @@ from biz.djangoapps.gx_member.models import Member
 from biz.djangoapps.util import datetime_utils
 from biz.djangoapps.util.json_utils import EscapedEdxJSONEncoder
 from biz.djangoapps.util.decorators import check_course_selection, check_organization_group
-from biz.djangoapps.util.unicodetsv_utils import create_tsv_response, create_csv_response_double_quote
+from biz.djangoapps.util.unicodetsv_utils import create_csv_streaming_response_double_quote, \
+    create_tsv_streaming_response
 
 from courseware.models import StudentModule
 from edxmako.shortcuts import render_to_response
@@ -38,6 +41,10 @@ log = logging.getLogger(__name__)
 # Note: Max number of score and playback data to display.
 MAX_RECORDS_SEARCH_BY_PLAYBACK = 10000
 SIMPLE_DISPLAY_MAX_LIMIT = 100
+# Note: Max number of score and playback data to return per request of the paginated grid.
+MAX_RECORDS_PER_PAGE = 1000
+# Note: Number of records to merge with member at once while streaming csv.
+MEMBER_MERGE_BATCH_SIZE = 1000
 
 @require_GET
 @login_required
@@ -77,8 +84,8 @@ def score(request):
         update_status = ''
 
     score_store = ScoreStore(contract_id, unicode(course_id))
-    # score_columns, score_records = score_store.get_data_for_w2ui(limit=settings.BIZ_MONGO_LIMIT_RECORDS)
-    score_columns, score_records = score_store.get_data_for_w2ui(limit=SIMPLE_DISPLAY_MAX_LIMIT)
+    # Note: Records are loaded by score_records_ajax per page of the grid
+    score_columns = (score_store.get_column_document() or {}).items()
     hidden_score_columns = score_store.get_section_names()
     score_section_names = [column[0] for column in hidden_score_columns]
 
@@ -92,14 +99,10 @@ def score(request):
     # Member
     child_group_ids = request.current_organization_visible_group_ids
 
-    new_score_records = _merge_to_store_by_member_for_search(
-        request, org, child_group_ids, manager, _(ScoreStore.FIELD_USERNAME), score_records)
-
     context = {
         'update_datetime': update_datetime,
         'update_status': update_status,
         'score_columns': json.dumps(score_columns),
-        'score_records': json.dumps(new_score_records),
         'status_list': status,
         'member_org_item_list': _get_member_org_item_list(),
         'group_list': _create_group_choice_list(manager, org, child_group_ids),
@@ -162,8 +165,8 @@ def playback(request):
         update_status = ''
 
     playback_store = PlaybackStore(contract_id, unicode(course_id))
-    # playback_columns, playback_records = playback_store.get_data_for_w2ui(limit=MAX_RECORDS_SEARCH_BY_PLAYBACK)
-    playback_columns, playback_records = playback_store.get_data_for_w2ui(limit=SIMPLE_DISPLAY_MAX_LIMIT)
+    # Note: Records are loaded by playback_records_ajax per page of the grid
+    playback_columns = (playback_store.get_column_document() or {}).items()
 
     hidden_playback_columns = playback_store.get_section_names()
     playback_section_names = [column[0] for column in hidden_playback_columns]
@@ -178,14 +181,10 @@ def playback(request):
     # Member
     child_group_ids = request.current_organization_visible_group_ids
 
-    new_playback_records = _merge_to_store_by_member_for_search(
-        request, org, child_group_ids, manager, _(PlaybackStore.FIELD_USERNAME), playback_records)
-
     context = {
         'update_datetime': update_datetime,
         'update_status': update_status,
         'playback_columns': json.dumps(playback_columns),
-        'playback_records': json.dumps(new_playback_records),
         'status_list': status,
         'member_org_item_list': _get_member_org_item_list(),
         'group_list': _create_group_choice_list(manager, org, child_group_ids),
@@ -200,48 +199,70 @@ def playback(request):
 @login_required
 @check_course_selection
 @check_organization_group
-def score_search_ajax(request):
+def score_records_ajax(request):
+    """
+    Returns a page of score status records for w2ui grid
+
+    Note: Records are filtered, sorted and paginated in MongoDB, so that only one page is loaded per request.
+
+    :param request: HttpRequest
+    :return: JsonResponse
+    """
     org = request.current_organization
     contract_id = request.current_contract.id
     course_id = request.current_course.id
     manager = request.current_manager
 
     try:
-        __, __, total_records, new_score_records = score_search_filter(request, org, contract_id, course_id, manager)
+        search_conditions = _get_score_search_conditions(request)
+        score_store = ScoreStore(contract_id, unicode(course_id))
+        total_records, score_records = _get_records_page(
+            request, org, course_id, manager, score_store, search_conditions)
     except Exception as e:
         log.exception('Caught the exception: ' + type(e).__name__)
         return JsonResponseBadRequest(_("An error has occurred while loading. Please wait a moment and try again."))
 
     content = {
         'status': 'success',
-        'total_records': total_records,
-        'score_records_json': json.dumps(new_score_records, cls=EscapedEdxJSONEncoder),
+        'total': total_records,
+        'records': score_records,
     }
-    return JsonResponse(content)
+    return JsonResponse(content, encoder=EscapedEdxJSONEncoder)
 
 
 @require_POST
 @login_required
 @check_course_selection
 @check_organization_group
-def playback_search_ajax(request):
+def playback_records_ajax(request):
+    """
+    Returns a page of playback status records for w2ui grid
+
+    Note: Records are filtered, sorted and paginated in MongoDB, so that only one page is loaded per request.
+
+    :param request: HttpRequest
+    :return: JsonResponse
+    """
     org = request.current_organization
     contract_id = request.current_contract.id
     course_id = request.current_course.id
     manager = request.current_manager
 
     try:
-        __, __, total_records, new_playback_records = playback_search_filter(request, org, contract_id, course_id, manager)
+        search_conditions = _get_playback_search_conditions(request)
+        playback_store = PlaybackStore(contract_id, unicode(course_id))
+        total_records, playback_records = _get_records_page(
+            request, org, course_id, manager, playback_store, search_conditions)
     except Exception as e:
         log.exception('Caught the exception: ' + type(e).__name__)
         return JsonResponseBadRequest(_("An error has occurred while loading. Please wait a moment and try again."))
 
     content = {
         'status': 'success',
-        'total_records': total_records,
-        'playback_records_json': json.dumps(new_playback_records, cls=EscapedEdxJSONEncoder),
+        'total': total_records,
+        'records': playback_records,
     }
-    return JsonResponse(content)
+    return JsonResponse(content, encoder=EscapedEdxJSONEncoder)
 
 
 @require_POST
@@ -253,12 +274,11 @@ def score_download_csv(request):
     Returns response for download of score status csv
 
     :param request: HttpRequest
-    :return: HttpResponse
+    :return: StreamingHttpResponse
     """
     org = request.current_organization
     contract_id = request.current_contract.id
     course_id = request.current_course.id
-    course_overview = CourseOverview.get_from_id(course_id)
     manager = request.current_manager
 
     batch_status = ScoreBatchStatus.get_last_status(contract_id, course_id)
@@ -268,120 +288,20 @@ def score_download_csv(request):
         update_datetime = 'no-timestamp'
 
     score_store = ScoreStore(contract_id, unicode(course_id))
-
-    enrollment_attribute_dict = {}
     if "search-download" in request.POST:
-        score_columns, score_records, __, new_score_records = score_search_filter(request, org, contract_id, course_id,
-                                                                                  manager)
-        score_columns = _change_column(course_overview, score_columns)
+        search_conditions = _get_score_search_conditions(request)
+        limit = MAX_RECORDS_SEARCH_BY_PLAYBACK
     else:
-        score_columns, score_records = score_store.get_data_for_w2ui(limit=settings.BIZ_MONGO_LIMIT_RECORDS)
-        score_columns = _change_column(course_overview, score_columns)
-        if course_overview.extra.is_status_managed:
-            enrollment_attribute_dict = _get_attribute_value(course_id)
-        new_score_records = []
-
-    # Member
-    username_key = _(ScoreStore.FIELD_USERNAME)
-    members = Member.find_active_by_org(org=org.id).select_related('user', 'group').filter(
-        user__username__in=[s[username_key] for s in score_records])
-
-    is_manager = not manager.is_director() and manager.is_manager() and Group.objects.filter(org=org).exists()
-    child_group_ids = request.current_organization_visible_group_ids
-
-    members_dict = {member.user.username: member for member in members}
-
-    for score_record in score_records:
-        current_user_name = score_record[username_key]
-        if "search-download" not in request.POST:
-            score_record = _change_of_value_name(score_record)
-            if course_overview.extra.is_status_managed:
-                score_record = _set_student_status_record(score_record, enrollment_attribute_dict, current_user_name)
-            else:
-                del score_record[_("Student Status")]
-
-        member_record = {_("Organization Groups"): ''}
-        if current_user_name in members_dict:
-            m = members_dict[current_user_name]
-            if is_manager and m.group and m.group.id not in child_group_ids:
-                continue
-
-            if m.group:
-                member_record[_("Organization Groups")] = m.group.group_name
-            for i in range(1, 11):
-                member_record[_("Organization") + str(i)] = getattr(m, 'org' + str(i))
-                member_record[_("Item") + str(i)] = getattr(m, 'item' + str(i))
-
-        elif is_manager:
-            continue
-
-        if "search-download" not in request.POST:
-            score_record.update(member_record)
-            new_score_records.append(score_record)
-
-    header, types = [], []
-    score_columns.insert(1, (_("Organization Groups"), 'text'))
-    for num in range(1, 11):
-        score_columns.append([_("Organization") + str(num), 'text'])
-    for num in range(1, 11):
-        score_columns.append([_("Item") + str(num), 'text'])
-    for column in score_columns:
-        header.append(column[0])
-
-    datarows = []
-    for record in new_score_records:
-        data = []
-        for head, column_type in score_columns:
-            if head in record:
-                value = record[head]
-
-                if column_type == ScoreStore.COLUMN_TYPE__TEXT:
-                    if isinstance(value, basestring):
-                        data.append(value)
-                    else:
-                        data.append('')
-                elif column_type == ScoreStore.COLUMN_TYPE__DATE:
-                    try:
-                        value = datetime.strptime(value, '%Y/%m/%d %H:%M:%S %Z')
-                        data.append(datetime_utils.to_jst(value).strftime('%Y/%m/%d'))
-                    except:
-                        data.append('')
-                elif column_type == ScoreStore.COLUMN_TYPE__TIME:
-                    if isinstance(value, numbers.Number):
-                        # Convert seconds to 'h:mm' format
-                        data.append(datetime_utils.seconds_to_time_format(value))
-                    else:
-                        data.append('0:00')
-                elif column_type == ScoreStore.COLUMN_TYPE__PERCENT:
-                    if value == ScoreStore.VALUE__NOT_ATTEMPTED:
-                        # Note: '―'(U+2015) means 'Not Attempted' (#1816)
-                        data.append(value)
-                    elif isinstance(value, float):
-                        data.append('{:.01%}'.format(value))
-                    else:
-                        data.append('')
-                else:
-                    data.append(value)
-            else:
-                data.append('')
-
-        datarows.append(data)
+        search_conditions = {}
+        limit = settings.BIZ_MONGO_LIMIT_RECORDS
 
     filename = u'{course_prefix}_{csv_name}_{timestamp_str}.csv'.format(
         course_prefix=course_filename_prefix_generator(request.current_course.id),
         csv_name='score_status',
         timestamp_str=update_datetime,
     )
-    if 'encode' not in request.POST:
-        request.POST['encode'] = 'false'
-    if request.POST['encode'] == 'false':
-        response = create_csv_response_double_quote(filename, header, datarows)
-        response['Set-Cookie'] = 'fileDownload=true; path=/'
-        return response
-    elif request.POST['encode'] == 'true':
-        response = create_tsv_response(filename, header, datarows)
-        response['Set-Cookie'] = 'fileDownload=true; path=/'
-        return response
+    return _create_download_csv_response(request, org, course_id, manager, score_store, search_conditions, limit,
+                                         filename)
 
 
 @require_POST
@@ -390,15 +310,14 @@ def score_download_csv(request):
 @check_organization_group
 def playback_download_csv(request):
     """
-    Returns response for download of score status csv
+    Returns response for download of playback status csv
 
     :param request: HttpRequest
-    :return: HttpResponse
+    :return: StreamingHttpResponse
     """
     org = request.current_organization
     contract_id = request.current_contract.id
     course_id = request.current_course.id
-    course_overview = CourseOverview.get_from_id(course_id)
     manager = request.current_manager
 
     batch_status = PlaybackBatchStatus.get_last_status(contract_id, course_id)
@@ -408,120 +327,137 @@ def playback_download_csv(request):
         update_datetime = 'no-timestamp'
 
     playback_store = PlaybackStore(contract_id, unicode(course_id))
-
-    enrollment_attribute_dict = {}
     if "search-download" in request.POST:
-        playback_columns, playback_records, __, new_playback_records = playback_search_filter(request, org, contract_id,
-                                                                                              course_id, manager)
-        playback_columns = _change_column(course_overview, playback_columns)
+        search_conditions = _get_playback_search_conditions(request)
+        limit = MAX_RECORDS_SEARCH_BY_PLAYBACK
     else:
-        playback_columns, playback_records = playback_store.get_data_for_w2ui(limit=settings.BIZ_MONGO_LIMIT_RECORDS)
-        playback_columns = _change_column(course_overview, playback_columns)
-        if course_overview.extra.is_status_managed:
-            enrollment_attribute_dict = _get_attribute_value(course_id)
-        new_playback_records = []
+        search_conditions = {}
+        limit = settings.BIZ_MONGO_LIMIT_RECORDS
 
-    # Member
-    username_key = _(PlaybackStore.FIELD_USERNAME)
-    members = Member.find_active_by_org(org=org.id).select_related('user', 'group').filter(
-        user__username__in=[s[username_key] for s in playback_records])
+    filename = u'{course_prefix}_{csv_name}_{timestamp_str}.csv'.format(
+        course_prefix=course_filename_prefix_generator(request.current_course.id),
+        csv_name='playback_status',
+        timestamp_str=update_datetime,
+    )
+    return _create_download_csv_response(request, org, course_id, manager, playback_store, search_conditions, limit,
+                                         filename)
 
-    is_manager = not manager.is_director() and manager.is_manager() and Group.objects.filter(org=org).exists()
-    child_group_ids = request.current_organization_visible_group_ids
-    members_dict = {member.user.username: member for member in members}
-
-    for playback_record in playback_records:
-        current_username = playback_record[username_key]
-        if "search-download" not in request.POST:
-            playback_record = _change_of_value_name(playback_record)
-            if course_overview.extra.is_status_managed:
-                playback_record = _set_student_status_record(playback_record, enrollment_attribute_dict, current_username)
-            else:
-                del playback_record[_("Student Status")]
 
-        member_record = {_("Organization Groups"): ''}
-        if current_username in members_dict:
-            m = members_dict[current_username]
-            if is_manager and m.group and m.group.id not in child_group_ids:
-                continue
+def _create_download_csv_response(request, org, course_id, manager, store, search_conditions, limit, filename):
+    """
+    Create a response which streams records of the store as csv (or tsv)
 
-            if m.group:
-                member_record[_("Organization Groups")] = m.group.group_name
-            for i in range(1, 11):
-                member_record[_("Organization") + str(i)] = getattr(m, 'org' + str(i))
-                member_record[_("Item") + str(i)] = getattr(m, 'item' + str(i))
+    Note: Records are read from a MongoDB cursor and merged with member by batches while streaming,
+          so that all of them are not loaded into memory.
 
-        elif is_manager:
-            continue
+    :param request: HttpRequest
+    :param org: request.current_organization
+    :param course_id: CourseKey
+    :param manager: request.current_manager
+    :param store: ScoreStore or PlaybackStore
+    :param search_conditions: dict of keyword arguments for get_data_for_w2ui of the store
+    :param limit: Limit to records
+    :param filename: file name to download
+    :return: StreamingHttpResponse
+    """
+    course_overview = CourseOverview.get_from_id(course_id)
 
-        if "search-download" not in request.POST:
-            playback_record.update(member_record)
-            new_playback_records.append(playback_record)
+    # Note: Conditions of member and manager are pushed down into MongoDB query
+    usernames, excluded_usernames = _get_username_conditions(request, org, course_id, manager)
+    if usernames is not None and len(usernames) == 0:
+        columns, records = (store.get_column_document() or {}).items(), []
+    else:
+        columns, records = store.get_data_for_w2ui(
+            usernames=usernames or [], excluded_usernames=excluded_usernames, limit=limit, iterate=True,
+            **search_conditions)
 
-    header, types = [], []
-    playback_columns.insert(1, (_("Organization Groups"), 'text'))
+    columns = _change_column(course_overview, columns)
+    columns.insert(1, (_("Organization Groups"), 'text'))
     for num in range(1, 11):
-        playback_columns.append([_("Organization") + str(num), 'text'])
+        columns.append([_("Organization") + str(num), 'text'])
     for num in range(1, 11):
-        playback_columns.append([_("Item") + str(num), 'text'])
-    for column in playback_columns:
-        header.append(column[0])
-
-    datarows = []
-    for record in new_playback_records:
-        data = []
-        for head, column_type in playback_columns:
-            if head in record:
-                value = record[head]
-
-                if column_type == PlaybackStore.COLUMN_TYPE__TEXT:
-                    if isinstance(value, basestring):
-                        data.append(value)
-                    else:
-                        data.append('')
-                elif column_type == PlaybackStore.COLUMN_TYPE__DATE:
-                    try:
-                        value = datetime.strptime(value, '%Y/%m/%d %H:%M:%S %Z')
-                        data.append(datetime_utils.to_jst(value).strftime('%Y/%m/%d'))
-                    except:
-                        data.append('')
-                elif column_type == PlaybackStore.COLUMN_TYPE__TIME:
-                    if isinstance(value, numbers.Number):
-                        # Convert seconds to 'h:mm' format
-                        data.append(datetime_utils.seconds_to_time_format(value))
-                    else:
-                        data.append('0:00')
-                elif column_type == PlaybackStore.COLUMN_TYPE__PERCENT:
-                    if value == PlaybackStore.VALUE__NOT_ATTEMPTED:
-                        # Note: '―'(U+2015) means 'Not Attempted' (#1816)
-                        data.append(value)
-                    elif isinstance(value, float):
-                        data.append('{:.01%}'.format(value))
-                    else:
-                        data.append('')
-                else:
-                    data.append(value)
-            else:
-                data.append('')
-        datarows.append(data)
+        columns.append([_("Item") + str(num), 'text'])
+    header = [column[0] for column in columns]
 
-    filename = u'{course_prefix}_{csv_name}_{timestamp_str}.csv'.format(
-        course_prefix=course_filename_prefix_generator(request.current_course.id),
-        csv_name='playback_status',
-        timestamp_str=update_datetime,
+    datarows = (
+        _create_csv_row(record, columns)
+        for record in _merge_to_store_by_member_by_batches(
+            request, org, request.current_organization_visible_group_ids, manager, _(store.FIELD_USERNAME), records)
     )
+
     if 'encode' not in request.POST:
         request.POST['encode'] = 'false'
     if request.POST['encode'] == 'false':
-        response = create_csv_response_double_quote(filename, header, datarows)
+        response = create_csv_streaming_response_double_quote(filename, header, datarows)
         response['Set-Cookie'] = 'fileDownload=true; path=/'
         return response
     elif request.POST['encode'] == 'true':
-        response = create_tsv_response(filename, header, datarows)
+        response = create_tsv_streaming_response(filename, header, datarows)
         response['Set-Cookie'] = 'fileDownload=true; path=/'
         return response
 
 
+def _merge_to_store_by_member_by_batches(request, org, child_group_ids, manager, merge_key, records):
+    """
+    Merge member data to records by batches (see _merge_to_store_by_member_for_search)
+
+    :param records: iterable of records (e.g. generator)
+    :return: generator of merged records
+    """
+    records = iter(records)
+    while True:
+        batch = list(islice(records, MEMBER_MERGE_BATCH_SIZE))
+        if not batch:
+            break
+        for record in _merge_to_store_by_member_for_search(request, org, child_group_ids, manager, merge_key, batch):
+            yield record
+
+
+def _create_csv_row(record, columns):
+    """
+    Convert a record to a row of csv
+
+    :param record: a record merged with member
+    :param columns: [(column name, column type),...]
+    :return: list of values
+    """
+    data = []
+    for head, column_type in columns:
+        if head in record:
+            value = record[head]
+
+            if column_type == AchievementStoreBase.COLUMN_TYPE__TEXT:
+                if isinstance(value, basestring):
+                    data.append(value)
+                else:
+                    data.append('')
+            elif column_type == AchievementStoreBase.COLUMN_TYPE__DATE:
+                try:
+                    value = datetime.strptime(value, '%Y/%m/%d %H:%M:%S %Z')
+                    data.append(datetime_utils.to_jst(value).strftime('%Y/%m/%d'))
+                except:
+                    data.append('')
+            elif column_type == AchievementStoreBase.COLUMN_TYPE__TIME:
+                if isinstance(value, numbers.Number):
+                    # Convert seconds to 'h:mm' format
+                    data.append(datetime_utils.seconds_to_time_format(value))
+                else:
+                    data.append('0:00')
+            elif column_type == AchievementStoreBase.COLUMN_TYPE__PERCENT:
+                if value == AchievementStoreBase.VALUE__NOT_ATTEMPTED:
+                    # Note: '―'(U+2015) means 'Not Attempted' (#1816)
+                    data.append(value)
+                elif isinstance(value, float):
+                    data.append('{:.01%}'.format(value))
+                else:
+                    data.append('')
+            else:
+                data.append(value)
+        else:
+            data.append('')
+    return data
+
+
 def _get_member_org_item_list():
     member_org_item_list = OrderedDict()
     member_org_item_list.update([('org' + str(i), _("Organization") + str(i)) for i in range(1, 11)])
@@ -529,7 +465,13 @@ def _get_member_org_item_list():
     return member_org_item_list
 
 
-def score_search_filter(request, org, contract_id, course_id, manager):
+def _get_score_search_conditions(request):
+    """
+    Get conditions of ScoreStore from the search form
+
+    :param request: HttpRequest
+    :return: dict of keyword arguments for ScoreStore.get_data_for_w2ui
+    """
     total_score_no = 'total_score_no' in request.POST
     total_score_from = request.POST['total_score_from']
     total_score_to = request.POST['total_score_to']
@@ -556,24 +498,20 @@ def score_search_filter(request, org, contract_id, course_id, manager):
             condition['no'] = 'detail_condition_score_no_' + count in request.POST
             section_score_conditions.append(condition)
 
-    record_offset = int(request.POST['offset'])
-    score_store = ScoreStore(contract_id, unicode(course_id))
-    score_columns, score_records = score_store.get_data_for_w2ui(total_condition=total_condition,
-                                                                 section_conditions=section_score_conditions,
-                                                                 certificate_status=certificate_status,
-                                                                 # limit=settings.BIZ_MONGO_LIMIT_RECORDS)
-                                                                 limit=MAX_RECORDS_SEARCH_BY_PLAYBACK)
-    total_records = len(score_records)
-
-    # Member
-    new_score_records = _merge_to_store_by_member_for_search(
-        request, org, request.current_organization_visible_group_ids, manager, _(ScoreStore.FIELD_USERNAME),
-        score_records, True)
+    return {
+        'total_condition': total_condition,
+        'section_conditions': section_score_conditions,
+        'certificate_status': certificate_status,
+    }
 
-    return score_columns, score_records, total_records, new_score_records
 
+def _get_playback_search_conditions(request):
+    """
+    Get conditions of PlaybackStore from the search form
 
-def playback_search_filter(request, org, contract_id, course_id, manager):
+    :param request: HttpRequest
+    :return: dict of keyword arguments for PlaybackStore.get_data_for_w2ui
+    """
     total_playback_no = 'total_playback_no' in request.POST
     total_playback_from = request.POST['total_playback_time_from']
     total_playback_to = request.POST['total_playback_time_to']
@@ -600,23 +538,123 @@ def playback_search_filter(request, org, contract_id, course_id, manager):
             condition['no'] = 'detail_condition_playback_no_' + count in request.POST
             section_playback_conditions.append(condition)
 
-    record_offset = int(request.POST['offset'])
-    playback_store = PlaybackStore(contract_id, unicode(course_id))
-    playback_columns, playback_records = playback_store.get_data_for_w2ui(total_condition=total_condition,
-                                                         section_conditions=section_playback_conditions,
-                                                         limit=MAX_RECORDS_SEARCH_BY_PLAYBACK)
-    total_records = len(playback_records)
+    return {
+        'total_condition': total_condition,
+        'section_conditions': section_playback_conditions,
+    }
 
-    # Member
-    new_playback_records = _merge_to_store_by_member_for_search(
-        request, org, request.current_organization_visible_group_ids, manager, _(PlaybackStore.FIELD_USERNAME),
-        playback_records, True)
 
-    return playback_columns, playback_records, total_records, new_playback_records
+def _get_records_page(request, org, course_id, manager, store, search_conditions):
+    """
+    Get a page of records of the store, which conditions of the search form are pushed down into MongoDB query
 
+    :param request: HttpRequest (POST parameters of w2ui grid: offset, limit, sort and search)
+    :param org: request.current_organization
+    :param course_id: CourseKey
+    :param manager: request.current_manager
+    :param store: ScoreStore or PlaybackStore
+    :param search_conditions: dict of keyword arguments for get_data_for_w2ui of the store
+    :return: (total count of records, list of records merged with member)
+    """
+    offset = int(request.POST.get('offset', 0))
+    limit = int(request.POST.get('limit', SIMPLE_DISPLAY_MAX_LIMIT))
+    if offset < 0 or not 0 < limit <= MAX_RECORDS_PER_PAGE:
+        raise ValueError('offset or limit is out of range.')
+
+    column_document = store.get_column_document() or {}
+    sort_column = request.POST.get('sort[0][field]')
+    sort = DESCENDING if request.POST.get('sort[0][direction]') == 'desc' else ASCENDING
+
+    # Text search of w2ui toolbar (only for columns of the store)
+    text_conditions = []
+    counter = 0
+    while 'search[{}][field]'.format(counter) in request.POST:
+        field = request.POST['search[{}][field]'.format(counter)]
+        value = request.POST.get('search[{}][value]'.format(counter), '')
+        if column_document.get(field) == store.COLUMN_TYPE__TEXT and value:
+            text_conditions.append({
+                'field': field,
+                'operator': request.POST.get('search[{}][operator]'.format(counter)),
+                'value': value,
+            })
+        counter += 1
+    search_logic = request.POST.get('searchLogic', 'AND')
+
+    usernames, excluded_usernames = _get_username_conditions(request, org, course_id, manager)
+    if usernames is not None and len(usernames) == 0:
+        return 0, []
+
+    conditions = dict(search_conditions)
+    conditions.update({
+        'usernames': usernames or [],
+        'excluded_usernames': excluded_usernames,
+        'search_conditions': text_conditions,
+        'search_logic': search_logic,
+    })
+    total_records = store.get_record_count(**conditions)
+    __, records = store.get_data_for_w2ui(offset=offset, limit=limit, sort_column=sort_column, sort=sort, **conditions)
 
-def _merge_to_store_by_member_for_search(
-        request, org, child_group_ids, manager, merge_key, store_list, search_flg=False):
+    records = _merge_to_store_by_member_for_search(
+        request, org, request.current_organization_visible_group_ids, manager, _(store.FIELD_USERNAME), records)
+    return total_records, records
+
+
+def _get_username_conditions(request, org, course_id, manager):
+    """
+    Get conditions of usernames from member, organization group and student status conditions of the search form,
+    so that they can be pushed down into MongoDB query
+
+    :param request: HttpRequest
+    :param org: request.current_organization
+    :param course_id: CourseKey
+    :param manager: request.current_manager
+    :return: (usernames to include (None means all users), usernames to exclude)
+    """
+    is_manager = not manager.is_director() and manager.is_manager() and Group.objects.filter(org=org).exists()
+    member_org_item_list = _get_member_org_item_list()
+
+    members = Member.find_active_by_org(org=org.id)
+    is_restricted = False
+    if is_manager:
+        members = members.filter(group__id__in=request.current_organization_visible_group_ids)
+        is_restricted = True
+
+    counter = 1
+    while 'detail_condition_member_name_' + str(counter) in request.POST:
+        key = request.POST['detail_condition_member_name_' + str(counter)]
+        value = request.POST.get('detail_condition_member_' + str(counter), '')
+        counter += 1
+        if key in member_org_item_list:
+            members = members.filter(**{key + '__contains': value})
+            is_restricted = True
+
+    if request.POST.get('group_code'):
+        members = members.filter(group__id=int(request.POST['group_code']))
+        is_restricted = True
+
+    usernames = set(members.values_list('user__username', flat=True)) if is_restricted else None
+    excluded_usernames = set()
+
+    student_status = request.POST.get('student_status')
+    if student_status and CourseOverview.get_from_id(course_id).extra.is_status_managed:
+        enrollment_attribute_dict = _get_attribute_value(course_id)
+        if student_status == _("Not Enrolled"):
+            # Note: Users who have no attendance status are 'Not Enrolled'
+            excluded_usernames = set(
+                username for username in enrollment_attribute_dict
+                if _get_student_status(enrollment_attribute_dict, username) != student_status
+            )
+        else:
+            status_usernames = set(
+                username for username in enrollment_attribute_dict
+                if _get_student_status(enrollment_attribute_dict, username) == student_status
+            )
+            usernames = status_usernames if usernames is None else usernames & status_usernames
+
+    return (None if usernames is None else list(usernames)), list(excluded_usernames)
+
+
+def _merge_to_store_by_member_for_search(request, org, child_group_ids, manager, merge_key, store_list):
     """
     Member data merge to Store data.
     :param request:
@@ -625,7 +663,6 @@ def _merge_to_store_by_member_for_search(
     :param manager: request.current_manager
     :param merge_key: _('Username') (ScoreStore.FIELD_USERNAME or PlayBackStore.FIELD_USERNAME)
     :param store_list: [{},..] playback or score
-    :param search_flg bool
     :return: result list
     """
     result = []
@@ -647,10 +684,9 @@ def _merge_to_store_by_member_for_search(
     course_id = request.current_course.id
     course_overview = CourseOverview.get_from_id(course_id)
     if course_overview.extra.is_status_managed:
-        enrollment_attribute_dict = _get_attribute_value(course_id)
+        enrollment_attribute_dict = _get_attribute_value(course_id, [s[merge_key] for s in store_list])
 
     for store_record in store_list:
-        insert_flag = True
         current_user_name = store_record[merge_key]
         store_record = _change_of_value_name(store_record)
         if course_overview.extra.is_status_managed:
@@ -661,21 +697,6 @@ def _merge_to_store_by_member_for_search(
         if current_user_name in members_dict:
             member = members_dict[current_user_name]
 
-            if search_flg:
-                counter = 1
-                while 'detail_condition_member_name_' + str(counter) in request.POST:
-                    count = str(counter)
-                    counter += 1
-                    key = request.POST['detail_condition_member_name_' + count]
-                    value = request.POST['detail_condition_member_' + count]
-                    if key != '' and value not in member[select_columns.get(key)]:
-                        insert_flag = False
-                        break
-
-                if request.POST['group_code'] and request.POST['group_code'] != str(
-                        member[select_columns.get('group_id')]):
-                    continue
-
             if is_manager and member[select_columns.get('group_id')] not in child_group_ids:
                 continue
 
@@ -692,24 +713,7 @@ def _merge_to_store_by_member_for_search(
             if is_manager:
                 continue
 
-            if search_flg:
-                counter = 1
-                while 'detail_condition_member_name_' + str(counter) in request.POST:
-                    if request.POST['detail_condition_member_name_' + str(counter)] != '':
-                        insert_flag = False
-                        break
-                    counter += 1
-                if request.POST['group_code'] != '':
-                    continue
-
-        if search_flg and course_overview.extra.is_status_managed:
-            student_status = request.POST['student_status']
-            if student_status:
-                if student_status != store_record[_("Student Status")]:
-                    insert_flag = False
-
-        if insert_flag:
-            result.append(store_record)
+        result.append(store_record)
 
     return result
 
@@ -729,10 +733,13 @@ def _change_column(course_overview, columns):
     return columns
 
 
-def _get_attribute_value(course_id):
+def _get_attribute_value(course_id, usernames=None):
+    enrollments = CourseEnrollment.objects.filter(course_id=course_id)
+    if usernames is not None:
+        enrollments = enrollments.filter(user__username__in=usernames)
     enroll_dict = {
         enrollment['id']: enrollment['user__username']
-        for enrollment in CourseEnrollment.objects.filter(course_id=course_id).values('id', 'user__username')
+        for enrollment in enrollments.values('id', 'user__username')
     }
 
     if enroll_dict:
@@ -746,18 +753,18 @@ def _get_attribute_value(course_id):
         return {}
 
 
-def _set_student_status_record(record, attr_dict, username):
+def _get_student_status(attr_dict, username):
     if username in attr_dict:
         if AttendanceStatusExecutor.attendance_status_is_completed(attr_dict[username]):
-            record[_("Student Status")] = _("Finish Enrolled")
+            return _("Finish Enrolled")
         elif AttendanceStatusExecutor.attendance_status_is_attended(attr_dict[username]):
-            record[_("Student Status")] = _("Enrolled")
-        else:
-            record[_("Student Status")] = _("Not Enrolled")
+            return _("Enrolled")
 
-    else:
-        record[_("Student Status")] = _("Not Enrolled")
+    return _("Not Enrolled")
 
+
+def _set_student_status_record(record, attr_dict, username):
+    record[_("Student Status")] = _get_student_status(attr_dict, username)
     return record
 
 
@@ -1,7 +1,9 @@
 # -*- coding: utf-8 -*-
+import json
 import logging
 import re
 import time
+import uuid
 
 from django.conf import settings
 from django.contrib.auth import authenticate
@@ -10,10 +12,13 @@ from django.core.mail import send_mail as django_send_mail, get_connection as ge
 from django.core.validators import validate_email
 from django.contrib.auth.models import User
 from django.db import IntegrityError, transaction
+from django.utils import timezone
 from django.utils.translation import ugettext as _
 
 from biz.djangoapps.ga_contract_operation.models import ContractMail, ContractTaskHistory, StudentRegisterTaskTarget
-from biz.djangoapps.ga_invitation.models import ContractRegister, INPUT_INVITATION_CODE, REGISTER_INVITATION_CODE
+from biz.djangoapps.ga_invitation.models import (
+    ContractRegister, ContractRegisterHistory, INPUT_INVITATION_CODE, REGISTER_INVITATION_CODE
+)
 from biz.djangoapps.ga_login.models import BizUser, LOGIN_CODE_MIN_LENGTH, LOGIN_CODE_MAX_LENGTH
 from bulk_email.models import Optout
 from lms.djangoapps.instructor.views.api import generate_unique_password
@@ -22,9 +27,11 @@ from openedx.core.djangoapps.ga_task.models import Task
 from openedx.core.djangoapps.ga_task.task import TaskProgress
 from openedx.core.lib.ga_mail_utils import replace_braces
 from enrollment.api import _default_course_mode
+from microsite_configuration import microsite
 from student.forms import AccountCreationForm
-from student.models import CourseEnrollment, UserProfile
+from student.models import CourseEnrollment, PasswordHistory, Registration, UserProfile, UserSignupSource
 from student.views import _do_create_account, AccountValidationError
+from util.model_utils import emit_setting_changed_event
 from util.password_policy_validators import validate_password_strength
 
 
@@ -62,6 +69,351 @@ def _validate_and_get_arguments(task_id, task_input):
     return (contract, targets)
 
 
+def _validate_student_columns(student, has_contractauth):
+    """
+    Validate the columns of a line of students without accessing database
+
+    :param student: a line of students
+    :param has_contractauth: whether the contract uses login code
+    :return: tuple of (message, student_columns)
+             Both of them are None if the line should be skipped, and student_columns is None if the line is invalid.
+    """
+    student_columns = student.split(',') if student else []
+    len_student_columns = len(student_columns)
+
+    # 2 columns(status,) 1 line and second element is empty
+    if len_student_columns == 2 and not student_columns[1]:
+        # skip
+        return (None, None)
+
+    if has_contractauth and len_student_columns != 6:
+        # status + 5 input columns(email,username,name,logincode,password) 1 line
+        return (_("Data must have exactly five columns: email, username, full name, login code and password."), None)
+    elif not has_contractauth and len_student_columns != 4:
+        # status + 3 input columns(email,username,name) 1 line
+        return (_("Data must have exactly three columns: email, username, and full name."), None)
+
+    status, email, __, name = student_columns[:4]
+
+    # validate status
+    if status not in (INPUT_INVITATION_CODE, REGISTER_INVITATION_CODE):
+        log.error('Invalid status: {status}.'.format(status=status))
+        return (_("Failed to register. Please operation again after a time delay."), None)
+
+    # validate email
+    try:
+        validate_email(email)
+    except ValidationError:
+        return (_("Invalid email {email_address}.").format(email_address=email), None)
+
+    # validate name
+    name_max_length = UserProfile._meta.get_field('name').max_length
+    if len(name) > name_max_length:
+        return (_(
+            "Name cannot be more than {name_max_length} characters long"
+        ).format(name_max_length=name_max_length), None)
+
+    if has_contractauth:
+        login_code, password = student_columns[4:]
+        # validate login_code
+        if not re.match(
+            r'^[-\w]{{{min_length},{max_length}}}$'.format(
+                min_length=LOGIN_CODE_MIN_LENGTH,
+                max_length=LOGIN_CODE_MAX_LENGTH),
+            login_code):
+            return (_("Invalid login code {login_code}.").format(login_code=login_code), None)
+
+        # validate password
+        try:
+            validate_password_strength(password)
+        except ValidationError:
+            return (_("Invalid password {password}.").format(password=password), None)
+
+    return (None, student_columns)
+
+
+class _BulkStudentRegister(object):
+    """
+    Register students of a chunk by set-based queries and bulk inserts in a transaction
+
+    Lines which conflict with a preceding line in the chunk (same email, username or login code) are returned
+    to be registered in the next chunk, so that the result of each line is the same as registering one by one.
+    """
+
+    def __init__(self, contract, contract_details, generated_passwords):
+        self.contract = contract
+        self.contract_details = contract_details
+        self.has_contractauth = contract.has_auth
+        self.generated_passwords = generated_passwords
+        self._global_course_ids = None
+        self._contract_mails = {}
+
+    def _get_contract_mail(self, get_contract_mail):
+        if get_contract_mail not in self._contract_mails:
+            self._contract_mails[get_contract_mail] = get_contract_mail(self.contract)
+        return self._contract_mails[get_contract_mail]
+
+    def _get_global_course_ids(self):
+        if self._global_course_ids is None:
+            self._global_course_ids = CourseGlobalSetting.all_course_id()
+        return self._global_course_ids
+
+    def register(self, entries):
+        """
+        :param entries: list of (line_number, target, student_columns) validated by _validate_student_columns
+        :return: tuple of (results, rest)
+            results: list of (line_number, target, message, user, contract_mail, replace_dict) for registered lines
+                     (user is None if the line is invalid)
+            rest: entries which are not registered in this chunk
+        """
+        entries, rest = self._split_conflicts(entries)
+        with transaction.atomic():
+            results = self._register(entries)
+        return results, rest
+
+    def _split_conflicts(self, entries):
+        emails = set()
+        usernames = set()
+        login_codes = set()
+        for i, (__, __, student_columns) in enumerate(entries):
+            email, username = student_columns[1].lower(), student_columns[2].lower()
+            login_code = student_columns[4].lower() if self.has_contractauth else None
+            if email in emails or username in usernames or login_code in login_codes:
+                return entries[:i], entries[i:]
+            emails.add(email)
+            usernames.add(username)
+            if login_code:
+                login_codes.add(login_code)
+        return entries, []
+
+    def _register(self, entries):
+        contract = self.contract
+        students = [student_columns for __, __, student_columns in entries]
+
+        # Get existing data of the chunk by set-based queries
+        existing_users = {
+            user.email.lower(): user
+            for user in User.objects.select_related('bizuser').filter(email__in=[s[1] for s in students])
+        }
+        existing_usernames = set(
+            username.lower()
+            for username in User.objects.filter(username__in=[s[2] for s in students]).values_list('username', flat=True)
+        )
+        contract_registers_by_login_code = {}
+        if self.has_contractauth:
+            contract_registers_by_login_code = {
+                register.user.bizuser.login_code.lower(): register
+                for register in ContractRegister.objects.select_related('user__bizuser').filter(
+                    contract=contract, user__bizuser__login_code__in=[s[4] for s in students])
+            }
+
+        results = []
+        new_users = []
+        new_biz_users = []
+
+        def _fail(line_number, target, message):
+            results.append([line_number, target, message, None, None, None])
+
+        for line_number, target, student_columns in entries:
+            status, email, username, name = student_columns[:4]
+            login_code, password = student_columns[4:] if self.has_contractauth else (None, None)
+            contract_register_same_login_code = contract_registers_by_login_code.get(login_code.lower()) if login_code else None
+
+            messages = []
+            user = existing_users.get(email.lower())
+            if user is not None:
+                if user.username != username:
+                    messages.append(_(
+                        "Warning, an account with the e-mail {email} exists but the registered username {username} is different."
+                    ).format(email=email, username=user.username))
+                    log.warning(u'email {email} already exist, but username is different.'.format(email=email))
+
+                if self.has_contractauth:
+                    # validate duplicate login_code in contract
+                    if contract_register_same_login_code and contract_register_same_login_code.user.id != user.id:
+                        _fail(line_number, target, _("Login code {login_code} already exists.").format(login_code=login_code))
+                        continue
+
+                    try:
+                        biz_user = user.bizuser
+                    except BizUser.DoesNotExist:
+                        biz_user = BizUser(user=user, login_code=login_code)
+                        new_biz_users.append(biz_user)
+                    if biz_user.login_code != login_code:
+                        messages.append(_(
+                            "Warning, an account with the e-mail {email} exists but the registered login code {login_code} is different."
+                        ).format(email=email, login_code=biz_user.login_code))
+                        log.warning(u'email {email} already exist, but login code is different.'.format(email=email))
+
+                    if authenticate(username=user.username, password=password) is None:
+                        messages.append(_(
+                            "Warning, an account with the e-mail {email} exists but the registered password is different."
+                        ).format(email=email))
+                        log.warning(u'email {email} already exist, but password is different.'.format(email=email))
+
+                    contract_mail = self._get_contract_mail(ContractMail.get_register_existing_user_logincode)
+                    replace_dict = ContractMail.register_replace_dict(user, contract, login_code=biz_user.login_code)
+                else:
+                    contract_mail = self._get_contract_mail(ContractMail.get_register_existing_user)
+                    replace_dict = ContractMail.register_replace_dict(user, contract)
+            else:
+                # validate duplicate login_code in contract
+                if login_code and contract_register_same_login_code:
+                    _fail(line_number, target, _("Login code {login_code} already exists.").format(login_code=login_code))
+                    continue
+
+                password = password or generate_unique_password(self.generated_passwords)
+                form = AccountCreationForm(
+                    data={
+                        'username': username,
+                        'email': email,
+                        'password': password,
+                        'name': name,
+                    },
+                    tos_required=False
+                )
+                if not form.is_valid():
+                    _fail(line_number, target, ' '.join(ValidationError(form.errors).messages))
+                    continue
+                if username.lower() in existing_usernames:
+                    _fail(line_number, target, _("Username {user} already exists.").format(user=username))
+                    continue
+
+                # Note: Same as _do_create_account and Registration.activate, but created active at once
+                user = User(
+                    username=form.cleaned_data['username'],
+                    email=form.cleaned_data['email'],
+                    is_active=True
+                )
+                user.set_password(form.cleaned_data['password'])
+                new_users.append((user, form, login_code))
+
+                if self.has_contractauth:
+                    contract_mail = self._get_contract_mail(ContractMail.get_register_new_user_logincode)
+                else:
+                    contract_mail = self._get_contract_mail(ContractMail.get_register_new_user)
+                replace_dict = ContractMail.register_replace_dict(user, contract, password, login_code)
+
+            results.append([line_number, target, ''.join(messages), user, contract_mail, replace_dict, status])
+
+        self._create_users(new_users, new_biz_users)
+        self._register_contract(
+            [(result[3], result[6]) for result in results if result[3] is not None])
+
+        return [tuple(result[:6]) for result in results]
+
+    def _create_users(self, new_users, new_biz_users):
+        """
+        Same as _do_create_account and Registration.activate for each new user, but by bulk inserts
+
+        As bulk_create does not send post_save, the side effects of the receivers of User are done here:
+        the UserSignupSource of user_signup_handler, and the event of the change of is_active emitted by
+        user_post_save_callback when Registration.activate saves the user. The receivers of UserProfile
+        do nothing for a new profile.
+        """
+        if not new_users and not new_biz_users:
+            return
+
+        User.objects.bulk_create([user for user, __, __ in new_users])
+        # Note: Get ids of created users, because bulk_create does not set them
+        user_ids = dict(User.objects.filter(
+            username__in=[user.username for user, __, __ in new_users]).values_list('username', 'id'))
+
+        profile_fields = [
+            "name", "level_of_education", "gender", "mailing_address", "city", "country", "goals",
+            "year_of_birth"
+        ]
+        site = microsite.get_value('SITE_NAME')
+        profiles = []
+        registrations = []
+        signup_sources = []
+        optouts = []
+        for user, form, login_code in new_users:
+            user.id = user_ids[user.username]
+            # add this account creation to password history
+            # NOTE, this will be a NOP unless the feature has been turned on in configuration
+            PasswordHistory().create(user)
+
+            profile = UserProfile(user=user, **{key: form.cleaned_data.get(key) for key in profile_fields})
+            if form.cleaned_extended_profile:
+                profile.meta = json.dumps(form.cleaned_extended_profile)
+            profiles.append(profile)
+            registrations.append(Registration(user=user, activation_key=uuid.uuid4().hex))
+            if site:
+                signup_sources.append(UserSignupSource(user=user, site=site))
+            if self.has_contractauth:
+                new_biz_users.append(BizUser(user=user, login_code=login_code))
+            # Optout of bulk email(Global Courses) for only new user.
+            optouts.extend(
+                [Optout(user=user, course_id=global_course_id) for global_course_id in self._get_global_course_ids()])
+
+        UserProfile.objects.bulk_create(profiles)
+        Registration.objects.bulk_create(registrations)
+        UserSignupSource.objects.bulk_create(signup_sources)
+        BizUser.objects.bulk_create(new_biz_users)
+        Optout.objects.bulk_create(optouts)
+
+        for user, __, __ in new_users:
+            emit_setting_changed_event(user, User._meta.db_table, 'is_active', False, True)  # pylint: disable=protected-access
+
+    def _register_contract(self, users_and_statuses):
+        """
+        Same as ContractRegister.get_or_create and saving status for each user, but by bulk inserts
+        """
+        if not users_and_statuses:
+            return
+
+        contract = self.contract
+        user_ids = [user.id for user, __ in users_and_statuses]
+
+        def _get_registers():
+            registers = {}
+            for register in ContractRegister.objects.filter(contract=contract, user_id__in=user_ids).order_by('-id'):
+                registers[register.user_id] = register
+            return registers
+
+        registers = _get_registers()
+        new_registers = [
+            ContractRegister(user_id=user_id, contract=contract, status=INPUT_INVITATION_CODE)
+            for user_id in user_ids if user_id not in registers
+        ]
+        histories = []
+        if new_registers:
+            ContractRegister.objects.bulk_create(new_registers)
+            registers = _get_registers()
+            histories.extend([
+                ContractRegisterHistory(
+                    user_id=register.user_id,
+                    contract=contract,
+                    status=register.status,
+                    created=register.created,
+                    modified=register.modified,
+                ) for register in new_registers
+            ])
+
+        register_users = [user for user, status in users_and_statuses if status == REGISTER_INVITATION_CODE]
+        if register_users:
+            now = timezone.now()
+            ContractRegister.objects.filter(
+                id__in=[registers[user.id].id for user in register_users]
+            ).update(status=REGISTER_INVITATION_CODE, modified=now)
+            for user in register_users:
+                histories.append(ContractRegisterHistory(
+                    user_id=user.id,
+                    contract=contract,
+                    status=REGISTER_INVITATION_CODE,
+                    created=registers[user.id].created,
+                    modified=now,
+                ))
+
+                # Note: Perform equivalent processing to CourseEnrollment.enroll()
+                for detail in self.contract_details:
+                    enrollment = CourseEnrollment.get_or_create_enrollment(user, detail['key'])
+                    enrollment.update_enrollment(is_active=True, mode=detail['mode'])
+
+        ContractRegisterHistory.objects.bulk_create(histories)
+
+
 def perform_delegate_student_register(entry_id, task_input, action_name):
     """
     Executes to register students. This function is called by run_main_task.
@@ -90,39 +442,7 @@ def perform_delegate_student_register(entry_id, task_input, action_name):
         return (message, None, None, None, None)
 
     def _validate_student_and_get_or_create_user(status, email, username, name, login_code=None, password=None):
-        # validate status
-        if status not in (INPUT_INVITATION_CODE, REGISTER_INVITATION_CODE):
-            log.error('Invalid status: {status}.'.format(status=status))
-            return _fail(_("Failed to register. Please operation again after a time delay."))
-
-        # validate email
-        try:
-            validate_email(email)
-        except ValidationError:
-            return _fail(_("Invalid email {email_address}.").format(email_address=email))
-
-        # validate name
-        name_max_length = UserProfile._meta.get_field('name').max_length
-        if len(name) > name_max_length:
-            return _fail(_(
-                "Name cannot be more than {name_max_length} characters long"
-            ).format(name_max_length=name_max_length))
-
         if has_contractauth:
-            # validate login_code
-            if not re.match(
-                r'^[-\w]{{{min_length},{max_length}}}$'.format(
-                    min_length=LOGIN_CODE_MIN_LENGTH,
-                    max_length=LOGIN_CODE_MAX_LENGTH),
-                login_code):
-                return _fail(_("Invalid login code {login_code}.").format(login_code=login_code))
-
-            # validate password
-            try:
-                validate_password_strength(password)
-            except ValidationError:
-                return _fail(_("Invalid password {password}.").format(password=password))
-
             # Get contract register by login code for after-validate.
             contract_register_same_login_code = ContractRegister.get_by_login_code_contract(login_code, contract)
 
@@ -206,24 +526,38 @@ def perform_delegate_student_register(entry_id, task_input, action_name):
         )
 
     def _validate(student):
-        student_columns = student.split(',') if student else []
-        len_student_columns = len(student_columns)
+        message, student_columns = _validate_student_columns(student, has_contractauth)
+        if student_columns is None:
+            # skip if message is None
+            return (message, None, None, None, None)
 
-        # 2 columns(status,) 1 line and second element is empty
-        if len_student_columns == 2 and not student_columns[1]:
-            # skip
-            return (None, None, None, None, None)
+        return _validate_student_and_get_or_create_user(*student_columns)
 
-        if has_contractauth and len_student_columns != 6:
-            # status + 5 input columns(email,username,name,logincode,password) 1 line
-            return _fail(_("Data must have exactly five columns: email, username, full name, login code and password."))
-        elif not has_contractauth and len_student_columns != 4:
-            # status + 3 input columns(email,username,name) 1 line
-            return _fail(_("Data must have exactly three columns: email, username, and full name."))
+    def _send_mail(user, contract_mail, replace_dict):
+        if contract.can_send_mail and mail_connection and task_input['sendmail_flg']:
+            mail_subject = replace_braces(contract_mail.mail_subject, replace_dict)
+            mail_body = replace_braces(contract_mail.mail_body, replace_dict)
+            django_send_mail(
+                subject=mail_subject,
+                message=mail_body,
+                from_email=settings.DEFAULT_FROM_EMAIL,
+                recipient_list=[user.email],
+                connection=mail_connection
+            )
 
-        return _validate_student_and_get_or_create_user(*student_columns)
+    def _incomplete(line_number, target):
+        # If an exception occur, logging it and to continue processing next target.
+        log.exception(u"Task {task_id}: Failed to register {student}".format(task_id=task_id, student=target.student))
+        task_progress.fail()
+        target.incomplete(_("Line {line_number}:{message}").format(
+            line_number=line_number,
+            message=_("Failed to register. Please operation again after a time delay."),
+        ))
+
+    def _complete(line_number, target, message):
+        target.complete(_("Line {line_number}:{message}").format(line_number=line_number, message=message) if message else "")
 
-    for line_number, target in enumerate(targets, start=1):
+    def _register(line_number, target):
         task_progress.attempt()
 
         try:
@@ -248,29 +582,73 @@ def perform_delegate_student_register(entry_id, task_input, action_name):
                             enrollment = CourseEnrollment.get_or_create_enrollment(user, detail['key'])
                             enrollment.update_enrollment(is_active=True, mode=detail['mode'])
 
-                    if contract.can_send_mail and mail_connection and task_input['sendmail_flg']:
-                        mail_subject = replace_braces(contract_mail.mail_subject, replace_dict)
-                        mail_body = replace_braces(contract_mail.mail_body, replace_dict)
-                        django_send_mail(
-                            subject=mail_subject,
-                            message=mail_body,
-                            from_email=settings.DEFAULT_FROM_EMAIL,
-                            recipient_list=[user.email],
-                            connection=mail_connection
-                        )
+                    _send_mail(user, contract_mail, replace_dict)
 
                     log.info("Task {task_id}: Success to process of register to User {user_id}".format(task_id=task_id, user_id=user.id))
                     task_progress.success()
 
-                target.complete(_("Line {line_number}:{message}").format(line_number=line_number, message=message) if message else "")
+                _complete(line_number, target, message)
         except:
-            # If an exception occur, logging it and to continue processing next target.
-            log.exception(u"Task {task_id}: Failed to register {student}".format(task_id=task_id, student=target.student))
-            task_progress.fail()
-            target.incomplete(_("Line {line_number}:{message}").format(
-                line_number=line_number,
-                message=_("Failed to register. Please operation again after a time delay."),
-            ))
+            _incomplete(line_number, target)
+
+    def _register_in_bulk():
+        bulk_register = _BulkStudentRegister(contract, contract_details, generated_passwords)
+
+        # Validate all targets before accessing database
+        entries = []
+        for line_number, target in enumerate(targets, start=1):
+            try:
+                message, student_columns = _validate_student_columns(target.student, has_contractauth)
+            except:
+                task_progress.attempt()
+                _incomplete(line_number, target)
+                continue
+            if student_columns is None:
+                task_progress.attempt()
+                if message is None:
+                    task_progress.skip()
+                else:
+                    task_progress.fail()
+                _complete(line_number, target, message)
+            else:
+                entries.append((line_number, target, student_columns))
+
+        chunk_size = settings.BIZ_STUDENT_REGISTER_BULK_CHUNK_SIZE
+        while entries:
+            chunk = entries[:chunk_size]
+            try:
+                results, rest = bulk_register.register(chunk)
+            except:
+                # Register each target of the chunk one by one to report errors per line
+                log.exception(u"Task {task_id}: Failed to register students in bulk, retry one by one.".format(task_id=task_id))
+                for line_number, target, __ in chunk:
+                    _register(line_number, target)
+                entries = entries[chunk_size:]
+                continue
+            entries = rest + entries[chunk_size:]
+
+            for line_number, target, message, user, contract_mail, replace_dict in results:
+                task_progress.attempt()
+                if user is None:
+                    task_progress.fail()
+                    _complete(line_number, target, message)
+                    continue
+                try:
+                    _send_mail(user, contract_mail, replace_dict)
+                except:
+                    # The chunk has been committed, so the student is registered even though the mail is not sent
+                    # (unlike registering one by one, which rolls back the line)
+                    log.exception(u"Task {task_id}: Failed to send mail to User {user_id}".format(task_id=task_id, user_id=user.id))
+                    message += _("The student has been registered, but failed to send the mail.")
+                log.info("Task {task_id}: Success to process of register to User {user_id}".format(task_id=task_id, user_id=user.id))
+                task_progress.success()
+                _complete(line_number, target, message)
+
+    if len(targets) >= settings.BIZ_STUDENT_REGISTER_BULK_MIN_TARGETS:
+        _register_in_bulk()
+    else:
+        for line_number, target in enumerate(targets, start=1):
+            _register(line_number, target)
 
     # Close mail connection
     if contract.can_send_mail and mail_connection is not None:
@@ -16,14 +16,17 @@ from biz.djangoapps.ga_contract_operation.models import StudentRegisterTaskTarge
 from biz.djangoapps.ga_contract_operation.tasks import student_register
 from biz.djangoapps.ga_contract_operation.tests.factories import ContractTaskHistoryFactory,\
     StudentRegisterTaskTargetFactory
-from biz.djangoapps.ga_invitation.models import ContractRegister, INPUT_INVITATION_CODE, REGISTER_INVITATION_CODE
+from biz.djangoapps.ga_invitation.models import (
+    ContractRegister, ContractRegisterHistory, INPUT_INVITATION_CODE, REGISTER_INVITATION_CODE
+)
 from biz.djangoapps.ga_invitation.tests.factories import ContractRegisterFactory
 from biz.djangoapps.ga_login.models import BizUser
 from biz.djangoapps.ga_login.tests.factories import BizUserFactory
 from biz.djangoapps.util.tests.testcase import BizViewTestBase
 from openedx.core.djangoapps.course_global.tests.factories import CourseGlobalSettingFactory
 from openedx.core.djangoapps.ga_task.tests.test_task import TaskTestMixin
-from student.models import CourseEnrollment
+from student.models import CourseEnrollment, UserSignupSource
+from util.model_utils import USER_SETTINGS_CHANGED_EVENT_NAME
 
 
 @ddt.ddt
@@ -261,6 +264,47 @@ class StudentRegisterTaskTest(BizViewTestBase, ModuleStoreTestCase, TaskTestMixi
         if url_code:
             self.assertEqual('Test_Student_1', BizUser.objects.get(user=user).login_code)
 
+    @ddt.data(
+        (None, ["Input,test_student@example.com,test_student_1,tester1"]),
+        ('contract-url-code', ["Input,test_student@example.com,test_student_1,tester1,Test_Student_1,TestStudent1"]),
+    )
+    @ddt.unpack
+    def test_register_account_creation_side_effects(self, url_code, students):
+        # ----------------------------------------------------------
+        # Setup test data
+        # ----------------------------------------------------------
+        contract = self._create_contract(url_code=url_code)
+        history = self._create_task_history(contract=contract)
+        self._create_targets(history, students)
+
+        # ----------------------------------------------------------
+        # Execute task
+        # ----------------------------------------------------------
+        with patch('microsite_configuration.microsite.get_value', return_value='test_site'), \
+                patch('util.model_utils.tracker.emit') as mock_emit:
+            self._test_run_with_task(
+                student_register,
+                'student_register',
+                task_entry=self._create_input_entry(contract=contract, history=history),
+                expected_attempted=1,
+                expected_num_succeeded=1,
+                expected_total=1,
+            )
+
+        # ----------------------------------------------------------
+        # Assertion
+        # ----------------------------------------------------------
+        user = User.objects.get(email='test_student@example.com')
+        self.assertEqual('test_site', UserSignupSource.objects.get(user=user).site)
+        mock_emit.assert_any_call(USER_SETTINGS_CHANGED_EVENT_NAME, {
+            'setting': 'is_active',
+            'old': False,
+            'new': True,
+            'truncated': [],
+            'user_id': user.id,
+            'table': 'auth_user',
+        })
+
     @ddt.data(
         (None, ["Input,test_student@example.com,test_student_1,tester1"]),
         ('contract-url-code', ["Input,test_student@example.com,test_student_1,tester1,Test_Student_1,TestStudent1"]),
@@ -1217,4 +1261,97 @@ class StudentRegisterTaskTest(BizViewTestBase, ModuleStoreTestCase, TaskTestMixi
         self.assertEqual(ContractRegister.objects.get(user__email='test_student2@example.com', contract=contract).status, INPUT_INVITATION_CODE)
         if url_code:
             self.assertEqual('Test_Student_2', BizUser.objects.get(user=user).login_code)
-        self.assertEqual(send_mail_call_count, send_mail_to_student.call_count)
\ No newline at end of file
+        self.assertEqual(send_mail_call_count, send_mail_to_student.call_count)
+
+
+@override_settings(BIZ_STUDENT_REGISTER_BULK_MIN_TARGETS=1, BIZ_STUDENT_REGISTER_BULK_CHUNK_SIZE=2)
+class StudentRegisterBulkTaskTest(StudentRegisterTaskTest):
+    """
+    Run all tests of StudentRegisterTaskTest by registering students in bulk
+    """
+
+    def test_register_same_email_in_bulk(self):
+        contract = self._create_contract()
+        history = self._create_task_history(contract=contract)
+        students = [
+            "Input,test_student1@example.com,test_student_1,tester1",
+            "Register,test_student1@example.com,test_student_2,tester1",
+            "Input,test_student2@example.com,test_student_2,tester2",
+        ]
+        self._create_targets(history, students)
+
+        self._test_run_with_task(
+            student_register,
+            'student_register',
+            task_entry=self._create_input_entry(contract=contract, history=history),
+            expected_attempted=3,
+            expected_num_succeeded=3,
+            expected_total=3,
+        )
+
+        self.assertIsNone(StudentRegisterTaskTarget.objects.get(history=history, student=students[0]).message)
+        self.assertEqual(
+            "Line 2:Warning, an account with the e-mail test_student1@example.com exists but the registered username test_student_1 is different.",
+            StudentRegisterTaskTarget.objects.get(history=history, student=students[1]).message
+        )
+        self.assertIsNone(StudentRegisterTaskTarget.objects.get(history=history, student=students[2]).message)
+        self.assertEqual(ContractRegister.objects.get(user__email='test_student1@example.com', contract=contract).status, REGISTER_INVITATION_CODE)
+        self.assertEqual(
+            [INPUT_INVITATION_CODE, REGISTER_INVITATION_CODE],
+            list(ContractRegisterHistory.objects.filter(
+                user__email='test_student1@example.com', contract=contract).order_by('id').values_list('status', flat=True))
+        )
+        self.assertEqual(ContractRegister.objects.get(user__email='test_student2@example.com', contract=contract).status, INPUT_INVITATION_CODE)
+
+    @patch('biz.djangoapps.ga_contract_operation.student_register.django_send_mail')
+    def test_register_send_mail_failed_in_bulk(self, send_mail_to_student):
+        contract = self._create_contract(send_mail=True)
+        history = self._create_task_history(contract=contract)
+        students = [
+            "Input,test_student1@example.com,test_student_1,tester1",
+            "Input,test_student2@example.com,test_student_2,tester2",
+        ]
+        self._create_targets(history, students)
+        send_mail_to_student.side_effect = [Exception, None]
+
+        self._test_run_with_task(
+            student_register,
+            'student_register',
+            task_entry=self._create_input_entry(contract=contract, history=history),
+            expected_attempted=2,
+            expected_num_succeeded=2,
+            expected_total=2,
+        )
+
+        self.assertEqual(2, StudentRegisterTaskTarget.objects.filter(history=history, completed=True).count())
+        self.assertEqual(
+            "Line 1:The student has been registered, but failed to send the mail.",
+            StudentRegisterTaskTarget.objects.get(history=history, student=students[0]).message
+        )
+        self.assertIsNone(StudentRegisterTaskTarget.objects.get(history=history, student=students[1]).message)
+        self.assertTrue(User.objects.get(email='test_student1@example.com').is_active)
+        self.assertEqual(ContractRegister.objects.get(user__email='test_student1@example.com', contract=contract).status, INPUT_INVITATION_CODE)
+        self.assertEqual(2, send_mail_to_student.call_count)
+
+    def test_register_one_by_one_if_bulk_failed(self):
+        contract = self._create_contract()
+        history = self._create_task_history(contract=contract)
+        students = [
+            "Input,test_student1@example.com,test_student_1,tester1",
+            "Input,test_student2@example.com,test_student_2,tester2",
+        ]
+        self._create_targets(history, students)
+
+        with patch('biz.djangoapps.ga_contract_operation.student_register._BulkStudentRegister._create_users', side_effect=Exception):
+            self._test_run_with_task(
+                student_register,
+                'student_register',
+                task_entry=self._create_input_entry(contract=contract, history=history),
+                expected_attempted=2,
+                expected_num_succeeded=2,
+                expected_total=2,
+            )
+
+        self.assertEqual(2, StudentRegisterTaskTarget.objects.filter(history=history, completed=True).count())
+        self.assertTrue(ContractRegister.objects.filter(user__email='test_student1@example.com', contract=contract).exists())
+        self.assertTrue(ContractRegister.objects.filter(user__email='test_student2@example.com', contract=contract).exists())
@@ -42,6 +42,7 @@ class AdditionalInfoSetting(models.Model):
     display_name = models.CharField(max_length=255)
     value = models.CharField(max_length=255, default='')
     created = models.DateTimeField(auto_now_add=True)
+    modified = models.DateTimeField(auto_now=True)
 
     @classmethod
     def set_value(cls, user, contract, additional_info, value):
@@ -18,6 +18,7 @@ from courseware.courses import get_course
 from lms.djangoapps.courseware.ga_mongo_utils import PlaybackFinishStore
 from openedx.core.djangoapps.content.course_overviews.models import CourseOverview
 from opaque_keys.edx.keys import UsageKey
+from util.ga_attendance_status import ModuleStatusData
 
 log = logging.getLogger(__name__)
 
@@ -196,170 +197,31 @@ class Command(BaseCommand):
         log.debug('write to enrollment csv time: {}'.format(time.time() - timer))
 
     def _write_course_info(self, course_file_writer, course, playback_finish_store):
-        unicode_course_id = unicode(course.id)
-        video_all_modules = None
-
-        for chapter in course.get_children():
-            for section in chapter.get_children():
-                for vertical in section.get_children():
-                    for module in vertical.get_children():
-                        if hasattr(module, 'is_status_managed') and module.is_status_managed:
-                            if module.location.category == 'problem':
-                                for problem in self._get_problem_module(
-                                        UsageKey.from_string(module.location.to_deprecated_string()),
-                                        unicode_course_id):
-                                    course_file_writer.writerow(self._format_row_for_course_info(
-                                        course_id=course.id, end=course.end, user_id=problem[0],
-                                        module_category=module.location.category, module_name=module.display_name,
-                                        module_block_id=module.location.block_id,
-                                        module_usage_key=UsageKey.from_string(module.location.to_deprecated_string()),
-                                        module_modified=problem[1]
-                                    ))
-
-                            elif module.location.category == 'html':
-                                for survey in self._get_survey(
-                                        unicode_course_id, unicode(vertical.location.block_id)):
-                                    course_file_writer.writerow(self._format_row_for_course_info(
-                                        course_id=course.id, end=course.end, user_id=survey[0],
-                                        module_category=module.location.category, module_name=module.display_name,
-                                        module_block_id=module.location.block_id,
-                                        module_usage_key=UsageKey.from_string(module.location.to_deprecated_string()),
-                                        survey_created=survey[1],
-                                    ))
-
-                            elif module.location.category in ['video', 'jwplayerxblock']:
-                                # get playback finish status
-                                if video_all_modules is None:
-                                    video_all_modules = playback_finish_store.find_status_data_by_course_id(
-                                        unicode_course_id)
-
-                                for video in video_all_modules:
-                                    for video_module in video['module_list']:
-                                        if video_module['block_id'] == module.location.block_id:
-                                            course_file_writer.writerow(self._format_row_for_course_info(
-                                                course_id=course.id, end=course.end,
-                                                user_id=video['user_id'], module_category=module.location.category,
-                                                module_name=module.display_name, module_block_id=module.location.block_id,
-                                                module_usage_key=UsageKey.from_string(
-                                                    module.location.to_deprecated_string()),
-                                                video_status=video_module['status'],
-                                                video_change_time=video_module['change_time'],
-                                            ))
-
-                            elif module.location.category == 'survey':
-                                for survey in self._get_survey_module(
-                                        UsageKey.from_string(module.location.to_deprecated_string()),
-                                        unicode_course_id):
-                                    try:
-                                        tmp_state = json.loads(survey[2])
-                                        survey_submission_count = tmp_state['submissions_count']
-                                    except (AttributeError, ValueError, KeyError):
-                                        survey_submission_count = 0
-
-                                    if survey_submission_count > 0:
-                                        course_file_writer.writerow(self._format_row_for_course_info(
-                                            course_id=course.id, end=course.end, user_id=survey[0],
-                                            module_category=module.location.category, module_name=module.display_name,
-                                            module_block_id=module.location.block_id,
-                                            module_usage_key=UsageKey.from_string(
-                                                module.location.to_deprecated_string()),
-                                            module_modified=survey[1]
-                                        ))
-
-                            elif module.location.category == 'freetextresponse':
-                                for free_text_response in self._get_freetextresponse_module(
-                                        UsageKey.from_string(module.location.to_deprecated_string()),
-                                        unicode_course_id):
-                                    course_file_writer.writerow(self._format_row_for_course_info(
-                                        course_id=course.id, end=course.end, user_id=free_text_response[0],
-                                        module_category=module.location.category, module_name=module.display_name,
-                                        module_block_id=module.location.block_id,
-                                        module_usage_key=UsageKey.from_string(
-                                            module.location.to_deprecated_string()),
-                                        module_modified=free_text_response[1]
-                                    ))
-
-    def _get_problem_module(self, module_id, course_id):
-        with connection.cursor() as cursor:
-            sql = """
-            SELECT
-                module.student_id,
-                module.modified
-            FROM
-              courseware_studentmodule as module
-            WHERE 
-              module.module_id = %s AND
-              module.module_type = 'problem' AND
-              module.course_id = %s AND 
-              module.grade is NOT NULL 
-            ORDER BY
-              module.created desc 
-            """
-            cursor.execute(sql, [str(module_id), course_id])
-            student_modules = cursor.fetchall()
-            cursor.execute('UNLOCK TABLES')
-        return student_modules
-
-    def _get_survey_module(self, module_id, course_id):
-        with connection.cursor() as cursor:
-            sql = """
-            SELECT
-                module.student_id,
-                module.modified,
-                module.state
-            FROM
-              courseware_studentmodule as module
-            WHERE 
-              module.module_id = %s AND
-              module.module_type = 'survey' AND
-              module.course_id = %s
-            ORDER BY
-              module.created desc 
-            """
-            cursor.execute(sql, [str(module_id), course_id])
-            student_modules = cursor.fetchall()
-            cursor.execute('UNLOCK TABLES')
-        return student_modules
-
-    def _get_freetextresponse_module(self, module_id, course_id):
-        with connection.cursor() as cursor:
-            sql = """
-            SELECT
-                module.student_id,
-                module.modified
-            FROM
-              courseware_studentmodule as module
-            WHERE 
-              module.module_id = %s AND
-              module.module_type IN ('freetextresponse', 'problem') AND
-              module.course_id = %s AND
-              module.grade is NOT NULL 
-            ORDER BY
-              module.created desc 
-            """
-            cursor.execute(sql, [str(module_id), course_id])
-            student_modules = cursor.fetchall()
-            cursor.execute('UNLOCK TABLES')
-        return student_modules
-
-    def _get_survey(self, course_id, block_id):
-        with connection.cursor() as cursor:
-            sql = """
-            SELECT
-                survey.user_id,
-                survey.created
-            FROM
-              ga_survey_surveysubmission as survey
-            WHERE 
-              survey.course_id = %s AND
-              survey.unit_id = %s
-            ORDER BY
-              survey.created desc 
-            """
-            cursor.execute(sql, [course_id, block_id])
-            survey = cursor.fetchall()
-            cursor.execute('UNLOCK TABLES')
-        return survey
+        # Note: Fetch statuses of all the students in the course at once, instead of queries for each module
+        module_status_data = ModuleStatusData(course, playback_finish_store=playback_finish_store)
+
+        for vertical, module in module_status_data.modules:
+            module_category = module.location.category
+            row_kwargs = dict(
+                course_id=course.id, end=course.end, module_category=module_category,
+                module_name=module.display_name, module_block_id=module.location.block_id,
+                module_usage_key=UsageKey.from_string(module.location.to_deprecated_string()),
+            )
+            if module_category in ('problem', 'survey', 'freetextresponse'):
+                for user_id, modified in module_status_data.get_student_modules(module):
+                    course_file_writer.writerow(self._format_row_for_course_info(
+                        user_id=user_id, module_modified=modified, **row_kwargs))
+
+            elif module_category == 'html':
+                for user_id, created in module_status_data.get_survey_submissions(vertical):
+                    course_file_writer.writerow(self._format_row_for_course_info(
+                        user_id=user_id, survey_created=created, **row_kwargs))
+
+            elif module_category in ['video', 'jwplayerxblock']:
+                for user_id, video_module in module_status_data.get_playback_modules(module):
+                    course_file_writer.writerow(self._format_row_for_course_info(
+                        user_id=user_id, video_status=video_module['status'],
+                        video_change_time=video_module['change_time'], **row_kwargs))
 
     def _get_enrollments(self, course_ids):
         if len(course_ids) is 0:
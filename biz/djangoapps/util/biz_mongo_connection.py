@@ -1,10 +1,152 @@
 """
 Segregation of pymongo functions from the data modeling mechanisms for BizStore in mongo_utils.
 """
+import logging
+import os
+import threading
+
+import dogstats_wrapper as dog_stats_api
 import pymongo
 
 from mongodb_proxy import MongoProxy
 
+log = logging.getLogger(__name__)
+
+
+class _ClientRegistry(object):
+    """
+    Process-wide registry of pymongo clients shared by BizMongoConnection objects
+
+    A client has its own connection pool, so sharing it avoids a TCP connection and an authentication
+    for each BizStore object. Clients are dropped when the process is forked (e.g. celery or gunicorn workers),
+    because a client must not be shared between processes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._clients = {}
+        self._stats = {}
+
+    def _check_fork(self):
+        if self._pid != os.getpid():
+            # Note: Do not close clients inherited from the parent process, they are still used by the parent.
+            log.info("BizMongoConnection detected fork (pid {} -> {}), drop shared clients.".format(self._pid, os.getpid()))
+            self._reset()
+
+    def get_database(self, db, host, port, tz_aware, user, password, kwargs):
+        """
+        Get the database of the shared client for the config, and create a client if not exists
+
+        :return: pymongo.database.Database object
+        """
+        key = _make_key(db, host, port, tz_aware, user, password, kwargs)
+        with self._lock:
+            self._check_fork()
+            client = self._clients.get(key)
+            stats = self._stats.setdefault(key, {
+                'name': '{}:{}/{}'.format(host, port, db),
+                'created': 0,
+                'reused': 0,
+            })
+            if client is not None:
+                stats['reused'] += 1
+                dog_stats_api.increment('biz.mongo.client.reused')
+                return pymongo.database.Database(client, db)
+
+            if kwargs.get('replicaSet') is None:
+                kwargs.pop('replicaSet', None)
+                mongo_class = pymongo.MongoClient
+            else:
+                mongo_class = pymongo.MongoReplicaSetClient
+            client = mongo_class(
+                host=host,
+                port=port,
+                tz_aware=tz_aware,
+                **kwargs
+            )
+            database = pymongo.database.Database(client, db)
+            if user is not None and password is not None:
+                # Note: pymongo caches the credentials in the client, and uses them for all sockets of the pool.
+                try:
+                    database.authenticate(user, password)
+                except Exception:
+                    client.close()
+                    raise
+            # Register the client only after authenticated successfully
+            self._clients[key] = client
+            stats['created'] += 1
+            dog_stats_api.increment('biz.mongo.client.created')
+            return database
+
+    def get_stats(self):
+        """
+        Get metrics of the shared clients in this process
+
+        :return: list of dict
+            e.g.)
+            [
+                {
+                    'name': 'localhost:27017/biz',
+                    'created': 1,
+                    'reused': 10,
+                    'max_pool_size': 100,
+                },
+            ]
+        """
+        with self._lock:
+            self._check_fork()
+            result = []
+            for key, stats in self._stats.items():
+                stats = dict(stats)
+                client = self._clients.get(key)
+                stats['max_pool_size'] = client.max_pool_size if client is not None else None
+                result.append(stats)
+            return sorted(result, key=lambda stats: stats['name'])
+
+    def clear(self):
+        """
+        Close and drop all shared clients in this process
+        """
+        with self._lock:
+            self._check_fork()
+            for client in self._clients.values():
+                client.close()
+            self._reset()
+
+
+def _make_key(*args):
+    """
+    Make a hashable key from the config values
+    """
+    def _hashable(value):
+        if isinstance(value, dict):
+            return tuple(sorted((k, _hashable(v)) for k, v in value.items()))
+        if isinstance(value, (list, tuple)):
+            return tuple(_hashable(v) for v in value)
+        return value
+    return _hashable(args)
+
+
+_client_registry = _ClientRegistry()
+
+
+def get_client_stats():
+    """
+    Get metrics of pymongo clients shared by BizMongoConnection in this process
+    """
+    return _client_registry.get_stats()
+
+
+def clear_clients():
+    """
+    Close all pymongo clients shared by BizMongoConnection in this process
+    """
+    _client_registry.clear()
+
 
 class BizMongoConnection(object):
     """
@@ -15,23 +157,10 @@ class BizMongoConnection(object):
         retry_wait_time=0.1, **kwargs
     ):
         """
-        Create & open the connection, authenticate, and provide pointers to the collections
+        Provide pointers to the collections on the client shared for the same config
+        (The client is created, connected and authenticated at the first time.)
         """
-        if kwargs.get('replicaSet') is None:
-            kwargs.pop('replicaSet', None)
-            mongo_class = pymongo.MongoClient
-        else:
-            mongo_class = pymongo.MongoReplicaSetClient
-
-        _client = mongo_class(
-            host=host,
-            port=port,
-            tz_aware=tz_aware,
-            **kwargs
-        )
         self.database = MongoProxy(
-            pymongo.database.Database(_client, db),
+            _client_registry.get_database(db, host, port, tz_aware, user, password, kwargs),
             wait_time=retry_wait_time
         )
-        if user is not None and password is not None:
-            self.database.authenticate(user, password)
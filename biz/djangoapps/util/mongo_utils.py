@@ -7,6 +7,8 @@ import copy
 from datetime import datetime
 import logging
 import pytz
+import time
+import uuid
 from mongodb_proxy import autoretry_read
 from pymongo import ASCENDING
 
@@ -18,6 +20,8 @@ log = logging.getLogger(__name__)
 
 DEFAULT_DATETIME = datetime(9999, 1, 1, 0, 0, 0, 0, tzinfo=pytz.utc)
 
+_NOT_LOADED = object()
+
 
 class BizStore(object):
     """
@@ -25,6 +29,15 @@ class BizStore(object):
     """
 
     FIELD_DELIMITER = '___'
+    FIELD_GENERATION = '_generation'
+    FIELD_GENERATION_KEY = '_generation_key'
+    FIELD_ACTIVE_GENERATION = '_active_generation'
+    FIELD_GENERATION_CONDITIONS = '_generation_conditions'
+    FIELD_INACTIVE_GENERATIONS = '_inactive_generations'
+    FIELD_DEACTIVATED = '_deactivated'
+
+    # Note: If True, a batch can replace documents atomically by set_generation_documents and activate_generation
+    USE_GENERATION = False
 
     def __init__(self, store_config, key_conditions=None, key_index_columns=None):
         """
@@ -45,6 +58,9 @@ class BizStore(object):
             raise
         self._key_conditions = key_conditions or {}
         self._key_index_columns = key_index_columns or []
+        self._generation_key = self.FIELD_DELIMITER.join(
+            u'{}={}'.format(k, v) for k, v in sorted(self._key_conditions.items()))
+        self._active_generation = _NOT_LOADED
 
     @autoretry_read()
     def get_document(self, conditions=None, excludes=None):
@@ -57,11 +73,9 @@ class BizStore(object):
         """
         if conditions is None:
             conditions = {}
-        _conditions = copy.deepcopy(self._key_conditions)
+        _conditions = self._get_key_conditions()
         _conditions.update(conditions)
-        if excludes is None:
-            excludes = ['_id']
-        _excludes = dict((exclude, False) for exclude in excludes)
+        _excludes = self._get_excludes(excludes)
         try:
             return self._collection.find_one(_conditions, _excludes, as_class=OrderedDict)
         except Exception as e:
@@ -83,11 +97,9 @@ class BizStore(object):
         """
         if conditions is None:
             conditions = {}
-        _conditions = copy.deepcopy(self._key_conditions)
+        _conditions = self._get_key_conditions()
         _conditions.update(conditions)
-        if excludes is None:
-            excludes = ['_id']
-        _excludes = dict((exclude, False) for exclude in excludes)
+        _excludes = self._get_excludes(excludes)
         try:
             return list(
                 self._collection.find(_conditions, _excludes, as_class=OrderedDict).skip(offset).limit(limit).sort(sort_column, sort)
@@ -96,6 +108,35 @@ class BizStore(object):
             log.error("Error occurred while find MongoDB: %s" % e)
             raise
 
+    def iter_documents(self, conditions=None, excludes=None, sort_column='_id', sort=ASCENDING, offset=0, limit=0):
+        """
+        Get the data of MongoDB lazily
+
+        Note: Documents are fetched from a cursor by batches while iterating, so that all of them are not loaded
+              into memory at once. (Iteration can not be retried by autoretry_read.)
+
+        :param conditions: MongoDB Condition for Dict
+        :param excludes: _id flag of exclusion
+        :param sort_column: Keys to sort
+        :param sort: Sorting method
+        :param offset: Offset to documents
+        :param limit: Limit to documents (A limit() value of 0 (i.e. .limit(0)) is equivalent to setting no limit.)
+        :return: generator of documents
+        """
+        if conditions is None:
+            conditions = {}
+        _conditions = self._get_key_conditions()
+        _conditions.update(conditions)
+        _excludes = self._get_excludes(excludes)
+        try:
+            cursor = self._collection.find(
+                _conditions, _excludes, as_class=OrderedDict).skip(offset).limit(limit).sort(sort_column, sort)
+            for document in cursor:
+                yield document
+        except Exception as e:
+            log.error("Error occurred while iterate documents MongoDB: %s" % e)
+            raise
+
     @autoretry_read()
     def get_count(self, conditions=None):
         """
@@ -106,7 +147,7 @@ class BizStore(object):
         """
         if conditions is None:
             conditions = {}
-        _conditions = copy.deepcopy(self._key_conditions)
+        _conditions = self._get_key_conditions()
         _conditions.update(conditions)
         try:
             return self._collection.find(_conditions).count(True)
@@ -132,7 +173,7 @@ class BizStore(object):
         """
         if conditions is None:
             conditions = {}
-        _conditions = copy.deepcopy(self._key_conditions)
+        _conditions = self._get_key_conditions()
         _conditions.update(conditions)
         try:
             result = self._collection.aggregate([
@@ -168,7 +209,7 @@ class BizStore(object):
         """
         if conditions is None:
             conditions = {}
-        _conditions = copy.deepcopy(self._key_conditions)
+        _conditions = self._get_key_conditions()
         _conditions.update(conditions)
         try:
             all_result = {}
@@ -205,11 +246,236 @@ class BizStore(object):
         :return: _id
         """
         try:
+            if isinstance(posts, dict):
+                posts = self._with_active_generation(posts)
+            else:
+                posts = [self._with_active_generation(post) for post in posts]
             return self._collection.insert(posts, check_keys=False)
         except Exception as e:
             log.error("Error occurred while insert MongoDB: %s" % e)
             raise
 
+    def get_active_generation(self):
+        """
+        Get the active generation of documents for the key conditions
+
+        Note: The active generation is loaded only once for each store object.
+
+        :return: generation id, or None if documents have never been stored as a generation
+        """
+        if not self.USE_GENERATION:
+            return None
+        if self._active_generation is _NOT_LOADED:
+            try:
+                pointer = self._collection.find_one({self.FIELD_GENERATION_KEY: self._generation_key})
+            except Exception as e:
+                log.error("Error occurred while find active generation MongoDB: %s" % e)
+                raise
+            self._active_generation = pointer[self.FIELD_ACTIVE_GENERATION] if pointer else None
+        return self._active_generation
+
+    def set_generation_documents(self, posts, generation=None):
+        """
+        Data insert into MongoDB as a new generation
+
+        Note: Inserted documents are invisible to readers until activate_generation() is called.
+              This is not decorated by autoretry_read, because retrying may insert the documents twice.
+
+        :param posts: list of dict data for inserting
+        :param generation: generation id (generate a new one if not specified)
+        :return: generation id
+        """
+        generation = generation or uuid.uuid4().hex
+        try:
+            for i in range(0, len(posts), settings.BIZ_STORE_INSERT_CHUNK_SIZE):
+                chunk = []
+                for post in posts[i:i + settings.BIZ_STORE_INSERT_CHUNK_SIZE]:
+                    post = copy.copy(post)
+                    post[self.FIELD_GENERATION] = generation
+                    chunk.append(post)
+                self._collection.insert(chunk, check_keys=False)
+            return generation
+        except Exception as e:
+            log.error("Error occurred while insert generation MongoDB: %s" % e)
+            raise
+
+    @autoretry_read()
+    def get_generation_count(self, generation):
+        """
+        Get the count of documents in the specified generation
+
+        :param generation: generation id
+        :return: int
+        """
+        _conditions = copy.deepcopy(self._key_conditions)
+        _conditions[self.FIELD_GENERATION] = generation
+        try:
+            return self._collection.find(_conditions).count(True)
+        except Exception as e:
+            log.error("Error occurred while get generation count MongoDB: %s" % e)
+            raise
+
+    def activate_generation(self, generation):
+        """
+        Switch documents which readers see to the specified generation by updating a single pointer document
+
+        Note: Documents of the previous generation are kept, because readers which have already resolved it
+              may still be reading them. They are removed by remove_expired_generations() after a grace period.
+
+        :param generation: generation id
+        :return: None
+        """
+        try:
+            pointer = self._collection.find_one({self.FIELD_GENERATION_KEY: self._generation_key})
+            # Note: None means documents stored before using generation
+            previous_generation = pointer[self.FIELD_ACTIVE_GENERATION] if pointer else None
+            update = {'$set': {
+                self.FIELD_ACTIVE_GENERATION: generation,
+                self.FIELD_GENERATION_CONDITIONS: self._key_conditions,
+            }}
+            if previous_generation != generation:
+                update['$push'] = {self.FIELD_INACTIVE_GENERATIONS: {
+                    self.FIELD_GENERATION: previous_generation,
+                    self.FIELD_DEACTIVATED: time.time(),
+                }}
+            self._collection.update({self.FIELD_GENERATION_KEY: self._generation_key}, update, upsert=True)
+        except Exception as e:
+            log.error("Error occurred while activate generation MongoDB: %s" % e)
+            raise
+        self._active_generation = generation
+
+    def remove_generation(self, generation):
+        """
+        Remove documents of the specified generation which has not been activated (e.g. failed to be confirmed)
+
+        :param generation: generation id
+        :return: None
+        """
+        if generation == self.get_active_generation():
+            raise ValueError("Can not remove the active generation: {}".format(generation))
+        _conditions = copy.deepcopy(self._key_conditions)
+        _conditions[self.FIELD_GENERATION] = generation
+        try:
+            return self._collection.remove(_conditions)
+        except Exception as e:
+            log.error("Error occurred while remove generation MongoDB: %s" % e)
+            raise
+
+    def remove_expired_generations(self, grace_period):
+        """
+        Remove documents of generations which were deactivated more than the grace period ago
+
+        Note: This deals with generations of all key conditions in the collection, and is expected to be called
+              by a background job (cleanup_biz_store_generations) rather than by the batches which activate them.
+
+        :param grace_period: datetime.timedelta
+        :return: number of removed generations
+        """
+        expired_before = time.time() - grace_period.total_seconds()
+        field_deactivated = '{}.{}'.format(self.FIELD_INACTIVE_GENERATIONS, self.FIELD_DEACTIVATED)
+        removed_count = 0
+        try:
+            for pointer in list(self._collection.find({field_deactivated: {'$lt': expired_before}})):
+                for inactive in pointer[self.FIELD_INACTIVE_GENERATIONS]:
+                    if inactive[self.FIELD_DEACTIVATED] >= expired_before:
+                        continue
+                    generation = inactive[self.FIELD_GENERATION]
+                    _conditions = dict(pointer[self.FIELD_GENERATION_CONDITIONS])
+                    _conditions[self.FIELD_GENERATION] = generation
+                    self._collection.remove(_conditions)
+                    # Note: Forget the generation only after its documents have been removed, so that it can be retried
+                    self._collection.update(
+                        {'_id': pointer['_id']},
+                        {'$pull': {self.FIELD_INACTIVE_GENERATIONS: {self.FIELD_GENERATION: generation}}},
+                    )
+                    removed_count += 1
+            return removed_count
+        except Exception as e:
+            log.error("Error occurred while remove expired generations MongoDB: %s" % e)
+            raise
+
+    def _get_key_conditions(self):
+        """
+        Get key conditions to find documents
+
+        Note: If the store uses generation, documents are limited to the active generation.
+              (Documents stored before using generation match while no generation has been activated,
+              because the condition of None matches documents which do not have the field.)
+        """
+        _conditions = copy.deepcopy(self._key_conditions)
+        if self.USE_GENERATION:
+            _conditions[self.FIELD_GENERATION] = self.get_active_generation()
+        return _conditions
+
+    def _get_excludes(self, excludes=None):
+        """
+        Get projection to exclude the specified fields (and the internal generation field)
+        """
+        if excludes is None:
+            excludes = ['_id']
+        _excludes = dict((exclude, False) for exclude in excludes)
+        if self.USE_GENERATION:
+            _excludes[self.FIELD_GENERATION] = False
+        return _excludes
+
+    def _with_active_generation(self, post):
+        """
+        Tag the post with the active generation if exists
+        """
+        generation = self.get_active_generation()
+        if generation is None:
+            return post
+        post = copy.copy(post)
+        post[self.FIELD_GENERATION] = generation
+        return post
+
+    def upsert_documents(self, posts, key_field_names):
+        """
+        Data replace into MongoDB, or insert if the document does not exist
+
+        Note: This is not decorated by autoretry_read, because it is not a read operation.
+
+        :param posts: list of dict data for upserting
+        :param key_field_names: field names to identify the document to be replaced
+        :return: result of bulk operation
+        """
+        if not posts:
+            return None
+        try:
+            bulk = self._collection.initialize_unordered_bulk_op()
+            for post in posts:
+                _conditions = self._get_key_conditions()
+                _conditions.update(dict((key_field_name, post[key_field_name]) for key_field_name in key_field_names))
+                bulk.find(_conditions).upsert().replace_one(self._with_active_generation(post))
+            return bulk.execute()
+        except Exception as e:
+            log.error("Error occurred while upsert MongoDB: %s" % e)
+            raise
+
+    def increment_documents(self, posts, key_field_names, inc_field_name):
+        """
+        Add the value of the field to the documents, or insert if the document does not exist
+
+        Note: This is not decorated by autoretry_read, because retrying may increment the value twice.
+
+        :param posts: list of dict data which have key fields and the field to increment
+        :param key_field_names: field names to identify the document to be incremented
+        :param inc_field_name: field name to increment
+        :return: result of bulk operation
+        """
+        if not posts:
+            return None
+        try:
+            bulk = self._collection.initialize_unordered_bulk_op()
+            for post in posts:
+                _conditions = self._get_key_conditions()
+                _conditions.update(dict((key_field_name, post[key_field_name]) for key_field_name in key_field_names))
+                bulk.find(_conditions).upsert().update_one({'$inc': {inc_field_name: post[inc_field_name]}})
+            return bulk.execute()
+        except Exception as e:
+            log.error("Error occurred while increment MongoDB: %s" % e)
+            raise
+
     @autoretry_read()
     def ensure_indexes(self, index_columns=None):
         """
@@ -247,7 +513,7 @@ class BizStore(object):
         """
         if conditions is None:
             conditions = {}
-        _conditions = copy.deepcopy(self._key_conditions)
+        _conditions = self._get_key_conditions()
         _conditions.update(conditions)
         try:
             return self._collection.remove(_conditions)
@@ -259,7 +525,7 @@ class BizStore(object):
     def has_duplicate(self, group_field_keys, conditions=None):
         if conditions is None:
             conditions = {}
-        _conditions = copy.deepcopy(self._key_conditions)
+        _conditions = self._get_key_conditions()
         _conditions.update(conditions)
         try:
             return bool(self._collection.aggregate([
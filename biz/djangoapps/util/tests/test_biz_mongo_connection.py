@@ -1,9 +1,10 @@
 """
 Tests for biz_mongo_connection
 """
+from mock import patch
 from pymongo.errors import OperationFailure
 
-from biz.djangoapps.util.biz_mongo_connection import BizMongoConnection
+from biz.djangoapps.util.biz_mongo_connection import BizMongoConnection, clear_clients, get_client_stats
 from biz.djangoapps.util.tests.testcase import TestCase
 
 from mongodb_proxy import MongoProxy
@@ -11,6 +12,11 @@ from mongodb_proxy import MongoProxy
 
 class BizMongoConnectionTest(TestCase):
 
+    def setUp(self):
+        super(BizMongoConnectionTest, self).setUp()
+        clear_clients()
+        self.addCleanup(clear_clients)
+
     def set_config(self):
         self._store_config = {
             'db': 'test',
@@ -41,3 +47,38 @@ class BizMongoConnectionTest(TestCase):
     def test_user_password_biz_mongo_connection_exception(self):
         with self.assertRaises(OperationFailure):
             self.user_password_biz_mongo_connection()
+
+    def test_shared_client(self):
+        self.set_config()
+        BizMongoConnection(**self._store_config)
+        BizMongoConnection(**dict(self._store_config, collection='test2'))
+
+        self.assertEqual([{
+            'name': 'localhost:27017/test',
+            'created': 1,
+            'reused': 1,
+            'max_pool_size': 100,
+        }], get_client_stats())
+
+    def test_not_shared_client_for_other_db(self):
+        self.set_config()
+        BizMongoConnection(**self._store_config)
+        BizMongoConnection(**dict(self._store_config, db='test2'))
+
+        self.assertEqual([(1, 0), (1, 0)], [(stats['created'], stats['reused']) for stats in get_client_stats()])
+
+    def test_not_shared_client_after_fork(self):
+        self.set_config()
+        BizMongoConnection(**self._store_config)
+        with patch('biz.djangoapps.util.biz_mongo_connection.os.getpid', return_value=-1):
+            BizMongoConnection(**self._store_config)
+
+            self.assertEqual([(1, 0)], [(stats['created'], stats['reused']) for stats in get_client_stats()])
+
+    def test_not_shared_client_failed_to_authenticate(self):
+        with self.assertRaises(OperationFailure):
+            self.user_password_biz_mongo_connection()
+        with self.assertRaises(OperationFailure):
+            self.user_password_biz_mongo_connection()
+
+        self.assertEqual([(0, 0)], [(stats['created'], stats['reused']) for stats in get_client_stats()])
@@ -4,6 +4,7 @@ Tests for mongo_utils
 import copy
 import random
 from collections import OrderedDict
+from datetime import timedelta
 from ddt import data, ddt, unpack
 from mock import MagicMock
 
@@ -113,6 +114,17 @@ class BizStoreTest(BizStoreTestBase):
 
         self._drop_mongo_collection()
 
+    def test_iter_documents(self):
+        self.set_normal()
+        self._bizstore = BizStore(self._test_store_config, self.key_conditions, self.key_index_columns)
+        self._bizstore.set_documents(self._documents)
+
+        documents = self._bizstore.iter_documents(sort_column=ScoreStore.FIELD_USERNAME, offset=1)
+        self.assertFalse(isinstance(documents, list))
+        self.assertEqual(['user_test2'], [d[ScoreStore.FIELD_USERNAME] for d in documents])
+
+        self._drop_mongo_collection()
+
     def test_get_count(self):
         self.set_normal()
         self._bizstore = BizStore(self._test_store_config, self.key_conditions, self.key_index_columns)
@@ -148,6 +160,37 @@ class BizStoreTest(BizStoreTestBase):
 
         self._drop_mongo_collection()
 
+    def test_upsert_documents(self):
+        self.set_normal()
+        self._bizstore = BizStore(self._test_store_config, self.key_conditions, self.key_index_columns)
+        self._bizstore.set_documents(self._documents)
+
+        od2 = copy.deepcopy(self._documents[1])
+        od2[ScoreStore.FIELD_FULL_NAME] = 'test2_updated'
+        od3 = copy.deepcopy(self._documents[1])
+        od3[ScoreStore.FIELD_USERNAME] = 'user_test3'
+        od3.pop('_id', None)
+        od2.pop('_id', None)
+        self._bizstore.upsert_documents([od2, od3], [ScoreStore.FIELD_USERNAME])
+
+        self.assertEqual(3, self._bizstore.get_count())
+        self.assertEqual(
+            'test1', self._bizstore.get_document({ScoreStore.FIELD_USERNAME: 'user_test1'})[ScoreStore.FIELD_FULL_NAME])
+        self.assertEqual(
+            'test2_updated',
+            self._bizstore.get_document({ScoreStore.FIELD_USERNAME: 'user_test2'})[ScoreStore.FIELD_FULL_NAME])
+        self.assertIsNotNone(self._bizstore.get_document({ScoreStore.FIELD_USERNAME: 'user_test3'}))
+
+        self._drop_mongo_collection()
+
+    def test_upsert_documents_with_no_post(self):
+        self.set_normal()
+        self._bizstore = BizStore(self._test_store_config, self.key_conditions, self.key_index_columns)
+        self.assertIsNone(self._bizstore.upsert_documents([], [ScoreStore.FIELD_USERNAME]))
+        self.assertEqual(0, self._bizstore.get_count())
+
+        self._drop_mongo_collection()
+
     def test_remove_documents(self):
         self.set_normal()
         self._bizstore = BizStore(self._test_store_config, self.key_conditions, self.key_index_columns)
@@ -277,6 +320,103 @@ class BizStoreTest(BizStoreTestBase):
         self.assertEqual(5, self._bizstore._collection.find.call_count)
 
 
+class _GenerationBizStore(BizStore):
+    """BizStore which replaces documents by generation"""
+    USE_GENERATION = True
+
+
+class BizStoreGenerationTest(BizStoreTestBase):
+
+    def setUp(self):
+        super(BizStoreGenerationTest, self).setUp()
+        self.store_config = self.BIZ_MONGO.values()[0]
+        self.key_conditions = {'contract_id': 1, 'course_id': 'test'}
+        self.test_store = _GenerationBizStore(self.store_config, self.key_conditions)
+
+    def _new_store(self):
+        return _GenerationBizStore(self.store_config, self.key_conditions)
+
+    def test_legacy_documents_before_activation(self):
+        # Documents stored without generation
+        BizStore(self.store_config, self.key_conditions).set_documents([
+            {'contract_id': 1, 'course_id': 'test', 'user': 'user1'},
+        ])
+        self.assertIsNone(self.test_store.get_active_generation())
+        self.assertEqual(1, self.test_store.get_count())
+
+    def test_set_generation_documents_invisible_until_activated(self):
+        self.test_store.set_documents([{'contract_id': 1, 'course_id': 'test', 'user': 'user1'}])
+        generation = self.test_store.set_generation_documents([
+            {'contract_id': 1, 'course_id': 'test', 'user': 'user2'},
+            {'contract_id': 1, 'course_id': 'test', 'user': 'user3'},
+        ])
+        self.assertEqual(2, self.test_store.get_generation_count(generation))
+        self.assertEqual(['user1'], [d['user'] for d in self._new_store().get_documents()])
+
+        self.test_store.activate_generation(generation)
+
+        store = self._new_store()
+        self.assertEqual(generation, store.get_active_generation())
+        documents = store.get_documents(sort_column='user')
+        self.assertEqual(['user2', 'user3'], [d['user'] for d in documents])
+        self.assertNotIn(BizStore.FIELD_GENERATION, documents[0])
+        self.assertNotIn(BizStore.FIELD_GENERATION, store.get_document({'user': 'user2'}))
+
+    def test_remove_generation(self):
+        generation = self.test_store.set_generation_documents([{'contract_id': 1, 'course_id': 'test', 'user': 'user1'}])
+        self.test_store.remove_generation(generation)
+        self.assertEqual(0, self.test_store.get_generation_count(generation))
+
+    def test_remove_generation_active(self):
+        generation = self.test_store.set_generation_documents([{'contract_id': 1, 'course_id': 'test', 'user': 'user1'}])
+        self.test_store.activate_generation(generation)
+        with self.assertRaises(ValueError):
+            self.test_store.remove_generation(generation)
+        self.assertEqual(1, self.test_store.get_generation_count(generation))
+
+    def test_remove_expired_generations(self):
+        # Documents stored before using generation
+        BizStore(self.store_config, self.key_conditions).set_documents([
+            {'contract_id': 1, 'course_id': 'test', 'user': 'user0'},
+        ])
+        first_generation = self.test_store.set_generation_documents([{'contract_id': 1, 'course_id': 'test', 'user': 'user1'}])
+        self.test_store.activate_generation(first_generation)
+        # A reader which has resolved the first generation
+        reader = self._new_store()
+        self.assertEqual(first_generation, reader.get_active_generation())
+        second_generation = self.test_store.set_generation_documents([{'contract_id': 1, 'course_id': 'test', 'user': 'user2'}])
+        self.test_store.activate_generation(second_generation)
+        # Documents of other key conditions
+        other_store = _GenerationBizStore(self.store_config, {'contract_id': 2, 'course_id': 'test'})
+        other_store.activate_generation(
+            other_store.set_generation_documents([{'contract_id': 2, 'course_id': 'test', 'user': 'user3'}]))
+
+        # Deactivated generations are kept within the grace period
+        self.assertEqual(0, self.test_store.remove_expired_generations(timedelta(hours=1)))
+        self.assertEqual(['user1'], [d['user'] for d in reader.get_documents()])
+
+        self.assertEqual(3, self.test_store.remove_expired_generations(timedelta(0)))
+
+        self.assertEqual(0, reader.get_count())
+        self.assertEqual(0, self.test_store.get_generation_count(None))
+        self.assertEqual(0, self.test_store.get_generation_count(first_generation))
+        self.assertEqual(1, self.test_store.get_generation_count(second_generation))
+        self.assertEqual(1, self._new_store().get_count())
+        self.assertEqual(1, other_store.get_count())
+        # Removed generations are forgotten
+        self.assertEqual(0, self.test_store.remove_expired_generations(timedelta(0)))
+
+    def test_set_documents_with_active_generation(self):
+        generation = self.test_store.set_generation_documents([{'contract_id': 1, 'course_id': 'test', 'user': 'user1'}])
+        self.test_store.activate_generation(generation)
+
+        self.test_store.set_documents([{'contract_id': 1, 'course_id': 'test', 'user': 'user2'}])
+        self.test_store.upsert_documents([{'contract_id': 1, 'course_id': 'test', 'user': 'user1', 'score': 10}], ['user'])
+
+        self.assertEqual(2, self.test_store.get_generation_count(generation))
+        self.assertEqual(10, self._new_store().get_document({'user': 'user1'})['score'])
+
+
 class _Exception(Exception):
     """Exception for exception-based test case"""
     pass
@@ -3,9 +3,12 @@ import unicodecsv as csv
 import codecs
 from cStringIO import StringIO
 from django.utils.translation import ugettext as _
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
 import urllib
 
+# Note: Size of data to be sent at once by streaming responses
+STREAMING_CHUNK_SIZE = 64 * 1024
+
 
 def get_utf8_csv(request, filename, delimiter='\t', quotechar="'"):
     tmp_str = request.FILES[filename].file.read()
@@ -147,3 +150,71 @@ def create_csv_response_double_quote(filename, header, rows, encoding='cp932'):
     return response
 
 
+class _StreamBuffer(object):
+    """
+    File-like object which keeps written data until it is taken by pop()
+    """
+    def __init__(self):
+        self.data = []
+        self.size = 0
+
+    def write(self, data):
+        self.data.append(data)
+        self.size += len(data)
+
+    def pop(self):
+        data = ''.join(self.data)
+        self.data = []
+        self.size = 0
+        return data
+
+
+def _generate_stream(writer_class, header, rows, encoding):
+    """
+    Generate encoded data of header and rows by the writer
+
+    Note: Rows are consumed lazily, so that a generator of rows can be written without loading all of them.
+    """
+    buf = _StreamBuffer()
+    writer = writer_class(f=buf, encoding=encoding)
+    if header is not None:
+        writer.writerow(header)
+        # Note: Send header at once not to keep the client waiting
+        yield buf.pop()
+    if rows is not None:
+        for row in rows:
+            writer.writerow(row)
+            if buf.size >= STREAMING_CHUNK_SIZE:
+                yield buf.pop()
+    if buf.size:
+        yield buf.pop()
+
+
+def create_tsv_streaming_response(filename, header, rows, encoding='utf-16'):
+    """
+    :param filename: output_file_name
+    :param header: csv_header
+    :param rows: csv_rows (iterable, e.g. generator)
+    :param encoding: default utf-16
+    :return: http_output (StreamingHttpResponse)
+    """
+    response = StreamingHttpResponse(
+        _generate_stream(TSVWriter, header, rows, encoding), content_type='text/tab-separated-values')
+    filename = urllib.quote(filename.encode("utf-8"))
+    response['Content-Disposition'] = "attachment; filename*=UTF-8''{0}".format(filename)
+    return response
+
+
+def create_csv_streaming_response_double_quote(filename, header, rows, encoding='cp932'):
+    """
+    :param filename: output_file_name
+    :param header: csv_header
+    :param rows: csv_rows (iterable, e.g. generator)
+    :param encoding: default cp932
+    :return: http_output (StreamingHttpResponse)
+    """
+    response = StreamingHttpResponse(
+        _generate_stream(CSVWriterDoubleQuote, header, rows, encoding), content_type='text/csv')
+    filename = urllib.quote(filename.encode("utf-8"))
+    response['Content-Disposition'] = "attachment; filename*=UTF-8''{0}".format(filename)
+    return response
@@ -4,15 +4,16 @@ Settings for Biz
 from lms.envs.aws import AUTH_TOKENS, ENV_TOKENS, CELERY_DEFAULT_QUEUE
 from lms.envs.common import (
     BIZ_MONGO,
-    MAX_RETRY_REMOVE_DOCUMENTS,
-    SLEEP_RETRY_REMOVE_DOCUMENTS,
-    MAX_RETRY_SET_DOCUMENTS,
-    SLEEP_RETRY_SET_DOCUMENTS,
     AGGREGATE_FETCH_LIMIT,
+    BIZ_STORE_INSERT_CHUNK_SIZE,
+    BIZ_STORE_GENERATION_GRACE_HOURS,
+    BIZ_IMPORT_PLAYBACK_LOG_MAX_AGGREGATE_KEYS,
     BIZ_FROM_EMAIL,
     BIZ_RECIPIENT_LIST,
     BIZ_MAX_REGISTER_NUMBER,
     BIZ_MAX_CHAR_LENGTH_REGISTER_LINE,
+    BIZ_STUDENT_REGISTER_BULK_MIN_TARGETS,
+    BIZ_STUDENT_REGISTER_BULK_CHUNK_SIZE,
     BIZ_MAX_BULK_STUDENTS_NUMBER,
     BIZ_MAX_CHAR_LENGTH_BULK_STUDENTS_LINE,
     BIZ_MAX_REGISTER_ADDITIONAL_INFO,
@@ -29,6 +30,9 @@ BIZ_SECRET_KEY = AUTH_TOKENS['BIZ_SECRET_KEY']
 MongoDB
 """
 BIZ_MONGO = AUTH_TOKENS.get('BIZ_MONGO', BIZ_MONGO)
+# Note: Store the summary of playback log in the same database as playback log if not configured
+if 'playback_log_summary' not in BIZ_MONGO:
+    BIZ_MONGO['playback_log_summary'] = dict(BIZ_MONGO['playback_log'], collection='playback_log_summary')
 BIZ_MONGO_LIMIT_RECORDS = ENV_TOKENS.get('BIZ_MONGO_LIMIT_RECORDS', 0)
 
 """
@@ -39,11 +43,12 @@ BIZ_SET_SHOW_ENABLED_CONTRACT_COMMAND_OUTPUT = ENV_TOKENS.get('BIZ_SET_SHOW_ENAB
 BIZ_SET_PLAYBACK_COMMAND_OUTPUT = ENV_TOKENS.get('BIZ_SET_PLAYBACK_COMMAND_OUTPUT')
 BIZ_SEND_SUBMISSION_REMINDER_COMMAND_OUTPUT = ENV_TOKENS.get('BIZ_SEND_SUBMISSION_REMINDER_COMMAND_OUTPUT')
 BIZ_IMPORT_PLAYBACK_LOG_COMMAND_OUTPUT = ENV_TOKENS.get('BIZ_IMPORT_PLAYBACK_LOG_COMMAND_OUTPUT')
-MAX_RETRY_REMOVE_DOCUMENTS = ENV_TOKENS.get('MAX_RETRY_REMOVE_DOCUMENTS', MAX_RETRY_REMOVE_DOCUMENTS)
-SLEEP_RETRY_REMOVE_DOCUMENTS = ENV_TOKENS.get('SLEEP_RETRY_REMOVE_DOCUMENTS', SLEEP_RETRY_REMOVE_DOCUMENTS)
-MAX_RETRY_SET_DOCUMENTS = ENV_TOKENS.get('MAX_RETRY_SET_DOCUMENTS', MAX_RETRY_SET_DOCUMENTS)
-SLEEP_RETRY_SET_DOCUMENTS = ENV_TOKENS.get('SLEEP_RETRY_SET_DOCUMENTS', SLEEP_RETRY_SET_DOCUMENTS)
+BIZ_CLEANUP_STORE_GENERATIONS_COMMAND_OUTPUT = ENV_TOKENS.get('BIZ_CLEANUP_STORE_GENERATIONS_COMMAND_OUTPUT')
 AGGREGATE_FETCH_LIMIT = ENV_TOKENS.get('AGGREGATE_FETCH_LIMIT', AGGREGATE_FETCH_LIMIT)
+BIZ_STORE_INSERT_CHUNK_SIZE = ENV_TOKENS.get('BIZ_STORE_INSERT_CHUNK_SIZE', BIZ_STORE_INSERT_CHUNK_SIZE)
+BIZ_STORE_GENERATION_GRACE_HOURS = ENV_TOKENS.get('BIZ_STORE_GENERATION_GRACE_HOURS', BIZ_STORE_GENERATION_GRACE_HOURS)
+BIZ_IMPORT_PLAYBACK_LOG_MAX_AGGREGATE_KEYS = ENV_TOKENS.get(
+    'BIZ_IMPORT_PLAYBACK_LOG_MAX_AGGREGATE_KEYS', BIZ_IMPORT_PLAYBACK_LOG_MAX_AGGREGATE_KEYS)
 
 """
 AWS S3
@@ -67,6 +72,10 @@ Register student
 """
 BIZ_MAX_REGISTER_NUMBER = ENV_TOKENS.get('BIZ_MAX_REGISTER_NUMBER', BIZ_MAX_REGISTER_NUMBER)
 BIZ_MAX_CHAR_LENGTH_REGISTER_LINE = ENV_TOKENS.get('BIZ_MAX_CHAR_LENGTH_REGISTER_LINE', BIZ_MAX_CHAR_LENGTH_REGISTER_LINE)
+BIZ_STUDENT_REGISTER_BULK_MIN_TARGETS = ENV_TOKENS.get(
+    'BIZ_STUDENT_REGISTER_BULK_MIN_TARGETS', BIZ_STUDENT_REGISTER_BULK_MIN_TARGETS)
+BIZ_STUDENT_REGISTER_BULK_CHUNK_SIZE = ENV_TOKENS.get(
+    'BIZ_STUDENT_REGISTER_BULK_CHUNK_SIZE', BIZ_STUDENT_REGISTER_BULK_CHUNK_SIZE)
 
 """
 Bulk student Management
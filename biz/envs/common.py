@@ -21,7 +21,12 @@ BIZ_MONGO = {
         'host': ['localhost'],
         'db': 'biz',
         'collection': 'playback_log',
-    }
+    },
+    'playback_log_summary': {
+        'host': ['localhost'],
+        'db': 'biz',
+        'collection': 'playback_log_summary',
+    },
 }
 
 """
@@ -61,11 +66,12 @@ INSTALLED_APPS += (
 """
 Batch Settings
 """
-MAX_RETRY_REMOVE_DOCUMENTS = 5
-SLEEP_RETRY_REMOVE_DOCUMENTS = 1
-MAX_RETRY_SET_DOCUMENTS = 10
-SLEEP_RETRY_SET_DOCUMENTS = 3
 AGGREGATE_FETCH_LIMIT = 50000
+BIZ_STORE_INSERT_CHUNK_SIZE = 1000
+# Hours to keep documents of the previous generation of ScoreStore/PlaybackStore for readers which still see it
+BIZ_STORE_GENERATION_GRACE_HOURS = 6
+# Max number of aggregate keys kept on memory by import_playback_log before spilling to a temporary file
+BIZ_IMPORT_PLAYBACK_LOG_MAX_AGGREGATE_KEYS = 500000
 
 """
 Celery
@@ -83,6 +89,9 @@ Register student
 """
 BIZ_MAX_REGISTER_NUMBER = 10000
 BIZ_MAX_CHAR_LENGTH_REGISTER_LINE = 300
+# Register students by bulk inserts if the number of them is not less than this
+BIZ_STUDENT_REGISTER_BULK_MIN_TARGETS = 100
+BIZ_STUDENT_REGISTER_BULK_CHUNK_SIZE = 500
 
 """
 Bulk student Management
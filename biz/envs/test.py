@@ -19,6 +19,7 @@ BIZ_SET_SHOW_ENABLED_CONTRACT_COMMAND_OUTPUT = tempfile.NamedTemporaryFile().nam
 BIZ_SET_PLAYBACK_COMMAND_OUTPUT = tempfile.NamedTemporaryFile().name
 BIZ_SEND_SUBMISSION_REMINDER_COMMAND_OUTPUT = tempfile.NamedTemporaryFile().name
 BIZ_IMPORT_PLAYBACK_LOG_COMMAND_OUTPUT = tempfile.NamedTemporaryFile().name
+BIZ_CLEANUP_STORE_GENERATIONS_COMMAND_OUTPUT = tempfile.NamedTemporaryFile().name
 
 """
 Monthly report info
@@ -1,6 +1,8 @@
 import json
 import pytz
+from collections import defaultdict
 from datetime import datetime
+from django.db.models import Case, F, TextField, When
 from django.utils.timezone import UTC
 from opaque_keys.edx.keys import UsageKey
 from student.models import CourseEnrollment, CourseEnrollmentAttribute
@@ -14,6 +16,167 @@ KEY_ATTENDED_DATE = 'attended_date'
 KEY_COMPLETE_DATE = 'completed_date'
 
 
+STATUS_MANAGED_STUDENT_MODULE_TYPES = ('problem', 'freetextresponse', 'survey')
+STATUS_MANAGED_VIDEO_CATEGORIES = ('video', 'jwplayerxblock')
+STATUS_CHECKED_CATEGORIES = STATUS_MANAGED_STUDENT_MODULE_TYPES + STATUS_MANAGED_VIDEO_CATEGORIES + ('html',)
+
+
+def get_status_managed_modules(course):
+    """
+    Returns a list of (vertical, module) of the status-managed modules in the course
+    """
+    return [
+        (vertical, module)
+        for chapter in course.get_children()
+        for section in chapter.get_children()
+        for vertical in section.get_children()
+        for module in vertical.get_children()
+        if hasattr(module, 'is_status_managed') and module.is_status_managed
+    ]
+
+
+class ModuleStatusData(object):
+    """
+    Data to evaluate statuses of the status-managed modules in a course.
+
+    Each source (StudentModule, SurveySubmission and PlaybackFinishStore) is fetched by one query
+    at the first access, instead of queries for each module.
+
+    ex: data = ModuleStatusData(course, user_id=user.id)
+        data.is_completed(vertical, module)
+    """
+
+    def __init__(self, course, user_id=None, playback_finish_store=None):
+        """
+        :param course: CourseDescriptor
+        :param user_id: id of the user, or None for all users in the course
+        :param playback_finish_store: PlaybackFinishStore (created if None)
+        """
+        self.course_id = course.id
+        self.user_id = user_id
+        self.modules = get_status_managed_modules(course)
+        self._playback_finish_store = playback_finish_store
+        self._student_modules = None
+        self._survey_submissions = None
+        self._playback_modules = None
+
+    def _usage_key(self, location):
+        """
+        Returns the usage key to look up StudentModules
+        Note: Locations in StudentModule don't necessarily have course key info (old mongo)
+        """
+        return location.map_into_course(self.course_id)
+
+    def _load_student_modules(self):
+        student_modules = StudentModule.objects.filter(
+            course_id=self.course_id,
+            module_type__in=STATUS_MANAGED_STUDENT_MODULE_TYPES,
+            module_state_key__in=[
+                module.location for __, module in self.modules
+                if module.location.category in STATUS_MANAGED_STUDENT_MODULE_TYPES
+            ],
+        )
+        if self.user_id is not None:
+            student_modules = student_modules.filter(student_id=self.user_id)
+        # Note: Fetch state only for survey, since state of problems may be large and is not used
+        student_modules = student_modules.annotate(
+            survey_state=Case(When(module_type='survey', then=F('state')), output_field=TextField()),
+        ).order_by('-created').values_list(
+            'student_id', 'module_state_key', 'module_type', 'modified', 'grade', 'survey_state')
+
+        self._student_modules = defaultdict(list)
+        for student_id, module_state_key, module_type, modified, grade, survey_state in student_modules:
+            usage_key = self._usage_key(UsageKey.from_string(module_state_key))
+            self._student_modules[usage_key].append((student_id, module_type, modified, grade, survey_state))
+
+    def _load_survey_submissions(self):
+        survey_submissions = SurveySubmission.objects.filter(course_id=self.course_id)
+        if self.user_id is not None:
+            survey_submissions = survey_submissions.filter(user_id=self.user_id)
+
+        self._survey_submissions = defaultdict(list)
+        for user_id, unit_id, created in survey_submissions.order_by('-created').values_list(
+                'user_id', 'unit_id', 'created'):
+            self._survey_submissions[unit_id].append((user_id, created))
+
+    def _load_playback_modules(self):
+        if self._playback_finish_store is None:
+            self._playback_finish_store = PlaybackFinishStore()
+        if self.user_id is None:
+            records = self._playback_finish_store.find_status_data_by_course_id(unicode(self.course_id))
+        else:
+            records = self._playback_finish_store.find_record(self.user_id, unicode(self.course_id))
+
+        self._playback_modules = defaultdict(list)
+        for record in records:
+            for playback_module in record.get('module_list', []):
+                self._playback_modules[playback_module['block_id']].append((record['user_id'], playback_module))
+
+    def get_student_modules(self, module):
+        """
+        Returns a list of (student_id, modified) of StudentModules which make the module completed
+        (problem or freetextresponse has grade, survey has been submitted)
+
+        :param module: problem, freetextresponse or survey
+        """
+        if self._student_modules is None:
+            self._load_student_modules()
+
+        category = module.location.category
+        results = []
+        for student_id, module_type, modified, grade, survey_state in \
+                self._student_modules.get(self._usage_key(module.location), []):
+            if category == 'problem':
+                is_completed = module_type == 'problem' and grade is not None
+            elif category == 'freetextresponse':
+                is_completed = module_type in ('freetextresponse', 'problem') and grade is not None
+            elif category == 'survey' and module_type == 'survey':
+                try:
+                    is_completed = json.loads(survey_state).get('submissions_count', 0) > 0
+                except (TypeError, ValueError, AttributeError):
+                    is_completed = False
+            else:
+                is_completed = False
+            if is_completed:
+                results.append((student_id, modified))
+        return results
+
+    def get_survey_submissions(self, vertical):
+        """
+        Returns a list of (user_id, created) of SurveySubmissions of the vertical
+        """
+        if self._survey_submissions is None:
+            self._load_survey_submissions()
+        return self._survey_submissions.get(unicode(vertical.location.block_id), [])
+
+    def get_playback_modules(self, module):
+        """
+        Returns a list of (user_id, module dict of PlaybackFinishStore record) of the video module
+        """
+        if self._playback_modules is None:
+            self._load_playback_modules()
+        return self._playback_modules.get(module.location.block_id, [])
+
+    def is_completed(self, vertical, module, user_id=None):
+        """
+        Returns whether the user has completed the status-managed module
+
+        :param user_id: id of the user (the user of this object if None)
+        """
+        user_id = self.user_id if user_id is None else user_id
+        category = module.location.category
+        if category in STATUS_MANAGED_STUDENT_MODULE_TYPES:
+            return any(student_id == user_id for student_id, __ in self.get_student_modules(module))
+        elif category == 'html':
+            return any(_user_id == user_id for _user_id, __ in self.get_survey_submissions(vertical))
+        elif category in STATUS_MANAGED_VIDEO_CATEGORIES:
+            return any(
+                _user_id == user_id and playback_module.get('status') is True
+                for _user_id, playback_module in self.get_playback_modules(module)
+            )
+        return False
+
+
 class AttendanceStatusExecutor(object):
     """
     ex: executor = AttendanceStatusExecutor(enrollment=enrollment)
@@ -97,89 +260,21 @@ class AttendanceStatusExecutor(object):
 
     @staticmethod
     def check_attendance_status(course, user_id):
-
-        return_flg = True
-        module_non_is_managed_flg = False
-
-        if course.is_status_managed:
-            for chapter in course.get_children():
-                for section in chapter.get_children():
-                    for vertical in section.get_children():
-                        for module in vertical.get_children():
-                            if hasattr(module, 'is_status_managed') and module.is_status_managed:
-                                module_non_is_managed_flg = True
-                                if module.location.category == 'html':
-                                    if SurveySubmission.objects.filter(
-                                            course_id=course.id,
-                                            unit_id=vertical.location.block_id,
-                                            user=user_id
-                                    ).count() is 0:
-                                        return_flg = False
-                                        break
-                                if module.location.category == 'problem':
-                                    module_state_key = UsageKey.from_string(module.location.to_deprecated_string())
-                                    if StudentModule.objects.filter(
-                                            module_state_key=module_state_key,
-                                            module_type__exact='problem',
-                                            student=user_id,
-                                            course_id=course.id,
-                                            grade__isnull=False
-                                    ).count() is 0:
-                                        return_flg = False
-                                        break
-                                if module.location.category in ['video', 'jwplayerxblock']:
-                                    if not PlaybackFinishStore().find_status_true_data(user_id, unicode(course.id),
-                                                                                       module.location.block_id):
-                                        return_flg = False
-                                        break
-                                if module.location.category == 'survey':
-                                    student_module_values = StudentModule.objects.filter(
-                                        module_state_key=UsageKey.from_string(module.location.to_deprecated_string()),
-                                        module_type__exact='survey',
-                                        student=user_id,
-                                        course_id=course.id).values('state')
-                                    if len(student_module_values) is 0:
-                                        return_flg = False
-                                        break
-                                    else:
-                                        student_module_value = json.loads(student_module_values[0]['state'])
-                                        if 'submissions_count' in student_module_value:
-                                            if student_module_value['submissions_count'] is 0:
-                                                return_flg = False
-                                                break
-                                        else:
-                                            return_flg = False
-                                            break
-                                if module.location.category == 'freetextresponse':
-                                    if StudentModule.objects.filter(
-                                            module_state_key=UsageKey.from_string(
-                                                module.location.to_deprecated_string()),
-                                            module_type__in=('freetextresponse', 'problem'),
-                                            student=user_id,
-                                            course_id=course.id,
-                                            grade__isnull=False).count() is 0:
-                                        return_flg = False
-                                        break
-
-                                if not return_flg:
-                                    break
-                            if not return_flg:
-                                break
-                        if not return_flg:
-                            break
-                    if not return_flg:
-                        break
-                if not return_flg:
-                    break
-        if module_non_is_managed_flg:
-            return return_flg
-        else:
-            """
-            Set return_flg to False 
-            if is_status_managed of the course is True and is_statsu_managed of all modules is False.
-            """
-            return_flg = False
-            return return_flg
+        """
+        Returns True if the user has completed all the status-managed modules in the course.
+        Returns False if is_status_managed of the course is False or no module is status-managed.
+        """
+        if not course.is_status_managed:
+            return False
+        module_status_data = ModuleStatusData(course, user_id=user_id)
+        if not module_status_data.modules:
+            return False
+        # Note: Modules of other categories have no condition to be completed
+        return all(
+            module_status_data.is_completed(vertical, module)
+            for vertical, module in module_status_data.modules
+            if module.location.category in STATUS_CHECKED_CATEGORIES
+        )
 
     @staticmethod
     def attendance_status_is_attended(value):
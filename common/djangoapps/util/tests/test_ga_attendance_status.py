@@ -11,7 +11,7 @@ from ga_survey.tests.factories import SurveySubmissionFactory
 from lms.djangoapps.courseware.tests.test_ga_mongo_utils import PlaybackFinishTestBase
 from student.models import CourseEnrollmentAttribute
 from student.tests.factories import UserFactory, CourseEnrollmentFactory, CourseEnrollmentAttributeFactory
-from util.ga_attendance_status import AttendanceStatusExecutor
+from util.ga_attendance_status import AttendanceStatusExecutor, ModuleStatusData
 from xmodule.modulestore.tests.django_utils import ModuleStoreTestCase
 from xmodule.modulestore.tests.factories import CourseFactory, ItemFactory
 
@@ -694,3 +694,48 @@ class AttendanceStatusExecutorTests(ModuleStoreTestCase, PlaybackFinishTestBase)
             enrollment=self.enrollment).check_attendance_status(course=self.course, user_id=self.user.id)
         # assert
         self.assertFalse(act)
+
+    def test_module_status_data_for_all_users(self):
+        # arrange
+        self._setup_course_modules()
+        other_user = UserFactory.create()
+        StudentModuleFactory.create(
+            course_id=self.course.id, module_state_key=self.module_x11_problem1.location, student=self.user,
+            grade=1, max_grade=4, state=None)
+        StudentModuleFactory.create(
+            course_id=self.course.id, module_state_key=self.module_x11_problem1.location, student=other_user,
+            grade=None, max_grade=4, state=None)
+        PlaybackFinishFactory._create(course=self.course, user=self.user, module_list=[
+            PlaybackFinishFactory._create_module_param(module=self.module_x12_video1, status=True)])
+        PlaybackFinishFactory._create(course=self.course, user=other_user, module_list=[
+            PlaybackFinishFactory._create_module_param(module=self.module_x12_video1, status=False)])
+        SurveySubmissionFactory.create(
+            course_id=self.course.id, unit_id=self.vertical_x13.location.block_id, user=other_user,
+            survey_name=self.module_x13_html_survey1.display_name, survey_answer='')
+        StudentModuleFactory.create(
+            course_id=self.course.id, module_state_key=self.module_x17_survey1.location, student=self.user,
+            module_type='survey', state='{"submissions_count": 1}')
+        StudentModuleFactory.create(
+            course_id=self.course.id, module_state_key=self.module_x17_survey1.location, student=other_user,
+            module_type='survey', state='{"submissions_count": 0}')
+        # act
+        module_status_data = ModuleStatusData(self.course)
+        # assert
+        self.assertEqual(10, len(module_status_data.modules))
+        with self.assertNumQueries(2):
+            for vertical, module in module_status_data.modules:
+                module_status_data.is_completed(vertical, module, user_id=self.user.id)
+                module_status_data.is_completed(vertical, module, user_id=other_user.id)
+        for module, vertical, expected_user_ids in [
+            (self.module_x11_problem1, self.vertical_x11, [self.user.id]),
+            (self.module_x12_video1, self.vertical_x12, [self.user.id]),
+            (self.module_x13_html_survey1, self.vertical_x13, [other_user.id]),
+            (self.module_x17_survey1, self.vertical_x17, [self.user.id]),
+            (self.module_x16_freetextresponse1, self.vertical_x16, []),
+        ]:
+            for user_id in (self.user.id, other_user.id):
+                self.assertEqual(
+                    user_id in expected_user_ids, module_status_data.is_completed(vertical, module, user_id=user_id))
+        self.assertEqual(
+            [self.user.id], [user_id for user_id, __ in module_status_data.get_student_modules(self.module_x17_survey1)])
+        self.assertEqual(2, len(module_status_data.get_playback_modules(self.module_x12_video1)))
@@ -470,6 +470,9 @@ class MongoBulkOpsRecord(BulkOpsRecord):
     def __init__(self):
         super(MongoBulkOpsRecord, self).__init__()
         self.dirty = False
+        # locations whose inherited metadata needs to be recomputed at the end of the bulk operation
+        # (None means the whole course)
+        self.metadata_inheritance_locations = set()
 
 
 class MongoBulkOpsMixin(BulkOperationsMixin):
@@ -484,6 +487,7 @@ class MongoBulkOpsMixin(BulkOperationsMixin):
         """
         # ensure it starts clean
         bulk_ops_record.dirty = False
+        bulk_ops_record.metadata_inheritance_locations = set()
 
     def _end_outermost_bulk_operation(self, bulk_ops_record, structure_key):
         """
@@ -492,7 +496,10 @@ class MongoBulkOpsMixin(BulkOperationsMixin):
         """
         dirty = False
         if bulk_ops_record.dirty:
-            self.refresh_cached_metadata_inheritance_tree(structure_key)
+            # only recompute the subtrees edited during the bulk operation, if they're known
+            locations = bulk_ops_record.metadata_inheritance_locations or None
+            bulk_ops_record.metadata_inheritance_locations = set()
+            self.refresh_cached_metadata_inheritance_tree(structure_key, locations=locations)
             dirty = True
             bulk_ops_record.dirty = False  # brand spanking clean now
         return dirty
@@ -667,38 +674,27 @@ class MongoModuleStore(ModuleStoreDraftAndPublished, ModuleStoreWriteBase, Mongo
         else:
             return ParentLocationCache()
 
-    def _compute_metadata_inheritance_tree(self, course_id):
-        '''
-        Find all inheritable fields from all xblocks in the course which may define inheritable data
-        '''
-        # get all collections in the course, this query should not return any leaf nodes
-        course_id = self.fill_in_run(course_id)
-        query = SON([
-            ('_id.tag', 'i4x'),
-            ('_id.org', course_id.org),
-            ('_id.course', course_id.course),
-            ('_id.category', {'$in': BLOCK_TYPES_WITH_CHILDREN})
-        ])
-        # if we're only dealing in the published branch, then only get published containers
-        if self.get_branch_setting() == ModuleStoreEnum.Branch.published_only:
-            query['_id.revision'] = None
-        # we just want the Location, children, and inheritable metadata
+    @staticmethod
+    def _metadata_inheritance_record_filter():
+        """
+        Returns the projection which gets only the Location, children, and inheritable metadata of xblocks
+        """
         record_filter = {'_id': 1, 'definition.children': 1}
 
         # just get the inheritable metadata since that is all we need for the computation
         # this minimizes both data pushed over the wire
         for field_name in InheritanceMixin.fields:
             record_filter['metadata.{0}'.format(field_name)] = 1
+        return record_filter
 
-        # call out to the DB
-        resultset = self.collection.find(query, record_filter)
+    def _collect_metadata_inheritance_records(self, course_id, resultset, results_by_url):
+        """
+        Adds the records in resultset to results_by_url keyed by their published location url,
+        merging the children of the draft and published versions of the same xblock.
 
-        # it's ok to keep these as deprecated strings b/c the overall cache is indexed by course_key and this
-        # is a dictionary relative to that course
-        results_by_url = {}
+        Returns the url of the course if it is in resultset.
+        """
         root = None
-
-        # now go through the results and order them by the location url
         for result in resultset:
             # manually pick it apart b/c the db has tag and we want as_published revision regardless
             location = as_published(Location._from_deprecated_son(result['_id'], course_id.run))
@@ -717,40 +713,156 @@ class MongoModuleStore(ModuleStoreDraftAndPublished, ModuleStoreWriteBase, Mongo
                 results_by_url[location_url] = result
             if location.category == 'course':
                 root = location_url
+        return root
 
-        # now traverse the tree and compute down the inherited metadata
-        metadata_to_inherit = {}
+    def _inherit_metadata_down(self, results_by_url, url, metadata_to_inherit):
+        """
+        Computes the metadata inherited by the descendants of the location url into metadata_to_inherit
+        """
+        my_metadata = results_by_url[url].get('metadata', {})
 
-        def _compute_inherited_metadata(url):
-            """
-            Helper method for computing inherited metadata for a specific location url
-            """
-            my_metadata = results_by_url[url].get('metadata', {})
-
-            # go through all the children and recurse, but only if we have
-            # in the result set. Remember results will not contain leaf nodes
-            for child in results_by_url[url].get('definition', {}).get('children', []):
-                if child in results_by_url:
-                    new_child_metadata = copy.deepcopy(my_metadata)
-                    new_child_metadata.update(results_by_url[child].get('metadata', {}))
-                    results_by_url[child]['metadata'] = new_child_metadata
-                    metadata_to_inherit[child] = new_child_metadata
-                    _compute_inherited_metadata(child)
-                else:
-                    # this is likely a leaf node, so let's record what metadata we need to inherit
-                    metadata_to_inherit[child] = my_metadata.copy()
-                # WARNING: 'parent' is not part of inherited metadata, but
-                # we're piggybacking on this recursive traversal to grab
-                # and cache the child's parent, as a performance optimization.
-                # The 'parent' key will be popped out of the dictionary during
-                # CachingDescriptorSystem.load_item
-                metadata_to_inherit[child].setdefault('parent', {})[self.get_branch_setting()] = url
+        # go through all the children and recurse, but only if we have
+        # in the result set. Remember results will not contain leaf nodes
+        for child in results_by_url[url].get('definition', {}).get('children', []):
+            if child in results_by_url:
+                new_child_metadata = copy.deepcopy(my_metadata)
+                new_child_metadata.update(results_by_url[child].get('metadata', {}))
+                results_by_url[child]['metadata'] = new_child_metadata
+                metadata_to_inherit[child] = new_child_metadata
+                self._inherit_metadata_down(results_by_url, child, metadata_to_inherit)
+            else:
+                # this is likely a leaf node, so let's record what metadata we need to inherit
+                metadata_to_inherit[child] = my_metadata.copy()
+            # WARNING: 'parent' is not part of inherited metadata, but
+            # we're piggybacking on this recursive traversal to grab
+            # and cache the child's parent, as a performance optimization.
+            # The 'parent' key will be popped out of the dictionary during
+            # CachingDescriptorSystem.load_item
+            metadata_to_inherit[child].setdefault('parent', {})[self.get_branch_setting()] = url
 
+    def _compute_metadata_inheritance_tree(self, course_id):
+        '''
+        Find all inheritable fields from all xblocks in the course which may define inheritable data
+        '''
+        # get all collections in the course, this query should not return any leaf nodes
+        course_id = self.fill_in_run(course_id)
+        query = SON([
+            ('_id.tag', 'i4x'),
+            ('_id.org', course_id.org),
+            ('_id.course', course_id.course),
+            ('_id.category', {'$in': BLOCK_TYPES_WITH_CHILDREN})
+        ])
+        # if we're only dealing in the published branch, then only get published containers
+        if self.get_branch_setting() == ModuleStoreEnum.Branch.published_only:
+            query['_id.revision'] = None
+
+        # call out to the DB
+        resultset = self.collection.find(query, self._metadata_inheritance_record_filter())
+
+        # it's ok to keep these as deprecated strings b/c the overall cache is indexed by course_key and this
+        # is a dictionary relative to that course
+        results_by_url = {}
+
+        # now go through the results and order them by the location url
+        root = self._collect_metadata_inheritance_records(course_id, resultset, results_by_url)
+
+        # now traverse the tree and compute down the inherited metadata
+        metadata_to_inherit = {}
         if root is not None:
-            _compute_inherited_metadata(root)
+            self._inherit_metadata_down(results_by_url, root, metadata_to_inherit)
 
         return metadata_to_inherit
 
+    @staticmethod
+    def _drop_metadata_inheritance_subtree(tree, location_url):
+        """
+        Removes the entries of location_url and all of its descendants from the inheritance tree
+        """
+        children_by_parent = {}
+        for url, metadata in tree.iteritems():
+            for parent_url in metadata.get('parent', {}).itervalues():
+                children_by_parent.setdefault(parent_url, set()).add(url)
+
+        to_drop = [location_url]
+        while to_drop:
+            url = to_drop.pop()
+            tree.pop(url, None)
+            to_drop.extend(children_by_parent.pop(url, []))
+
+    def _update_metadata_inheritance_subtree(self, course_id, tree, location):
+        """
+        Recomputes, in place, the entries of the inheritance tree for the descendants of location
+        (and location itself) from the current inherited metadata of its parent.
+
+        Only the containers in the subtree are read from the DB (one query per level of the subtree),
+        so editing a unit doesn't cost a recomputation of the whole course.
+        """
+        location_url = unicode(as_published(location))
+        self._drop_metadata_inheritance_subtree(tree, location_url)
+
+        record_filter = self._metadata_inheritance_record_filter()
+        published_only = self.get_branch_setting() == ModuleStoreEnum.Branch.published_only
+
+        # find the parent and what it passes down
+        query = self._course_key_to_son(course_id)
+        query['definition.children'] = location_url
+        if published_only:
+            query['_id.revision'] = MongoRevisionKey.published
+        parents = list(self.collection.find(query, record_filter, sort=[SORT_REVISION_FAVOR_DRAFT]).limit(1))
+        if not parents:
+            # deleted or orphaned, so nothing inherits anything here
+            return
+        parent_location = as_published(Location._from_deprecated_son(parents[0]['_id'], course_id.run))
+        parent_url = unicode(parent_location)
+        if parent_location.category == 'course':
+            parent_metadata = parents[0].get('metadata', {})
+        elif parent_url in tree:
+            parent_metadata = {key: value for key, value in tree[parent_url].iteritems() if key != 'parent'}
+        else:
+            # the parent isn't reachable from the course either
+            return
+
+        # load the containers of the subtree level by level
+        results_by_url = {}
+        level = [location_url]
+        while level:
+            ids = []
+            for url in level:
+                usage_key = course_id.make_usage_key_from_deprecated_string(url)
+                ids.append(usage_key.to_deprecated_son())
+                if not published_only:
+                    ids.append(as_draft(usage_key).to_deprecated_son())
+            self._collect_metadata_inheritance_records(
+                course_id, self.collection.find({'_id': {'$in': ids}}, record_filter), results_by_url
+            )
+            level = set(
+                child
+                for url in level if url in results_by_url
+                for child in results_by_url[url].get('definition', {}).get('children', [])
+                if child not in results_by_url and
+                course_id.make_usage_key_from_deprecated_string(child).category in BLOCK_TYPES_WITH_CHILDREN
+            )
+
+        if location_url not in results_by_url:
+            return
+
+        metadata = copy.deepcopy(parent_metadata)
+        metadata.update(results_by_url[location_url].get('metadata', {}))
+        results_by_url[location_url]['metadata'] = metadata
+        self._inherit_metadata_down(results_by_url, location_url, tree)
+        metadata.setdefault('parent', {})[self.get_branch_setting()] = parent_url
+        tree[location_url] = metadata
+
+    def _set_cached_metadata_inheritance_tree(self, course_id, tree):
+        """
+        Writes out the inheritance tree to the caching subsystem (e.g. memcached) and the request cache
+        """
+        if self.metadata_inheritance_cache_subsystem is not None:
+            self.metadata_inheritance_cache_subsystem.set(unicode(course_id), tree)
+
+        if self.request_cache is not None:
+            self.request_cache.data.setdefault('metadata_inheritance', {})[unicode(course_id)] = tree
+
     def _get_cached_metadata_inheritance_tree(self, course_id, force_refresh=False):
         '''
         Compute the metadata inheritance for the course.
@@ -792,18 +904,59 @@ class MongoModuleStore(ModuleStoreDraftAndPublished, ModuleStoreWriteBase, Mongo
 
         return tree
 
-    def refresh_cached_metadata_inheritance_tree(self, course_id, runtime=None):
+    def _update_cached_metadata_inheritance_tree(self, course_id, locations):
+        """
+        Recompute the cached inheritance tree only for the subtrees of the given locations.
+        Falls back to computing the whole tree if it isn't cached yet or the course itself was edited.
+        """
+        course_id = self.fill_in_run(course_id)
+        tree = None
+        if self.request_cache is not None:
+            tree = self.request_cache.data.get('metadata_inheritance', {}).get(unicode(course_id))
+        if not tree and self.metadata_inheritance_cache_subsystem is not None:
+            tree = self.metadata_inheritance_cache_subsystem.get(unicode(course_id))
+        if not tree or any(location.category == 'course' for location in locations):
+            return self._get_cached_metadata_inheritance_tree(course_id, force_refresh=True)
+
+        # leaf xblocks don't pass anything down, and their own entries only depend on their parents
+        location_urls = set(
+            unicode(as_published(location)) for location in locations
+            if location.category in BLOCK_TYPES_WITH_CHILDREN
+        )
+        if location_urls:
+            # don't mutate the tree which may be in use by runtimes of this request
+            tree = dict(tree)
+            for location_url in location_urls:
+                self._update_metadata_inheritance_subtree(
+                    course_id, tree, course_id.make_usage_key_from_deprecated_string(location_url)
+                )
+        self._set_cached_metadata_inheritance_tree(course_id, tree)
+        return tree
+
+    def refresh_cached_metadata_inheritance_tree(self, course_id, runtime=None, locations=None):
         """
         Refresh the cached metadata inheritance tree for the org/course combination
         for location
 
+        If given locations, only the inherited metadata of their subtrees is recomputed.
+
         If given a runtime, it replaces the cached_metadata in that runtime. NOTE: failure to provide
         a runtime may mean that some objects report old values for inherited data.
         """
         course_id = course_id.for_branch(None)
-        if not self._is_in_bulk_operation(course_id):
+        if self._is_in_bulk_operation(course_id):
+            # defer to the end of the bulk operation
+            bulk_record = self._get_bulk_ops_record(course_id)
+            if locations is None:
+                bulk_record.metadata_inheritance_locations = None
+            elif bulk_record.metadata_inheritance_locations is not None:
+                bulk_record.metadata_inheritance_locations.update(locations)
+        else:
             # below is done for side effects when runtime is None
-            cached_metadata = self._get_cached_metadata_inheritance_tree(course_id, force_refresh=True)
+            if locations is None:
+                cached_metadata = self._get_cached_metadata_inheritance_tree(course_id, force_refresh=True)
+            else:
+                cached_metadata = self._update_cached_metadata_inheritance_tree(course_id, locations)
             if runtime:
                 runtime.cached_metadata = cached_metadata
 
@@ -1480,7 +1633,9 @@ class MongoModuleStore(ModuleStoreDraftAndPublished, ModuleStoreWriteBase, Mongo
             xblock._edit_info = payload['edit_info']
 
             # recompute (and update) the metadata inheritance tree which is cached
-            self.refresh_cached_metadata_inheritance_tree(xblock.scope_ids.usage_id.course_key, xblock.runtime)
+            self.refresh_cached_metadata_inheritance_tree(
+                xblock.scope_ids.usage_id.course_key, xblock.runtime, locations=[xblock.scope_ids.usage_id]
+            )
             # fire signal that we've written to DB
         except ItemNotFoundError:
             if not allow_not_found:
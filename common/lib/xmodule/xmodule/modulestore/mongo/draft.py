@@ -606,7 +606,7 @@ class DraftModuleStore(MongoModuleStore):
         first_tier = [as_func(location) for as_func in as_functions]
         self._breadth_first(_delete_item, first_tier)
         # recompute (and update) the metadata inheritance tree which is cached
-        self.refresh_cached_metadata_inheritance_tree(location.course_key)
+        self.refresh_cached_metadata_inheritance_tree(location.course_key, locations=[location])
 
     def _breadth_first(self, function, root_usages):
         """
@@ -743,6 +743,10 @@ class DraftModuleStore(MongoModuleStore):
             bulk_record.dirty = True
             self.collection.remove({'_id': {'$in': to_be_deleted}})
 
+        # warm the cached metadata inheritance tree for the published subtree now rather than
+        # leaving it to the first request for the course
+        self.refresh_cached_metadata_inheritance_tree(course_key, locations=[location])
+
         self._flag_publish_event(course_key)
 
         return self.get_item(as_published(location))
@@ -8,6 +8,8 @@ import zlib
 import pymongo
 import pytz
 import re
+import threading
+from collections import OrderedDict
 from contextlib import contextmanager
 from time import time
 
@@ -225,6 +227,110 @@ def structure_to_mongo(structure, course_context=None):
         return new_structure
 
 
+class MemoryLRUCache(object):
+    """
+    LRU cache of decoded objects kept in the memory of the process.
+
+    The least recently used entries are evicted when the total size of the entries exceeds `max_size`.
+    Cached objects are shared among requests (and threads), so callers must not modify them.
+    """
+    def __init__(self, name, max_size):
+        """
+        Arguments:
+            name: The name used in metrics (e.g. 'structures')
+            max_size (int): Max total size of the entries (bytes of pickled data)
+        """
+        self.name = name
+        self.max_size = max_size
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _increment(self, metric_name, course_context, sample_rate=0.01):
+        """Send a count metric of this cache."""
+        dog_stats_api.increment(
+            '{}.MemoryLRUCache.{}.{}'.format(__name__, self.name, metric_name),
+            tags=['course:{}'.format(course_context)],
+            sample_rate=sample_rate,
+        )
+
+    def get(self, key, course_context=None):
+        """Return the cached object for key, or None if it is not cached."""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                self.misses += 1
+            else:
+                # Move the entry to the most recently used end
+                self._entries[key] = entry
+                self.hits += 1
+
+        if entry is None:
+            self._increment('miss', course_context)
+            return None
+        self._increment('hit', course_context)
+        return entry[0]
+
+    def set(self, key, value, size, course_context=None):
+        """Cache value for key, and evict the least recently used entries if the cache is full."""
+        if size > self.max_size:
+            return
+
+        evictions = 0
+        with self._lock:
+            old_entry = self._entries.pop(key, None)
+            if old_entry is not None:
+                self.size -= old_entry[1]
+            self._entries[key] = (value, size)
+            self.size += size
+            while self.size > self.max_size:
+                __, (__, evicted_size) = self._entries.popitem(last=False)
+                self.size -= evicted_size
+                evictions += 1
+            self.evictions += evictions
+
+        if evictions:
+            self._increment('eviction', course_context, sample_rate=1)
+        dog_stats_api.histogram(
+            '{}.MemoryLRUCache.{}.size'.format(__name__, self.name),
+            self.size,
+            sample_rate=0.01,
+        )
+
+    def clear(self):
+        """Remove all the entries."""
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+
+_MEMORY_CACHES = {}
+_MEMORY_CACHES_LOCK = threading.Lock()
+
+
+def get_memory_cache(name):
+    """
+    Return the MemoryLRUCache for `name` ('structures' or 'definitions'),
+    or None if its size is not configured in settings.SPLIT_MONGO_MEMORY_CACHE_MAX_SIZE.
+
+    Note: Only read-only processes (e.g. LMS) should configure it, since cached objects are shared.
+    """
+    if name not in _MEMORY_CACHES:
+        with _MEMORY_CACHES_LOCK:
+            if name not in _MEMORY_CACHES:
+                max_size = getattr(settings, 'SPLIT_MONGO_MEMORY_CACHE_MAX_SIZE', {}).get(name)
+                _MEMORY_CACHES[name] = MemoryLRUCache(name, max_size) if max_size else None
+    return _MEMORY_CACHES[name]
+
+
+def _pickled_size(obj):
+    """Return the size of the pickled obj, used as the size of an entry in MemoryLRUCache."""
+    return len(pickle.dumps(obj, pickle.HIGHEST_PROTOCOL))
+
+
 class CourseStructureCache(object):
     """
     Wrapper around django cache object to cache course structure objects.
@@ -243,6 +349,12 @@ class CourseStructureCache(object):
 
     def get(self, key, course_context=None):
         """Pull the compressed, pickled struct data from cache and deserialize."""
+        memory_cache = get_memory_cache('structures')
+        if memory_cache is not None:
+            structure = memory_cache.get(key, course_context)
+            if structure is not None:
+                return structure
+
         if self.cache is None:
             return None
 
@@ -260,11 +372,17 @@ class CourseStructureCache(object):
             pickled_data = zlib.decompress(compressed_pickled_data)
             tagger.measure('uncompressed_size', len(pickled_data))
 
-            return pickle.loads(pickled_data)
+            structure = pickle.loads(pickled_data)
+            if memory_cache is not None:
+                memory_cache.set(key, structure, len(pickled_data), course_context)
+            return structure
 
     def set(self, key, structure, course_context=None):
         """Given a structure, will pickle, compress, and write to cache."""
+        memory_cache = get_memory_cache('structures')
         if self.cache is None:
+            if memory_cache is not None:
+                memory_cache.set(key, structure, _pickled_size(structure), course_context)
             return None
 
         with TIMER.timer("CourseStructureCache.set", course_context) as tagger:
@@ -278,6 +396,9 @@ class CourseStructureCache(object):
             # Stuctures are immutable, so we set a timeout of "never"
             self.cache.set(key, compressed_pickled_data, None)
 
+            if memory_cache is not None:
+                memory_cache.set(key, structure, len(pickled_data), course_context)
+
 
 class MongoConnection(object):
     """
@@ -503,20 +624,49 @@ class MongoConnection(object):
         """
         Get the definition from the persistence mechanism whose id is the given key
         """
+        memory_cache = get_memory_cache('definitions')
+        if memory_cache is not None:
+            definition = memory_cache.get(key, course_context)
+            if definition is not None:
+                return definition
+
         with TIMER.timer("get_definition", course_context) as tagger:
             definition = self.definitions.find_one({'_id': key})
             tagger.measure("fields", len(definition['fields']))
             tagger.tag(block_type=definition['block_type'])
+            # Definitions are immutable per _id, so they can be shared
+            if memory_cache is not None:
+                memory_cache.set(key, definition, _pickled_size(definition), course_context)
             return definition
 
     def get_definitions(self, definitions, course_context=None):
         """
         Retrieve all definitions listed in `definitions`.
         """
-        with TIMER.timer("get_definitions", course_context) as tagger:
-            tagger.measure('definitions', len(definitions))
-            definitions = self.definitions.find({'_id': {'$in': definitions}})
-            return definitions
+        memory_cache = get_memory_cache('definitions')
+        if memory_cache is None:
+            with TIMER.timer("get_definitions", course_context) as tagger:
+                tagger.measure('definitions', len(definitions))
+                definitions = self.definitions.find({'_id': {'$in': definitions}})
+                return definitions
+
+        # Only query for the definitions that aren't in the memory cache
+        results = []
+        missing_ids = []
+        for definition_id in definitions:
+            definition = memory_cache.get(definition_id, course_context)
+            if definition is None:
+                missing_ids.append(definition_id)
+            else:
+                results.append(definition)
+
+        if missing_ids:
+            with TIMER.timer("get_definitions", course_context) as tagger:
+                tagger.measure('definitions', len(missing_ids))
+                for definition in self.definitions.find({'_id': {'$in': missing_ids}}):
+                    memory_cache.set(definition['_id'], definition, _pickled_size(definition), course_context)
+                    results.append(definition)
+        return results
 
     def insert_definition(self, definition, course_context=None):
         """
@@ -689,6 +689,35 @@ class TestMongoModuleStore(TestMongoModuleStoreBase):
         # Clean up the data so we don't break other tests which apparently expect a particular state
         self.draft_store.delete_course(course.id, self.dummy_user)
 
+    def test_update_metadata_inheritance_subtree(self):
+        """
+        Recomputing the inheritance tree for an edited subtree gives the same tree as recomputing the whole course
+        """
+        course = self.draft_store.create_course("TestX", "InheritanceTest", "1234_A1", self.dummy_user)
+        chapter = self.draft_store.create_child(self.dummy_user, course.location, "chapter")
+        sequential = self.draft_store.create_child(self.dummy_user, chapter.location, "sequential")
+        vertical = self.draft_store.create_child(self.dummy_user, sequential.location, "vertical")
+        html = self.draft_store.create_child(self.dummy_user, vertical.location, "html")
+        tree = self.draft_store._compute_metadata_inheritance_tree(course.id)
+        self.assertEqual(tree[unicode(html.location)]['parent'].values(), [unicode(vertical.location)])
+
+        # change inheritable metadata in the middle of the course
+        sequential = self.draft_store.get_item(sequential.location)
+        sequential.showanswer = 'never'
+        self.draft_store.update_item(sequential, self.dummy_user)
+        self.draft_store._update_metadata_inheritance_subtree(course.id, tree, sequential.location)
+        self.assertEqual(tree[unicode(html.location)]['showanswer'], 'never')
+        self.assertEqual(tree, self.draft_store._compute_metadata_inheritance_tree(course.id))
+
+        # remove a subtree
+        self.draft_store.delete_item(vertical.location, self.dummy_user)
+        self.draft_store._update_metadata_inheritance_subtree(course.id, tree, sequential.location)
+        self.assertNotIn(unicode(html.location), tree)
+        self.assertEqual(tree, self.draft_store._compute_metadata_inheritance_tree(course.id))
+
+        # Clean up the data so we don't break other tests which apparently expect a particular state
+        self.draft_store.delete_course(course.id, self.dummy_user)
+
     def test_make_course_usage_key(self):
         """Test that we get back the appropriate usage key for the root of a course key."""
         course_key = CourseLocator(org="edX", course="101", run="2015")
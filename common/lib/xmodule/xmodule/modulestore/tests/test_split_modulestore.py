@@ -768,6 +768,26 @@ class SplitModuleCourseTests(SplitModuleTest):
         self.assertIn(BlockKey('chapter', 'chapter1'), block_map)
         self.assertIn(BlockKey('problem', 'problem3_2'), block_map)
 
+    @patch('xmodule.tabs.CourseTab.from_json', side_effect=mock_tab_from_json)
+    def test_cache_items_not_lazy(self, _from_json):
+        """
+        Test that loading the definitions doesn't modify the blocks of the structure, which may be shared.
+        """
+        locator = CourseLocator(org='testx', course='GreekHero', run="run", branch=BRANCH_NAME_DRAFT)
+        course = modulestore().get_course(locator)
+        structure_blocks = course.system.course_entry.structure['blocks']
+        structure_fields = {block_key: dict(block.fields) for block_key, block in structure_blocks.iteritems()}
+        block_map = modulestore().cache_items(
+            course.system, [BlockKey.from_usage_key(child) for child in course.children], course.id, depth=3,
+            lazy=False
+        )
+        problem_key = BlockKey('problem', 'problem3_2')
+        self.assertTrue(block_map[problem_key].definition_loaded)
+        self.assertIsNot(block_map[problem_key], structure_blocks[problem_key])
+        self.assertFalse(structure_blocks[problem_key].definition_loaded)
+        for block_key, block in structure_blocks.iteritems():
+            self.assertEqual(block.fields, structure_fields[block_key])
+
     @patch('xmodule.tabs.CourseTab.from_json', side_effect=mock_tab_from_json)
     def test_course_successors(self, _from_json):
         """
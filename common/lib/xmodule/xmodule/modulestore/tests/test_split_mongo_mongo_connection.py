@@ -1,7 +1,7 @@
 """ Test the behavior of split_mongo/MongoConnection """
 import unittest
 from mock import patch
-from xmodule.modulestore.split_mongo.mongo_connection import MongoConnection
+from xmodule.modulestore.split_mongo.mongo_connection import MemoryLRUCache, MongoConnection
 from xmodule.exceptions import HeartbeatFailure
 
 
@@ -17,3 +17,46 @@ class TestHeartbeatFailureException(unittest.TestCase):
 
             with self.assertRaises(HeartbeatFailure):
                 useless_conn.heartbeat()
+
+
+class TestMemoryLRUCache(unittest.TestCase):
+    """ Test the in-process LRU cache of decoded objects """
+    def setUp(self):
+        super(TestMemoryLRUCache, self).setUp()
+        self.cache = MemoryLRUCache('test', 10)
+
+    def test_get_and_set(self):
+        self.assertIsNone(self.cache.get('a'))
+        self.cache.set('a', {'value': 1}, 4)
+        self.assertEqual(self.cache.get('a'), {'value': 1})
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+        self.assertEqual(self.cache.size, 4)
+
+    def test_evict_least_recently_used(self):
+        self.cache.set('a', 'a', 4)
+        self.cache.set('b', 'b', 4)
+        # 'a' becomes the most recently used
+        self.cache.get('a')
+        self.cache.set('c', 'c', 4)
+        self.assertIsNone(self.cache.get('b'))
+        self.assertEqual(self.cache.get('a'), 'a')
+        self.assertEqual(self.cache.get('c'), 'c')
+        self.assertEqual(self.cache.evictions, 1)
+        self.assertEqual(self.cache.size, 8)
+
+    def test_set_same_key(self):
+        self.cache.set('a', 'a', 4)
+        self.cache.set('a', 'aa', 6)
+        self.assertEqual(self.cache.get('a'), 'aa')
+        self.assertEqual(self.cache.size, 6)
+
+    def test_object_larger_than_max_size(self):
+        self.cache.set('a', 'a', 11)
+        self.assertIsNone(self.cache.get('a'))
+        self.assertEqual(self.cache.size, 0)
+
+    def test_clear(self):
+        self.cache.set('a', 'a', 4)
+        self.cache.clear()
+        self.assertIsNone(self.cache.get('a'))
+        self.assertEqual(self.cache.size, 0)
@@ -12,6 +12,8 @@ file and check it in at the same time as your model changes. To do that,
 
 """
 import logging
+from string import Formatter
+
 from django.conf import settings
 from django.contrib.auth.models import User
 from django.db import models, transaction
@@ -224,6 +226,124 @@ class CourseEmailTemplate(models.Model):
         """
         return CourseEmailTemplate._render(self.html_template, htmltext, context)
 
+    def compile(self, plaintext, htmltext):
+        """
+        Compile the stored templates with the plain text and HTML bodies of a message.
+
+        Returns a CompiledCourseEmailTemplate, which renders the same messages as
+        render_plaintext() and render_htmltext(), but finds the body tag in the
+        templates once instead of in the formatted message of each recipient.
+        """
+        return CompiledCourseEmailTemplate(self.plain_template, plaintext, self.html_template, htmltext)
+
+
+class _CompiledFormatString(object):
+    """
+    A template format string with a message body, split once at the body tag to be rendered with many contexts.
+
+    The parts of the template before and after the body tag are formatted separately, so the message body
+    is neither copied into the formatted template nor searched for the tag for each context. When the tag
+    in the template would not be the first one in the formatted result (e.g. a context value contains the
+    tag), or the template has no tag, it falls back to CourseEmailTemplate._render(), so the result is the
+    same as _render() in every case.
+    """
+    _formatter = Formatter()
+
+    def __init__(self, format_string, message_body):
+        self.format_string = format_string
+        self.message_body = message_body
+        self.has_keywords = message_body is not None and '%%' in message_body
+
+        # The body tag in the template is "formatted" before CourseEmailTemplate._render() replaces it,
+        # so look for the formatted tag in the literal text of the parsed template.
+        self.message_body_tag = COURSE_EMAIL_MESSAGE_BODY_TAG.format()
+        self.head = None
+        self.tail = None
+        try:
+            items = []
+            for literal_text, field_name, format_spec, conversion in self._formatter.parse(format_string):
+                # Literal text is split at escaped braces, so join it up to the next field
+                if items and items[-1][1] is None:
+                    literal_text = items.pop()[0] + literal_text
+                items.append((literal_text, field_name, format_spec, conversion))
+
+            for index, (literal_text, field_name, format_spec, conversion) in enumerate(items):
+                position = literal_text.find(self.message_body_tag)
+                if position < 0:
+                    continue
+                self.head = u''.join(
+                    [self._unparse(*item) for item in items[:index]] + [self._unparse(literal_text[:position])]
+                )
+                self.tail = u''.join(
+                    [self._unparse(
+                        literal_text[position + len(self.message_body_tag):], field_name, format_spec, conversion
+                    )] + [self._unparse(*item) for item in items[index + 1:]]
+                )
+                break
+        except ValueError:
+            # Let _render() raise the error of the malformed template for each context
+            self.head = None
+            self.tail = None
+
+    @staticmethod
+    def _unparse(literal_text, field_name=None, format_spec=None, conversion=None):
+        """
+        Return the format string of an item parsed by Formatter.parse().
+        """
+        result = literal_text.replace(u'{', u'{{').replace(u'}', u'}}')
+        if field_name is not None:
+            result += u'{' + field_name
+            if conversion:
+                result += u'!' + conversion
+            if format_spec:
+                result += u':' + format_spec
+            result += u'}'
+        return result
+
+    def render(self, context):
+        """
+        Create a message for the `context` dict, as CourseEmailTemplate._render() does.
+        """
+        if self.head is None:
+            return CourseEmailTemplate._render(self.format_string, self.message_body, context)
+
+        message_body = self.message_body
+        if self.has_keywords and 'user_id' in context and 'course_id' in context:
+            message_body = substitute_keywords_with_data(message_body, context)
+
+        head = self.head.format(**context)
+        # _render() replaces the first tag of the formatted result, which may start in the formatted head
+        if (head + self.message_body_tag).find(self.message_body_tag) != len(head):
+            return CourseEmailTemplate._render(self.format_string, self.message_body, context)
+
+        result = head + message_body + self.tail.format(**context)
+        return wrap_message(result, 450)
+
+
+class CompiledCourseEmailTemplate(object):
+    """
+    The templates of a CourseEmailTemplate compiled with the bodies of a CourseEmail,
+    to render the message for each of its recipients.
+
+    Use CourseEmailTemplate.compile() to create one.
+    """
+
+    def __init__(self, plain_template, plaintext, html_template, htmltext):
+        self._plain = _CompiledFormatString(plain_template, plaintext)
+        self._html = _CompiledFormatString(html_template, htmltext)
+
+    def render_plaintext(self, context):
+        """
+        Create plain text message with the provided `context` dict.
+        """
+        return self._plain.render(context)
+
+    def render_htmltext(self, context):
+        """
+        Create HTML text message with the provided `context` dict.
+        """
+        return self._html.render(context)
+
 
 class CourseAuthorization(models.Model):
     """
@@ -6,12 +6,14 @@ to a course.
 import re
 import random
 import json
-from time import sleep
+import socket
+import threading
+from time import sleep, time
 from collections import Counter
 import logging
 
 import dogstats_wrapper as dog_stats_api
-from smtplib import SMTPServerDisconnected, SMTPDataError, SMTPConnectError, SMTPException
+from smtplib import SMTP, SMTPServerDisconnected, SMTPDataError, SMTPConnectError, SMTPException
 from boto.ses.exceptions import (
     SESAddressNotVerifiedError,
     SESIdentityNotVerifiedError,
@@ -28,6 +30,7 @@ from boto.exception import AWSConnectionError
 from celery import task, current_task  # pylint: disable=no-name-in-module
 from celery.states import SUCCESS, FAILURE, RETRY  # pylint: disable=no-name-in-module, import-error
 from celery.exceptions import RetryTaskError  # pylint: disable=no-name-in-module, import-error
+from celery.signals import worker_process_shutdown  # pylint: disable=no-name-in-module, import-error
 
 from django.conf import settings
 from django.contrib.auth.models import User
@@ -47,8 +50,9 @@ from student.roles import CourseStaffRole, CourseInstructorRole, GaCourseScorerR
 from instructor_task.models import InstructorTask
 from instructor_task.subtasks import (
     SubtaskStatus,
-    queue_subtasks_for_query,
+    queue_subtasks_for_id_ranges,
     check_subtask_is_valid,
+    filter_id_range,
     update_subtask_status,
 )
 from util.query import use_read_replica_if_available
@@ -99,6 +103,120 @@ BULK_EMAIL_FAILURE_ERRORS = (
     SMTPException,
 )
 
+# SMTP connection kept by this worker to be reused by the bulk email subtasks it runs.
+_CONNECTION_POOL = threading.local()
+
+
+class SendRateController(object):
+    """
+    Paces the emails sent over an SMTP connection.
+
+    Instead of sleeping for a fixed delay between sends, the delay adapts to what is observed
+    from the SMTP server: it is doubled when sending is throttled, increased by a step when the
+    server takes longer than settings.BULK_EMAIL_SEND_LATENCY_TARGET to accept an email, and
+    decreased by a tenth of a step when it accepts one in time.  The step is
+    settings.BULK_EMAIL_RETRY_DELAY_BETWEEN_SENDS.
+    """
+
+    def __init__(self):
+        self.delay = 0
+
+    def wait(self, min_delay=0):
+        """
+        Sleep before sending the next email, for at least `min_delay` seconds.
+        """
+        delay = max(self.delay, min_delay)
+        if delay > 0:
+            sleep(delay)
+
+    def record_send(self, latency):
+        """
+        Adapt the delay to an email accepted by the server in `latency` seconds.
+        """
+        step = settings.BULK_EMAIL_RETRY_DELAY_BETWEEN_SENDS
+        if latency > settings.BULK_EMAIL_SEND_LATENCY_TARGET:
+            self.delay = min(self.delay + step, settings.BULK_EMAIL_MAX_DELAY_BETWEEN_SENDS)
+        else:
+            self.delay = max(self.delay - step / 10.0, 0)
+
+    def record_throttling(self):
+        """
+        Adapt the delay to an email refused by the server because of the sending rate.
+        """
+        step = settings.BULK_EMAIL_RETRY_DELAY_BETWEEN_SENDS
+        self.delay = min(max(self.delay * 2, step), settings.BULK_EMAIL_MAX_DELAY_BETWEEN_SENDS)
+
+
+class _PooledConnection(object):
+    """
+    An open SMTP connection with the SendRateController pacing the emails sent over it.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.rate_controller = SendRateController()
+        self.opened_at = time()
+
+    def is_usable(self):
+        """
+        Return whether the connection can be reused: it has not expired and the server still answers.
+        """
+        if time() - self.opened_at >= settings.BULK_EMAIL_CONNECTION_MAX_AGE:
+            return False
+        # Only an SMTP connection can be checked with NOOP.  Other backends (e.g. django_ses, whose
+        # connection is a boto SESConnection) are regarded as usable until they expire.
+        smtp_connection = getattr(self.connection, 'connection', None)
+        if not isinstance(smtp_connection, SMTP):
+            return True
+        try:
+            return smtp_connection.noop()[0] == 250
+        except (SMTPException, socket.error):
+            return False
+
+
+def _checkout_connection():
+    """
+    Take the SMTP connection kept by this worker, or open a new one if it has none that is usable.
+
+    Returns a _PooledConnection, to be given back with _checkin_connection().
+    """
+    pooled = getattr(_CONNECTION_POOL, 'pooled', None)
+    _CONNECTION_POOL.pooled = None
+    if pooled is not None:
+        if pooled.is_usable():
+            return pooled
+        pooled.connection.close()
+    connection = get_connection()
+    connection.open()
+    return _PooledConnection(connection)
+
+
+def _checkin_connection(pooled, discard=False):
+    """
+    Give back an SMTP connection taken with _checkout_connection(), if any.
+
+    The connection is kept for the next subtask run by this worker, unless `discard` is set
+    (e.g. because of a connection error), settings.BULK_EMAIL_CONNECTION_MAX_AGE is 0, or
+    the worker already keeps another one.  Otherwise it is closed.
+    """
+    if pooled is None:
+        return
+    if discard or settings.BULK_EMAIL_CONNECTION_MAX_AGE <= 0 or getattr(_CONNECTION_POOL, 'pooled', None):
+        pooled.connection.close()
+    else:
+        _CONNECTION_POOL.pooled = pooled
+
+
+@worker_process_shutdown.connect
+def _close_pooled_connection(**kwargs):  # pylint: disable=unused-argument
+    """
+    Close the SMTP connection kept by this worker, if any.
+    """
+    pooled = getattr(_CONNECTION_POOL, 'pooled', None)
+    _CONNECTION_POOL.pooled = None
+    if pooled is not None:
+        pooled.connection.close()
+
 
 def _get_recipient_querysets(user_id, to_option, course_id):
     """
@@ -153,11 +271,11 @@ def _get_recipient_querysets(user_id, to_option, course_id):
 
 
 def _get_advanced_course_recipient_querysets(course_id, advanced_course_id):
-    # use set because AdvancedCourseItem should be only one per user, but it is not ensured.
-    purchased_user_ids = set([
-        item.user.id
-        for item in AdvancedCourseItem.find_purchased_by_advanced_course_id(advanced_course_id)
-    ])
+    # Note: Filter users by a subquery of the purchased items rather than by a list of their ids.
+    # AdvancedCourseItem should be only one per user, but it is not ensured, so do not join it.
+    purchased_user_ids = AdvancedCourseItem.find_purchased_by_advanced_course_id(
+        advanced_course_id
+    ).values('user_id')
     enrollment_and_purchased_qset = User.objects.filter(
         id__in=purchased_user_ids,
         is_active=True,
@@ -188,6 +306,34 @@ def _get_advanced_course_recipient_querysets(course_id, advanced_course_id):
     return recipient_qsets
 
 
+def _get_email_recipient_querysets(entry, email_obj, task_input):
+    """
+    Returns a list of query sets of the recipients of the CourseEmail `email_obj`
+    sent by the InstructorTask `entry` with `task_input`.
+    """
+    if email_obj.to_option == SEND_TO_ADVANCED_COURSE:
+        if 'advanced_course_id' not in task_input:
+            msg = u"Task %s: advanced_course_id not found: %s"
+            log.error(msg, entry.task_id, email_obj.course_id)
+            raise ValueError(msg % (entry.task_id, email_obj.course_id))
+        return _get_advanced_course_recipient_querysets(email_obj.course_id, task_input['advanced_course_id'])
+    else:
+        return _get_recipient_querysets(entry.requester.id, email_obj.to_option, email_obj.course_id)
+
+
+def _get_optout_user_ids(course_id, to_option):
+    """
+    Returns a query of the ids of the users who opted out of receiving emails from the course,
+    to be used as a subquery.  With SEND_TO_ALL_INCLUDE_OPTOUT, only those whose emails were
+    force disabled are returned.
+    """
+    # Note: Exclude optouts without user, as NOT IN a list containing NULL excludes all the users
+    optouts = Optout.objects.filter(course_id=course_id, user__isnull=False)
+    if to_option == SEND_TO_ALL_INCLUDE_OPTOUT:
+        optouts = optouts.filter(force_disabled=True)
+    return optouts.values('user_id')
+
+
 def _get_course_email_context(course):
     """
     Returns context arguments to apply to all emails, independent of recipient.
@@ -220,7 +366,6 @@ def perform_delegate_email_batches(entry_id, course_id, task_input, action_name)
     """
     entry = InstructorTask.objects.get(pk=entry_id)
     # Get inputs to use in this task from the entry.
-    user_id = entry.requester.id
     task_id = entry.task_id
 
     # Perfunctory check, since expansion is made for convenience of other task
@@ -270,17 +415,7 @@ def perform_delegate_email_batches(entry_id, course_id, task_input, action_name)
     to_option = email_obj.to_option
     global_email_context = _get_course_email_context(course)
 
-    if to_option == SEND_TO_ADVANCED_COURSE:
-        if 'advanced_course_id' not in task_input:
-            msg = u"Task %s: advanced_course_id not found: %s"
-            log.error(msg, task_id, course_id)
-            raise ValueError(msg % (task_id, course_id))
-        advanced_course_id = task_input['advanced_course_id']
-        recipient_qsets = _get_advanced_course_recipient_querysets(course_id, advanced_course_id)
-    else:
-        recipient_qsets = _get_recipient_querysets(user_id, to_option, course_id)
-
-    recipient_fields = ['profile__name', 'email']
+    recipient_qsets = _get_email_recipient_querysets(entry, email_obj, task_input)
 
     log.info(u"Task %s: Preparing to queue subtasks for sending emails for course %s, email %s, to_option %s",
              task_id, course_id, email_id, to_option)
@@ -293,14 +428,14 @@ def perform_delegate_email_batches(entry_id, course_id, task_input, action_name)
     if total_recipients <= settings.BULK_EMAIL_JOB_SIZE_THRESHOLD:
         routing_key = settings.BULK_EMAIL_ROUTING_KEY_SMALL_JOBS
 
-    def _create_send_email_subtask(to_list, initial_subtask_status):
-        """Creates a subtask to send email to a given recipient list."""
+    def _create_send_email_subtask(id_range, initial_subtask_status):
+        """Creates a subtask to send email to the recipients in a given range of user ids."""
         subtask_id = initial_subtask_status.task_id
         new_subtask = send_course_email.subtask(
             (
                 entry_id,
                 email_id,
-                to_list,
+                id_range,
                 global_email_context,
                 initial_subtask_status.to_dict(),
             ),
@@ -309,12 +444,12 @@ def perform_delegate_email_batches(entry_id, course_id, task_input, action_name)
         )
         return new_subtask
 
-    progress = queue_subtasks_for_query(
+    # Subtasks are only given ranges of user ids, and query their recipients themselves.
+    progress = queue_subtasks_for_id_ranges(
         entry,
         action_name,
         _create_send_email_subtask,
         recipient_qsets,
-        recipient_fields,
         settings.BULK_EMAIL_EMAILS_PER_TASK,
         total_recipients,
     )
@@ -328,20 +463,20 @@ def perform_delegate_email_batches(entry_id, course_id, task_input, action_name)
 
 
 @task(default_retry_delay=settings.BULK_EMAIL_DEFAULT_RETRY_DELAY, max_retries=settings.BULK_EMAIL_MAX_RETRIES)
-def send_course_email(entry_id, email_id, to_list, global_email_context, subtask_status_dict):
+def send_course_email(entry_id, email_id, id_range, global_email_context, subtask_status_dict):
     """
-    Sends an email to a list of recipients.
+    Sends an email to the recipients in a range of user ids.
 
     Inputs are:
       * `entry_id`: id of the InstructorTask object to which progress should be recorded.
       * `email_id`: id of the CourseEmail model that is to be emailed.
-      * `to_list`: list of recipients.  Each is represented as a dict with the following keys:
-        - 'profile__name': full name of User.
-        - 'email': email address of User.
-        - 'pk': primary key of User model.
+      * `id_range`: range of the user ids of the recipients, as a dict with the following keys:
+        - 'start': smallest user id, or None.
+        - 'end': user id following the largest one (i.e. not included), or None.
+        - 'count': number of recipients in the range when the subtask was created.
       * `global_email_context`: dict containing values that are unique for this email but the same
         for all recipients of this email.  This dict is to be used to fill in slots in email
-        template.  It does not include 'name' and 'email', which will be provided by the to_list.
+        template.  It does not include 'name' and 'email', which will be provided by the recipients.
       * `subtask_status_dict` : dict containing values representing current status.  Keys are:
 
         'task_id' : id of subtask.  This is used to pass task information across retries.
@@ -358,13 +493,13 @@ def send_course_email(entry_id, email_id, to_list, global_email_context, subtask
         Most values will be zero on initial call, but may be different when the task is
         invoked as part of a retry.
 
-    Sends to all addresses contained in to_list that are not also in the Optout table.
+    Sends to all recipients of the email in id_range that are not also in the Optout table.
     Emails are sent multi-part, in both plain text and html.  Updates InstructorTask object
     with status information (sends, failures, skips) and updates number of subtasks completed.
     """
     subtask_status = SubtaskStatus.from_dict(subtask_status_dict)
     current_task_id = subtask_status.task_id
-    num_to_send = len(to_list)
+    num_to_send = id_range['count']
     log.info((u"Preparing to send email %s to %d recipients as subtask %s "
               u"for instructor task %d: context = %s, status=%s"),
              email_id, num_to_send, current_task_id, entry_id, global_email_context, subtask_status)
@@ -388,7 +523,7 @@ def send_course_email(entry_id, email_id, to_list, global_email_context, subtask
             new_subtask_status, send_exception = _send_course_email(
                 entry_id,
                 email_id,
-                to_list,
+                id_range,
                 global_email_context,
                 subtask_status,
             )
@@ -423,30 +558,45 @@ def send_course_email(entry_id, email_id, to_list, global_email_context, subtask
     return new_subtask_status.to_dict()
 
 
-def _filter_optouts_from_recipients(to_list, course_id, to_option):
+def _get_recipients(entry, course_email, id_range, count_optouts):
     """
-    Filters a recipient list based on student opt-outs for a given course.
+    Gets the recipients of the CourseEmail `course_email` sent by the InstructorTask `entry`
+    whose user ids are in `id_range`, excluding the students who opted out of emails.
 
-    Returns the filtered recipient list, as well as the number of optouts
-    removed from the list.
+    Returns the list of recipients, sorted by descending user id, as well as the number of
+    optouts excluded from the list if `count_optouts` is set.
     """
-    optouts_filter = Optout.objects.filter(
-        course_id=course_id,
-        user__in=[i['pk'] for i in to_list]
-    )
-    if to_option == SEND_TO_ALL_INCLUDE_OPTOUT:
-        optouts_filter = optouts_filter.filter(force_disabled=True)
-
-    optouts = optouts_filter.values_list('user__email', flat=True)
-    optouts = set(optouts)
-    # Only count the num_optout for the first time the optouts are calculated.
-    # We assume that the number will not change on retries, and so we don't need
-    # to calculate it each time.
-    num_optout = len(optouts)
-    to_list = [recipient for recipient in to_list if recipient['email'] not in optouts]
+    recipient_qsets = [
+        filter_id_range(recipient_qset, id_range)
+        for recipient_qset in _get_email_recipient_querysets(entry, course_email, json.loads(entry.task_input))
+    ]
+    optout_user_ids = _get_optout_user_ids(course_email.course_id, course_email.to_option)
+
+    to_list = []
+    for recipient_qset in recipient_qsets:
+        to_list.extend(recipient_qset.exclude(id__in=optout_user_ids).values('profile__name', 'email', 'pk'))
+    # Recipients are emailed from the end of the list, so that the ones remaining to be
+    # emailed are the ones with the largest user ids (see _get_remaining_id_range).
+    to_list.sort(key=lambda recipient: recipient['pk'], reverse=True)
+
+    num_optout = 0
+    if count_optouts:
+        num_optout = sum([
+            recipient_qset.filter(id__in=optout_user_ids).count() for recipient_qset in recipient_qsets
+        ])
     return to_list, num_optout
 
 
+def _get_remaining_id_range(id_range, to_list):
+    """
+    Returns the range of user ids of the recipients in `to_list` remaining to be emailed,
+    out of those in `id_range`.
+    """
+    if not to_list:
+        return id_range
+    return {'start': to_list[-1]['pk'], 'end': id_range['end'], 'count': len(to_list)}
+
+
 def _get_source_address(course_id, course_title):
     """
     Calculates an email address to be used as the 'from-address' for sent emails.
@@ -470,25 +620,22 @@ def _get_source_address(course_id, course_title):
     return from_addr
 
 
-def _send_course_email(entry_id, email_id, to_list, global_email_context, subtask_status):
+def _send_course_email(entry_id, email_id, id_range, global_email_context, subtask_status):
     """
     Performs the email sending task.
 
-    Sends an email to a list of recipients.
+    Sends an email to the recipients in a range of user ids.
 
     Inputs are:
       * `entry_id`: id of the InstructorTask object to which progress should be recorded.
       * `email_id`: id of the CourseEmail model that is to be emailed.
-      * `to_list`: list of recipients.  Each is represented as a dict with the following keys:
-        - 'profile__name': full name of User.
-        - 'email': email address of User.
-        - 'pk': primary key of User model.
+      * `id_range`: range of the user ids of the recipients (see send_course_email).
       * `global_email_context`: dict containing values that are unique for this email but the same
         for all recipients of this email.  This dict is to be used to fill in slots in email
-        template.  It does not include 'name' and 'email', which will be provided by the to_list.
+        template.  It does not include 'name' and 'email', which will be provided by the recipients.
       * `subtask_status` : object of class SubtaskStatus representing current status.
 
-    Sends to all addresses contained in to_list that are not also in the Optout table.
+    Sends to all recipients of the email in id_range that are not also in the Optout table.
     Emails are sent multi-part, in both plain text and html.
 
     Returns a tuple of two values:
@@ -499,22 +646,14 @@ def _send_course_email(entry_id, email_id, to_list, global_email_context, subtas
         'failed' count above.
     """
     # Get information from current task's request:
-    parent_task_id = InstructorTask.objects.get(pk=entry_id).task_id
+    entry = InstructorTask.objects.get(pk=entry_id)
+    parent_task_id = entry.task_id
     task_id = subtask_status.task_id
-    total_recipients = len(to_list)
     recipient_num = 0
     total_recipients_successful = 0
     total_recipients_failed = 0
     recipients_info = Counter()
 
-    log.info(
-        "BulkEmail ==> Task: %s, SubTask: %s, EmailId: %s, TotalRecipients: %s",
-        parent_task_id,
-        task_id,
-        email_id,
-        total_recipients
-    )
-
     try:
         course_email = CourseEmail.objects.get(id=email_id)
     except CourseEmail.DoesNotExist as exc:
@@ -526,15 +665,24 @@ def _send_course_email(entry_id, email_id, to_list, global_email_context, subtas
         )
         raise
 
-    # Exclude optouts (if not a retry):
-    # Note that we don't have to do the optout logic at all if this is a retry,
-    # because we have presumably already performed the optout logic on the first
-    # attempt.  Anyone on the to_list on a retry has already passed the filter
-    # that existed at that time, and we don't need to keep checking for changes
-    # in the Optout list.
-    if subtask_status.get_retry_count() == 0:
-        to_list, num_optout = _filter_optouts_from_recipients(to_list, course_email.course_id, course_email.to_option)
+    # Get the recipients, excluding optouts, and count optouts (if not a retry):
+    # Note that we don't have to count the optouts at all if this is a retry,
+    # because we have presumably already counted them on the first attempt.
+    # A retry only gets the recipients that remained to be emailed, from the
+    # largest user ids of the range.
+    is_first_attempt = subtask_status.get_retry_count() == 0
+    to_list, num_optout = _get_recipients(entry, course_email, id_range, count_optouts=is_first_attempt)
+    if is_first_attempt:
         subtask_status.increment(skipped=num_optout)
+    total_recipients = len(to_list)
+
+    log.info(
+        "BulkEmail ==> Task: %s, SubTask: %s, EmailId: %s, TotalRecipients: %s",
+        parent_task_id,
+        task_id,
+        email_id,
+        total_recipients
+    )
 
     course_title = global_email_context['course_title']
 
@@ -542,11 +690,15 @@ def _send_course_email(entry_id, email_id, to_list, global_email_context, subtas
     from_addr = course_email.from_addr if course_email.from_addr else \
         _get_source_address(course_email.course_id, course_title)
 
-    # use the CourseEmailTemplate that was associated with the CourseEmail
-    course_email_template = course_email.get_template()
+    # use the CourseEmailTemplate that was associated with the CourseEmail, compiled once
+    # with the message to render it for each recipient
+    course_email_template = course_email.get_template().compile(course_email.text_message, course_email.html_message)
+    pooled = None
+    start_time = time()
     try:
-        connection = get_connection()
-        connection.open()
+        pooled = _checkout_connection()
+        connection = pooled.connection
+        rate_controller = pooled.rate_controller
 
         # Define context values to use in all course emails:
         email_context = {'name': '', 'email': ''}
@@ -568,8 +720,8 @@ def _send_course_email(entry_id, email_id, to_list, global_email_context, subtas
             email_context['course_id'] = course_email.course_id
 
             # Construct message content using templates and context:
-            plaintext_msg = course_email_template.render_plaintext(course_email.text_message, email_context)
-            html_msg = course_email_template.render_htmltext(course_email.html_message, email_context)
+            plaintext_msg = course_email_template.render_plaintext(email_context)
+            html_msg = course_email_template.render_htmltext(email_context)
 
             # Create email:
             email_msg = EmailMultiAlternatives(
@@ -581,13 +733,13 @@ def _send_course_email(entry_id, email_id, to_list, global_email_context, subtas
             )
             email_msg.attach_alternative(html_msg, 'text/html')
 
-            # Throttle if we have gotten the rate limiter.  This is not very high-tech,
-            # but if a task has been retried for rate-limiting reasons, then we sleep
-            # for a period of time between all emails within this task.  Choice of
-            # the value depends on the number of workers that might be sending email in
-            # parallel, and what the SES throttle rate is.
-            if subtask_status.retried_nomax > 0:
-                sleep(settings.BULK_EMAIL_RETRY_DELAY_BETWEEN_SENDS)
+            # Throttle to the rate the server accepts (see SendRateController).  If a task
+            # has been retried for rate-limiting reasons, then we sleep at least for a period
+            # of time between all emails within this task.  Choice of the value depends on
+            # the number of workers that might be sending email in parallel, and what the
+            # SES throttle rate is.
+            min_delay = settings.BULK_EMAIL_RETRY_DELAY_BETWEEN_SENDS if subtask_status.retried_nomax > 0 else 0
+            rate_controller.wait(min_delay)
 
             try:
                 log.info(
@@ -601,8 +753,10 @@ def _send_course_email(entry_id, email_id, to_list, global_email_context, subtas
                     current_recipient['profile__name'],
                     email
                 )
+                send_start_time = time()
                 with dog_stats_api.timer('course_email.single_send.time.overall', tags=[_statsd_tag(course_title)]):
                     connection.send_messages([email_msg])
+                send_latency = time() - send_start_time
 
             except SMTPDataError as exc:
                 # According to SMTP spec, we'll retry error codes in the 4xx range.  5xx range indicates hard failure.
@@ -619,6 +773,7 @@ def _send_course_email(entry_id, email_id, to_list, global_email_context, subtas
                 )
                 if exc.smtp_code >= 400 and exc.smtp_code < 500:
                     # This will cause the outer handler to catch the exception and retry the entire task.
+                    rate_controller.record_throttling()
                     raise exc
                 else:
                     # This will fall through and not retry the message.
@@ -653,7 +808,13 @@ def _send_course_email(entry_id, email_id, to_list, global_email_context, subtas
                 dog_stats_api.increment('course_email.error', tags=[_statsd_tag(course_title)])
                 subtask_status.increment(failed=1)
 
+            except SESMaxSendingRateExceededError:
+                # This will cause the outer handler to catch the exception and retry the entire task.
+                rate_controller.record_throttling()
+                raise
+
             else:
+                rate_controller.record_send(send_latency)
                 total_recipients_successful += 1
                 log.info(
                     "BulkEmail ==> Status: Success, Task: %s, SubTask: %s, EmailId: %s, \
@@ -706,8 +867,11 @@ def _send_course_email(entry_id, email_id, to_list, global_email_context, subtas
         # Increment the "retried_nomax" counter, update other counters with progress to date,
         # and set the state to RETRY:
         subtask_status.increment(retried_nomax=1, state=RETRY)
+        # Keep the connection and its sending rate for the retry, which may run in this worker.
+        _checkin_connection(pooled)
+        pooled = None
         return _submit_for_retry(
-            entry_id, email_id, to_list, global_email_context, exc, subtask_status, skip_retry_max=True
+            entry_id, email_id, id_range, to_list, global_email_context, exc, subtask_status, skip_retry_max=True
         )
 
     except LIMITED_RETRY_ERRORS as exc:
@@ -718,8 +882,10 @@ def _send_course_email(entry_id, email_id, to_list, global_email_context, subtas
         # Increment the "retried_withmax" counter, update other counters with progress to date,
         # and set the state to RETRY:
         subtask_status.increment(retried_withmax=1, state=RETRY)
+        _checkin_connection(pooled, discard=True)
+        pooled = None
         return _submit_for_retry(
-            entry_id, email_id, to_list, global_email_context, exc, subtask_status, skip_retry_max=False
+            entry_id, email_id, id_range, to_list, global_email_context, exc, subtask_status, skip_retry_max=False
         )
 
     except BULK_EMAIL_FAILURE_ERRORS as exc:
@@ -731,6 +897,8 @@ def _send_course_email(entry_id, email_id, to_list, global_email_context, subtas
         # Update counters with progress to date, counting unsent emails as failures,
         # and set the state to FAILURE:
         subtask_status.increment(failed=num_pending, state=FAILURE)
+        _checkin_connection(pooled, discard=True)
+        pooled = None
         return subtask_status, exc
 
     except Exception as exc:  # pylint: disable=broad-except
@@ -745,8 +913,10 @@ def _send_course_email(entry_id, email_id, to_list, global_email_context, subtas
         # Increment the "retried_withmax" counter, update other counters with progress to date,
         # and set the state to RETRY:
         subtask_status.increment(retried_withmax=1, state=RETRY)
+        _checkin_connection(pooled, discard=True)
+        pooled = None
         return _submit_for_retry(
-            entry_id, email_id, to_list, global_email_context, exc, subtask_status, skip_retry_max=False
+            entry_id, email_id, id_range, to_list, global_email_context, exc, subtask_status, skip_retry_max=False
         )
 
     else:
@@ -757,7 +927,29 @@ def _send_course_email(entry_id, email_id, to_list, global_email_context, subtas
         return subtask_status, None
     finally:
         # Clean up at the end.
-        connection.close()
+        _checkin_connection(pooled)
+        _record_throughput(
+            parent_task_id, task_id, email_id, course_title,
+            total_recipients_successful + total_recipients_failed, time() - start_time,
+        )
+
+
+def _record_throughput(parent_task_id, task_id, email_id, course_title, num_sent, duration):
+    """
+    Log and report the number of emails sent per second by a subtask.
+    """
+    throughput = num_sent / duration if duration > 0 else 0
+    log.info(
+        "BulkEmail ==> Task: %s, SubTask: %s, EmailId: %s, Sent %s emails in %.2f seconds (%.2f emails/second)",
+        parent_task_id,
+        task_id,
+        email_id,
+        num_sent,
+        duration,
+        throughput
+    )
+    dog_stats_api.histogram('course_email.single_task.sent', num_sent, tags=[_statsd_tag(course_title)])
+    dog_stats_api.histogram('course_email.single_task.throughput', throughput, tags=[_statsd_tag(course_title)])
 
 
 def _get_current_task():
@@ -773,12 +965,13 @@ def _get_current_task():
     return current_task
 
 
-def _submit_for_retry(entry_id, email_id, to_list, global_email_context,
+def _submit_for_retry(entry_id, email_id, id_range, to_list, global_email_context,
                       current_exception, subtask_status, skip_retry_max=False):
     """
     Helper function to requeue a task for retry, using the new version of arguments provided.
 
-    Inputs are the same as for running a task, plus two extra indicating the state at the time of retry.
+    Inputs are the same as for running a task, plus the `to_list` of recipients remaining
+    to be emailed, to which the retry is limited, and two extra indicating the state at the time of retry.
     These include the `current_exception` that the task encountered that is causing the retry attempt,
     and the `subtask_status` that is to be returned.  A third extra argument `skip_retry_max`
     indicates whether the current retry should be subject to a maximum test.
@@ -844,7 +1037,7 @@ def _submit_for_retry(entry_id, email_id, to_list, global_email_context,
             args=[
                 entry_id,
                 email_id,
-                to_list,
+                _get_remaining_id_range(id_range, to_list),
                 global_email_context,
                 subtask_status.to_dict(),
             ],
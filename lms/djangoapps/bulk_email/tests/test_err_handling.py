@@ -23,7 +23,6 @@ from instructor_task.subtasks import (
     check_subtask_is_valid,
     update_subtask_status,
     DuplicateTaskException,
-    MAX_DATABASE_LOCK_RETRIES,
 )
 from opaque_keys.edx.locations import SlashSeparatedCourseKey
 from student.tests.factories import UserFactory, AdminFactory, CourseEnrollmentFactory
@@ -225,19 +224,19 @@ class TestEmailErrors(ModuleStoreTestCase):
         # test at a lower level, to ensure that the course gets checked down below too.
         entry = InstructorTask.create(self.course.id, "task_type", "task_key", "task_input", self.instructor)
         entry_id = entry.id
-        to_list = ['test@test.com']
+        id_range = {'start': None, 'end': None, 'count': 1}
         global_email_context = {'course_title': 'dummy course'}
         subtask_id = "subtask-id-value"
         subtask_status = SubtaskStatus.create(subtask_id)
         email_id = 1001
         with self.assertRaisesRegexp(DuplicateTaskException, 'unable to find subtasks of instructor task'):
-            send_course_email(entry_id, email_id, to_list, global_email_context, subtask_status.to_dict())
+            send_course_email(entry_id, email_id, id_range, global_email_context, subtask_status.to_dict())
 
     def test_send_email_missing_subtask(self):
         # test at a lower level, to ensure that the course gets checked down below too.
         entry = InstructorTask.create(self.course.id, "task_type", "task_key", "task_input", self.instructor)
         entry_id = entry.id
-        to_list = ['test@test.com']
+        id_range = {'start': None, 'end': None, 'count': 1}
         global_email_context = {'course_title': 'dummy course'}
         subtask_id = "subtask-id-value"
         initialize_subtask_info(entry, "emailed", 100, [subtask_id])
@@ -245,7 +244,7 @@ class TestEmailErrors(ModuleStoreTestCase):
         subtask_status = SubtaskStatus.create(different_subtask_id)
         bogus_email_id = 1001
         with self.assertRaisesRegexp(DuplicateTaskException, 'unable to find status for subtask of instructor task'):
-            send_course_email(entry_id, bogus_email_id, to_list, global_email_context, subtask_status.to_dict())
+            send_course_email(entry_id, bogus_email_id, id_range, global_email_context, subtask_status.to_dict())
 
     def test_send_email_completed_subtask(self):
         # test at a lower level, to ensure that the course gets checked down below too.
@@ -256,11 +255,11 @@ class TestEmailErrors(ModuleStoreTestCase):
         subtask_status = SubtaskStatus.create(subtask_id, state=SUCCESS)
         update_subtask_status(entry_id, subtask_id, subtask_status)
         bogus_email_id = 1001
-        to_list = ['test@test.com']
+        id_range = {'start': None, 'end': None, 'count': 1}
         global_email_context = {'course_title': 'dummy course'}
         new_subtask_status = SubtaskStatus.create(subtask_id)
         with self.assertRaisesRegexp(DuplicateTaskException, 'already completed'):
-            send_course_email(entry_id, bogus_email_id, to_list, global_email_context, new_subtask_status.to_dict())
+            send_course_email(entry_id, bogus_email_id, id_range, global_email_context, new_subtask_status.to_dict())
 
     def test_send_email_running_subtask(self):
         # test at a lower level, to ensure that the course gets checked down below too.
@@ -272,10 +271,10 @@ class TestEmailErrors(ModuleStoreTestCase):
         update_subtask_status(entry_id, subtask_id, subtask_status)
         check_subtask_is_valid(entry_id, subtask_id, subtask_status)
         bogus_email_id = 1001
-        to_list = ['test@test.com']
+        id_range = {'start': None, 'end': None, 'count': 1}
         global_email_context = {'course_title': 'dummy course'}
         with self.assertRaisesRegexp(DuplicateTaskException, 'already being executed'):
-            send_course_email(entry_id, bogus_email_id, to_list, global_email_context, subtask_status.to_dict())
+            send_course_email(entry_id, bogus_email_id, id_range, global_email_context, subtask_status.to_dict())
 
     def test_send_email_retried_subtask(self):
         # test at a lower level, to ensure that the course gets checked down below too.
@@ -286,18 +285,18 @@ class TestEmailErrors(ModuleStoreTestCase):
         subtask_status = SubtaskStatus.create(subtask_id, state=RETRY, retried_nomax=2)
         update_subtask_status(entry_id, subtask_id, subtask_status)
         bogus_email_id = 1001
-        to_list = ['test@test.com']
+        id_range = {'start': None, 'end': None, 'count': 1}
         global_email_context = {'course_title': 'dummy course'}
         # try running with a clean subtask:
         new_subtask_status = SubtaskStatus.create(subtask_id)
         with self.assertRaisesRegexp(DuplicateTaskException, 'already retried'):
-            send_course_email(entry_id, bogus_email_id, to_list, global_email_context, new_subtask_status.to_dict())
+            send_course_email(entry_id, bogus_email_id, id_range, global_email_context, new_subtask_status.to_dict())
         # try again, with a retried subtask with lower count:
         new_subtask_status = SubtaskStatus.create(subtask_id, state=RETRY, retried_nomax=1)
         with self.assertRaisesRegexp(DuplicateTaskException, 'already retried'):
-            send_course_email(entry_id, bogus_email_id, to_list, global_email_context, new_subtask_status.to_dict())
+            send_course_email(entry_id, bogus_email_id, id_range, global_email_context, new_subtask_status.to_dict())
 
-    def test_send_email_with_locked_instructor_task(self):
+    def test_send_email_with_failed_status_update(self):
         # test at a lower level, to ensure that the course gets checked down below too.
         entry = InstructorTask.create(self.course.id, "task_type", "task_key", "task_input", self.instructor)
         entry_id = entry.id
@@ -305,19 +304,19 @@ class TestEmailErrors(ModuleStoreTestCase):
         initialize_subtask_info(entry, "emailed", 100, [subtask_id])
         subtask_status = SubtaskStatus.create(subtask_id)
         bogus_email_id = 1001
-        to_list = ['test@test.com']
+        id_range = {'start': None, 'end': None, 'count': 1}
         global_email_context = {'course_title': 'dummy course'}
-        with patch('instructor_task.subtasks.InstructorTask.save') as mock_task_save:
-            mock_task_save.side_effect = DatabaseError
+        with patch('instructor_task.subtasks.InstructorTaskSubtaskStatus.save') as mock_status_save:
+            mock_status_save.side_effect = DatabaseError
             with self.assertRaises(DatabaseError):
-                send_course_email(entry_id, bogus_email_id, to_list, global_email_context, subtask_status.to_dict())
-            self.assertEquals(mock_task_save.call_count, MAX_DATABASE_LOCK_RETRIES)
+                send_course_email(entry_id, bogus_email_id, id_range, global_email_context, subtask_status.to_dict())
+            self.assertEquals(mock_status_save.call_count, 1)
 
     def test_send_email_undefined_email(self):
         # test at a lower level, to ensure that the course gets checked down below too.
         entry = InstructorTask.create(self.course.id, "task_type", "task_key", "task_input", self.instructor)
         entry_id = entry.id
-        to_list = ['test@test.com']
+        id_range = {'start': None, 'end': None, 'count': 1}
         global_email_context = {'course_title': 'dummy course'}
         subtask_id = "subtask-id-undefined-email"
         initialize_subtask_info(entry, "emailed", 100, [subtask_id])
@@ -327,4 +326,4 @@ class TestEmailErrors(ModuleStoreTestCase):
             # we skip the call that updates subtask status, since we've not set up the InstructorTask
             # for the subtask, and it's not important to the test.
             with patch('bulk_email.tasks.update_subtask_status'):
-                send_course_email(entry_id, bogus_email_id, to_list, global_email_context, subtask_status.to_dict())
+                send_course_email(entry_id, bogus_email_id, id_range, global_email_context, subtask_status.to_dict())
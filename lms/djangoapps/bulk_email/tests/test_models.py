@@ -139,6 +139,65 @@ class CourseEmailTemplateTest(TestCase):
         context = self._get_sample_plain_context()
         template.render_plaintext("My new plain text.", context)
 
+    def test_render_compiled(self):
+        template = CourseEmailTemplate.get_template()
+        context = self._get_sample_html_context()
+        compiled_template = template.compile("My new plain text.", "My new html text.")
+        self.assertEquals(
+            compiled_template.render_plaintext(context), template.render_plaintext("My new plain text.", context)
+        )
+        self.assertEquals(
+            compiled_template.render_htmltext(context), template.render_htmltext("My new html text.", context)
+        )
+
+    def test_render_compiled_stored_templates(self):
+        context = self._get_sample_html_context()
+        for template in CourseEmailTemplate.objects.all():
+            for message_body in ["My new text.", "{message_body} {{message_body}} {course_title}"]:
+                compiled_template = template.compile(message_body, message_body)
+                self.assertEquals(
+                    compiled_template.render_plaintext(context), template.render_plaintext(message_body, context)
+                )
+                self.assertEquals(
+                    compiled_template.render_htmltext(context), template.render_htmltext(message_body, context)
+                )
+
+    def test_render_compiled_escaped_braces(self):
+        context = self._get_sample_plain_context()
+        for plain_template in [
+            u"{{{{message_body}}}} {course_title}",
+            u"{{{course_title}{{message_body}}}}",
+            u"{course_title}message_body}} {{message_body}}",
+        ]:
+            template = CourseEmailTemplate(plain_template=plain_template, html_template=u"")
+            self.assertEquals(
+                template.compile("My new plain text.", "").render_plaintext(context),
+                template.render_plaintext("My new plain text.", context)
+            )
+
+    def test_render_compiled_context_with_tag(self):
+        context = self._get_sample_plain_context()
+        context['course_title'] = u"{message_body}"
+        for plain_template in [
+            u"{course_title} {{message_body}}",
+            u"{{message_body}} {course_title}",
+            u"{course_title}",
+        ]:
+            template = CourseEmailTemplate(plain_template=plain_template, html_template=u"")
+            self.assertEquals(
+                template.compile("My new plain text.", "").render_plaintext(context),
+                template.render_plaintext("My new plain text.", context)
+            )
+
+    def test_render_compiled_without_context(self):
+        compiled_template = CourseEmailTemplate.get_template().compile("My new plain text.", "My new html text.")
+        base_context = self._get_sample_html_context()
+        for keyname in base_context:
+            context = dict(base_context)
+            del context[keyname]
+            with self.assertRaises(KeyError):
+                compiled_template.render_htmltext(context)
+
 
 @attr('shard_1')
 class CourseAuthorizationTest(TestCase):
@@ -11,7 +11,7 @@ from uuid import uuid4
 from itertools import cycle, chain, repeat
 from mock import patch, Mock
 from nose.plugins.attrib import attr
-from smtplib import SMTPServerDisconnected, SMTPDataError, SMTPConnectError, SMTPAuthenticationError
+from smtplib import SMTP, SMTPServerDisconnected, SMTPDataError, SMTPConnectError, SMTPAuthenticationError
 from boto.ses.exceptions import (
     SESAddressNotVerifiedError,
     SESIdentityNotVerifiedError,
@@ -24,15 +24,19 @@ from boto.ses.exceptions import (
     SESIllegalAddressError,
 )
 from boto.exception import AWSConnectionError
+from boto.ses.connection import SESConnection
 
 from celery.states import SUCCESS, FAILURE  # pylint: disable=no-name-in-module, import-error
 
 from django.conf import settings
 from django.core.management import call_command
+from django.test import TestCase
+from django.test.utils import override_settings
 
 from xmodule.modulestore.tests.factories import CourseFactory
 
 from bulk_email.models import CourseEmail, Optout, SEND_TO_ALL, SEND_TO_ALL_INCLUDE_OPTOUT, SEND_TO_ADVANCED_COURSE
+from bulk_email.tasks import SendRateController, _close_pooled_connection
 from courseware.tests.factories import (
     GaCourseScorerFactory,
     InstructorFactory,
@@ -262,6 +266,42 @@ class TestBulkEmailInstructorTask(InstructorTaskCourseTestCase):
         self.assertEquals(parent_status.get('succeeded'), num_emails)
         self.assertEquals(parent_status.get('failed'), 0)
 
+    @override_settings(BULK_EMAIL_CONNECTION_MAX_AGE=60)
+    def test_connection_reused(self):
+        num_emails = settings.BULK_EMAIL_EMAILS_PER_TASK
+        # We also send email to the instructor:
+        self._create_students(num_emails - 1)
+        self.addCleanup(_close_pooled_connection)
+        with patch('bulk_email.tasks.get_connection', autospec=True) as get_conn:
+            get_conn.return_value.send_messages.side_effect = cycle([None])
+            get_conn.return_value.connection = Mock(spec=SMTP)
+            get_conn.return_value.connection.noop.return_value = (250, 'OK')
+            self._test_run_with_task(send_bulk_course_email, 'emailed', num_emails, num_emails)
+            self._test_run_with_task(send_bulk_course_email, 'emailed', num_emails, num_emails)
+            self.assertEquals(get_conn.call_count, 1)
+            self.assertFalse(get_conn.return_value.close.called)
+
+            # A connection the server does not answer on anymore is replaced
+            get_conn.return_value.connection.noop.return_value = (421, 'Timeout')
+            self._test_run_with_task(send_bulk_course_email, 'emailed', num_emails, num_emails)
+            self.assertEquals(get_conn.call_count, 2)
+            self.assertEquals(get_conn.return_value.close.call_count, 1)
+
+    @override_settings(BULK_EMAIL_CONNECTION_MAX_AGE=60)
+    def test_connection_reused_non_smtp_backend(self):
+        num_emails = settings.BULK_EMAIL_EMAILS_PER_TASK
+        # We also send email to the instructor:
+        self._create_students(num_emails - 1)
+        self.addCleanup(_close_pooled_connection)
+        with patch('bulk_email.tasks.get_connection', autospec=True) as get_conn:
+            get_conn.return_value.send_messages.side_effect = cycle([None])
+            # e.g. django_ses.SESBackend, whose connection does not have noop()
+            get_conn.return_value.connection = Mock(spec=SESConnection)
+            self._test_run_with_task(send_bulk_course_email, 'emailed', num_emails, num_emails)
+            self._test_run_with_task(send_bulk_course_email, 'emailed', num_emails, num_emails)
+            self.assertEquals(get_conn.call_count, 1)
+            self.assertFalse(get_conn.return_value.close.called)
+
     def test_unactivated_user(self):
         # Select number of emails to fit into a single subtask.
         num_emails = settings.BULK_EMAIL_EMAILS_PER_TASK
@@ -322,6 +362,28 @@ class TestBulkEmailInstructorTask(InstructorTaskCourseTestCase):
                 send_bulk_course_email, 'emailed', num_emails, expected_succeeds, skipped=expected_skipped
             )
 
+    @override_settings(BULK_EMAIL_EMAILS_PER_TASK=3)
+    def test_skipped_in_several_subtasks(self):
+        num_emails = 10
+        # We also send email to the instructor:
+        students = self._create_students(num_emails - 1)
+        # have every third student optout:
+        for student in students[::3]:
+            Optout.objects.create(user=student, course_id=self.course.id)
+        with patch('bulk_email.tasks.get_connection', autospec=True) as get_conn:
+            get_conn.return_value.send_messages.side_effect = cycle([None])
+            task_entry = self._create_input_entry()
+            self._run_task_with_mock_celery(send_bulk_course_email, task_entry.id, task_entry.task_id)
+            self.assertEquals(get_conn.return_value.send_messages.call_count, num_emails - 3)
+
+        entry = InstructorTask.objects.get(id=task_entry.id)
+        self.assertEquals(entry.task_state, SUCCESS)
+        self.assertEquals(json.loads(entry.subtasks)['total'], 4)
+        status = json.loads(entry.task_output)
+        self.assertEquals(status.get('total'), num_emails)
+        self.assertEquals(status.get('succeeded'), num_emails - 3)
+        self.assertEquals(status.get('skipped'), 3)
+
     def test_skipped_include_optout(self):
         # Select number of emails to fit into a single subtask.
         num_emails = settings.BULK_EMAIL_EMAILS_PER_TASK
@@ -597,3 +659,45 @@ class TestBulkEmailInstructorTask(InstructorTaskCourseTestCase):
                 extra_task_input={'advanced_course_id': advanced_course_tickets['ticket_1_1'].advanced_course.id}
             )
             self._test_run_with_entry(send_bulk_course_email, task_entry, 'emailed', len(expected_succeeds), len(expected_succeeds))
+
+
+@attr('shard_1')
+@override_settings(
+    BULK_EMAIL_RETRY_DELAY_BETWEEN_SENDS=0.1,
+    BULK_EMAIL_SEND_LATENCY_TARGET=1,
+    BULK_EMAIL_MAX_DELAY_BETWEEN_SENDS=0.5,
+)
+class TestSendRateController(TestCase):
+    """Tests the adaptation of the delay between sends to the SMTP server."""
+
+    def test_throttling(self):
+        rate_controller = SendRateController()
+        self.assertEquals(rate_controller.delay, 0)
+        rate_controller.record_throttling()
+        self.assertAlmostEqual(rate_controller.delay, 0.1)
+        rate_controller.record_throttling()
+        self.assertAlmostEqual(rate_controller.delay, 0.2)
+        for __ in range(3):
+            rate_controller.record_throttling()
+        self.assertAlmostEqual(rate_controller.delay, 0.5)
+
+    def test_latency(self):
+        rate_controller = SendRateController()
+        rate_controller.record_send(2)
+        self.assertAlmostEqual(rate_controller.delay, 0.1)
+        rate_controller.record_send(0.5)
+        self.assertAlmostEqual(rate_controller.delay, 0.09)
+        for __ in range(10):
+            rate_controller.record_send(0.5)
+        self.assertEquals(rate_controller.delay, 0)
+
+    @patch('bulk_email.tasks.sleep')
+    def test_wait(self, mock_sleep):
+        rate_controller = SendRateController()
+        rate_controller.wait()
+        self.assertFalse(mock_sleep.called)
+        rate_controller.wait(0.02)
+        mock_sleep.assert_called_once_with(0.02)
+        rate_controller.record_throttling()
+        rate_controller.wait(0.02)
+        mock_sleep.assert_called_with(0.1)
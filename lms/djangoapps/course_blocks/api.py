@@ -1,10 +1,12 @@
 """
 API entry point to the course_blocks app with top-level
-get_course_blocks and clear_course_from_cache functions.
+get_course_blocks, update_course_in_cache and clear_course_from_cache
+functions.
 """
 from django.core.cache import cache
 
-from openedx.core.lib.block_cache.block_cache import get_blocks, clear_block_cache
+from openedx.core.lib.block_cache.block_cache import get_blocks, clear_block_cache, update_block_cache
+from openedx.core.lib.block_cache.block_structure_factory import BlockStructureFactory
 from xmodule.modulestore.django import modulestore
 
 from .transformers import (
@@ -13,6 +15,7 @@ from .transformers import (
     user_partitions,
     visibility,
 )
+from .persistent_cache import PersistentBlockStructureCache
 from .usage_info import CourseUsageInfo
 
 
@@ -72,14 +75,43 @@ def get_course_blocks(
         # structures starting at the root block of the course.
         raise NotImplementedError
 
-    return get_blocks(
-        cache,
+    course_key = root_block_usage_key.course_key
+    block_cache = PersistentBlockStructureCache(cache, _get_course_version(course_key))
+    block_structure = get_blocks(
+        block_cache,
         store,
-        CourseUsageInfo(root_block_usage_key.course_key, user),
+        CourseUsageInfo(course_key, user),
         root_block_usage_key,
         COURSE_BLOCK_ACCESS_TRANSFORMERS if transformers is None else transformers,
     )
 
+    # The collected data for an old version of the course are used
+    # until they are updated in the background.
+    if block_cache.is_outdated:
+        # Enqueue the task only once for each version of the course
+        if cache.add(u'course_blocks.updating.{}.{}'.format(course_key, block_cache.course_version), True, 300):
+            # Import here to avoid circular import.
+            from .tasks import update_course_in_cache as update_course_in_cache_task
+            update_course_in_cache_task.apply_async([unicode(course_key)], countdown=0)
+
+    return block_structure
+
+
+def update_course_in_cache(course_key):
+    """
+    A higher order function implemented on top of the
+    block_cache.update_block_cache function that executes the collect
+    phase for the block structure starting at the root block of the
+    course for the given course_key, unless the collected data for the
+    current version of the course already exist.
+    """
+    store = modulestore()
+    course_usage_key = store.make_course_usage_key(course_key)
+    block_cache = PersistentBlockStructureCache(cache, _get_course_version(course_key))
+    if block_cache.is_collected(BlockStructureFactory._encode_root_cache_key(course_usage_key)):  # pylint: disable=protected-access
+        return
+    update_block_cache(block_cache, store, course_usage_key)
+
 
 def clear_course_from_cache(course_key):
     """
@@ -94,4 +126,25 @@ def clear_course_from_cache(course_key):
     arbitrary access to an intermediate block will be supported.
     """
     course_usage_key = modulestore().make_course_usage_key(course_key)
-    return clear_block_cache(cache, course_usage_key)
+    return clear_block_cache(PersistentBlockStructureCache(cache, _get_course_version(course_key)), course_usage_key)
+
+
+def _get_course_version(course_key):
+    """
+    Returns the version of the course with which collected data are stored,
+    which changes whenever the content of the course is changed, or None if
+    the course has no such version, in which case the collected data are not
+    persisted.
+    """
+    course = modulestore().get_course(course_key, depth=0)
+    if course is None:
+        return None
+    # The id of the structure of split courses, which doesn't need to walk the structure
+    if course.course_version is not None:
+        return unicode(course.course_version)
+    # Old mongo courses keep the last edit of any of their blocks, except for
+    # those whose blocks were last edited before it was kept
+    if course.subtree_edited_on is not None:
+        return course.subtree_edited_on.isoformat()
+    # XML courses have no version
+    return None
@@ -0,0 +1,25 @@
+"""
+Models for the course_blocks app.
+"""
+from django.db import models
+from model_utils.models import TimeStampedModel
+
+
+class CollectedBlockStructure(TimeStampedModel):
+    """
+    Data of a block structure collected by the registered transformers,
+    persisted so that they survive evictions of the django cache.
+
+    The data are stored as serialized by BlockStructureFactory.serialize_to_cache.
+    """
+
+    class Meta(object):
+        app_label = 'course_blocks'
+
+    # The key with which BlockStructureFactory caches the block structure
+    cache_key = models.CharField(max_length=255, unique=True)
+
+    # Version of the course when the data were collected
+    course_version = models.CharField(max_length=255, blank=True)
+
+    data = models.BinaryField()
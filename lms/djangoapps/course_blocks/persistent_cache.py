@@ -0,0 +1,100 @@
+"""
+Cache of collected block structures backed by the database.
+"""
+from logging import getLogger
+
+from .models import CollectedBlockStructure
+
+
+logger = getLogger(__name__)  # pylint: disable=C0103
+
+
+class PersistentBlockStructureCache(object):
+    """
+    Cache with the interface of django cache used by BlockStructureFactory,
+    which keeps collected block structures in the given django cache and
+    in the CollectedBlockStructure model.
+
+    Data are read from the django cache first, and then from the database,
+    so that an eviction from the django cache doesn't need a collect phase.
+    Data collected for another version of the course are returned as well
+    and `is_outdated` is set, so that the caller can update them in the
+    background instead of collecting them synchronously.
+
+    If the course has no version, data can't be told outdated, so they
+    are only kept in the django cache.
+    """
+    def __init__(self, cache, course_version):
+        """
+        Arguments:
+            cache (django.core.cache.backends.base.BaseCache) - The
+                django cache in front of the database.
+
+            course_version (unicode) - The current version of the course,
+                or None if it has no version.
+        """
+        self.cache = cache
+        self.course_version = course_version
+        self.is_outdated = False
+
+    def _versioned_key(self, key):
+        """
+        Returns the key in the django cache, so that data for an old
+        version of the course are never read from the django cache.
+        """
+        if self.course_version is None:
+            return key
+        return u'{}.{}'.format(key, self.course_version)
+
+    def get(self, key):
+        """
+        Returns the data for the key, or None if they have never been collected.
+        """
+        data = self.cache.get(self._versioned_key(key))
+        if data is not None or self.course_version is None:
+            return data
+
+        try:
+            collected = CollectedBlockStructure.objects.get(cache_key=key)
+        except CollectedBlockStructure.DoesNotExist:
+            return None
+
+        data = bytes(collected.data)
+        if collected.course_version == self.course_version:
+            self.cache.set(self._versioned_key(key), data)
+        else:
+            logger.info(
+                "Collected BlockStructure %s is outdated, version: %s, collected: %s",
+                key,
+                self.course_version,
+                collected.course_version,
+            )
+            self.is_outdated = True
+        return data
+
+    def set(self, key, data):
+        """
+        Stores the data for the key into the django cache and the database.
+        """
+        self.cache.set(self._versioned_key(key), data)
+        if self.course_version is None:
+            return
+        CollectedBlockStructure.objects.update_or_create(
+            cache_key=key,
+            defaults={'course_version': self.course_version, 'data': data},
+        )
+
+    def delete(self, key):
+        """
+        Removes the data for the key from the django cache and the database.
+        """
+        self.cache.delete(self._versioned_key(key))
+        CollectedBlockStructure.objects.filter(cache_key=key).delete()
+
+    def is_collected(self, key):
+        """
+        Returns whether the data for the key have been collected for the current version of the course.
+        """
+        if self.course_version is None:
+            return False
+        return CollectedBlockStructure.objects.filter(cache_key=key, course_version=self.course_version).exists()
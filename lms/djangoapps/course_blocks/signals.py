@@ -5,16 +5,20 @@ from django.dispatch.dispatcher import receiver
 
 from xmodule.modulestore.django import SignalHandler
 
-from .api import clear_course_from_cache
-
 
 @receiver(SignalHandler.course_published)
 def _listen_for_course_publish(sender, course_key, **kwargs):  # pylint: disable=unused-argument
     """
     Catches the signal that a course has been published in the module
-    store and invalidates the corresponding cache entry if one exists.
+    store and updates the corresponding cache entry in the background,
+    so that requests don't need to execute the collect phase.
     """
-    clear_course_from_cache(course_key)
+    # Import tasks here not to import models while the app is loaded.
+    from .tasks import update_course_in_cache
+
+    # Note: The countdown=0 kwarg is set to ensure the task does not access the course
+    # before the signal emitter has finished all operations.
+    update_course_in_cache.apply_async([unicode(course_key)], countdown=0)
 
 
 @receiver(SignalHandler.course_deleted)
@@ -24,4 +28,6 @@ def _listen_for_course_delete(sender, course_key, **kwargs):  # pylint: disable=
     module store and invalidates the corresponding cache entry if one
     exists.
     """
+    # Import api here not to import models while the app is loaded.
+    from .api import clear_course_from_cache
     clear_course_from_cache(course_key)
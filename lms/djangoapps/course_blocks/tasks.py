@@ -0,0 +1,25 @@
+"""
+Asynchronous tasks related to the course_blocks app
+"""
+import logging
+
+from celery.task import task
+from opaque_keys.edx.keys import CourseKey
+
+
+log = logging.getLogger('edx.celery.task')
+
+
+@task(name=u'lms.djangoapps.course_blocks.tasks.update_course_in_cache')
+def update_course_in_cache(course_id):
+    """
+    Executes the collect phase for the course and updates the collected data in the cache and the database.
+    """
+    # Import here to avoid circular import.
+    from .api import update_course_in_cache as _update_course_in_cache
+
+    try:
+        _update_course_in_cache(CourseKey.from_string(course_id))
+    except Exception as ex:
+        log.exception('An error occurred while collecting course blocks of %s: %s', course_id, ex.message)
+        raise
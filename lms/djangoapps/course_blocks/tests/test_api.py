@@ -0,0 +1,78 @@
+"""
+Tests for the persistence of collected course blocks.
+"""
+import ddt
+from django.core.cache import cache
+from mock import patch
+
+from student.tests.factories import UserFactory
+from xmodule.modulestore import ModuleStoreEnum
+from xmodule.modulestore.tests.django_utils import ModuleStoreTestCase
+from xmodule.modulestore.tests.factories import CourseFactory, ItemFactory
+
+from ..api import get_course_blocks, update_course_in_cache, clear_course_from_cache, _get_course_version
+from ..models import CollectedBlockStructure
+
+
+@ddt.ddt
+class CollectedBlockStructureTestCase(ModuleStoreTestCase):
+    """
+    Tests that collected course blocks are persisted and updated in the background.
+    """
+    def setUp(self):
+        super(CollectedBlockStructureTestCase, self).setUp()
+        self.course = CourseFactory.create()
+        self.chapter = ItemFactory.create(parent=self.course, category='chapter')
+        self.user = UserFactory.create()
+        self.addCleanup(cache.clear)
+
+    def test_collected_data_survive_cache_eviction(self):
+        get_course_blocks(self.user, self.course.location)
+        self.assertEqual(CollectedBlockStructure.objects.count(), 1)
+        cache.clear()
+
+        with patch('openedx.core.lib.block_cache.block_cache.update_block_cache') as mock_update_block_cache:
+            block_structure = get_course_blocks(self.user, self.course.location)
+        self.assertFalse(mock_update_block_cache.called)
+        self.assertIn(self.chapter.location, block_structure.get_block_keys())
+
+    def test_outdated_data_updated_in_background(self):
+        get_course_blocks(self.user, self.course.location)
+
+        with patch('lms.djangoapps.course_blocks.api._get_course_version', return_value=u'new_version'):
+            with patch('lms.djangoapps.course_blocks.tasks.update_course_in_cache.apply_async') as mock_task:
+                block_structure = get_course_blocks(self.user, self.course.location)
+                get_course_blocks(self.user, self.course.location)
+        self.assertIn(self.chapter.location, block_structure.get_block_keys())
+        mock_task.assert_called_once_with([unicode(self.course.id)], countdown=0)
+
+    def test_update_course_in_cache(self):
+        update_course_in_cache(self.course.id)
+        collected = CollectedBlockStructure.objects.get()
+        self.assertEqual(collected.course_version, _get_course_version(self.course.id))
+
+        # Not collected again for the same version of the course
+        with patch('lms.djangoapps.course_blocks.api.update_block_cache') as mock_update_block_cache:
+            update_course_in_cache(self.course.id)
+        self.assertFalse(mock_update_block_cache.called)
+
+    def test_clear_course_from_cache(self):
+        update_course_in_cache(self.course.id)
+        clear_course_from_cache(self.course.id)
+        self.assertFalse(CollectedBlockStructure.objects.exists())
+
+    @ddt.data(ModuleStoreEnum.Type.mongo, ModuleStoreEnum.Type.split)
+    def test_course_version_changed(self, default_store):
+        with self.store.default_store(default_store):
+            course = CourseFactory.create()
+            course_version = _get_course_version(course.id)
+            self.assertIsNotNone(course_version)
+
+            ItemFactory.create(parent=course, category='chapter')
+        self.assertNotEqual(_get_course_version(course.id), course_version)
+
+    def test_course_without_version(self):
+        with patch('lms.djangoapps.course_blocks.api._get_course_version', return_value=None):
+            block_structure = get_course_blocks(self.user, self.course.location)
+        self.assertIn(self.chapter.location, block_structure.get_block_keys())
+        self.assertFalse(CollectedBlockStructure.objects.exists())
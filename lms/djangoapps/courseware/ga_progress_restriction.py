@@ -1,8 +1,7 @@
 """
 Progress Restriction
 """
-import json
-from courseware.models import StudentModuleHistory
+from courseware.models import StudentModuleCorrectAnswers
 
 PROGRESS_RESTRICTION_TYPE = {
     'no-restriction': 'No Restriction',
@@ -23,10 +22,8 @@ class ProgressRestriction(object):
         self.dict_restricted_verticals_by_section_name = {}
 
         if course_module:
-            student_module_histories = StudentModuleHistory.objects.filter(
-                student_module__course_id=course_key,
-                student_module__student_id=user.id,
-            )
+            # Note: Loaded at the first vertical with a correct-answer-rate restriction
+            answer_ids_by_location = None
 
             passed_restricted_vertical = False
             for chapter_idx, chapter in enumerate(course_module.get_display_items()):
@@ -76,13 +73,10 @@ class ProgressRestriction(object):
                             if problem_count:
                                 problems = filter(lambda p: not p['whole_point_addition'], problems)
                                 correct_count = problem_count - sum([p['count'] for p in problems])
-                                has_answered_correctly = {}
-                                for sm in student_module_histories.filter(student_module__module_state_key__in=[p['location'] for p in problems]):
-                                    st = json.loads(sm.state)
-                                    for k in st.get('correct_map', []):
-                                        if st['correct_map'][k]['correctness'] == 'correct':
-                                            has_answered_correctly[k] = True
-                                correct_count += len(filter(lambda v: v, has_answered_correctly.values()))
+                                if answer_ids_by_location is None:
+                                    answer_ids_by_location = StudentModuleCorrectAnswers.get_answer_ids_by_location(
+                                        user.id, course_key)
+                                correct_count += sum([len(answer_ids_by_location.get(unicode(p['location']), [])) for p in problems])
 
                                 is_restricted_vertical = (100 * correct_count / problem_count) < vertical.progress_restriction.get('passing_mark', 0)
 
@@ -2,6 +2,7 @@
 from __future__ import division
 from collections import defaultdict, namedtuple
 from functools import partial
+from itertools import islice
 import json
 import random
 import logging
@@ -16,14 +17,14 @@ import dogstats_wrapper as dog_stats_api
 from courseware import courses
 from courseware.access import has_access
 from courseware.model_data import FieldDataCache, ScoresClient
-from student.models import anonymous_id_for_user
+from student.models import AnonymousUserId, anonymous_id_for_user
 from util.db import outer_atomic
 from util.module_utils import yield_dynamic_descriptor_descendants
 from xmodule import graders
 from xmodule.graders import Score
 from xmodule.modulestore.django import modulestore
 from xmodule.modulestore.exceptions import ItemNotFoundError
-from .models import StudentModule
+from .models import PersistentSubsectionGrade, StudentModule
 from .module_render import get_module_for_descriptor
 from opaque_keys import InvalidKeyError
 from opaque_keys.edx.keys import CourseKey
@@ -298,13 +299,16 @@ def answer_distributions(course_key):
     return answer_counts
 
 
-def grade(student, request, course, keep_raw_scores=False, field_data_cache=None, scores_client=None):
+def grade(student, request, course, keep_raw_scores=False, field_data_cache=None, scores_client=None,
+          grading_batch=None):
     """
     Returns the grade of the student.
 
     Also sends a signal to update the minimum grade requirement status.
+
+    grading_batch: CourseGradingBatch which has prefetched scores of the student (see iterate_grades_for)
     """
-    grade_summary = _grade(student, request, course, keep_raw_scores, field_data_cache, scores_client)
+    grade_summary = _grade(student, request, course, keep_raw_scores, field_data_cache, scores_client, grading_batch)
     responses = GRADES_UPDATED.send_robust(
         sender=None,
         username=student.username,
@@ -319,7 +323,7 @@ def grade(student, request, course, keep_raw_scores=False, field_data_cache=None
     return grade_summary
 
 
-def _grade(student, request, course, keep_raw_scores, field_data_cache, scores_client):
+def _grade(student, request, course, keep_raw_scores, field_data_cache, scores_client, grading_batch=None):
     """
     Unwrapped version of "grade"
 
@@ -339,33 +343,24 @@ def _grade(student, request, course, keep_raw_scores, field_data_cache, scores_c
       for every graded module
 
     More information on the format is in the docstring for CourseGrader.
-    """
-    with outer_atomic():
-        if field_data_cache is None:
-            field_data_cache = field_data_cache_for_grading(course, student)
-        if scores_client is None:
-            scores_client = ScoresClient.from_field_data_cache(field_data_cache)
-
-    # Dict of item_ids -> (earned, possible) point tuples. This *only* grabs
-    # scores that were registered with the submissions API, which for the moment
-    # means only openassessment (edx-ora2)
-    # We need to import this here to avoid a circular dependency of the form:
-    # XBlock --> submissions --> Django Rest Framework error strings -->
-    # Django translation --> ... --> courseware --> submissions
-    from submissions import api as sub_api  # installed from the edx-submissions repository
 
-    with outer_atomic():
-        submissions_scores = sub_api.get_scores(
-            course.id.to_deprecated_string(),
-            anonymous_id_for_user(student, course.id)
-        )
-        max_scores_cache = MaxScoresCache.create_for_course(course)
+    If persistent subsection grades are enabled, sections are graded from the persisted grades
+    and only the sections whose state has changed are computed.
+    """
+    if grading_batch is None:
+        grading_data = _SectionGradingData(student, course, field_data_cache, scores_client)
+        persisted_grades = None
+    else:
+        grading_data = grading_batch.grading_data_for(student)
+        persisted_grades = grading_batch.persisted_grades_for(student)
 
-        # For the moment, we have to get scorable_locations from field_data_cache
-        # and not from scores_client, because scores_client is ignorant of things
-        # in the submissions API. As a further refactoring step, submissions should
-        # be hidden behind the ScoresClient.
-        max_scores_cache.fetch_from_remote(field_data_cache.scorable_locations)
+    # Note: Persisted grades are not used if raw scores of problems are needed
+    course_version = _course_version_for_persistence(student, course)
+    if course_version is None or keep_raw_scores:
+        persisted_grades = {}
+    elif persisted_grades is None:
+        with outer_atomic():
+            persisted_grades = PersistentSubsectionGrade.get_grades(student.id, course.id)
 
     grading_context = course.grading_context
     raw_scores = []
@@ -377,114 +372,37 @@ def _grade(student, request, course, keep_raw_scores, field_data_cache, scores_c
         format_scores = []
         for section in sections:
             section_descriptor = section['section_descriptor']
-            section_name = section_descriptor.display_name_with_default
-
-            with outer_atomic():
-                # some problems have state that is updated independently of interaction
-                # with the LMS, so they need to always be scored. (E.g. combinedopenended ORA1)
-                # TODO This block is causing extra savepoints to be fired that are empty because no queries are executed
-                # during the loop. When refactoring this code please keep this outer_atomic call in mind and ensure we
-                # are not making unnecessary database queries.
-                should_grade_section = any(
-                    descriptor.always_recalculate_grades for descriptor in section['xmoduledescriptors']
-                )
-
-                # If there are no problems that always have to be regraded, check to
-                # see if any of our locations are in the scores from the submissions
-                # API. If scores exist, we have to calculate grades for this section.
-                if not should_grade_section:
-                    should_grade_section = any(
-                        descriptor.location.to_deprecated_string() in submissions_scores
-                        for descriptor in section['xmoduledescriptors']
-                    )
-
-                if not should_grade_section:
-                    should_grade_section = any(
-                        descriptor.location in scores_client
-                        for descriptor in section['xmoduledescriptors']
-                    )
-
-                # If we haven't seen a single problem in the section, we don't have
-                # to grade it at all! We can assume 0%
-                if should_grade_section:
-                    scores = []
-                    is_section_attempted = False
-
-                    def create_module(descriptor):
-                        '''creates an XModule instance given a descriptor'''
-                        # TODO: We need the request to pass into here. If we could forego that, our arguments
-                        # would be simpler
-                        return get_module_for_descriptor(
-                            student, request, descriptor, field_data_cache, course.id, course=course
-                        )
-
-                    descendants = yield_dynamic_descriptor_descendants(section_descriptor, student.id, create_module)
-                    for module_descriptor in descendants:
-                        user_access = has_access(
-                            student, 'load', module_descriptor, module_descriptor.location.course_key
-                        )
-                        if not user_access:
-                            continue
-
-                        (correct, total) = get_score(
-                            student,
-                            module_descriptor,
-                            create_module,
-                            scores_client,
-                            submissions_scores,
-                            max_scores_cache,
-                        )
-                        if correct is None and total is None:
-                            continue
-
-                        if settings.GENERATE_PROFILE_SCORES:    # for debugging!
-                            if total > 1:
-                                correct = random.randrange(max(total - 2, 1), total + 1)
-                            else:
-                                correct = total
-
-                        graded = module_descriptor.graded
-                        if not total > 0:
-                            # We simply cannot grade a problem that is 12/0, because we might need it as a percentage
-                            graded = False
-
-                        scores.append(
-                            Score(
-                                correct,
-                                total,
-                                graded,
-                                module_descriptor.display_name_with_default,
-                                module_descriptor.location
-                            )
-                        )
 
-                        # Set True if the student attempted any problem in a section
-                        if check_attempted(student, module_descriptor, create_module):
-                            is_section_attempted = True
-
-                    __, graded_total = graders.aggregate_scores(scores, section_name)
-                    graded_total = _Score(
-                        graded_total.earned,
-                        graded_total.possible,
-                        graded_total.graded,
-                        graded_total.section,
-                        # Note: Set module_id to identify the section for update_biz_score_status (#1816)
-                        unicode(section_descriptor.location),
-                        is_section_attempted,
-                    )
+            persisted_grade = persisted_grades.get(section_descriptor.location)
+            if persisted_grade is not None and not persisted_grade.stale and \
+                    persisted_grade.course_version == course_version:
+                graded_total = _graded_total_from_persisted_grade(persisted_grade, section_descriptor)
+            else:
+                with outer_atomic():
+                    graded_total, scores, persistable = _grade_section(student, request, course, section, grading_data)
                     if keep_raw_scores:
                         raw_scores += scores
-                else:
-                    graded_total = Score(0.0, 1.0, True, section_name, None)
-
-                #Add the graded total to totaled_scores
-                if graded_total.possible > 0:
-                    format_scores.append(graded_total)
-                else:
-                    log.info(
-                        "Unable to grade a section with a total possible score of zero. " +
-                        str(section_descriptor.location)
-                    )
+                    if course_version is not None and persistable:
+                        PersistentSubsectionGrade.save_grade(
+                            student.id,
+                            course.id,
+                            section_descriptor.location,
+                            persisted_grade,
+                            course_version=course_version,
+                            earned=graded_total.earned,
+                            possible=graded_total.possible,
+                            attempted=getattr(graded_total, 'is_attempted', False),
+                            calculated=graded_total.module_id is not None,
+                        )
+
+            #Add the graded total to totaled_scores
+            if graded_total.possible > 0:
+                format_scores.append(graded_total)
+            else:
+                log.info(
+                    "Unable to grade a section with a total possible score of zero. " +
+                    str(section_descriptor.location)
+                )
 
         totaled_scores[section_format] = format_scores
 
@@ -505,11 +423,334 @@ def _grade(student, request, course, keep_raw_scores, field_data_cache, scores_c
             # so grader can be double-checked
             grade_summary['raw_scores'] = raw_scores
 
-        max_scores_cache.push_to_remote()
+        grading_data.push_to_remote()
 
     return grade_summary
 
 
+class _SectionGradingData(object):
+    """
+    Data of a student in a course used to compute grades of sections.
+
+    Each kind of data is loaded at the first access, so that nothing is loaded
+    if the grades of all sections are persisted. Note that it must be accessed
+    inside outer_atomic.
+    """
+    def __init__(self, student, course, field_data_cache=None, scores_client=None,
+                 submissions_scores=None, max_scores_cache=None, descriptors=None):
+        """
+        Data given to the constructor is shared with others (e.g. in CourseGradingBatch)
+
+        descriptors: list of descriptors affecting grading to create FieldDataCache
+        """
+        self.student = student
+        self.course = course
+        self._field_data_cache = field_data_cache
+        self._scores_client = scores_client
+        self._submissions_scores = submissions_scores
+        self._max_scores_cache = max_scores_cache
+        self._owns_max_scores_cache = max_scores_cache is None
+        self._descriptors = descriptors
+
+    @property
+    def field_data_cache(self):
+        """FieldDataCache for grading"""
+        if self._field_data_cache is None:
+            if self._descriptors is None:
+                self._field_data_cache = field_data_cache_for_grading(self.course, self.student)
+            else:
+                self._field_data_cache = FieldDataCache(self._descriptors, self.course.id, self.student)
+        return self._field_data_cache
+
+    @property
+    def scores_client(self):
+        """ScoresClient for the field_data_cache"""
+        if self._scores_client is None:
+            self._scores_client = ScoresClient.from_field_data_cache(self.field_data_cache)
+        return self._scores_client
+
+    @property
+    def submissions_scores(self):
+        """
+        Dict of item_ids -> (earned, possible) point tuples. This *only* grabs
+        scores that were registered with the submissions API, which for the moment
+        means only openassessment (edx-ora2)
+        """
+        if self._submissions_scores is None:
+            # We need to import this here to avoid a circular dependency of the form:
+            # XBlock --> submissions --> Django Rest Framework error strings -->
+            # Django translation --> ... --> courseware --> submissions
+            from submissions import api as sub_api  # installed from the edx-submissions repository
+
+            self._submissions_scores = sub_api.get_scores(
+                self.course.id.to_deprecated_string(),
+                anonymous_id_for_user(self.student, self.course.id)
+            )
+        return self._submissions_scores
+
+    @property
+    def max_scores_cache(self):
+        """MaxScoresCache for the course"""
+        if self._max_scores_cache is None:
+            max_scores_cache = MaxScoresCache.create_for_course(self.course)
+            # For the moment, we have to get scorable_locations from field_data_cache
+            # and not from scores_client, because scores_client is ignorant of things
+            # in the submissions API. As a further refactoring step, submissions should
+            # be hidden behind the ScoresClient.
+            max_scores_cache.fetch_from_remote(self.field_data_cache.scorable_locations)
+            self._max_scores_cache = max_scores_cache
+        return self._max_scores_cache
+
+    def push_to_remote(self):
+        """Update the remote cache of max scores if loaded, unless it is shared with others"""
+        if self._owns_max_scores_cache and self._max_scores_cache is not None:
+            self._max_scores_cache.push_to_remote()
+
+
+class CourseGradingBatch(object):
+    """
+    Data shared to grade many students in a course.
+
+    Descriptors affecting grading and max scores of the course are loaded once, and scores
+    of each chunk of students are fetched by a few set-based queries with `prefetch`,
+    instead of queries for each student.
+    """
+    def __init__(self, course):
+        self.course = course
+        descriptor_filter = partial(descriptor_affects_grading, course.block_types_affecting_grading)
+        self.descriptors = FieldDataCache.get_descendant_descriptors(course, None, descriptor_filter)
+        self.scorable_locations = set(
+            descriptor.location for descriptor in self.descriptors if descriptor.has_score
+        )
+        self.max_scores_cache = MaxScoresCache.create_for_course(course)
+        self.max_scores_cache.fetch_from_remote(self.scorable_locations)
+        self._scores_clients = {}
+        self._submissions_scores = {}
+        self._persisted_grades = None
+
+    def prefetch(self, students):
+        """
+        Fetch scores of the students, replacing the ones of the previous chunk.
+        Must be called inside outer_atomic.
+        """
+        self._scores_clients = {}
+        self._submissions_scores = {}
+        self._persisted_grades = None
+        user_ids = [student.id for student in students]
+        self._scores_clients = ScoresClient.for_users(self.course.id, user_ids, self.scorable_locations)
+        self._submissions_scores = _get_submissions_scores_for_users(self.course.id, students)
+        if PersistentSubsectionGrade.is_enabled():
+            self._persisted_grades = PersistentSubsectionGrade.get_grades_for_users(user_ids, self.course.id)
+
+    def grading_data_for(self, student):
+        """
+        Returns _SectionGradingData of the student sharing the data of the course.
+        Scores which have not been prefetched are loaded at the first access.
+        """
+        return _SectionGradingData(
+            student,
+            self.course,
+            scores_client=self._scores_clients.get(student.id),
+            submissions_scores=self._submissions_scores.get(student.id),
+            max_scores_cache=self.max_scores_cache,
+            descriptors=self.descriptors,
+        )
+
+    def persisted_grades_for(self, student):
+        """
+        Returns persisted grades of the student (same as PersistentSubsectionGrade.get_grades),
+        or None if they have not been prefetched.
+        """
+        if self._persisted_grades is None:
+            return None
+        return self._persisted_grades.get(student.id)
+
+    def push_to_remote(self):
+        """Update the remote cache of max scores"""
+        self.max_scores_cache.push_to_remote()
+
+
+def _get_submissions_scores_for_users(course_key, students):
+    """
+    Returns a dict of user id -> dict of item_ids -> (earned, possible) point tuples
+    (same as submissions.api.get_scores) of the students, fetched by a query.
+    """
+    # We need to import this here to avoid a circular dependency (see _SectionGradingData.submissions_scores)
+    from submissions.models import ScoreSummary  # installed from the edx-submissions repository
+
+    user_ids_by_anonymous_id = {}
+    saved_user_ids = set(AnonymousUserId.objects.filter(
+        user_id__in=[student.id for student in students], course_id=course_key
+    ).values_list('user_id', flat=True))
+    for student in students:
+        # Note: Save anonymous ids only for the users who have not had them, instead of querying for each user
+        anonymous_id = anonymous_id_for_user(student, course_key, save=student.id not in saved_user_ids)
+        user_ids_by_anonymous_id[anonymous_id] = student.id
+
+    submissions_scores = {student.id: {} for student in students}
+    score_summaries = ScoreSummary.objects.filter(
+        student_item__course_id=course_key.to_deprecated_string(),
+        student_item__student_id__in=user_ids_by_anonymous_id.keys(),
+    ).select_related('latest', 'student_item')
+    for summary in score_summaries:
+        if summary.latest.is_hidden():
+            continue
+        user_id = user_ids_by_anonymous_id[summary.student_item.student_id]
+        submissions_scores[user_id][summary.student_item.item_id] = (
+            summary.latest.points_earned, summary.latest.points_possible
+        )
+    return submissions_scores
+
+
+def _course_version_for_persistence(student, course):
+    """
+    Returns the version of the course with which subsection grades are persisted,
+    or None if grades of the course should not be persisted.
+
+    As with MaxScoresCache, the version changes whenever a content change occurs.
+    """
+    if not PersistentSubsectionGrade.is_enabled() or settings.GENERATE_PROFILE_SCORES:
+        return None
+    if not student.is_authenticated() or course.subtree_edited_on is None:
+        # check for subtree_edited_on because old XML courses doesn't have this attribute
+        return None
+    return course.subtree_edited_on.isoformat()
+
+
+def _graded_total_from_persisted_grade(persisted_grade, section_descriptor):
+    """
+    Returns the graded total of a section from PersistentSubsectionGrade
+    in the same form as the one computed by _grade_section.
+    """
+    section_name = section_descriptor.display_name_with_default
+    if not persisted_grade.calculated:
+        return Score(0.0, 1.0, True, section_name, None)
+    return _Score(
+        persisted_grade.earned,
+        persisted_grade.possible,
+        True,
+        section_name,
+        unicode(section_descriptor.location),
+        persisted_grade.attempted,
+    )
+
+
+def _grade_section(student, request, course, section, grading_data):
+    """
+    Computes the graded total of a section of the grading context.
+
+    Returns a tuple (graded_total, scores, persistable).
+        graded_total: _Score of the section, or Score(0.0, 1.0, ...) if no problem has been seen
+        scores: list of Score of problems in the section
+        persistable: False if the graded total may change without any change of the state,
+            so that it should not be persisted
+    """
+    section_descriptor = section['section_descriptor']
+    section_name = section_descriptor.display_name_with_default
+    scores_client = grading_data.scores_client
+    submissions_scores = grading_data.submissions_scores
+
+    # some problems have state that is updated independently of interaction
+    # with the LMS, so they need to always be scored. (E.g. combinedopenended ORA1)
+    always_recalculate = any(
+        descriptor.always_recalculate_grades for descriptor in section['xmoduledescriptors']
+    )
+    should_grade_section = always_recalculate
+
+    # If there are no problems that always have to be regraded, check to
+    # see if any of our locations are in the scores from the submissions
+    # API. If scores exist, we have to calculate grades for this section.
+    if not should_grade_section:
+        should_grade_section = any(
+            descriptor.location.to_deprecated_string() in submissions_scores
+            for descriptor in section['xmoduledescriptors']
+        )
+
+    if not should_grade_section:
+        should_grade_section = any(
+            descriptor.location in scores_client
+            for descriptor in section['xmoduledescriptors']
+        )
+
+    # If we haven't seen a single problem in the section, we don't have
+    # to grade it at all! We can assume 0%
+    if not should_grade_section:
+        return Score(0.0, 1.0, True, section_name, None), [], True
+
+    field_data_cache = grading_data.field_data_cache
+    max_scores_cache = grading_data.max_scores_cache
+    scores = []
+    is_section_attempted = False
+    # Note: Access to a module may change with time (e.g. start date), so the grade is
+    # persisted only if the user can access all modules in the section
+    persistable = not always_recalculate
+
+    def create_module(descriptor):
+        '''creates an XModule instance given a descriptor'''
+        # TODO: We need the request to pass into here. If we could forego that, our arguments
+        # would be simpler
+        return get_module_for_descriptor(
+            student, request, descriptor, field_data_cache, course.id, course=course
+        )
+
+    descendants = yield_dynamic_descriptor_descendants(section_descriptor, student.id, create_module)
+    for module_descriptor in descendants:
+        user_access = has_access(
+            student, 'load', module_descriptor, module_descriptor.location.course_key
+        )
+        if not user_access:
+            persistable = False
+            continue
+
+        (correct, total) = get_score(
+            student,
+            module_descriptor,
+            create_module,
+            scores_client,
+            submissions_scores,
+            max_scores_cache,
+        )
+        if correct is None and total is None:
+            continue
+
+        if settings.GENERATE_PROFILE_SCORES:    # for debugging!
+            if total > 1:
+                correct = random.randrange(max(total - 2, 1), total + 1)
+            else:
+                correct = total
+
+        graded = module_descriptor.graded
+        if not total > 0:
+            # We simply cannot grade a problem that is 12/0, because we might need it as a percentage
+            graded = False
+
+        scores.append(
+            Score(
+                correct,
+                total,
+                graded,
+                module_descriptor.display_name_with_default,
+                module_descriptor.location
+            )
+        )
+
+        # Set True if the student attempted any problem in a section
+        if check_attempted(student, module_descriptor, create_module):
+            is_section_attempted = True
+
+    __, graded_total = graders.aggregate_scores(scores, section_name)
+    graded_total = _Score(
+        graded_total.earned,
+        graded_total.possible,
+        graded_total.graded,
+        graded_total.section,
+        # Note: Set module_id to identify the section for update_biz_score_status (#1816)
+        unicode(section_descriptor.location),
+        is_section_attempted,
+    )
+    return graded_total, scores, persistable
+
+
 def check_attempted(user, problem_descriptor, module_creator):
     """Check if the user has submitted the given problem."""
     problem = module_creator(problem_descriptor)
@@ -812,28 +1053,44 @@ def iterate_grades_for(course_or_id, students, keep_raw_scores=False):
     else:
         course = course_or_id
 
-    for student in students:
-        with dog_stats_api.timer('lms.grades.iterate_grades_for', tags=[u'action:{}'.format(course.id)]):
-            try:
-                request = _get_mock_request(student)
-                # Grading calls problem rendering, which calls masquerading,
-                # which checks session vars -- thus the empty session dict below.
-                # It's not pretty, but untangling that is currently beyond the
-                # scope of this feature.
-                request.session = {}
-                gradeset = grade(student, request, course, keep_raw_scores)
-                yield student, gradeset, ""
-            except Exception as exc:  # pylint: disable=broad-except
-                # Keep marching on even if this student couldn't be graded for
-                # some reason, but log it for future reference.
-                log.exception(
-                    'Cannot grade student %s (%s) in course %s because of exception: %s',
-                    student.username,
-                    student.id,
-                    course.id,
-                    exc.message
-                )
-                yield student, {}, exc.message
+    # Note: Share the course data among students, and fetch scores of every GRADES_BATCH_SIZE students at once
+    grading_batch = CourseGradingBatch(course)
+    students = iter(students)
+    while True:
+        chunk = list(islice(students, settings.GRADES_BATCH_SIZE))
+        if not chunk:
+            break
+        try:
+            with outer_atomic():
+                grading_batch.prefetch(chunk)
+        except Exception:  # pylint: disable=broad-except
+            # Scores which have not been prefetched are loaded for each student
+            log.exception(u"Cannot prefetch scores of %d students in course %s", len(chunk), course.id)
+
+        for student in chunk:
+            with dog_stats_api.timer('lms.grades.iterate_grades_for', tags=[u'action:{}'.format(course.id)]):
+                try:
+                    request = _get_mock_request(student)
+                    # Grading calls problem rendering, which calls masquerading,
+                    # which checks session vars -- thus the empty session dict below.
+                    # It's not pretty, but untangling that is currently beyond the
+                    # scope of this feature.
+                    request.session = {}
+                    gradeset = grade(student, request, course, keep_raw_scores, grading_batch=grading_batch)
+                    yield student, gradeset, ""
+                except Exception as exc:  # pylint: disable=broad-except
+                    # Keep marching on even if this student couldn't be graded for
+                    # some reason, but log it for future reference.
+                    log.exception(
+                        'Cannot grade student %s (%s) in course %s because of exception: %s',
+                        student.username,
+                        student.id,
+                        course.id,
+                        exc.message
+                    )
+                    yield student, {}, exc.message
+
+        grading_batch.push_to_remote()
 
 
 def _get_mock_request(student):
@@ -2,10 +2,13 @@
 Middleware for the courseware app
 """
 
+from django.http import HttpResponseServerError
 from django.shortcuts import redirect
 from django.core.urlresolvers import reverse
+from xblock.exceptions import KeyValueMultiSaveError
 
 from courseware.courses import UserNotEnrolled
+from courseware.model_data import flush_deferred_user_states
 
 
 class RedirectUnenrolledMiddleware(object):
@@ -22,3 +25,18 @@ class RedirectUnenrolledMiddleware(object):
                     args=[course_key.to_deprecated_string()]
                 )
             )
+
+
+class FlushUserStateMiddleware(object):
+    """
+    Save the user state whose saving was deferred during the request
+    (see settings.STUDENT_MODULE_DEFERRED_FIELDS) before the response is returned,
+    and return an error instead if it fails to save
+    """
+    def process_response(self, _request, response):
+        try:
+            flush_deferred_user_states()
+        except KeyValueMultiSaveError:
+            # don't tell the client that the state was saved
+            return HttpResponseServerError()
+        return response
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import xmodule_django.models
+from django.conf import settings
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('courseware', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PersistentSubsectionGrade',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('course_id', xmodule_django.models.CourseKeyField(max_length=255, db_index=True)),
+                ('usage_key', xmodule_django.models.LocationKeyField(max_length=255)),
+                ('course_version', models.CharField(default=b'', max_length=255, blank=True)),
+                ('earned', models.FloatField(default=0.0)),
+                ('possible', models.FloatField(default=0.0)),
+                ('attempted', models.BooleanField(default=False)),
+                ('calculated', models.BooleanField(default=False)),
+                ('stale', models.BooleanField(default=False)),
+                ('version', models.IntegerField(default=0)),
+                ('modified', models.DateTimeField(auto_now=True, db_index=True)),
+                ('user', models.ForeignKey(to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='persistentsubsectiongrade',
+            unique_together=set([('user', 'course_id', 'usage_key')]),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import xmodule_django.models
+from django.conf import settings
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('courseware', '0002_persistentsubsectiongrade'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentModuleCorrectAnswers',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('course_id', xmodule_django.models.CourseKeyField(max_length=255)),
+                ('module_state_key', xmodule_django.models.LocationKeyField(max_length=255, db_column=b'module_id')),
+                ('answer_ids', models.TextField(default=b'[]')),
+                ('modified', models.DateTimeField(auto_now=True)),
+                ('student', models.ForeignKey(to=settings.AUTH_USER_MODEL)),
+                ('student_module', models.OneToOneField(related_name='correct_answers', to='courseware.StudentModule')),
+            ],
+        ),
+        migrations.AlterIndexTogether(
+            name='studentmodulecorrectanswers',
+            index_together=set([('student', 'course_id')]),
+        ),
+    ]
@@ -27,6 +27,7 @@ from pytz import UTC
 from abc import abstractmethod, ABCMeta
 from collections import defaultdict, namedtuple
 from .models import (
+    num_chunks,
     StudentModule,
     XModuleUserStateSummaryField,
     XModuleStudentPrefsField,
@@ -40,8 +41,10 @@ from contracts import contract, new_contract
 
 from courseware.user_state_client import DjangoXBlockUserStateClient
 
+from django.conf import settings
 from django.db import DatabaseError
 
+import request_cache
 from student.models import CourseEnrollment
 from util.ga_attendance_status import AttendanceStatusExecutor
 
@@ -54,6 +57,9 @@ from xblock.core import XBlockAside
 
 log = logging.getLogger(__name__)
 
+# Name of the request cache of the UserStateCaches which have deferred saving some fields
+DEFERRED_USER_STATE_CACHES = 'courseware.model_data.deferred_user_state_caches'
+
 
 class InvalidWriteError(Exception):
     """
@@ -181,9 +187,12 @@ class DjangoOrmFieldCache(object):
             fields (list of str): Field names to cache.
             xblocks (list of :class:`XBlock`): XBlocks to cache fields for.
             aside_types (list of str): Aside types to cache fields for.
+
+        Returns: the number of queries made
         """
         for field_object in self._read_objects(fields, xblocks, aside_types):
             self._cache[self._cache_key_for_field_object(field_object)] = field_object
+        return self._num_queries(fields, xblocks, aside_types)
 
     @contract(kvs_key=DjangoKeyValueStore.Key)
     def get(self, kvs_key):
@@ -330,6 +339,13 @@ class DjangoOrmFieldCache(object):
         """
         raise NotImplementedError()
 
+    def _num_queries(self, fields, xblocks, aside_types):  # pylint: disable=unused-argument
+        """
+        Return the number of queries which ``_read_objects`` makes for the
+        same arguments (one query unless it is chunked).
+        """
+        return 1
+
     @abstractmethod
     def _cache_key_for_field_object(self, field_object):
         """
@@ -360,6 +376,8 @@ class UserStateCache(object):
         self.course_id = course_id
         self.user = user
         self._client = DjangoXBlockUserStateClient(self.user)
+        # fields whose saving is deferred to the end of the request, by block
+        self._deferred_updates = defaultdict(dict)
 
     def cache_fields(self, fields, xblocks, aside_types):  # pylint: disable=unused-argument
         """
@@ -370,14 +388,23 @@ class UserStateCache(object):
             fields (list of str): Field names to cache.
             xblocks (list of :class:`XBlock`): XBlocks to cache fields for.
             aside_types (list of str): Aside types to cache fields for.
+
+        Returns: the number of queries made
         """
+        usage_keys = _all_usage_keys(xblocks, aside_types)
         block_field_state = self._client.get_many(
             self.user.username,
-            _all_usage_keys(xblocks, aside_types),
+            usage_keys,
         )
         for user_state in block_field_state:
             self._cache[user_state.block_key] = user_state.state
 
+        # The client queries the usage keys of each course in chunks
+        usage_keys_by_course = defaultdict(list)
+        for usage_key in usage_keys:
+            usage_keys_by_course[usage_key.course_key].append(usage_key)
+        return sum(num_chunks(keys) for keys in usage_keys_by_course.values())
+
     @contract(kvs_key=DjangoKeyValueStore.Key)
     def set(self, kvs_key, value):
         """
@@ -399,6 +426,9 @@ class UserStateCache(object):
 
         Returns: datetime if there was a modified date, or None otherwise
         """
+        if kvs_key.field_name in self._deferred_updates.get(self._cache_key_for_kvs_key(kvs_key), {}):
+            # it has been changed but not saved yet
+            return datetime.now(UTC)
         try:
             return self._client.get(
                 self.user.username,
@@ -423,17 +453,55 @@ class UserStateCache(object):
 
             pending_updates[cache_key][kvs_key.field_name] = value
 
+        updates_to_save = {}
+        for cache_key, field_state in pending_updates.iteritems():
+            if self._can_defer(cache_key, field_state):
+                self._deferred_updates[cache_key].update(field_state)
+                request_cache.get_cache(DEFERRED_USER_STATE_CACHES)[id(self)] = self
+            else:
+                # save the deferred fields of the block together with these ones
+                updates_to_save[cache_key] = self._deferred_updates.pop(cache_key, {})
+                updates_to_save[cache_key].update(field_state)
+
         try:
-            self._client.set_many(
-                self.user.username,
-                pending_updates
-            )
+            if updates_to_save:
+                self._client.set_many(
+                    self.user.username,
+                    updates_to_save
+                )
         except DatabaseError:
             log.exception("Saving user state failed for %s", self.user.username)
             raise KeyValueMultiSaveError([])
         finally:
             self._cache.update(pending_updates)
 
+    def _can_defer(self, block_key, field_state):
+        """
+        Return whether saving the fields of ``field_state`` can be deferred to the end of the request,
+        that is, all of them are listed for the block type in settings.STUDENT_MODULE_DEFERRED_FIELDS
+        and we are in a request.
+
+        Arguments:
+            block_key: The UsageKey of the block
+            field_state (dict): A dict mapping field names to values to set
+        """
+        deferred_fields = settings.STUDENT_MODULE_DEFERRED_FIELDS.get(getattr(block_key, 'block_type', None))
+        return (
+            bool(deferred_fields) and
+            all(field_name in deferred_fields for field_name in field_state) and
+            request_cache.get_request() is not None
+        )
+
+    def flush(self):
+        """
+        Save the fields whose saving was deferred.
+
+        Raises: DatabaseError if the fields fail to save
+        """
+        if self._deferred_updates:
+            deferred_updates, self._deferred_updates = self._deferred_updates, defaultdict(dict)
+            self._client.set_many(self.user.username, deferred_updates)
+
     @contract(kvs_key=DjangoKeyValueStore.Key)
     def get(self, kvs_key):
         """
@@ -470,6 +538,7 @@ class UserStateCache(object):
         if kvs_key.field_name not in field_state:
             raise KeyError(kvs_key.field_name)
 
+        self._deferred_updates.get(cache_key, {}).pop(kvs_key.field_name, None)
         self._client.delete(self.user.username, cache_key, fields=[kvs_key.field_name])
         del field_state[kvs_key.field_name]
 
@@ -503,6 +572,26 @@ class UserStateCache(object):
         return key.block_scope_id
 
 
+def flush_deferred_user_states():
+    """
+    Save the user state fields whose saving was deferred during the current request
+    (see settings.STUDENT_MODULE_DEFERRED_FIELDS).
+
+    Raises: KeyValueMultiSaveError if the fields of any user fail to save
+    """
+    user_state_caches = request_cache.get_cache(DEFERRED_USER_STATE_CACHES)
+    failed = False
+    for user_state_cache in user_state_caches.values():
+        try:
+            user_state_cache.flush()
+        except DatabaseError:
+            log.exception("Saving deferred user state failed for %s", user_state_cache.user.username)
+            failed = True
+    user_state_caches.clear()
+    if failed:
+        raise KeyValueMultiSaveError([])
+
+
 class UserStateSummaryCache(DjangoOrmFieldCache):
     """
     Cache for Scope.user_state_summary xblock field data.
@@ -545,6 +634,9 @@ class UserStateSummaryCache(DjangoOrmFieldCache):
             field_name__in=set(field.name for field in fields),
         )
 
+    def _num_queries(self, fields, xblocks, aside_types):
+        return num_chunks(_all_usage_keys(xblocks, aside_types))
+
     def _cache_key_for_field_object(self, field_object):
         """
         Return the key used in this DjangoOrmFieldCache to store the specified field_object.
@@ -608,6 +700,9 @@ class PreferencesCache(DjangoOrmFieldCache):
             field_name__in=set(field.name for field in fields),
         )
 
+    def _num_queries(self, fields, xblocks, aside_types):
+        return num_chunks(_all_block_types(xblocks, aside_types))
+
     def _cache_key_for_field_object(self, field_object):
         """
         Return the key used in this DjangoOrmFieldCache to store the specified field_object.
@@ -634,6 +729,27 @@ class UserInfoCache(DjangoOrmFieldCache):
     def __init__(self, user):
         super(UserInfoCache, self).__init__()
         self.user = user
+        self._cached_field_names = set()
+
+    def cache_fields(self, fields, xblocks, aside_types):
+        """
+        Load all fields specified by ``fields`` into this cache.
+
+        The fields don't depend on ``xblocks``, so only the fields which weren't loaded yet are queried.
+
+        Arguments:
+            fields (list of str): Field names to cache.
+            xblocks (list of :class:`XBlock`): XBlocks to cache fields for.
+            aside_types (list of str): Aside types to cache fields for.
+
+        Returns: the number of queries made
+        """
+        fields = [field for field in fields if field.name not in self._cached_field_names]
+        if not fields:
+            return 0
+        num_queries = super(UserInfoCache, self).cache_fields(fields, xblocks, aside_types)
+        self._cached_field_names.update(field.name for field in fields)
+        return num_queries
 
     def _create_object(self, kvs_key, value):
         """
@@ -731,19 +847,34 @@ class FieldDataCache(object):
             ),
         }
         self.scorable_locations = set()
+        # usage keys of the descriptors whose data was loaded already
+        self._cached_usage_keys = set()
+        # number of queries made to load the data of descriptors
+        self.num_queries = 0
         self.add_descriptors_to_cache(descriptors)
 
     def add_descriptors_to_cache(self, descriptors):
         """
         Add all `descriptors` to this FieldDataCache.
+
+        The data of each scope is loaded by one query per table (chunked if there are many descriptors),
+        and descriptors which were added already are not queried again.
         """
         if self.user.is_authenticated():
+            descriptors = [
+                descriptor for descriptor in descriptors
+                if descriptor.scope_ids.usage_id not in self._cached_usage_keys
+            ]
+            if not descriptors:
+                return
+            self._cached_usage_keys.update(descriptor.scope_ids.usage_id for descriptor in descriptors)
+
             self.scorable_locations.update(desc.location for desc in descriptors if desc.has_score)
             for scope, fields in self._fields_to_cache(descriptors).items():
                 if scope not in self.cache:
                     continue
 
-                self.cache[scope].cache_fields(fields, descriptors, self.asides)
+                self.num_queries += self.cache[scope].cache_fields(fields, descriptors, self.asides)
 
     def add_descriptor_descendents(self, descriptor, depth=None, descriptor_filter=lambda descriptor: True):
         """
@@ -756,6 +887,17 @@ class FieldDataCache(object):
             descriptor_filter is a function that accepts a descriptor and return whether the field data
                 should be cached
         """
+        descriptors = self.get_descendant_descriptors(descriptor, depth, descriptor_filter)
+        self.add_descriptors_to_cache(descriptors)
+
+    @staticmethod
+    def get_descendant_descriptors(descriptor, depth=None, descriptor_filter=lambda descriptor: True):
+        """
+        Return a list of all descendants of `descriptor` which add_descriptor_descendents adds to the cache,
+        so that they can be shared among FieldDataCaches of many users.
+
+        Arguments are the same as add_descriptor_descendents.
+        """
 
         def get_child_descriptors(descriptor, depth, descriptor_filter):
             """
@@ -781,9 +923,7 @@ class FieldDataCache(object):
             return descriptors
 
         with modulestore().bulk_operations(descriptor.location.course_key):
-            descriptors = get_child_descriptors(descriptor, depth, descriptor_filter)
-
-        self.add_descriptors_to_cache(descriptors)
+            return get_child_descriptors(descriptor, depth, descriptor_filter)
 
     @classmethod
     def cache_for_descriptor_descendents(cls, course_id, user, descriptor, depth=None,
@@ -803,6 +943,24 @@ class FieldDataCache(object):
         cache.add_descriptor_descendents(descriptor, depth, descriptor_filter)
         return cache
 
+    @classmethod
+    def cache_for_section(cls, course_id, user, course, section_descriptor=None, asides=None):
+        """
+        Return a FieldDataCache for the data needed to render a section of the courseware: the course
+        with 2 levels of its descendants (for the course navigation) and all descendants of the section.
+        All of them are loaded at once, so the number of queries doesn't depend on the size of the section.
+
+        course_id: the course in the context of which we want StudentModules.
+        user: the django user for whom to load modules.
+        course: the course descriptor
+        section_descriptor: the descriptor of the section, loaded with all of its descendants,
+            or None to load only the course and its 2 levels of descendants
+        """
+        descriptors = cls.get_descendant_descriptors(course, depth=2)
+        if section_descriptor is not None:
+            descriptors.extend(cls.get_descendant_descriptors(section_descriptor))
+        return FieldDataCache(descriptors, course_id, user, asides=asides)
+
     def _fields_to_cache(self, descriptors):
         """
         Returns a map of scopes to fields in that scope that should be cached
@@ -995,6 +1153,29 @@ class ScoresClient(object):
         client.fetch_scores(fd_cache.scorable_locations)
         return client
 
+    @classmethod
+    def for_users(cls, course_key, user_ids, locations):
+        """
+        Create ScoresClients of many users, fetching their scores with a query.
+
+        Returns a dict of user_id -> ScoresClient.
+        """
+        clients = {user_id: cls(course_key, user_id) for user_id in user_ids}
+        scores_qset = StudentModule.objects.filter(
+            student_id__in=clients.keys(),
+            course_id=course_key,
+            module_state_key__in=set(locations),
+        )
+        for user_id, location, correct, total in scores_qset.values_list(
+                'student_id', 'module_state_key', 'grade', 'max_grade'):
+            # pylint: disable=protected-access
+            clients[user_id]._locations_to_scores[
+                UsageKey.from_string(location).map_into_course(course_key)
+            ] = cls.Score(correct, total)
+        for client in clients.values():
+            client._has_fetched = True  # pylint: disable=protected-access
+        return clients
+
 
 # @contract(user_id=int, usage_key=UsageKey, score="number|None", max_score="number|None")
 def set_score(user_id, usage_key, score, max_score):
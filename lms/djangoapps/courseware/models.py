@@ -12,18 +12,27 @@ file and check it in at the same time as your model changes. To do that,
 ASSUMPTIONS: modules have unique IDs, even across different module_types
 
 """
+import json
 import logging
 import itertools
+from collections import defaultdict
 
 from django.contrib.auth.models import User
 from django.conf import settings
-from django.db import models
-from django.db.models.signals import post_save
+from django.core.cache import cache
+from django.db import models, transaction, IntegrityError
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver, Signal
+from django.utils import timezone
 
 from model_utils.models import TimeStampedModel
+from opaque_keys import InvalidKeyError
+from opaque_keys.edx.keys import CourseKey, UsageKey
 from student.models import user_by_anonymous_id
 from submissions.models import score_set, score_reset
+from xmodule.modulestore.django import modulestore
+from xmodule.modulestore.exceptions import ItemNotFoundError
 
 from xmodule_django.models import CourseKeyField, LocationKeyField, BlockTypeKeyField
 log = logging.getLogger(__name__)
@@ -31,6 +40,10 @@ log = logging.getLogger(__name__)
 log = logging.getLogger("edx.courseware")
 
 
+# Default number of items passed to a query by ChunkingManager.chunked_filter
+DEFAULT_CHUNK_SIZE = 500
+
+
 def chunks(items, chunk_size):
     """
     Yields the values from items in chunks of size chunk_size
@@ -39,6 +52,14 @@ def chunks(items, chunk_size):
     return (items[i:i + chunk_size] for i in xrange(0, len(items), chunk_size))
 
 
+def num_chunks(items, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Returns the number of chunks of size chunk_size for items,
+    that is, the number of queries which chunked_filter makes for them.
+    """
+    return (len(items) + chunk_size - 1) // chunk_size
+
+
 class ChunkingManager(models.Manager):
     """
     :class:`~Manager` that adds an additional method :meth:`chunked_filter` to provide
@@ -63,7 +84,7 @@ class ChunkingManager(models.Manager):
                 ``__in`` key.
             chunk_size (int): The size of chunks to pass. Defaults to 500.
         """
-        chunk_size = kwargs.pop('chunk_size', 500)
+        chunk_size = kwargs.pop('chunk_size', DEFAULT_CHUNK_SIZE)
         res = itertools.chain.from_iterable(
             self.filter(**dict([(chunk_field, chunk)] + kwargs.items()))
             for chunk in chunks(items, chunk_size)
@@ -189,6 +210,144 @@ class StudentModuleHistory(models.Model):
         return unicode(repr(self))
 
 
+def _get_correct_answer_ids(state):
+    """
+    Returns a set of ids of the answers which are correct in the state of a problem (keys of correct_map)
+    """
+    try:
+        state = json.loads(state) if state else {}
+    except ValueError:
+        return set()
+    correct_map = state.get('correct_map') or {}
+    return {
+        answer_id for answer_id, correctness in correct_map.items()
+        if correctness.get('correctness') == 'correct'
+    }
+
+
+class StudentModuleCorrectAnswers(models.Model):
+    """
+    Keeps ids of the answers of a problem which the student has ever answered correctly,
+    so that progress restriction does not have to parse all StudentModuleHistory of the student.
+
+    A row is created from StudentModuleHistory at the first save of the problem state or at the first
+    lookup for the student in the course, and then updated whenever the problem state is saved.
+    """
+    student_module = models.OneToOneField(StudentModule, related_name='correct_answers')
+    # Note: student and course_id are copied from student_module to look up by them without join
+    student = models.ForeignKey(User)
+    course_id = CourseKeyField(max_length=255)
+    module_state_key = LocationKeyField(max_length=255, db_column='module_id')
+    # JSON list of answer ids (keys of correct_map)
+    answer_ids = models.TextField(default='[]')
+    modified = models.DateTimeField(auto_now=True)
+
+    class Meta(object):
+        app_label = "courseware"
+        index_together = (('student', 'course_id'),)
+
+    CACHE_TIMEOUT = 60 * 60 * 24  # 1 day
+
+    @classmethod
+    def _cache_key(cls, user_id, course_key):
+        """Returns the key of django's cache for the answers of the user in the course"""
+        return u"courseware.StudentModuleCorrectAnswers.{}.{}".format(user_id, course_key)
+
+    @classmethod
+    def get_answer_ids_by_location(cls, user_id, course_key):
+        """
+        Returns a dict of unicode of a problem location -> set of ids of the answers which the user
+        has ever answered correctly in the course
+        """
+        cache_key = cls._cache_key(user_id, course_key)
+        answer_ids_by_location = cache.get(cache_key)
+        if answer_ids_by_location is None:
+            cls._create_missing(user_id, course_key)
+            answer_ids_by_location = {
+                unicode(UsageKey.from_string(location).map_into_course(course_key)): set(json.loads(answer_ids))
+                for location, answer_ids in cls.objects.filter(
+                    student_id=user_id, course_id=course_key,
+                ).values_list('module_state_key', 'answer_ids')
+            }
+            cache.set(cache_key, answer_ids_by_location, cls.CACHE_TIMEOUT)
+        return answer_ids_by_location
+
+    @classmethod
+    def _create_missing(cls, user_id, course_key):
+        """
+        Create rows from StudentModuleHistory for problems of the user in the course which have no row
+        """
+        student_modules = StudentModule.objects.filter(
+            student_id=user_id,
+            course_id=course_key,
+            module_type__in=StudentModuleHistory.HISTORY_SAVING_TYPES,
+            correct_answers__isnull=True,
+        ).only('id', 'student', 'course_id', 'module_state_key')
+        for student_modules_chunk in chunks(student_modules, 500):
+            answer_ids_by_module_id = defaultdict(set)
+            for student_module_id, state in StudentModuleHistory.objects.filter(
+                student_module__in=student_modules_chunk,
+            ).values_list('student_module_id', 'state'):
+                answer_ids_by_module_id[student_module_id].update(_get_correct_answer_ids(state))
+            for student_module in student_modules_chunk:
+                cls._create(student_module, answer_ids_by_module_id[student_module.id])
+
+    @classmethod
+    def _create(cls, student_module, answer_ids):
+        """
+        Create a row of the StudentModule unless it has been created concurrently
+        """
+        try:
+            with transaction.atomic():
+                cls.objects.create(
+                    student_module=student_module,
+                    student_id=student_module.student_id,
+                    course_id=student_module.course_id,
+                    module_state_key=student_module.module_state_key,
+                    answer_ids=json.dumps(sorted(answer_ids)),
+                )
+        except IntegrityError:
+            pass
+
+
+@receiver(post_save, sender=StudentModule)
+def update_student_module_correct_answers(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    """
+    Adds the answers which are correct in the saved state. Note that this is called after
+    StudentModuleHistory.save_history, so the history includes the saved state.
+    """
+    if instance.module_type not in StudentModuleHistory.HISTORY_SAVING_TYPES:
+        return
+    try:
+        correct_answers = StudentModuleCorrectAnswers.objects.get(student_module=instance)
+    except StudentModuleCorrectAnswers.DoesNotExist:
+        answer_ids = set()
+        for state in StudentModuleHistory.objects.filter(
+            student_module=instance
+        ).values_list('state', flat=True):
+            answer_ids.update(_get_correct_answer_ids(state))
+        StudentModuleCorrectAnswers._create(instance, answer_ids)  # pylint: disable=protected-access
+    else:
+        answer_ids = set(json.loads(correct_answers.answer_ids))
+        new_answer_ids = _get_correct_answer_ids(instance.state) - answer_ids
+        if not new_answer_ids:
+            return
+        correct_answers.answer_ids = json.dumps(sorted(answer_ids | new_answer_ids))
+        correct_answers.save()
+    cache.delete(StudentModuleCorrectAnswers._cache_key(  # pylint: disable=protected-access
+        instance.student_id, instance.course_id))
+
+
+@receiver(post_delete, sender=StudentModule)
+def delete_student_module_correct_answers_cache(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    """
+    Clears the cache of StudentModuleCorrectAnswers since its row is deleted with the StudentModule
+    """
+    if instance.module_type in StudentModuleHistory.HISTORY_SAVING_TYPES:
+        cache.delete(StudentModuleCorrectAnswers._cache_key(  # pylint: disable=protected-access
+            instance.student_id, instance.course_id))
+
+
 class XBlockFieldBase(models.Model):
     """
     Base class for all XBlock field storage.
@@ -313,6 +472,164 @@ class StudentFieldOverride(TimeStampedModel):
     value = models.TextField(default='null')
 
 
+class PersistentSubsectionGrade(models.Model):
+    """
+    Keeps the graded total of a subsection (a graded section of the grading context) for a user,
+    so that `courseware.grades` does not have to instantiate XModules of subsections whose state
+    has not changed since the last grading.
+
+    A grade is valid only for the `course_version` it was computed for. It is marked `stale` when
+    the state or the score of a module in the subsection changes, and `version` is incremented on
+    every invalidation so that a grade computed concurrently with the change is not saved over it.
+    """
+    user = models.ForeignKey(User, db_index=True)
+    course_id = CourseKeyField(max_length=255, db_index=True)
+    usage_key = LocationKeyField(max_length=255)
+    course_version = models.CharField(max_length=255, blank=True, default='')
+
+    earned = models.FloatField(default=0.0)
+    possible = models.FloatField(default=0.0)
+    attempted = models.BooleanField(default=False)
+    # False if the user had not seen any problem in the subsection, which is graded as 0/1 without computing
+    calculated = models.BooleanField(default=False)
+
+    stale = models.BooleanField(default=False)
+    version = models.IntegerField(default=0)
+    modified = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta(object):
+        app_label = "courseware"
+        unique_together = (('user', 'course_id', 'usage_key'),)
+
+    # Types of StudentModule whose state never affects grades
+    NON_GRADING_MODULE_TYPES = {'course', 'chapter', 'sequential', 'video', 'html'}
+
+    @classmethod
+    def is_enabled(cls):
+        """
+        Returns True if persistent subsection grades are enabled.
+
+        Note: Grades are not invalidated while disabled, so delete all the rows when enabling it again.
+        """
+        return settings.FEATURES.get('ENABLE_PERSISTENT_SUBSECTION_GRADES', False)
+
+    @classmethod
+    def get_grades(cls, user_id, course_key):
+        """
+        Returns a dict of subsection usage key -> PersistentSubsectionGrade of the user in the course
+        """
+        return {
+            grade.usage_key.map_into_course(course_key): grade
+            for grade in cls.objects.filter(user_id=user_id, course_id=course_key)
+        }
+
+    @classmethod
+    def get_grades_for_users(cls, user_ids, course_key):
+        """
+        Returns a dict of user id -> dict of subsection usage key -> PersistentSubsectionGrade
+        of the users in the course
+        """
+        grades = {user_id: {} for user_id in user_ids}
+        for grade in cls.objects.filter(user_id__in=grades.keys(), course_id=course_key):
+            grades[grade.user_id][grade.usage_key.map_into_course(course_key)] = grade
+        return grades
+
+    @classmethod
+    def save_grade(cls, user_id, course_key, usage_key, read_grade, **values):
+        """
+        Saves a computed grade unless the subsection has been invalidated after `read_grade` was read.
+
+        Arguments:
+            read_grade: PersistentSubsectionGrade read before the computation, or None if there was none
+            values: course_version, earned, possible, attempted and calculated
+
+        Returns True if saved.
+        """
+        values.update(stale=False)
+        if read_grade is None:
+            try:
+                with transaction.atomic():
+                    cls.objects.create(user_id=user_id, course_id=course_key, usage_key=usage_key, **values)
+            except IntegrityError:
+                # Invalidated (or computed) concurrently
+                return False
+            return True
+        return cls.objects.filter(
+            id=read_grade.id, version=read_grade.version
+        ).update(modified=timezone.now(), **values) > 0
+
+    @classmethod
+    def invalidate(cls, user_id, course_key, usage_key=None):
+        """
+        Marks the grade of the subsection, or all the grades of the user in the course if usage_key
+        is None, as stale.
+
+        A stale row is created if the subsection has no grade yet, so that a grade being computed
+        from the state before the change is not saved.
+        """
+        grades = cls.objects.filter(user_id=user_id, course_id=course_key)
+        if usage_key is None:
+            grades.update(stale=True, version=F('version') + 1)
+            return
+        grades = grades.filter(usage_key=usage_key)
+        if grades.update(stale=True, version=F('version') + 1):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(user_id=user_id, course_id=course_key, usage_key=usage_key, stale=True, version=1)
+        except IntegrityError:
+            # Created concurrently
+            grades.update(stale=True, version=F('version') + 1)
+
+    @classmethod
+    def get_subsection_key(cls, usage_key):
+        """
+        Returns the usage key of the subsection which contains the block, or None if not found
+        """
+        store = modulestore()
+        location = usage_key
+        while location is not None:
+            try:
+                parent = store.get_parent_location(location)
+            except ItemNotFoundError:
+                return None
+            if parent is None or parent.block_type == 'course':
+                return None
+            if parent.block_type == 'chapter':
+                return location
+            location = parent
+        return None
+
+    @classmethod
+    def invalidate_block(cls, user_id, course_key, usage_key):
+        """
+        Marks the grade of the subsection which contains the block as stale.
+        All the grades of the user in the course are marked if the subsection is not found.
+        """
+        usage_key = usage_key.map_into_course(course_key)
+        subsection_key = cls.get_subsection_key(usage_key)
+        if subsection_key is None:
+            log.info(
+                u"Invalidating all persistent subsection grades of user %s in course %s, "
+                u"since the subsection of %s is not found.", user_id, course_key, usage_key
+            )
+        cls.invalidate(user_id, course_key, subsection_key)
+
+
+@receiver(post_save, sender=StudentModule)
+@receiver(post_delete, sender=StudentModule)
+def invalidate_persistent_subsection_grade(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    """
+    Invalidates the persistent grade of the subsection whenever a module state changes,
+    including scores set by set_score.
+    """
+    if not PersistentSubsectionGrade.is_enabled():
+        return
+    if instance.module_type in PersistentSubsectionGrade.NON_GRADING_MODULE_TYPES:
+        return
+    PersistentSubsectionGrade.invalidate_block(instance.student_id, instance.course_id, instance.module_state_key)
+
+
 # Signal that indicates that a user's score for a problem has been updated.
 # This signal is generated when a scoring event occurs either within the core
 # platform or in the Submissions module. Note that this signal will be triggered
@@ -409,3 +726,25 @@ def submissions_score_reset_handler(sender, **kwargs):  # pylint: disable=unused
             u"Failed to process score_reset signal from Submissions API. "
             "user: %s, course_id: %s, usage_id: %s", user, course_id, usage_id
         )
+
+
+@receiver(SCORE_CHANGED)
+def score_changed_invalidate_persistent_subsection_grade(sender, **kwargs):  # pylint: disable=unused-argument
+    """
+    Invalidates the persistent grade of the subsection when a score changes,
+    including scores of the Submissions API which are not kept in StudentModule.
+    """
+    if not PersistentSubsectionGrade.is_enabled():
+        return
+    user_id = kwargs.get('user_id', None)
+    course_id = kwargs.get('course_id', None)
+    usage_id = kwargs.get('usage_id', None)
+    if None in (user_id, course_id, usage_id):
+        return
+    try:
+        course_key = CourseKey.from_string(course_id)
+        usage_key = UsageKey.from_string(usage_id)
+    except InvalidKeyError:
+        log.warning(u"Invalid keys in SCORE_CHANGED signal. course_id: %s, usage_id: %s", course_id, usage_id)
+        return
+    PersistentSubsectionGrade.invalidate_block(user_id, course_key, usage_key)
@@ -2,8 +2,10 @@ import ddt
 from capa.tests.response_xml_factory import OptionResponseXMLFactory
 from courseware.ga_progress_restriction import ProgressRestriction
 from courseware.model_data import FieldDataCache
+from courseware.models import StudentModuleCorrectAnswers
 from courseware.module_render import get_module_for_descriptor
 from courseware.tests.helpers import LoginEnrollmentTestCase
+from django.core.cache import cache
 from django.core.urlresolvers import reverse
 from django.test.client import RequestFactory
 from lms.djangoapps.lms_xblock.runtime import quote_slashes
@@ -339,3 +341,37 @@ class ProgressRestrictionTest(ProgressRestrictionTestBase):
         section = self.section_location_names[section_idx]
         progress_restriction = self.get_progress_restriction_obj()
         self.assertEqual(progress_restriction.is_restricted_section(section), is_restricted)
+
+    def test_answered_correctly_once(self):
+        self.set_course_optional_setting()
+
+        self.submit_problem(self.problem1, {'2_1': 'Correct'})
+        self.submit_problem(self.problem3, {'2_1': 'Correct'})
+        self.submit_problem(self.problem3, {'2_1': 'Incorrect'})
+
+        progress_restriction = self.get_progress_restriction_obj()
+
+        self.assertEqual(progress_restriction.get_restricted_chapters(), [self.chapter_ids[2]])
+
+    def test_correct_answers_created_from_history(self):
+        self.set_course_optional_setting()
+
+        self.submit_problem(self.problem1, {'2_1': 'Correct'})
+        self.submit_problem(self.problem3, {'2_1': 'Correct'})
+        # Remove correct answers as if the problems were answered before they had been kept
+        StudentModuleCorrectAnswers.objects.all().delete()
+        cache.clear()
+
+        progress_restriction = self.get_progress_restriction_obj()
+
+        self.assertEqual(progress_restriction.get_restricted_chapters(), [self.chapter_ids[2]])
+        self.assertEqual(StudentModuleCorrectAnswers.objects.filter(student=self.user).count(), 2)
+
+    def test_num_queries_with_cache(self):
+        self.set_course_optional_setting()
+
+        self.submit_problem(self.problem1, {'2_1': 'Correct'})
+        self.get_progress_restriction_obj()
+
+        with self.assertNumQueries(0):
+            StudentModuleCorrectAnswers.get_answer_ids_by_location(self.user.id, self.course.id)
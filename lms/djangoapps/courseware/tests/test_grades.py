@@ -4,20 +4,25 @@ Test grade calculation.
 from django.http import Http404
 from django.test import TestCase
 from django.test.client import RequestFactory
+from django.test.utils import override_settings
 
 from mock import patch, MagicMock
 from nose.plugins.attrib import attr
 from opaque_keys.edx.locations import SlashSeparatedCourseKey
 from opaque_keys.edx.locator import CourseLocator, BlockUsageLocator
 
-from courseware.grades import field_data_cache_for_grading, grade, iterate_grades_for, MaxScoresCache, ProgressSummary
+from courseware.grades import (
+    _grade_section, field_data_cache_for_grading, grade, iterate_grades_for, MaxScoresCache, ProgressSummary
+)
+from courseware.model_data import set_score
+from courseware.models import PersistentSubsectionGrade
 from student.tests.factories import UserFactory
 from student.models import CourseEnrollment
 from xmodule.modulestore.tests.factories import CourseFactory, ItemFactory
 from xmodule.modulestore.tests.django_utils import ModuleStoreTestCase
 
 
-def _grade_with_errors(student, request, course, keep_raw_scores=False):
+def _grade_with_errors(student, request, course, keep_raw_scores=False, **kwargs):
     """This fake grade method will throw exceptions for student3 and
     student4, but allow any other students to go through normal grading.
 
@@ -28,7 +33,7 @@ def _grade_with_errors(student, request, course, keep_raw_scores=False):
     if student.username in ['student3', 'student4']:
         raise Exception("I don't like {}".format(student.username))
 
-    return grade(student, request, course, keep_raw_scores=keep_raw_scores)
+    return grade(student, request, course, keep_raw_scores=keep_raw_scores, **kwargs)
 
 
 @attr('shard_1')
@@ -111,6 +116,29 @@ class TestGradeIteration(ModuleStoreTestCase):
         self.assertTrue(all_gradesets[student2])
         self.assertTrue(all_gradesets[student5])
 
+    @override_settings(GRADES_BATCH_SIZE=2)
+    def test_same_grades_as_individual_grading(self):
+        """Students graded in batches should get the same grades as graded one by one."""
+        chapter = ItemFactory.create(category='chapter', parent=self.course)
+        sequential = ItemFactory.create(
+            category='sequential', parent=chapter, metadata={'graded': True, 'format': 'Homework'}
+        )
+        vertical = ItemFactory.create(category='vertical', parent=sequential)
+        problems = [ItemFactory.create(category='problem', parent=vertical) for __ in range(2)]
+        for i, student in enumerate(self.students[:3]):
+            set_score(student.id, problems[0].location, i, 2)
+        set_score(self.students[0].id, problems[1].location, 1, 1)
+        course = self.store.get_course(self.course.id)
+
+        all_gradesets, all_errors = self._gradesets_and_errors_for(course, self.students)
+        self.assertEqual(len(all_errors), 0)
+        for student in self.students:
+            self.assertEqual(
+                all_gradesets[student]['totaled_scores'],
+                grade(student, RequestFactory().get('/'), course)['totaled_scores']
+            )
+        self.assertEqual(all_gradesets[self.students[0]]['totaled_scores']['Homework'][0].earned, 1)
+
     ################################# Helpers #################################
     def _gradesets_and_errors_for(self, course_id, students):
         """Simple helper method to iterate through student grades and give us
@@ -198,6 +226,91 @@ class TestFieldDataCacheScorableLocations(ModuleStoreTestCase):
         self.assertIn('problem', block_types)
 
 
+@patch.dict('django.conf.settings.FEATURES', {'ENABLE_PERSISTENT_SUBSECTION_GRADES': True})
+class TestPersistentSubsectionGrade(ModuleStoreTestCase):
+    """
+    Tests for grading with PersistentSubsectionGrade
+    """
+    def setUp(self):
+        super(TestPersistentSubsectionGrade, self).setUp()
+        self.student = UserFactory.create()
+        course = CourseFactory.create()
+        chapter = ItemFactory.create(category='chapter', parent=course)
+        self.sequential = ItemFactory.create(
+            category='sequential', parent=chapter, metadata={'graded': True, 'format': 'Homework'}
+        )
+        vertical = ItemFactory.create(category='vertical', parent=self.sequential)
+        self.problem = ItemFactory.create(category='problem', parent=vertical)
+        self.course = self.store.get_course(course.id)
+
+        CourseEnrollment.enroll(self.student, self.course.id)
+        self.request = RequestFactory().get('/')
+
+    def _get_persisted_grade(self):
+        """Returns PersistentSubsectionGrade of the sequential"""
+        return PersistentSubsectionGrade.objects.get(
+            user=self.student, course_id=self.course.id, usage_key=self.sequential.location
+        )
+
+    def _get_homework_score(self, grade_summary):
+        """Returns the graded total of the sequential"""
+        return grade_summary['totaled_scores']['Homework'][0]
+
+    def test_grade_from_persisted_grade(self):
+        grade_summary = grade(self.student, self.request, self.course)
+        persisted_grade = self._get_persisted_grade()
+        self.assertFalse(persisted_grade.calculated)
+        self.assertFalse(persisted_grade.stale)
+
+        with patch('courseware.grades._grade_section') as mock_grade_section:
+            self.assertEqual(grade(self.student, self.request, self.course), grade_summary)
+        self.assertFalse(mock_grade_section.called)
+
+    def test_grade_after_score_changed(self):
+        grade(self.student, self.request, self.course)
+
+        set_score(self.student.id, self.problem.location, 1, 2)
+        self.assertTrue(self._get_persisted_grade().stale)
+
+        score = self._get_homework_score(grade(self.student, self.request, self.course))
+        self.assertEqual((score.earned, score.possible), (1, 2))
+        persisted_grade = self._get_persisted_grade()
+        self.assertTrue(persisted_grade.calculated)
+        self.assertFalse(persisted_grade.stale)
+        self.assertEqual((persisted_grade.earned, persisted_grade.possible), (1, 2))
+
+        with patch('courseware.grades._grade_section') as mock_grade_section:
+            score = self._get_homework_score(grade(self.student, self.request, self.course))
+        self.assertFalse(mock_grade_section.called)
+        self.assertEqual((score.earned, score.possible), (1, 2))
+        self.assertEqual(score.module_id, unicode(self.sequential.location))
+
+    def test_grade_after_course_changed(self):
+        grade(self.student, self.request, self.course)
+        self.course = self.store.update_item(self.course, self.user.id)
+
+        with patch('courseware.grades._grade_section', wraps=_grade_section) as mock_grade_section:
+            grade(self.student, self.request, self.course)
+        self.assertTrue(mock_grade_section.called)
+
+    def test_not_saved_if_invalidated_while_grading(self):
+        PersistentSubsectionGrade.invalidate(self.student.id, self.course.id, self.sequential.location)
+        read_grade = self._get_persisted_grade()
+        PersistentSubsectionGrade.invalidate(self.student.id, self.course.id, self.sequential.location)
+
+        self.assertFalse(PersistentSubsectionGrade.save_grade(
+            self.student.id, self.course.id, self.sequential.location, read_grade,
+            course_version='version', earned=1.0, possible=1.0, attempted=True, calculated=True,
+        ))
+        self.assertTrue(self._get_persisted_grade().stale)
+
+    @patch.dict('django.conf.settings.FEATURES', {'ENABLE_PERSISTENT_SUBSECTION_GRADES': False})
+    def test_disabled(self):
+        grade(self.student, self.request, self.course)
+        set_score(self.student.id, self.problem.location, 1, 2)
+        self.assertFalse(PersistentSubsectionGrade.objects.exists())
+
+
 class TestProgressSummary(TestCase):
     """
     Test the method that calculates the score for a given block based on the
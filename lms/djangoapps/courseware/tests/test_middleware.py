@@ -4,12 +4,13 @@ Tests for courseware middleware
 
 from django.core.urlresolvers import reverse
 from django.test.client import RequestFactory
-from django.http import Http404
+from django.http import Http404, HttpResponse
 from mock import patch
 from nose.plugins.attrib import attr
+from xblock.exceptions import KeyValueMultiSaveError
 
 import courseware.courses as courses
-from courseware.middleware import RedirectUnenrolledMiddleware
+from courseware.middleware import FlushUserStateMiddleware, RedirectUnenrolledMiddleware
 from xmodule.modulestore.tests.django_utils import ModuleStoreTestCase
 from xmodule.modulestore.tests.factories import CourseFactory
 
@@ -52,3 +53,18 @@ class CoursewareMiddlewareTestCase(ModuleStoreTestCase):
             request, Http404()
         )
         self.assertIsNone(response)
+
+    @patch('courseware.middleware.flush_deferred_user_states')
+    def test_flush_user_state(self, mock_flush):
+        """The deferred user state should be saved before the response is returned"""
+        request = RequestFactory().get("dummy_url")
+        response = HttpResponse()
+        self.assertIs(FlushUserStateMiddleware().process_response(request, response), response)
+        mock_flush.assert_called_once_with()
+
+    @patch('courseware.middleware.flush_deferred_user_states', side_effect=KeyValueMultiSaveError([]))
+    def test_flush_user_state_failure(self, _mock_flush):
+        """A failure to save the deferred user state should be returned to the client"""
+        request = RequestFactory().get("dummy_url")
+        response = FlushUserStateMiddleware().process_response(request, HttpResponse())
+        self.assertEqual(response.status_code, 500)
@@ -6,8 +6,8 @@ from mock import Mock, patch
 from nose.plugins.attrib import attr
 from functools import partial
 
-from courseware.model_data import DjangoKeyValueStore, FieldDataCache, InvalidScopeError
-from courseware.models import StudentModule, XModuleUserStateSummaryField
+from courseware.model_data import DjangoKeyValueStore, FieldDataCache, InvalidScopeError, flush_deferred_user_states
+from courseware.models import DEFAULT_CHUNK_SIZE, StudentModule, XModuleUserStateSummaryField
 from courseware.models import XModuleStudentInfoField, XModuleStudentPrefsField
 
 from student.tests.factories import UserFactory
@@ -19,7 +19,9 @@ from xblock.fields import Scope, BlockScope, ScopeIds
 from xblock.exceptions import KeyValueMultiSaveError
 from xblock.core import XBlock
 from django.test import TestCase
+from django.test.utils import override_settings
 from django.db import DatabaseError
+from request_cache.middleware import RequestCache
 
 
 def mock_field(scope, name):
@@ -415,3 +417,97 @@ class TestStudentInfoStorage(OtherUserFailureTestMixin, StorageTestBase, TestCas
     storage_class = XModuleStudentInfoField
     other_key_factory = partial(DjangoKeyValueStore.Key, Scope.user_info, 2, 'mock_problem')  # user_id=2, not 1
     existing_field_name = "existing_field"
+
+
+@attr('shard_1')
+class TestFieldDataCachePrefetch(TestCase):
+    """Tests that FieldDataCache doesn't query data which was loaded already"""
+
+    def setUp(self):
+        super(TestFieldDataCachePrefetch, self).setUp()
+        self.user = UserFactory.create(username='user')
+        self.fields = [mock_field(Scope.user_state, 'a_field'), mock_field(Scope.user_info, 'b_field')]
+
+    def test_add_loaded_descriptors(self):
+        descriptor = mock_descriptor(self.fields)
+        with self.assertNumQueries(2):
+            field_data_cache = FieldDataCache([descriptor], course_id, self.user)
+        self.assertEqual(field_data_cache.num_queries, 2)
+
+        with self.assertNumQueries(0):
+            field_data_cache.add_descriptors_to_cache([descriptor])
+        self.assertEqual(field_data_cache.num_queries, 2)
+
+    def test_add_new_descriptors(self):
+        field_data_cache = FieldDataCache([mock_descriptor(self.fields)], course_id, self.user)
+        descriptors = [mock_descriptor(self.fields) for __ in range(3)]
+        for index, descriptor in enumerate(descriptors):
+            usage_id = location('usage_id_{}'.format(index))
+            descriptor.scope_ids = ScopeIds('user1', 'mock_problem', usage_id, usage_id)
+
+        # user_info fields were loaded already, so only user_state of all the new descriptors is queried
+        with self.assertNumQueries(1):
+            field_data_cache.add_descriptors_to_cache(descriptors)
+        self.assertEqual(field_data_cache.num_queries, 3)
+
+    def test_chunked_queries(self):
+        descriptors = [mock_descriptor(self.fields) for __ in range(DEFAULT_CHUNK_SIZE + 1)]
+        for index, descriptor in enumerate(descriptors):
+            usage_id = location('usage_id_{}'.format(index))
+            descriptor.scope_ids = ScopeIds('user1', 'mock_problem', usage_id, usage_id)
+
+        # user_state is queried in 2 chunks
+        with self.assertNumQueries(3):
+            field_data_cache = FieldDataCache(descriptors, course_id, self.user)
+        self.assertEqual(field_data_cache.num_queries, 3)
+
+
+@attr('shard_1')
+@override_settings(STUDENT_MODULE_DEFERRED_FIELDS={'problem': ['a_field']})
+class TestDeferredStudentModuleStorage(TestCase):
+    """Tests for deferring saving user_state fields to the end of the request"""
+
+    def setUp(self):
+        super(TestDeferredStudentModuleStorage, self).setUp()
+        student_module = StudentModuleFactory(state=json.dumps({'a_field': 'a_value', 'b_field': 'b_value'}))
+        self.user = student_module.student
+        self.field_data_cache = FieldDataCache(
+            [mock_descriptor([mock_field(Scope.user_state, 'a_field'), mock_field(Scope.user_state, 'b_field')])],
+            course_id,
+            self.user
+        )
+        self.kvs = DjangoKeyValueStore(self.field_data_cache)
+
+        patcher = patch('courseware.model_data.request_cache.get_request', return_value=Mock())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(RequestCache.clear_request_cache)
+
+    def _stored_state(self):
+        return json.loads(StudentModule.objects.get(student=self.user).state)
+
+    def test_deferred_field(self):
+        with self.assertNumQueries(0):
+            self.kvs.set(user_state_key('a_field'), 'new_value')
+        self.assertEquals('new_value', self.kvs.get(user_state_key('a_field')))
+        self.assertEquals('a_value', self._stored_state()['a_field'])
+
+        flush_deferred_user_states()
+        self.assertEquals('new_value', self._stored_state()['a_field'])
+
+    def test_deferred_field_saved_with_other_fields(self):
+        self.kvs.set(user_state_key('a_field'), 'new_value')
+        self.kvs.set(user_state_key('b_field'), 'new_b_value')
+        self.assertEquals({'a_field': 'new_value', 'b_field': 'new_b_value'}, self._stored_state())
+
+    def test_not_in_request(self):
+        with patch('courseware.model_data.request_cache.get_request', return_value=None):
+            self.kvs.set(user_state_key('a_field'), 'new_value')
+        self.assertEquals('new_value', self._stored_state()['a_field'])
+
+    def test_flush_failure(self):
+        self.kvs.set(user_state_key('a_field'), 'new_value')
+        with patch('courseware.model_data.DjangoXBlockUserStateClient.set_many', side_effect=DatabaseError):
+            with self.assertRaises(KeyValueMultiSaveError):
+                flush_deferred_user_states()
+        self.assertEquals('a_value', self._stored_state()['a_field'])
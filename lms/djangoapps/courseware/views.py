@@ -8,6 +8,7 @@ import numbers
 import textwrap
 import urllib
 import copy
+import dogstats_wrapper as dog_stats_api
 from util.json_request import JsonResponse
 
 from collections import OrderedDict
@@ -62,7 +63,6 @@ from openedx.core.djangoapps.credit.api import (
 )
 from openedx.core.djangoapps.ga_optional.api import is_available
 from openedx.core.djangoapps.ga_optional.models import DISCCUSION_IMAGE_UPLOAD_KEY, PROGRESS_RESTRICTION_OPTION_KEY
-from courseware.models import StudentModule
 from courseware.models import StudentModuleHistory
 from courseware.model_data import FieldDataCache, ScoresClient
 from .module_render import toc_for_course, get_module_for_descriptor, get_module, get_module_by_usage_id
@@ -87,7 +87,7 @@ from student.views import is_course_blocked
 from util.cache import cache, cache_if_anonymous
 from util.date_utils import strftime_localized
 from util.db import outer_atomic
-from util.ga_attendance_status import AttendanceStatusExecutor
+from util.ga_attendance_status import AttendanceStatusExecutor, ModuleStatusData
 from xblock.fragment import Fragment
 from xmodule.modulestore.django import modulestore
 from xmodule.modulestore.exceptions import ItemNotFoundError, NoPathToItem
@@ -115,7 +115,6 @@ from courseware.url_helpers import get_redirect_url
 from util.json_request import JsonResponse, JsonResponseBadRequest
 
 from lms.djangoapps.courseware.ga_mongo_utils import PlaybackFinishStore
-from ga_survey.models import SurveySubmission
 
 
 log = logging.getLogger("edx.courseware")
@@ -394,6 +393,22 @@ def index(request, course_id, chapter=None, section=None,
         return _index_bulk_op(request, course_key, chapter, section, position)
 
 
+def _get_section_descriptor(course, chapter, section):
+    """
+    Return the descriptor of the section in the chapter of the course with all of its descendants,
+    or None if it doesn't exist.
+    """
+    if chapter is None or section is None:
+        return None
+    chapter_descriptor = course.get_child_by(lambda m: m.location.name == chapter)
+    if chapter_descriptor is None:
+        return None
+    section_descriptor = chapter_descriptor.get_child_by(lambda m: m.location.name == section)
+    if section_descriptor is None:
+        return None
+    return modulestore().get_item(section_descriptor.location, depth=None)
+
+
 # pylint: disable=too-many-statements
 def _index_bulk_op(request, course_key, chapter, section, position):
     """
@@ -442,8 +457,9 @@ def _index_bulk_op(request, course_key, chapter, section, position):
         return redirect(reverse('course_survey', args=[unicode(course.id)]))
 
     try:
-        field_data_cache = FieldDataCache.cache_for_descriptor_descendents(
-            course_key, user, course, depth=2)
+        # load the data of the course navigation and of the whole requested section at once
+        prefetched_section = _get_section_descriptor(course, chapter, section)
+        field_data_cache = FieldDataCache.cache_for_section(course_key, user, course, prefetched_section)
 
         course_module = get_module_for_descriptor(
             user, request, course, field_data_cache, course_key, course=course
@@ -549,7 +565,10 @@ def _index_bulk_op(request, course_key, chapter, section, position):
 
             # cdodge: this looks silly, but let's refetch the section_descriptor with depth=None
             # which will prefetch the children more efficiently than doing a recursive load
-            section_descriptor = modulestore().get_item(section_descriptor.location, depth=None)
+            if prefetched_section is not None and prefetched_section.location == section_descriptor.location:
+                section_descriptor = prefetched_section
+            else:
+                section_descriptor = modulestore().get_item(section_descriptor.location, depth=None)
 
             # Load all descendants of the section, because we're going to display its
             # html, which in general will need all of its children
@@ -581,6 +600,7 @@ def _index_bulk_op(request, course_key, chapter, section, position):
             section_render_context = {'activate_block_id': request.GET.get('activate_block_id')}
             context['fragment'] = section_module.render(STUDENT_VIEW, section_render_context)
             context['section_title'] = section_descriptor.display_name_with_default
+            dog_stats_api.histogram('lms.courseware.index.field_data_queries', field_data_cache.num_queries)
         else:
             # section is none, so display a message
             studio_url = _get_studio_url(user, course, 'course')
@@ -1251,47 +1271,8 @@ def _attendance(request, course_key):
     except User.DoesNotExist:
         raise Http404
 
-    def _check_module_status(_course_id, _vertical, _module, _student):
-        """
-        :param _course_id: int
-        :param _vertical: XModulediscussion/forum
-        :param _module: XModule
-        :param _student: User
-        :return: bool
-        """
-        if _module.location.category == 'problem' and StudentModule.objects.filter(
-                module_state_key=UsageKey.from_string(_module.location.to_deprecated_string()),
-                module_type__exact='problem', student=_student, course_id=_course_id,
-                grade__isnull=False).count() is not 0:
-            return True
-
-        elif _module.location.category == 'html' and SurveySubmission.objects.filter(
-                course_id=_course_id, unit_id=_vertical.location.block_id, user=_student).count() is not 0:
-            return True
-
-        elif _module.location.category in ['video', 'jwplayerxblock']:
-            if PlaybackFinishStore().find_status_true_data(
-                    user_id=_student.id, course_id=unicode(_course_id), block_id=_module.location.block_id):
-                return True
-
-        elif _module.location.category == 'survey':
-            student_module_values = StudentModule.objects.filter(
-                    module_state_key=UsageKey.from_string(_module.location.to_deprecated_string()),
-                    module_type__exact='survey', student=_student, course_id=_course_id).values('state')
-            if len(student_module_values) is not 0:
-                student_module_value = json.loads(student_module_values[0]['state'])
-                if 'submissions_count' in student_module_value and student_module_value['submissions_count'] > 0:
-                    return True
-
-        elif _module.location.category == 'freetextresponse' and StudentModule.objects.filter(
-                module_state_key=UsageKey.from_string(_module.location.to_deprecated_string()),
-                student=_student, module_type__in=('freetextresponse', 'problem'), course_id=_course_id,
-                grade__isnull=False).count() is not 0:
-            return True
-
-        return False
-
     # Execute
+    module_status_data = ModuleStatusData(course, user_id=student.id)
     course_details = []
     for chapter in course.get_children():
         display_chapter = {
@@ -1316,7 +1297,7 @@ def _attendance(request, course_key):
                 }
                 for module in vertical.get_children():
                     if hasattr(module, 'is_status_managed') and module.is_status_managed:
-                        module_status = _check_module_status(course.id, vertical, module, student)
+                        module_status = module_status_data.is_completed(vertical, module)
                         display_vertical['modules'].append({
                             'name': module.display_name,
                             'status': module_status
@@ -20,6 +20,7 @@ from courseware.courses import get_problems_in_section
 from xmodule.modulestore.django import modulestore
 from opaque_keys.edx.keys import UsageKey
 from instructor_task.models import InstructorTask, PROGRESS
+from instructor_task.subtasks import get_subtask_progress
 
 
 log = logging.getLogger(__name__)
@@ -114,10 +115,10 @@ def _update_instructor_task(instructor_task, task_result):
     opportunity to update the InstructorTask entry.
 
     Tasks that are in progress and have subtasks doing the processing do not look
-    to the task's AsyncResult object.  When subtasks are running, the
-    InstructorTask object itself is updated with the subtasks' progress,
-    not any AsyncResult object.  In this case, the InstructorTask is
-    not updated at all.
+    to the task's AsyncResult object.  When subtasks are running, they record
+    their progress apart from the InstructorTask object, which is only updated
+    once they have all completed.  In this case, the "task_output" of the
+    InstructorTask is updated with their progress so far.
 
     Calculates json to store in "task_output" field of the `instructor_task`,
     as well as updating the task_state.
@@ -147,8 +148,9 @@ def _update_instructor_task(instructor_task, task_result):
         # meaning that the subtasks have successfully been defined.  However, the InstructorTask
         # will be marked as in PROGRESS, until the last subtask completes and marks it as SUCCESS.
         # We want to ignore the parent SUCCESS if subtasks are still running, and just trust the
-        # contents of the InstructorTask.
+        # progress recorded by the subtasks.
         entry_needs_updating = False
+        instructor_task.task_output = InstructorTask.create_output_for_success(get_subtask_progress(instructor_task))
     elif result_state in [PROGRESS, SUCCESS]:
         # construct a status message directly from the task result's result:
         # it needs to go back with the entry passed in.
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('instructor_task', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InstructorTaskSubtaskStatus',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('subtask_id', models.CharField(max_length=255)),
+                ('state', models.CharField(max_length=50)),
+                ('attempted', models.IntegerField(default=0)),
+                ('succeeded', models.IntegerField(default=0)),
+                ('failed', models.IntegerField(default=0)),
+                ('skipped', models.IntegerField(default=0)),
+                ('retried_nomax', models.IntegerField(default=0)),
+                ('retried_withmax', models.IntegerField(default=0)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('instructor_task', models.ForeignKey(to='instructor_task.InstructorTask')),
+            ],
+        ),
+        migrations.AlterIndexTogether(
+            name='instructortasksubtaskstatus',
+            index_together=set([('instructor_task', 'subtask_id')]),
+        ),
+    ]
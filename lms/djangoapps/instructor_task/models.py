@@ -19,7 +19,9 @@ import csv
 import json
 import hashlib
 import os.path
+import tempfile
 import urllib
+import zlib
 
 from boto.s3.connection import S3Connection
 from boto.s3.key import Key
@@ -35,6 +37,9 @@ from xmodule_django.models import CourseKeyField
 QUEUING = 'QUEUING'
 PROGRESS = 'PROGRESS'
 
+# Size of the parts of the multipart uploads of reports to S3 (S3 requires at least 5 MB but for the last part)
+REPORT_UPLOAD_PART_SIZE = 8 * 1024 * 1024
+
 
 class InstructorTask(models.Model):
     """
@@ -176,24 +181,54 @@ class InstructorTask(models.Model):
         return json.dumps({'message': 'Task revoked before running'})
 
 
+class InstructorTaskSubtaskStatus(models.Model):
+    """
+    Append-only log of the statuses of the subtasks of an InstructorTask.
+
+    Subtasks record their status by inserting a row rather than by updating
+    their InstructorTask, so that they never wait for each other's lock on it.
+    The latest row of a subtask is its current status, and the progress of the
+    InstructorTask is aggregated from the rows (see `instructor_task.subtasks`).
+
+    The fields other than `instructor_task` and `created` are those of a
+    `SubtaskStatus`, `subtask_id` being its `task_id`.
+    """
+    instructor_task = models.ForeignKey(InstructorTask)
+    subtask_id = models.CharField(max_length=255)  # max_length from celery_taskmeta
+    state = models.CharField(max_length=50)  # max_length from celery_taskmeta
+    attempted = models.IntegerField(default=0)
+    succeeded = models.IntegerField(default=0)
+    failed = models.IntegerField(default=0)
+    skipped = models.IntegerField(default=0)
+    retried_nomax = models.IntegerField(default=0)
+    retried_withmax = models.IntegerField(default=0)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta(object):
+        index_together = [('instructor_task', 'subtask_id')]
+
+
 class ReportStore(object):
     """
     Simple abstraction layer that can fetch and store CSV files for reports
-    download. Should probably refactor later to create a ReportFile object that
-    can simply be appended to for the sake of memory efficiency, rather than
-    passing in the whole dataset. Doing that for now just because it's simpler.
+    download. `store_rows` takes any iterable of rows and writes them out as
+    they come, so callers can generate rows lazily rather than building the
+    whole dataset in memory.
     """
     @classmethod
-    def from_config(cls, config_name):
+    def from_config(cls, config_name, namespace=None):
         """
         Return one of the ReportStore subclasses depending on django
         configuration. Look at subclasses for expected configuration.
+
+        If `namespace` is given, the files are stored under `{ROOT_PATH}/{namespace}`,
+        apart from the files that are listed for download.
         """
         storage_type = getattr(settings, config_name).get("STORAGE_TYPE")
         if storage_type.lower() == "s3":
-            return S3ReportStore.from_config(config_name)
+            return S3ReportStore.from_config(config_name, namespace)
         elif storage_type.lower() == "localfs":
-            return LocalFSReportStore.from_config(config_name)
+            return LocalFSReportStore.from_config(config_name, namespace)
 
     def _get_utf8_encoded_rows(self, rows):
         """
@@ -204,6 +239,14 @@ class ReportStore(object):
         for row in rows:
             yield [unicode(item).encode('utf-8') for item in row]
 
+    def _get_unicode_rows(self, lines):
+        """
+        Given an iterable of utf-8 encoded CSV `lines`, yield the rows of the
+        CSV as lists of unicode strings.
+        """
+        for row in csv.reader(lines):
+            yield [item.decode('utf-8') for item in row]
+
 
 class S3ReportStore(ReportStore):
     """
@@ -228,7 +271,7 @@ class S3ReportStore(ReportStore):
         self.bucket = conn.get_bucket(bucket_name)
 
     @classmethod
-    def from_config(cls, config_name):
+    def from_config(cls, config_name, namespace=None):
         """
         The expected configuration for an `S3ReportStore` is to have a
         `GRADES_DOWNLOAD` dict in settings with the following fields::
@@ -242,10 +285,10 @@ class S3ReportStore(ReportStore):
         Since S3 access relies on boto, you must also define `AWS_ACCESS_KEY_ID`
         and `AWS_SECRET_ACCESS_KEY` in settings.
         """
-        return cls(
-            getattr(settings, config_name).get("BUCKET"),
-            getattr(settings, config_name).get("ROOT_PATH")
-        )
+        root_path = getattr(settings, config_name).get("ROOT_PATH")
+        if namespace is not None:
+            root_path = "{}/{}".format(root_path, namespace)
+        return cls(getattr(settings, config_name).get("BUCKET"), root_path)
 
     def key_for(self, course_id, filename):
         """Return the S3 key we would use to store and retrieve the data for the
@@ -302,16 +345,90 @@ class S3ReportStore(ReportStore):
         strings), create a buffer that is a gzip'd csv file, and then `store()`
         that buffer.
 
+        `rows` is consumed as it is compressed. Once the compressed data
+        exceeds `REPORT_UPLOAD_PART_SIZE`, it is sent by a multipart upload
+        part by part, so that neither the rows nor the whole file are kept in
+        memory. The file only becomes visible when the upload is completed.
+
         Even though we store it in gzip format, browsers will transparently
         download and decompress it. Filenames should end in `.csv`, not `.gz`.
         """
         output_buffer = StringIO()
         gzip_file = GzipFile(fileobj=output_buffer, mode="wb")
         csvwriter = csv.writer(gzip_file)
-        csvwriter.writerows(self._get_utf8_encoded_rows(rows))
-        gzip_file.close()
+        multipart_upload = None
+        part_num = 0
+        try:
+            for row in self._get_utf8_encoded_rows(rows):
+                csvwriter.writerow(row)
+                if output_buffer.tell() >= REPORT_UPLOAD_PART_SIZE:
+                    if multipart_upload is None:
+                        multipart_upload = self.bucket.initiate_multipart_upload(
+                            self.key_for(course_id, filename).key,
+                            headers={
+                                "Content-Encoding": "gzip",
+                                "Content-Type": "text/csv",
+                            }
+                        )
+                    part_num += 1
+                    self._upload_part(multipart_upload, part_num, output_buffer)
+            gzip_file.close()
+
+            if multipart_upload is None:
+                self.store(course_id, filename, output_buffer)
+            else:
+                self._upload_part(multipart_upload, part_num + 1, output_buffer)
+                multipart_upload.complete_upload()
+        except Exception:
+            if multipart_upload is not None:
+                multipart_upload.cancel_upload()
+            raise
+
+    def _upload_part(self, multipart_upload, part_num, output_buffer):
+        """
+        Upload the contents of `output_buffer` as the part `part_num` of `multipart_upload`,
+        and empty the buffer for the following data.
+        """
+        output_buffer.seek(0)
+        multipart_upload.upload_part_from_file(output_buffer, part_num)
+        output_buffer.seek(0)
+        output_buffer.truncate()
 
-        self.store(course_id, filename, output_buffer)
+    def read_rows(self, course_id, filename):
+        """
+        Yield the rows of the CSV file `filename` stored by `store_rows()`,
+        decompressing it as it is downloaded.
+        """
+        return self._get_unicode_rows(self._get_lines(self._get_decompressed_chunks(course_id, filename)))
+
+    def _get_decompressed_chunks(self, course_id, filename):
+        """
+        Yield the decompressed contents of the gzip'd file `filename` chunk by chunk.
+        """
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)  # expect a gzip header
+        for chunk in self.key_for(course_id, filename):
+            yield decompressor.decompress(chunk)
+        yield decompressor.flush()
+
+    @staticmethod
+    def _get_lines(chunks):
+        """
+        Split the strings of `chunks` into lines, keeping the line endings.
+        """
+        pending = ''
+        for chunk in chunks:
+            lines = (pending + chunk).split('\n')
+            pending = lines.pop()
+            for line in lines:
+                yield line + '\n'
+        if pending:
+            yield pending
+
+    def delete(self, course_id, filename):
+        """
+        Delete the file `filename` of `course_id`.
+        """
+        self.key_for(course_id, filename).delete()
 
     def links_for(self, course_id):
         """
@@ -345,7 +462,7 @@ class LocalFSReportStore(ReportStore):
             os.makedirs(root_path)
 
     @classmethod
-    def from_config(cls, config_name):
+    def from_config(cls, config_name, namespace=None):
         """
         Generate an instance of this object from Django settings. It assumes
         that there is a dict in settings named GRADES_DOWNLOAD and that it has
@@ -356,7 +473,10 @@ class LocalFSReportStore(ReportStore):
             STORAGE_TYPE : "localfs"
             ROOT_PATH : /tmp/edx/report-downloads/
         """
-        return cls(getattr(settings, config_name).get("ROOT_PATH"))
+        root_path = getattr(settings, config_name).get("ROOT_PATH")
+        if namespace is not None:
+            root_path = os.path.join(root_path, namespace)
+        return cls(root_path)
 
     def path_to(self, course_id, filename):
         """Return the full path to a given file for a given course."""
@@ -381,12 +501,45 @@ class LocalFSReportStore(ReportStore):
         """
         Given a course_id, filename, and rows (each row is an iterable of strings),
         write this data out.
+
+        The rows are written to a temporary file as they come, which is then
+        renamed to `filename`, so that only complete files are listed.
         """
-        output_buffer = StringIO()
-        csvwriter = csv.writer(output_buffer)
-        csvwriter.writerows(self._get_utf8_encoded_rows(rows))
+        full_path = self.path_to(course_id, filename)
+        directory = os.path.dirname(full_path)
+        if not os.path.exists(directory):
+            os.mkdir(directory)
 
-        self.store(course_id, filename, output_buffer)
+        with tempfile.NamedTemporaryFile(dir=self.root_path, delete=False) as f:
+            try:
+                csvwriter = csv.writer(f)
+                csvwriter.writerows(self._get_utf8_encoded_rows(rows))
+                # NamedTemporaryFile creates the file readable by its owner only, so give
+                # it the mode of files created by open() (the umask can only be read by setting it)
+                umask = os.umask(0)
+                os.umask(umask)
+                os.chmod(f.name, 0o666 & ~umask)
+            except Exception:
+                os.remove(f.name)
+                raise
+        os.rename(f.name, full_path)
+
+    def read_rows(self, course_id, filename):
+        """
+        Yield the rows of the CSV file `filename` stored by `store_rows()`.
+        """
+        with open(self.path_to(course_id, filename), "rb") as f:
+            for row in self._get_unicode_rows(f):
+                yield row
+
+    def delete(self, course_id, filename):
+        """
+        Delete the file `filename` of `course_id`. As with S3, deleting a
+        missing file is not an error.
+        """
+        full_path = self.path_to(course_id, filename)
+        if os.path.exists(full_path):
+            os.remove(full_path)
 
     def links_for(self, course_id):
         """
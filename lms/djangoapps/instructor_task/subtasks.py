@@ -2,6 +2,7 @@
 This module contains celery task functions for handling the management of subtasks.
 """
 from time import time
+import heapq
 import json
 from uuid import uuid4
 import psutil
@@ -11,19 +12,23 @@ import logging
 from celery.states import SUCCESS, READY_STATES, RETRY
 import dogstats_wrapper as dog_stats_api
 
-from django.db import transaction, DatabaseError
 from django.core.cache import cache
+from django.db.models import Case, Count, Sum, When
+from django.utils import timezone
 
-from instructor_task.models import InstructorTask, PROGRESS, QUEUING
+from instructor_task.models import InstructorTask, InstructorTaskSubtaskStatus, PROGRESS, QUEUING
 from util.db import outer_atomic
 
 TASK_LOG = logging.getLogger('edx.celery.task')
 
 # Lock expiration should be long enough to allow a subtask to complete.
 SUBTASK_LOCK_EXPIRE = 60 * 10  # Lock expires in 10 minutes
-# Number of times to retry if a subtask update encounters a lock on the InstructorTask.
-# (These are recursive retries, so don't make this number too large.)
-MAX_DATABASE_LOCK_RETRIES = 5
+
+# Minimum interval between the writes of the progress of subtasks into their InstructorTask.
+SUBTASK_PROGRESS_UPDATE_INTERVAL = 30  # Progress written at most every 30 seconds
+
+# Number of item ids read by each query when generating ranges of ids for subtasks.
+ITEM_IDS_PAGE_SIZE = 10000
 
 
 class DuplicateTaskException(Exception):
@@ -33,7 +38,8 @@ class DuplicateTaskException(Exception):
 
 def _get_number_of_subtasks(total_num_items, items_per_task):
     """
-    Determines number of subtasks that would be generated by _generate_items_for_subtask.
+    Determines number of subtasks that would be generated by _generate_items_for_subtask
+    (or _generate_id_ranges_for_subtask).
 
     This needs to be calculated before the query is executed so that the list of all subtasks can be
     stored in the InstructorTask before any subtasks are started.
@@ -126,6 +132,95 @@ def _generate_items_for_subtask(
         TASK_LOG.info("Number of items generated by chunking %s not equal to original total %s", num_items_queued, total_num_items)
 
 
+def _iterate_item_ids(item_querysets):
+    """
+    Yields the distinct primary keys of the items of `item_querysets`, in ascending order.
+
+    Each query set is read by pages of ITEM_IDS_PAGE_SIZE keys, each page starting after the last key
+    of the previous one, so that the keys are streamed without an OFFSET to scan through or a
+    server-side cursor to hold open while subtasks are queued.
+    """
+    def _iterate_queryset_ids(queryset):
+        """Yields the primary keys of the items of `queryset`, in ascending order."""
+        item_ids = queryset.order_by('pk').values_list('pk', flat=True)
+        last_id = None
+        while True:
+            page_ids = item_ids if last_id is None else item_ids.filter(pk__gt=last_id)
+            page = list(page_ids[:ITEM_IDS_PAGE_SIZE])
+            for item_id in page:
+                yield item_id
+            if len(page) < ITEM_IDS_PAGE_SIZE:
+                return
+            last_id = page[-1]
+
+    last_id = None
+    for item_id in heapq.merge(*[_iterate_queryset_ids(queryset) for queryset in item_querysets]):
+        if item_id != last_id:
+            yield item_id
+            last_id = item_id
+
+
+def _generate_id_ranges_for_subtask(
+    item_querysets,  # pylint: disable=bad-continuation
+    total_num_items,
+    items_per_task,
+    total_num_subtasks,
+    course_id,
+):
+    """
+    Generates the range of primary keys of the "items" that should be processed by a subtask.
+
+    Arguments:
+        `item_querysets` : a list of query sets, each of which defines the "items" that should be processed by subtasks.
+        `total_num_items` : the result of summing the count of each queryset in `item_querysets`.
+        `items_per_task` : maximum number of items in the range of a subtask.
+        `total_num_subtasks` : number of subtasks, as calculated by _get_number_of_subtasks().
+        `course_id` : course_id of the course. Only needed for the track_memory_usage context manager.
+
+    Returns:  yields a dict with the keys 'start' and 'end', the bounds of the range of primary keys
+        (including 'start', excluding 'end'), and 'count', the number of items in the range when it was
+        generated.  The first range has no 'start' and the last one no 'end' (i.e. they are None), so that
+        the ranges cover the items created after they were generated too.
+
+    Warning:  if the algorithm here changes, the _get_number_of_subtasks() method should similarly be changed.
+    """
+    num_items_queued = 0
+    num_subtasks = 0
+    id_range = {'start': None, 'end': None, 'count': 0}
+
+    with track_memory_usage('course_email.subtask_generation.memory', course_id):
+        for item_id in _iterate_item_ids(item_querysets):
+            if id_range['count'] == items_per_task and num_subtasks < total_num_subtasks - 1:
+                id_range['end'] = item_id
+                yield id_range
+                num_items_queued += id_range['count']
+                id_range = {'start': item_id, 'end': None, 'count': 0}
+                num_subtasks += 1
+            id_range['count'] += 1
+
+        # yield remainder range for task, if any
+        if id_range['count']:
+            yield id_range
+            num_items_queued += id_range['count']
+
+    # As with _generate_items_for_subtask(), the items may have changed since they were counted.
+    if num_items_queued != total_num_items:
+        TASK_LOG.info(
+            "Number of items generated by chunking %s not equal to original total %s", num_items_queued, total_num_items
+        )
+
+
+def filter_id_range(queryset, id_range):
+    """
+    Filter `queryset` by a range of primary keys generated by _generate_id_ranges_for_subtask().
+    """
+    if id_range['start'] is not None:
+        queryset = queryset.filter(pk__gte=id_range['start'])
+    if id_range['end'] is not None:
+        queryset = queryset.filter(pk__lt=id_range['end'])
+    return queryset
+
+
 class SubtaskStatus(object):
     """
     Create and return a dict for tracking the status of a subtask.
@@ -285,6 +380,7 @@ def queue_subtasks_for_query(
     item_fields,
     items_per_task,
     total_num_items,
+    final_subtask_id=None,
 ):
     """
     Generates and queues subtasks to each execute a chunk of "items" generated by a queryset.
@@ -300,9 +396,89 @@ def queue_subtasks_for_query(
             These are in addition to the 'pk' field.
         `items_per_task` : maximum size of chunks to break each query chunk into for use by a subtask.
         `total_num_items` : total amount of items that will be put into subtasks
+        `final_subtask_id` : optional id of one more subtask to register, which is not queued here.
+            It is meant to be queued by the last of the other subtasks to complete (as told by
+            update_subtask_status()), e.g. to combine their results, and the InstructorTask only
+            succeeds once it has completed too.
 
     Returns:  the task progress as stored in the InstructorTask object.
 
+    """
+    def generate_items(total_num_subtasks):
+        """Generates the list of items of each subtask."""
+        return _generate_items_for_subtask(
+            item_querysets,
+            item_fields,
+            total_num_items,
+            items_per_task,
+            total_num_subtasks,
+            entry.course_id,
+        )
+
+    return _queue_subtasks(
+        entry, action_name, create_subtask_fcn, generate_items, items_per_task, total_num_items, final_subtask_id
+    )
+
+
+def queue_subtasks_for_id_ranges(
+    entry,
+    action_name,
+    create_subtask_fcn,
+    item_querysets,
+    items_per_task,
+    total_num_items,
+):
+    """
+    Generates and queues subtasks to each process the "items" of a queryset in a range of primary keys.
+
+    Unlike queue_subtasks_for_query(), the items themselves are not passed to the subtasks, which
+    are meant to query them with filter_id_range().
+
+    Arguments:
+        `entry` : the InstructorTask object for which subtasks are being queued.
+        `action_name` : a past-tense verb that can be used for constructing readable status messages.
+        `create_subtask_fcn` : a function of two arguments that constructs the desired kind of subtask object.
+            Arguments are the range of primary keys of the items to be processed by this subtask
+            (see _generate_id_ranges_for_subtask()), and a SubtaskStatus object reflecting initial
+            status (and containing the subtask's id).
+        `item_querysets` : a list of query sets that define the "items" that should be processed by subtasks.
+        `items_per_task` : maximum number of items to be processed by a subtask.
+        `total_num_items` : total amount of items that will be processed by subtasks
+
+    Returns:  the task progress as stored in the InstructorTask object.
+    """
+    def generate_id_ranges(total_num_subtasks):
+        """Generates the range of primary keys of each subtask."""
+        return _generate_id_ranges_for_subtask(
+            item_querysets,
+            total_num_items,
+            items_per_task,
+            total_num_subtasks,
+            entry.course_id,
+        )
+
+    return _queue_subtasks(
+        entry, action_name, create_subtask_fcn, generate_id_ranges, items_per_task, total_num_items
+    )
+
+
+def _queue_subtasks(
+    entry,
+    action_name,
+    create_subtask_fcn,
+    generate_fcn,
+    items_per_task,
+    total_num_items,
+    final_subtask_id=None,
+):
+    """
+    Generates and queues subtasks to each execute a chunk of "items".
+
+    `generate_fcn` is a function of the number of subtasks returning a generator of what should be
+    passed to create_subtask_fcn() for each subtask.  See queue_subtasks_for_query() for the other
+    arguments.
+
+    Returns:  the task progress as stored in the InstructorTask object.
     """
     task_id = entry.task_id
 
@@ -320,18 +496,15 @@ def queue_subtasks_for_query(
     )
     # Make sure this is committed to database before handing off subtasks to celery.
     with outer_atomic():
-        progress = initialize_subtask_info(entry, action_name, total_num_items, subtask_id_list)
+        progress = initialize_subtask_info(
+            entry,
+            action_name,
+            total_num_items,
+            subtask_id_list + ([final_subtask_id] if final_subtask_id is not None else []),
+        )
 
-    # Construct a generator that will return the recipients to use for each subtask.
-    # Pass in the desired fields to fetch for each recipient.
-    item_list_generator = _generate_items_for_subtask(
-        item_querysets,
-        item_fields,
-        total_num_items,
-        items_per_task,
-        total_num_subtasks,
-        entry.course_id,
-    )
+    # Construct a generator that will return the items to use for each subtask.
+    item_list_generator = generate_fcn(total_num_subtasks)
 
     # Now create the subtasks, and start them running.
     TASK_LOG.info(
@@ -429,7 +602,9 @@ def check_subtask_is_valid(entry_id, current_task_id, new_subtask_status):
 
     # Confirm that the InstructorTask doesn't think that this subtask has already been
     # performed successfully.
-    subtask_status = SubtaskStatus.from_dict(subtask_status_info[current_task_id])
+    subtask_status = _get_recorded_subtask_status(entry_id, current_task_id)
+    if subtask_status is None:
+        subtask_status = SubtaskStatus.from_dict(subtask_status_info[current_task_id])
     subtask_state = subtask_status.state
     if subtask_state in READY_STATES:
         format_str = "Unexpected task_id '{}': already completed - status {} for subtask of instructor task '{}': rejecting task {}"
@@ -463,127 +638,207 @@ def check_subtask_is_valid(entry_id, current_task_id, new_subtask_status):
         raise DuplicateTaskException(msg)
 
 
-def update_subtask_status(entry_id, current_task_id, new_subtask_status, retry_count=0):
+def update_subtask_status(entry_id, current_task_id, new_subtask_status):
     """
     Update the status of the subtask in the parent InstructorTask object tracking its progress.
 
-    Because select_for_update is used to lock the InstructorTask object while it is being updated,
-    multiple subtasks updating at the same time may time out while waiting for the lock.
-    The actual update operation is surrounded by a try/except/else that permits the update to be
-    retried if the transaction times out.
+    The status is appended to the InstructorTaskSubtaskStatus table rather than written into
+    the InstructorTask, so that subtasks completing at the same time do not wait for each other.
+    The progress aggregated from the subtasks is written back into the InstructorTask from time
+    to time while they run, and with their statuses once all of them have completed (see
+    _update_subtask_status()).  The current progress is aggregated on read by get_subtask_progress().
 
-    The subtask lock acquired in the call to check_subtask_is_valid() is released here, only when
-    the attempting of retries has concluded.
+    The subtask lock acquired in the call to check_subtask_is_valid() is released here.
+
+    Returns the number of subtasks of the InstructorTask that had not completed once the status
+    was recorded.  Subtasks completing at the same time may see the same number, but the last one
+    to record its status sees the final one.
     """
     try:
-        _update_subtask_status(entry_id, current_task_id, new_subtask_status)
-    except DatabaseError:
-        # If we fail, try again recursively.
-        retry_count += 1
-        if retry_count < MAX_DATABASE_LOCK_RETRIES:
-            TASK_LOG.info("Retrying to update status for subtask %s of instructor task %d with status %s:  retry %d",
-                          current_task_id, entry_id, new_subtask_status, retry_count)
-            dog_stats_api.increment('instructor_task.subtask.retry_after_failed_update')
-            update_subtask_status(entry_id, current_task_id, new_subtask_status, retry_count)
-        else:
-            TASK_LOG.info("Failed to update status after %d retries for subtask %s of instructor task %d with status %s",
-                          retry_count, current_task_id, entry_id, new_subtask_status)
-            dog_stats_api.increment('instructor_task.subtask.failed_after_update_retries')
-            raise
+        return _update_subtask_status(entry_id, current_task_id, new_subtask_status)
     finally:
-        # Only release the lock on the subtask when we're done trying to update it.
-        # Note that this will be called each time a recursive call to update_subtask_status()
-        # returns.  Fortunately, it's okay to release a lock that has already been released.
         _release_subtask_lock(current_task_id)
 
 
-@transaction.atomic
 def _update_subtask_status(entry_id, current_task_id, new_subtask_status):
     """
     Update the status of the subtask in the parent InstructorTask object tracking its progress.
 
-    Uses select_for_update to lock the InstructorTask object while it is being updated.
-    The operation is surrounded by a try/except/else that permit the manual transaction to be
-    committed on completion, or rolled back on error.
+    Appends `new_subtask_status` to the InstructorTaskSubtaskStatus table, then counts the
+    subtasks that have completed.  As each subtask records its status before counting, the
+    last one to complete sees that they all have, and then updates the InstructorTask with
+    the recorded statuses (see _complete_instructor_task()).  Until then, the progress of the
+    InstructorTask is updated periodically (see _update_instructor_task_progress()).
 
-    The InstructorTask's "task_output" field is updated.  This is a JSON-serialized dict.
-    Accumulates values for 'attempted', 'succeeded', 'failed', 'skipped' from `new_subtask_status`
-    into the corresponding values in the InstructorTask's task_output.  Also updates the 'duration_ms'
-    value with the current interval since the original InstructorTask started.  Note that this
-    value is only approximate, since the subtask may be running on a different server than the
-    original task, so is subject to clock skew.
-
-    The InstructorTask's "subtasks" field is also updated.  This is also a JSON-serialized dict.
-    Keys include 'total', 'succeeded', 'retried', 'failed', which are counters for the number of
-    subtasks.  'Total' is expected to have been set at the time the subtasks were created.
-    The other three counters are incremented depending on the value of `status`.  Once the counters
-    for 'succeeded' and 'failed' match the 'total', the subtasks are done and the InstructorTask's
-    "status" is changed to SUCCESS.
-
-    The "subtasks" field also contains a 'status' key, that contains a dict that stores status
-    information for each subtask.  At the moment, the value for each subtask (keyed by its task_id)
-    is the value of the SubtaskStatus.to_dict(), but could be expanded in future to store information
-    about failure messages, progress made, etc.
+    Returns the number of subtasks that have not completed yet.
     """
     TASK_LOG.info("Preparing to update status for subtask %s for instructor task %d with status %s",
                   current_task_id, entry_id, new_subtask_status)
 
     try:
-        entry = InstructorTask.objects.select_for_update().get(pk=entry_id)
+        entry = InstructorTask.objects.get(pk=entry_id)
         subtask_dict = json.loads(entry.subtasks)
-        subtask_status_info = subtask_dict['status']
-        if current_task_id not in subtask_status_info:
+        if current_task_id not in subtask_dict['status']:
             # unexpected error -- raise an exception
             format_str = "Unexpected task_id '{}': unable to update status for subtask of instructor task '{}'"
             msg = format_str.format(current_task_id, entry_id)
             TASK_LOG.warning(msg)
             raise ValueError(msg)
 
-        # Update status:
-        subtask_status_info[current_task_id] = new_subtask_status.to_dict()
-
-        # Update the parent task progress.
-        # Set the estimate of duration, but only if it
-        # increases.  Clock skew between time() returned by different machines
-        # may result in non-monotonic values for duration.
-        task_progress = json.loads(entry.task_output)
-        start_time = task_progress['start_time']
-        prev_duration = task_progress['duration_ms']
-        new_duration = int((time() - start_time) * 1000)
-        task_progress['duration_ms'] = max(prev_duration, new_duration)
-
-        # Update counts only when subtask is done.
-        # In future, we can make this more responsive by updating status
-        # between retries, by comparing counts that change from previous
-        # retry.
-        new_state = new_subtask_status.state
-        if new_subtask_status is not None and new_state in READY_STATES:
-            for statname in ['attempted', 'succeeded', 'failed', 'skipped']:
-                task_progress[statname] += getattr(new_subtask_status, statname)
-
-        # Figure out if we're actually done (i.e. this is the last task to complete).
-        # This is easier if we just maintain a counter, rather than scanning the
-        # entire new_subtask_status dict.
-        if new_state == SUCCESS:
-            subtask_dict['succeeded'] += 1
-        elif new_state in READY_STATES:
-            subtask_dict['failed'] += 1
-        num_remaining = subtask_dict['total'] - subtask_dict['succeeded'] - subtask_dict['failed']
+        InstructorTaskSubtaskStatus.objects.create(
+            instructor_task_id=entry_id,
+            subtask_id=current_task_id,
+            state=new_subtask_status.state,
+            attempted=new_subtask_status.attempted,
+            succeeded=new_subtask_status.succeeded,
+            failed=new_subtask_status.failed,
+            skipped=new_subtask_status.skipped,
+            retried_nomax=new_subtask_status.retried_nomax,
+            retried_withmax=new_subtask_status.retried_withmax,
+        )
+
+        counts = _aggregate_subtask_statuses(entry_id)
+        num_remaining = subtask_dict['total'] - counts['num_completed']
 
         # If we're done with the last task, update the parent status to indicate that.
         # At present, we mark the task as having succeeded.  In future, we should see
         # if there was a catastrophic failure that occurred, and figure out how to
         # report that here.
         if num_remaining <= 0:
-            entry.task_state = SUCCESS
-        entry.subtasks = json.dumps(subtask_dict)
-        entry.task_output = InstructorTask.create_output_for_success(task_progress)
-
-        TASK_LOG.debug("about to save....")
-        entry.save()
-        TASK_LOG.info("Task output updated to %s for subtask %s of instructor task %d",
-                      entry.task_output, current_task_id, entry_id)
+            _complete_instructor_task(entry, subtask_dict, counts)
+        else:
+            _update_instructor_task_progress(entry, counts)
+        return num_remaining
     except Exception:
         TASK_LOG.exception("Unexpected error while updating InstructorTask.")
         dog_stats_api.increment('instructor_task.subtask.update_exception')
         raise
+
+
+def _get_recorded_subtask_status(entry_id, subtask_id):
+    """
+    Return the latest SubtaskStatus recorded by the subtask, or None if it has not recorded any.
+    """
+    records = InstructorTaskSubtaskStatus.objects.filter(instructor_task_id=entry_id, subtask_id=subtask_id)
+    record = records.order_by('-id').first()
+    return _get_subtask_status_from_record(record) if record is not None else None
+
+
+def _get_subtask_status_from_record(record):
+    """
+    Construct a SubtaskStatus object from an InstructorTaskSubtaskStatus.
+    """
+    return SubtaskStatus.create(
+        record.subtask_id,
+        attempted=record.attempted,
+        succeeded=record.succeeded,
+        failed=record.failed,
+        skipped=record.skipped,
+        retried_nomax=record.retried_nomax,
+        retried_withmax=record.retried_withmax,
+        state=record.state,
+    )
+
+
+def get_subtask_statuses(entry):
+    """
+    Return the current status of each subtask of the InstructorTask `entry`, as a dict of
+    SubtaskStatus.to_dict() values keyed by the subtasks' task_id (as its "subtasks" field).
+
+    The status of a subtask is the latest one it has recorded, if any.
+    """
+    subtask_status_info = json.loads(entry.subtasks)['status']
+    for record in InstructorTaskSubtaskStatus.objects.filter(instructor_task_id=entry.id).order_by('id'):
+        subtask_status_info[record.subtask_id] = _get_subtask_status_from_record(record).to_dict()
+    return subtask_status_info
+
+
+def _aggregate_subtask_statuses(entry_id):
+    """
+    Return the sums of the 'attempted', 'succeeded', 'failed', 'skipped' counts of the subtasks of
+    an InstructorTask that have completed, with the number of such subtasks ('num_completed') and
+    of those which succeeded ('num_succeeded').
+    """
+    counts = InstructorTaskSubtaskStatus.objects.filter(
+        instructor_task_id=entry_id,
+        state__in=READY_STATES,
+    ).aggregate(
+        attempted=Sum('attempted'),
+        succeeded=Sum('succeeded'),
+        failed=Sum('failed'),
+        skipped=Sum('skipped'),
+        num_completed=Count('subtask_id', distinct=True),
+        num_succeeded=Count(Case(When(state=SUCCESS, then='subtask_id')), distinct=True),
+    )
+    # Sums are None when no subtask has completed
+    return {name: count or 0 for name, count in counts.iteritems()}
+
+
+def _get_task_progress(entry, counts):
+    """
+    Return the progress stored in the "task_output" of `entry` with the counts of its subtasks,
+    and the current duration.
+    """
+    task_progress = json.loads(entry.task_output)
+    for statname in ['attempted', 'succeeded', 'failed', 'skipped']:
+        task_progress[statname] = counts[statname]
+
+    # Set the estimate of duration, but only if it
+    # increases.  Clock skew between time() returned by different machines
+    # may result in non-monotonic values for duration.
+    new_duration = int((time() - task_progress['start_time']) * 1000)
+    task_progress['duration_ms'] = max(task_progress['duration_ms'], new_duration)
+    return task_progress
+
+
+def get_subtask_progress(entry):
+    """
+    Return the progress of the InstructorTask `entry`, aggregated from the statuses recorded by
+    its subtasks so far, in the format of its "task_output" field.
+    """
+    return _get_task_progress(entry, _aggregate_subtask_statuses(entry.id))
+
+
+def _update_instructor_task_progress(entry, counts):
+    """
+    Write the progress of the subtasks of the InstructorTask `entry` into its "task_output", so
+    that it does not look frozen to the readers of that field while the subtasks are running.
+
+    This is done at most once every SUBTASK_PROGRESS_UPDATE_INTERVAL seconds for each task, and is
+    conditional on the task not being marked as completed yet, so that it never overwrites the
+    output stored by _complete_instructor_task().
+    """
+    # cache.add fails if the key already exists
+    key = "subtask-progress-{}".format(entry.id)
+    if not cache.add(key, 'true', SUBTASK_PROGRESS_UPDATE_INTERVAL):
+        return
+
+    task_output = InstructorTask.create_output_for_success(_get_task_progress(entry, counts))
+    InstructorTask.objects.filter(pk=entry.id).exclude(task_state__in=READY_STATES).update(
+        task_output=task_output,
+        updated=timezone.now(),
+    )
+
+
+def _complete_instructor_task(entry, subtask_dict, counts):
+    """
+    Update the InstructorTask `entry` whose subtasks have all completed with their statuses, and
+    mark it as succeeded.
+
+    The update is conditional on the task not being marked as completed yet, so that it is only
+    done once even if several subtasks see that they all have completed.
+    """
+    task_progress = _get_task_progress(entry, counts)
+    subtask_dict['status'] = get_subtask_statuses(entry)
+    subtask_dict['succeeded'] = counts['num_succeeded']
+    subtask_dict['failed'] = counts['num_completed'] - counts['num_succeeded']
+    task_output = InstructorTask.create_output_for_success(task_progress)
+
+    num_updated = InstructorTask.objects.filter(pk=entry.id).exclude(task_state__in=READY_STATES).update(
+        task_state=SUCCESS,
+        task_output=task_output,
+        subtasks=json.dumps(subtask_dict),
+        updated=timezone.now(),
+    )
+    if num_updated:
+        TASK_LOG.info("Task output updated to %s for instructor task %d", task_output, entry.id)
@@ -37,6 +37,8 @@ from instructor_task.tasks_helper import (
     upload_problem_responses_csv,
     upload_grades_csv,
     upload_problem_grade_report,
+    upload_report_shard,
+    merge_and_upload_report_shards,
     upload_students_csv,
     cohort_students_and_upload,
     upload_enrollment_report,
@@ -192,6 +194,26 @@ def calculate_problem_grade_report(entry_id, xmodule_instance_args):
     return run_main_task(entry_id, task_fn, action_name)
 
 
+@task(routing_key=settings.GRADES_DOWNLOAD_ROUTING_KEY)
+def calculate_report_shard(entry_id, csv_name, shard_num, user_ids, merge_subtask_id, subtask_status_dict):
+    """
+    Subtask of `calculate_grades_csv` or `calculate_problem_grade_report`, which
+    generates the report for a range of the students into a partial report.
+
+    As a subtask, it updates the InstructorTask itself and so is not based on BaseInstructorTask.
+    """
+    return upload_report_shard(entry_id, csv_name, shard_num, user_ids, merge_subtask_id, subtask_status_dict)
+
+
+@task(routing_key=settings.GRADES_DOWNLOAD_ROUTING_KEY)
+def merge_report_shards(entry_id, csv_name, subtask_status_dict):
+    """
+    Last subtask of `calculate_grades_csv` or `calculate_problem_grade_report`,
+    which merges the partial reports generated by `calculate_report_shard`.
+    """
+    return merge_and_upload_report_shards(entry_id, csv_name, subtask_status_dict)
+
+
 @task(base=BaseInstructorTask, routing_key=settings.GRADES_DOWNLOAD_ROUTING_KEY)
 def calculate_students_features_csv(entry_id, xmodule_instance_args):
     """
@@ -9,14 +9,16 @@ from collections import OrderedDict
 from datetime import datetime
 from django.conf import settings
 from eventtracking import tracker
-from itertools import chain
+from itertools import chain, count
 from time import time
+from uuid import uuid4
 import unicodecsv
 import logging
 
 from celery import Task, current_task
 from celery.states import SUCCESS, FAILURE
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.core.files.storage import DefaultStorage
 from django.db import transaction, reset_queries
 from django.db.models import Q
@@ -58,6 +60,15 @@ from instructor_analytics.basic import (
 )
 from instructor_analytics.csvs import format_dictlist
 from instructor_task.models import ReportStore, InstructorTask, PROGRESS
+from instructor_task.subtasks import (
+    SUBTASK_LOCK_EXPIRE,
+    DuplicateTaskException,
+    SubtaskStatus,
+    check_subtask_is_valid,
+    get_subtask_statuses,
+    queue_subtasks_for_query,
+    update_subtask_status,
+)
 from lms.djangoapps.lms_xblock.runtime import LmsPartitionService
 from openedx.core.djangoapps.course_groups.cohorts import get_cohort
 from openedx.core.djangoapps.course_groups.models import CourseUserGroup
@@ -82,6 +93,9 @@ UPDATE_STATUS_SKIPPED = 'skipped'
 # The setting name used for events when "settings" (account settings, preferences, profile information) change.
 REPORT_REQUESTED_EVENT_NAME = u'edx.instructor.report.requested'
 
+# ReportStore namespace of the partial reports generated by the subtasks of a report task
+REPORT_SHARDS_NAMESPACE = 'shards'
+
 
 class BaseInstructorTask(Task):
     """
@@ -626,6 +640,17 @@ def upload_csv_to_report_store(rows, csv_name, course_id, timestamp, config_name
     tracker.emit(REPORT_REQUESTED_EVENT_NAME, {"report_type": csv_name, })
 
 
+def _upload_csv_rows_to_report_store(rows, csv_name, course_id, timestamp):
+    """
+    Upload `rows` (the header first) as a CSV using ReportStore, only if there are
+    rows besides the header.
+    """
+    header = next(rows, None)
+    first_row = next(rows, None)
+    if first_row is not None:
+        upload_csv_to_report_store(chain([header, first_row], rows), csv_name, course_id, timestamp)
+
+
 def upload_exec_summary_to_store(data_dict, report_name, course_id, generated_at, config_name='FINANCIAL_REPORTS'):
     """
     Upload Executive Summary Html file using ReportStore.
@@ -656,7 +681,7 @@ def upload_exec_summary_to_store(data_dict, report_name, course_id, generated_at
     tracker.emit(REPORT_REQUESTED_EVENT_NAME, {"report_type": report_name})
 
 
-def upload_grades_csv(_xmodule_instance_args, _entry_id, course_id, _task_input, action_name):  # pylint: disable=too-many-statements
+def upload_grades_csv(_xmodule_instance_args, _entry_id, course_id, _task_input, action_name):
     """
     For a given `course_id`, generate a grades CSV file for all students that
     are enrolled, and store using a `ReportStore`. Once created, the files can
@@ -665,15 +690,18 @@ def upload_grades_csv(_xmodule_instance_args, _entry_id, course_id, _task_input,
     buffered, so we'll never write part of a CSV file to S3 -- i.e. any files
     that are visible in ReportStore will be complete ones.
 
+    If there are more than `settings.GRADES_DOWNLOAD_STUDENTS_PER_TASK` students,
+    they are graded by subtasks instead, see `_queue_report_shards()`.
+
     As we start to add more CSV downloads, it will probably be worthwhile to
     make a more general CSVDoc class instead of building out the rows like we
     do here.
     """
     start_time = time()
     start_date = datetime.now(UTC)
-    status_interval = 100
     enrolled_students = CourseEnrollment.objects.users_enrolled_in(course_id)
-    task_progress = TaskProgress(action_name, enrolled_students.count(), start_time)
+    total_enrolled_students = enrolled_students.count()
+    task_progress = TaskProgress(action_name, total_enrolled_students, start_time)
 
     fmt = u'Task: {task_id}, InstructorTask ID: {entry_id}, Course: {course_id}, Input: {task_input}'
     task_info_string = fmt.format(
@@ -684,6 +712,40 @@ def upload_grades_csv(_xmodule_instance_args, _entry_id, course_id, _task_input,
     )
     TASK_LOG.info(u'%s, Task type: %s, Starting task execution', task_info_string, action_name)
 
+    if total_enrolled_students > settings.GRADES_DOWNLOAD_STUDENTS_PER_TASK:
+        return _queue_report_shards(_entry_id, action_name, 'grade_report', enrolled_students, total_enrolled_students)
+
+    # Perform the actual upload, which grades the students as it consumes the rows
+    err_rows = []
+    upload_csv_to_report_store(
+        _grade_report_rows(course_id, enrolled_students, task_progress, err_rows, task_info_string),
+        'grade_report',
+        course_id,
+        start_date
+    )
+
+    current_step = {'step': 'Uploading CSVs'}
+    task_progress.update_task_state(extra_meta=current_step)
+    TASK_LOG.info(u'%s, Task type: %s, Current step: %s', task_info_string, action_name, current_step)
+
+    # If there are any error rows (don't count the header), write them out as well
+    if len(err_rows) > 1:
+        upload_csv_to_report_store(err_rows, 'grade_report_err', course_id, start_date)
+
+    # One last update before we close out...
+    TASK_LOG.info(u'%s, Task type: %s, Finalizing grade task', task_info_string, action_name)
+    return task_progress.update_task_state(extra_meta=current_step)
+
+
+def _grade_report_rows(course_id, students, task_progress, err_rows, task_info_string):  # pylint: disable=too-many-statements
+    """
+    Grade `students` and yield the rows of the grade report, the header first
+    (once a student has been graded). Failures are appended to `err_rows`,
+    after their header.
+    """
+    status_interval = 100
+    action_name = task_progress.action_name
+
     course = get_course_by_id(course_id)
     course_is_cohorted = is_course_cohorted(course.id)
     teams_enabled = course.teams_enabled
@@ -697,13 +759,13 @@ def upload_grades_csv(_xmodule_instance_args, _entry_id, course_id, _task_input,
     certificate_whitelist = CertificateWhitelist.objects.filter(course_id=course_id, whitelist=True)
     whitelisted_user_ids = [entry.user_id for entry in certificate_whitelist]
 
-    # Loop over all our students and build our CSV lists in memory
+    # Loop over all our students and yield the rows of our CSV, so that they are written out
+    # while grading rather than built in memory
     header = None
-    rows = []
-    err_rows = [["id", "username", "error_msg"]]
+    err_rows.append(["id", "username", "error_msg"])
     current_step = {'step': 'Calculating Grades'}
 
-    total_enrolled_students = enrolled_students.count()
+    total_enrolled_students = task_progress.total
     student_counter = 0
     TASK_LOG.info(
         u'%s, Task type: %s, Current step: %s, Starting grade calculation for total students: %s',
@@ -713,7 +775,7 @@ def upload_grades_csv(_xmodule_instance_args, _entry_id, course_id, _task_input,
 
         total_enrolled_students
     )
-    for student, gradeset, err_msg in iterate_grades_for(course_id, enrolled_students):
+    for student, gradeset, err_msg in iterate_grades_for(course_id, students):
         # Periodically update task status (this is a cache write)
         if task_progress.attempted % status_interval == 0:
             task_progress.update_task_state(extra_meta=current_step)
@@ -736,7 +798,7 @@ def upload_grades_csv(_xmodule_instance_args, _entry_id, course_id, _task_input,
             task_progress.succeeded += 1
             if not header:
                 header = [section['label'] for section in gradeset[u'section_breakdown']]
-                rows.append(
+                yield (
                     ["id", "email", "username", "grade"] + header + cohorts_header +
                     group_configs_header + teams_header +
                     ['Enrollment Track', 'Verification Status'] + certificate_info_header
@@ -786,7 +848,7 @@ def upload_grades_csv(_xmodule_instance_args, _entry_id, course_id, _task_input,
             # possible for a student to have a 0.0 show up in their row but
             # still have 100% for the course.
             row_percents = [percents.get(label, 0.0) for label in header]
-            rows.append(
+            yield (
                 [student.id, student.email, student.username, gradeset['percent']] +
                 row_percents + cohorts_group_name + group_configs_group_names + team_name +
                 [enrollment_mode] + [verification_status] + certificate_info
@@ -805,22 +867,6 @@ def upload_grades_csv(_xmodule_instance_args, _entry_id, course_id, _task_input,
         total_enrolled_students
     )
 
-    # By this point, we've got the rows we're going to stuff into our CSV files.
-    current_step = {'step': 'Uploading CSVs'}
-    task_progress.update_task_state(extra_meta=current_step)
-    TASK_LOG.info(u'%s, Task type: %s, Current step: %s', task_info_string, action_name, current_step)
-
-    # Perform the actual upload
-    upload_csv_to_report_store(rows, 'grade_report', course_id, start_date)
-
-    # If there are any error rows (don't count the header), write them out as well
-    if len(err_rows) > 1:
-        upload_csv_to_report_store(err_rows, 'grade_report_err', course_id, start_date)
-
-    # One last update before we close out...
-    TASK_LOG.info(u'%s, Task type: %s, Finalizing grade task', task_info_string, action_name)
-    return task_progress.update_task_state(extra_meta=current_step)
-
 
 def _order_problems(blocks):
     """
@@ -910,33 +956,63 @@ def upload_problem_grade_report(_xmodule_instance_args, _entry_id, course_id, _t
     """
     Generate a CSV containing all students' problem grades within a given
     `course_id`.
+
+    If there are more than `settings.GRADES_DOWNLOAD_STUDENTS_PER_TASK` students,
+    they are graded by subtasks instead, see `_queue_report_shards()`.
     """
     start_time = time()
     start_date = datetime.now(UTC)
-    status_interval = 100
     enrolled_students = CourseEnrollment.objects.users_enrolled_in(course_id)
-    task_progress = TaskProgress(action_name, enrolled_students.count(), start_time)
+    total_enrolled_students = enrolled_students.count()
+    task_progress = TaskProgress(action_name, total_enrolled_students, start_time)
+
+    if not CourseStructure.objects.filter(course_id=course_id).exists():
+        return task_progress.update_task_state(
+            extra_meta={'step': 'Generating course structure. Please refresh and try again.'}
+        )
+
+    if total_enrolled_students > settings.GRADES_DOWNLOAD_STUDENTS_PER_TASK:
+        return _queue_report_shards(
+            _entry_id, action_name, 'problem_grade_report', enrolled_students, total_enrolled_students
+        )
+
+    # Perform the upload if any students have been successfully graded
+    error_rows = []
+    _upload_csv_rows_to_report_store(
+        _problem_grade_report_rows(course_id, enrolled_students, task_progress, error_rows, None),
+        'problem_grade_report',
+        course_id,
+        start_date
+    )
+    # If there are any error rows, write them out as well
+    if len(error_rows) > 1:
+        upload_csv_to_report_store(error_rows, 'problem_grade_report_err', course_id, start_date)
+
+    return task_progress.update_task_state(extra_meta={'step': 'Uploading CSV'})
+
+
+def _problem_grade_report_rows(course_id, students, task_progress, error_rows, _task_info_string):
+    """
+    Grade `students` and yield the rows of the problem grade report, the header
+    first. Failures are appended to `error_rows`, after their header.
+    """
+    status_interval = 100
 
     # This struct encapsulates both the display names of each static item in the
     # header row as values as well as the django User field names of those items
     # as the keys.  It is structured in this way to keep the values related.
     header_row = OrderedDict([('id', 'Student ID'), ('email', 'Email'), ('username', 'Username')])
 
-    try:
-        course_structure = CourseStructure.objects.get(course_id=course_id)
-        blocks = course_structure.ordered_blocks
-        problems = _order_problems(blocks)
-    except CourseStructure.DoesNotExist:
-        return task_progress.update_task_state(
-            extra_meta={'step': 'Generating course structure. Please refresh and try again.'}
-        )
+    course_structure = CourseStructure.objects.get(course_id=course_id)
+    blocks = course_structure.ordered_blocks
+    problems = _order_problems(blocks)
 
     # Just generate the static fields for now.
-    rows = [list(header_row.values()) + ['Final Grade'] + list(chain.from_iterable(problems.values()))]
-    error_rows = [list(header_row.values()) + ['error_msg']]
+    error_rows.append(list(header_row.values()) + ['error_msg'])
+    yield list(header_row.values()) + ['Final Grade'] + list(chain.from_iterable(problems.values()))
     current_step = {'step': 'Calculating Grades'}
 
-    for student, gradeset, err_msg in iterate_grades_for(course_id, enrolled_students, keep_raw_scores=True):
+    for student, gradeset, err_msg in iterate_grades_for(course_id, students, keep_raw_scores=True):
         student_fields = [getattr(student, field_name) for field_name in header_row]
         task_progress.attempted += 1
 
@@ -964,20 +1040,217 @@ def upload_problem_grade_report(_xmodule_instance_args, _entry_id, course_id, _t
                 # the case that the student does not have access to it (e.g. A/B
                 # test or cohorted courseware).
                 earned_possible_values.append(['N/A', 'N/A'])
-        rows.append(student_fields + [final_grade] + list(chain.from_iterable(earned_possible_values)))
+        yield student_fields + [final_grade] + list(chain.from_iterable(earned_possible_values))
 
         task_progress.succeeded += 1
         if task_progress.attempted % status_interval == 0:
             task_progress.update_task_state(extra_meta=current_step)
 
-    # Perform the upload if any students have been successfully graded
-    if len(rows) > 1:
-        upload_csv_to_report_store(rows, 'problem_grade_report', course_id, start_date)
-    # If there are any error rows, write them out as well
-    if len(error_rows) > 1:
-        upload_csv_to_report_store(error_rows, 'problem_grade_report_err', course_id, start_date)
 
-    return task_progress.update_task_state(extra_meta={'step': 'Uploading CSV'})
+# Functions yielding the rows of the reports that can be split into report shards, by report name.
+# They take the course id, the students, the TaskProgress, the list to append the error rows to and
+# a string identifying the task for logging, and yield the header first.
+SHARDED_REPORT_ROW_GENERATORS = {
+    'grade_report': _grade_report_rows,
+    'problem_grade_report': _problem_grade_report_rows,
+}
+
+
+def _queue_report_shards(entry_id, action_name, csv_name, students, total_num_students):
+    """
+    Split the generation of the report `csv_name` into subtasks, which each grade
+    `settings.GRADES_DOWNLOAD_STUDENTS_PER_TASK` of `students` (in order of id) and
+    store the rows as a partial report, see `upload_report_shard()`. The last of
+    them to complete queues one more subtask, which merges the partial reports in
+    order, see `merge_and_upload_report_shards()`.
+
+    Returns the task progress as stored in the InstructorTask object.
+    """
+    # Avoid the circular import of the tasks, which import this module
+    from instructor_task.tasks import calculate_report_shard
+
+    entry = InstructorTask.objects.get(pk=entry_id)
+    # Check to see if subtasks have already been defined, in case this task has been
+    # requeued (see perform_delegate_email_batches).
+    if len(entry.subtasks) > 0 and len(entry.task_output) > 0:
+        TASK_LOG.warning(
+            u"Task %s has already been split into report shards! InstructorTask = %s", entry.task_id, entry
+        )
+        return json.loads(entry.task_output)
+
+    merge_subtask_id = str(uuid4())
+    shard_nums = count()
+
+    def _create_report_shard_subtask(student_list, initial_subtask_status):
+        """Creates a subtask to generate a partial report for a given list of students."""
+        return calculate_report_shard.subtask(
+            (
+                entry_id,
+                csv_name,
+                next(shard_nums),
+                [student['pk'] for student in student_list],
+                merge_subtask_id,
+                initial_subtask_status.to_dict(),
+            ),
+            task_id=initial_subtask_status.task_id,
+            routing_key=settings.GRADES_DOWNLOAD_ROUTING_KEY,
+        )
+
+    return queue_subtasks_for_query(
+        entry,
+        action_name,
+        _create_report_shard_subtask,
+        [students.order_by('id')],
+        [],
+        settings.GRADES_DOWNLOAD_STUDENTS_PER_TASK,
+        total_num_students,
+        final_subtask_id=merge_subtask_id,
+    )
+
+
+def _report_shard_filename(entry_id, csv_name, shard_num):
+    """
+    Return the name of the partial report `csv_name` generated by the subtask `shard_num`.
+    """
+    return u"{entry_id}_{csv_name}_{shard_num:05d}.csv".format(
+        entry_id=entry_id,
+        csv_name=csv_name,
+        shard_num=shard_num
+    )
+
+
+def upload_report_shard(entry_id, csv_name, shard_num, user_ids, merge_subtask_id, subtask_status_dict):
+    """
+    Grade the students `user_ids` and store the rows of the report `csv_name`
+    (and of its errors) as partial reports, then queue the merge subtask
+    `merge_subtask_id` if this is the last of the report shards to complete.
+
+    Returns the SubtaskStatus of this subtask as a dict.
+    """
+    subtask_status = SubtaskStatus.from_dict(subtask_status_dict)
+    current_task_id = subtask_status.task_id
+    fmt = u'Task: {task_id}, InstructorTask ID: {entry_id}, Shard: {shard_num}'
+    task_info_string = fmt.format(task_id=current_task_id, entry_id=entry_id, shard_num=shard_num)
+    action_name = None
+
+    err_rows = []
+    try:
+        check_subtask_is_valid(entry_id, current_task_id, subtask_status)
+
+        entry = InstructorTask.objects.get(pk=entry_id)
+        course_id = entry.course_id
+        action_name = json.loads(entry.task_output)['action_name']
+        students = CourseEnrollment.objects.users_enrolled_in(course_id).filter(id__in=user_ids).order_by('id')
+        task_progress = TaskProgress(action_name, len(user_ids), time())
+        TASK_LOG.info(
+            u'%s, Course: %s, Task type: %s, Starting report shard for %s students',
+            task_info_string, course_id, action_name, len(user_ids)
+        )
+
+        rows = SHARDED_REPORT_ROW_GENERATORS[csv_name](course_id, students, task_progress, err_rows, task_info_string)
+        report_store = ReportStore.from_config('GRADES_DOWNLOAD', REPORT_SHARDS_NAMESPACE)
+        report_store.store_rows(course_id, _report_shard_filename(entry_id, csv_name, shard_num), rows)
+        report_store.store_rows(course_id, _report_shard_filename(entry_id, csv_name + '_err', shard_num), err_rows)
+    except DuplicateTaskException:
+        # Another execution of this subtask is running or has completed, and records its status
+        raise
+    except Exception:
+        # We don't know how far the subtask got, so we count all students as having failed.
+        TASK_LOG.exception(u'%s, Task type: %s, Report shard failed', task_info_string, action_name)
+        subtask_status.increment(failed=len(user_ids), state=FAILURE)
+        _update_report_shard_status(entry_id, csv_name, merge_subtask_id, subtask_status)
+        raise
+
+    subtask_status.increment(succeeded=task_progress.succeeded, failed=task_progress.failed, state=SUCCESS)
+    _update_report_shard_status(entry_id, csv_name, merge_subtask_id, subtask_status)
+    TASK_LOG.info(u'%s, Task type: %s, Report shard completed: %s', task_info_string, action_name, subtask_status)
+    return subtask_status.to_dict()
+
+
+def _update_report_shard_status(entry_id, csv_name, merge_subtask_id, subtask_status):
+    """
+    Update the status of a report shard subtask, and queue the merge subtask
+    if it is the only one left.
+    """
+    # Avoid the circular import of the tasks, which import this module
+    from instructor_task.tasks import merge_report_shards
+
+    num_remaining = update_subtask_status(entry_id, subtask_status.task_id, subtask_status)
+    # Several report shards completing at the same time may see that only the merge subtask is
+    # left, so make sure that only one of them queues it (cache.add fails if the key already exists)
+    merge_key = "report-shards-merge-{}".format(merge_subtask_id)
+    if num_remaining == 1 and cache.add(merge_key, 'true', SUBTASK_LOCK_EXPIRE):
+        merge_report_shards.apply_async(
+            (entry_id, csv_name, SubtaskStatus.create(merge_subtask_id).to_dict()),
+            task_id=merge_subtask_id,
+            routing_key=settings.GRADES_DOWNLOAD_ROUTING_KEY,
+        )
+
+
+def _merge_report_shard_rows(report_store, course_id, filenames):
+    """
+    Yield the rows of the partial reports `filenames` in order, with the header
+    of the first non-empty one only.
+    """
+    header = None
+    for filename in filenames:
+        rows = report_store.read_rows(course_id, filename)
+        shard_header = next(rows, None)
+        if header is None and shard_header is not None:
+            header = shard_header
+            yield header
+        for row in rows:
+            yield row
+
+
+def merge_and_upload_report_shards(entry_id, csv_name, subtask_status_dict):
+    """
+    Merge the partial reports of `csv_name` (and of its errors) generated by
+    the report shard subtasks, upload the results as the reports of the task,
+    and delete the partial reports. Nothing is uploaded if a report shard has
+    failed.
+
+    Returns the SubtaskStatus of this subtask as a dict.
+    """
+    subtask_status = SubtaskStatus.from_dict(subtask_status_dict)
+    current_task_id = subtask_status.task_id
+    check_subtask_is_valid(entry_id, current_task_id, subtask_status)
+
+    entry = InstructorTask.objects.get(pk=entry_id)
+    course_id = entry.course_id
+    start_date = datetime.now(UTC)
+    shard_states = [
+        status['state'] for task_id, status in get_subtask_statuses(entry).iteritems()
+        if task_id != current_task_id
+    ]
+    report_store = ReportStore.from_config('GRADES_DOWNLOAD', REPORT_SHARDS_NAMESPACE)
+    report_names = [csv_name, csv_name + '_err']
+
+    try:
+        if all(state == SUCCESS for state in shard_states):
+            for report_name in report_names:
+                rows = _merge_report_shard_rows(
+                    report_store,
+                    course_id,
+                    [_report_shard_filename(entry_id, report_name, shard_num) for shard_num in range(len(shard_states))]
+                )
+                _upload_csv_rows_to_report_store(rows, report_name, course_id, start_date)
+            subtask_status.increment(state=SUCCESS)
+        else:
+            TASK_LOG.warning(u"Report shards of instructor task %s failed: %s not uploaded", entry_id, csv_name)
+            subtask_status.increment(state=FAILURE)
+    except Exception:
+        TASK_LOG.exception(u"Merging report shards of instructor task %s failed", entry_id)
+        subtask_status.increment(state=FAILURE)
+        update_subtask_status(entry_id, current_task_id, subtask_status)
+        raise
+    finally:
+        for report_name in report_names:
+            for shard_num in range(len(shard_states)):
+                report_store.delete(course_id, _report_shard_filename(entry_id, report_name, shard_num))
+
+    update_subtask_status(entry_id, current_task_id, subtask_status)
+    return subtask_status.to_dict()
 
 
 def upload_students_csv(_xmodule_instance_args, _entry_id, course_id, task_input, action_name):
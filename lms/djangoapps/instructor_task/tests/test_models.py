@@ -3,7 +3,10 @@ Tests for instructor_task/models.py.
 """
 
 from cStringIO import StringIO
+import gzip
 import mock
+import os
+import stat
 import time
 from datetime import datetime
 from unittest import TestCase
@@ -30,10 +33,38 @@ class MockKey(object):
         return "http://fake-edx-s3.edx.org/"
 
 
+class MockMultiPartUpload(object):
+    """ Mocking a boto S3 MultiPartUpload object. """
+    def __init__(self, key_name):
+        self.key_name = key_name
+        self.parts = {}
+        self.completed = False
+        self.cancelled = False
+
+    def upload_part_from_file(self, fp, part_num):
+        """ Expected method on a MultiPartUpload object. """
+        self.parts[part_num] = fp.read()
+
+    def complete_upload(self):
+        """ Expected method on a MultiPartUpload object. """
+        self.completed = True
+
+    def cancel_upload(self):
+        """ Expected method on a MultiPartUpload object. """
+        self.cancelled = True
+
+
 class MockBucket(object):
     """ Mocking a boto S3 Bucket object. """
     def __init__(self, _name):
         self.keys = []
+        self.multipart_uploads = []
+
+    def initiate_multipart_upload(self, key_name, headers):  # pylint: disable=unused-argument
+        """ Expected method on a Bucket object. """
+        multipart_upload = MockMultiPartUpload(key_name)
+        self.multipart_uploads.append(multipart_upload)
+        return multipart_upload
 
     def store_key(self, key):
         """ Not a Bucket method, created just to store the keys in the Bucket for testing purposes. """
@@ -93,6 +124,43 @@ class LocalFSReportStoreTestCase(ReportStoreTestMixin, TestReportMixin, TestCase
         """ Create and return a LocalFSReportStore. """
         return LocalFSReportStore.from_config(config_name='GRADES_DOWNLOAD')
 
+    def test_store_rows_from_generator(self):
+        """
+        Test that store_rows() writes out the rows of a generator, leaving no temporary file.
+        """
+        report_store = self.create_report_store()
+        report_store.store_rows(self.course_id, 'rows.csv', (['row', unicode(i)] for i in range(3)))
+
+        with open(report_store.path_to(self.course_id, 'rows.csv')) as report_file:
+            self.assertEqual(report_file.read(), 'row,0\r\nrow,1\r\nrow,2\r\n')
+        self.assertEqual([link[0] for link in report_store.links_for(self.course_id)], ['rows.csv'])
+
+    def test_store_rows_mode(self):
+        """
+        Test that store_rows() creates files with the mode given by the umask, as store() does.
+        """
+        report_store = self.create_report_store()
+        umask = os.umask(0o022)
+        try:
+            report_store.store_rows(self.course_id, 'rows.csv', [['a', 'b']])
+        finally:
+            os.umask(umask)
+
+        mode = os.stat(report_store.path_to(self.course_id, 'rows.csv')).st_mode
+        self.assertEqual(stat.S_IMODE(mode), 0o644)
+
+    def test_namespace(self):
+        """
+        Test that files stored in a namespace can be read back and deleted, and are not listed for download.
+        """
+        report_store = LocalFSReportStore.from_config(config_name='GRADES_DOWNLOAD', namespace='shards')
+        report_store.store_rows(self.course_id, 'rows.csv', [[u'ni\xf1o', u'1']])
+
+        self.assertEqual(list(report_store.read_rows(self.course_id, 'rows.csv')), [[u'ni\xf1o', u'1']])
+        self.assertEqual(self.create_report_store().links_for(self.course_id), [])
+        report_store.delete(self.course_id, 'rows.csv')
+        self.assertEqual(report_store.links_for(self.course_id), [])
+
 
 @mock.patch('instructor_task.models.S3Connection', new=MockS3Connection)
 @mock.patch('instructor_task.models.Key', new=MockKey)
@@ -105,3 +173,49 @@ class S3ReportStoreTestCase(ReportStoreTestMixin, TestReportMixin, TestCase):
     def create_report_store(self):
         """ Create and return a S3ReportStore. """
         return S3ReportStore.from_config(config_name='GRADES_DOWNLOAD')
+
+    def test_store_rows_small(self):
+        """
+        Test that store_rows() stores a report smaller than a part with a single request.
+        """
+        report_store = self.create_report_store()
+        report_store.store_rows(self.course_id, 'rows.csv', [['a', 'b']])
+
+        self.assertEqual(len(report_store.bucket.keys), 1)
+        self.assertEqual(report_store.bucket.multipart_uploads, [])
+
+    @mock.patch('instructor_task.models.REPORT_UPLOAD_PART_SIZE', new=1)
+    def test_store_rows_multipart(self):
+        """
+        Test that store_rows() uploads a report larger than a part by a multipart upload.
+        """
+        report_store = self.create_report_store()
+        rows = [['row', unicode(i)] for i in range(3)]
+        report_store.store_rows(self.course_id, 'rows.csv', rows)
+
+        self.assertEqual(report_store.bucket.keys, [])
+        multipart_upload, = report_store.bucket.multipart_uploads
+        self.assertTrue(multipart_upload.completed)
+        contents = ''.join(multipart_upload.parts[i] for i in sorted(multipart_upload.parts))
+        self.assertEqual(
+            gzip.GzipFile(fileobj=StringIO(contents)).read(),
+            'row,0\r\nrow,1\r\nrow,2\r\n'
+        )
+
+    @mock.patch('instructor_task.models.REPORT_UPLOAD_PART_SIZE', new=1)
+    def test_store_rows_multipart_error(self):
+        """
+        Test that store_rows() cancels the multipart upload when generating rows fails.
+        """
+        def _rows():
+            """ Fail after a row has been uploaded. """
+            yield ['row', 'a' * 100]
+            raise ValueError()
+
+        report_store = self.create_report_store()
+        with self.assertRaises(ValueError):
+            report_store.store_rows(self.course_id, 'rows.csv', _rows())
+
+        multipart_upload, = report_store.bucket.multipart_uploads
+        self.assertTrue(multipart_upload.cancelled)
+        self.assertFalse(multipart_upload.completed)
@@ -1,13 +1,26 @@
 """
 Unit tests for instructor_task subtasks.
 """
+import json
 from uuid import uuid4
 
+from celery.states import SUCCESS
+from django.contrib.auth.models import User
+from django.core.cache import cache
 from mock import Mock, patch
 
 from student.models import CourseEnrollment
 
-from instructor_task.subtasks import queue_subtasks_for_query
+from instructor_task.models import InstructorTask
+from instructor_task.subtasks import (
+    SubtaskStatus,
+    filter_id_range,
+    get_subtask_progress,
+    initialize_subtask_info,
+    queue_subtasks_for_id_ranges,
+    queue_subtasks_for_query,
+    update_subtask_status,
+)
 from instructor_task.tests.factories import InstructorTaskFactory
 from instructor_task.tests.test_base import InstructorTaskCourseTestCase
 
@@ -80,3 +93,92 @@ class TestSubtasks(InstructorTaskCourseTestCase):
         self.assertEqual(len(mock_create_subtask_fcn_args[0][0][0]), 3)
         self.assertEqual(len(mock_create_subtask_fcn_args[1][0][0]), 3)
         self.assertEqual(len(mock_create_subtask_fcn_args[2][0][0]), 5)
+
+    @patch('instructor_task.subtasks.ITEM_IDS_PAGE_SIZE', 2)
+    def test_queue_subtasks_for_id_ranges(self):
+        """Test that queue_subtasks_for_id_ranges() gives subtasks ranges of ids covering all items."""
+
+        self._enroll_students_in_course(self.course.id, 8)
+        instructor_task = InstructorTaskFactory.create(
+            course_id=self.course.id,
+            task_id=str(uuid4()),
+            task_key='dummy_task_key',
+            task_type='bulk_course_email',
+        )
+        queryset = User.objects.filter(courseenrollment__course_id=self.course.id)
+        user_ids = sorted(queryset.values_list('id', flat=True))
+
+        mock_create_subtask_fcn = Mock()
+        queue_subtasks_for_id_ranges(
+            entry=instructor_task,
+            action_name='action_name',
+            create_subtask_fcn=mock_create_subtask_fcn,
+            item_querysets=[queryset],
+            items_per_task=3,
+            total_num_items=len(user_ids),
+        )
+
+        id_ranges = [args[0] for args, __ in mock_create_subtask_fcn.call_args_list]
+        self.assertEqual(len(id_ranges), len(json.loads(instructor_task.subtasks)['status']))
+        self.assertIsNone(id_ranges[0]['start'])
+        self.assertIsNone(id_ranges[-1]['end'])
+        for index, id_range in enumerate(id_ranges):
+            expected_user_ids = user_ids[index * 3:(index + 1) * 3]
+            self.assertEqual(id_range['count'], len(expected_user_ids))
+            range_user_ids = filter_id_range(queryset, id_range).values_list('id', flat=True)
+            self.assertEqual(sorted(range_user_ids), expected_user_ids)
+
+    def test_update_subtask_status(self):
+        """Test that subtask statuses are aggregated, and stored into the InstructorTask once all are completed."""
+
+        instructor_task = InstructorTaskFactory.create(course_id=self.course.id, task_key='dummy_task_key')
+        subtask_ids = [str(uuid4()) for _ in range(2)]
+        initialize_subtask_info(instructor_task, 'emailed', 5, subtask_ids)
+
+        num_remaining = update_subtask_status(
+            instructor_task.id, subtask_ids[0], SubtaskStatus.create(subtask_ids[0], succeeded=2, state=SUCCESS))
+        self.assertEqual(num_remaining, 1)
+        instructor_task = InstructorTask.objects.get(id=instructor_task.id)
+        self.assertNotEqual(instructor_task.task_state, SUCCESS)
+        progress = get_subtask_progress(instructor_task)
+        self.assertEqual((progress['attempted'], progress['succeeded'], progress['failed']), (2, 2, 0))
+
+        num_remaining = update_subtask_status(
+            instructor_task.id, subtask_ids[1], SubtaskStatus.create(subtask_ids[1], failed=3, state=SUCCESS))
+        self.assertEqual(num_remaining, 0)
+        instructor_task = InstructorTask.objects.get(id=instructor_task.id)
+        self.assertEqual(instructor_task.task_state, SUCCESS)
+        task_output = json.loads(instructor_task.task_output)
+        self.assertEqual((task_output['attempted'], task_output['succeeded'], task_output['failed']), (5, 2, 3))
+        subtask_dict = json.loads(instructor_task.subtasks)
+        self.assertEqual(subtask_dict['succeeded'], 2)
+        self.assertEqual(subtask_dict['status'][subtask_ids[1]]['failed'], 3)
+
+    def test_update_subtask_status_progress(self):
+        """Test that the progress of running subtasks is written into the InstructorTask periodically."""
+
+        instructor_task = InstructorTaskFactory.create(course_id=self.course.id, task_key='dummy_task_key')
+        subtask_ids = [str(uuid4()) for _ in range(3)]
+        initialize_subtask_info(instructor_task, 'emailed', 6, subtask_ids)
+        cache.delete("subtask-progress-{}".format(instructor_task.id))
+
+        update_subtask_status(
+            instructor_task.id, subtask_ids[0], SubtaskStatus.create(subtask_ids[0], succeeded=2, state=SUCCESS))
+        instructor_task = InstructorTask.objects.get(id=instructor_task.id)
+        self.assertNotEqual(instructor_task.task_state, SUCCESS)
+        task_output = json.loads(instructor_task.task_output)
+        self.assertEqual((task_output['attempted'], task_output['succeeded'], task_output['failed']), (2, 2, 0))
+
+        # Not written again within the update interval
+        update_subtask_status(
+            instructor_task.id, subtask_ids[1], SubtaskStatus.create(subtask_ids[1], failed=2, state=SUCCESS))
+        task_output = json.loads(InstructorTask.objects.get(id=instructor_task.id).task_output)
+        self.assertEqual((task_output['attempted'], task_output['succeeded'], task_output['failed']), (2, 2, 0))
+
+        cache.delete("subtask-progress-{}".format(instructor_task.id))
+        update_subtask_status(
+            instructor_task.id, subtask_ids[2], SubtaskStatus.create(subtask_ids[2], succeeded=2, state=SUCCESS))
+        instructor_task = InstructorTask.objects.get(id=instructor_task.id)
+        self.assertEqual(instructor_task.task_state, SUCCESS)
+        task_output = json.loads(instructor_task.task_output)
+        self.assertEqual((task_output['attempted'], task_output['succeeded'], task_output['failed']), (6, 4, 2))
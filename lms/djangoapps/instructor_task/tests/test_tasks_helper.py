@@ -10,6 +10,8 @@ import ddt
 from mock import Mock, patch
 import tempfile
 import json
+from uuid import uuid4
+from celery.states import SUCCESS
 from openedx.core.djangoapps.course_groups import cohorts
 import unicodecsv
 from django.core.urlresolvers import reverse
@@ -32,7 +34,8 @@ from student.models import CourseEnrollment, CourseEnrollmentAllowed, ManualEnro
 from lms.djangoapps.verify_student.tests.factories import SoftwareSecurePhotoVerificationFactory
 from xmodule.modulestore.tests.factories import CourseFactory, ItemFactory
 from xmodule.partitions.partitions import Group, UserPartition
-from instructor_task.models import ReportStore
+from instructor_task.models import InstructorTask, ReportStore
+from instructor_task.tests.factories import InstructorTaskFactory
 from survey.models import SurveyForm, SurveyAnswer
 from instructor_task.tasks_helper import (
     cohort_students_and_upload,
@@ -45,6 +48,7 @@ from instructor_task.tasks_helper import (
     upload_exec_summary_report,
     upload_course_survey_report,
     generate_students_certificates,
+    REPORT_SHARDS_NAMESPACE,
 )
 from instructor_analytics.basic import UNAVAILABLE
 from openedx.core.djangoapps.util.testing import ContentGroupTestCase, TestConditionalContent
@@ -651,6 +655,73 @@ class TestProblemGradeReport(TestReportMixin, InstructorTaskModuleTestCase):
         ])
 
 
+@override_settings(GRADES_DOWNLOAD_STUDENTS_PER_TASK=1)
+class TestShardedGradeReport(TestReportMixin, InstructorTaskCourseTestCase):
+    """
+    Test that grade reports of courses with many students are generated by subtasks.
+    """
+    def setUp(self):
+        super(TestShardedGradeReport, self).setUp()
+        self.initialize_course()
+        self.students = [self.create_student(u'student{}'.format(i)) for i in range(3)]
+        self.entry = InstructorTaskFactory.create(
+            course_id=self.course.id,
+            task_id=str(uuid4()),
+            task_type='grade_course',
+        )
+
+    def _assert_entry_output(self, expected_output):
+        """
+        Verify the output of the InstructorTask and that the report shards have been deleted.
+        """
+        entry = InstructorTask.objects.get(pk=self.entry.id)
+        self.assertEqual(entry.task_state, SUCCESS)
+        self.assertDictContainsSubset(expected_output, json.loads(entry.task_output))
+        shard_store = ReportStore.from_config('GRADES_DOWNLOAD', REPORT_SHARDS_NAMESPACE)
+        self.assertEqual(shard_store.links_for(self.course.id), [])
+
+    @patch('instructor_task.tasks_helper._get_current_task')
+    def test_grade_report(self, _mock_current_task):
+        upload_grades_csv(None, self.entry.id, self.course.id, None, 'graded')
+
+        self.verify_rows_in_csv(
+            [{u'id': unicode(student.id), u'username': student.username} for student in self.students],
+            ignore_other_columns=True
+        )
+        self._assert_entry_output({'attempted': 3, 'succeeded': 3, 'failed': 0})
+
+    @patch('instructor_task.tasks_helper._get_current_task')
+    def test_problem_grade_report(self, _mock_current_task):
+        upload_problem_grade_report(None, self.entry.id, self.course.id, None, 'graded')
+
+        self.verify_rows_in_csv(
+            [{u'Student ID': unicode(student.id), u'Username': student.username} for student in self.students],
+            ignore_other_columns=True
+        )
+        self._assert_entry_output({'attempted': 3, 'succeeded': 3, 'failed': 0})
+
+    @patch('instructor_task.tasks_helper._get_current_task')
+    @patch('instructor_task.tasks_helper.get_course_by_id')
+    def test_report_shard_failure(self, mock_get_course_by_id, _mock_current_task):
+        mock_get_course_by_id.side_effect = [self.course, ValueError(), self.course]
+        upload_grades_csv(None, self.entry.id, self.course.id, None, 'graded')
+
+        report_store = ReportStore.from_config(config_name='GRADES_DOWNLOAD')
+        self.assertEqual(report_store.links_for(self.course.id), [])
+        self._assert_entry_output({'attempted': 3, 'succeeded': 2, 'failed': 1})
+
+    @patch('instructor_task.tasks_helper._get_current_task')
+    @patch('instructor_task.tasks_helper.check_subtask_is_valid')
+    def test_report_shard_failure_before_grading(self, mock_check_subtask_is_valid, _mock_current_task):
+        # the second report shard fails before grading its students, the merge subtask is checked last
+        mock_check_subtask_is_valid.side_effect = [None, ValueError(), None, None]
+        upload_grades_csv(None, self.entry.id, self.course.id, None, 'graded')
+
+        report_store = ReportStore.from_config(config_name='GRADES_DOWNLOAD')
+        self.assertEqual(report_store.links_for(self.course.id), [])
+        self._assert_entry_output({'attempted': 3, 'succeeded': 2, 'failed': 1})
+
+
 class TestProblemReportSplitTestContent(TestReportMixin, TestConditionalContent, InstructorTaskModuleTestCase):
     """
     Test the problem report on a course that has split tests.
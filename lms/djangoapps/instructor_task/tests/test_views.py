@@ -10,6 +10,7 @@ from mock import Mock, patch
 from django.utils.datastructures import MultiValueDict
 
 from instructor_task.models import PROGRESS
+from instructor_task.subtasks import SubtaskStatus, initialize_subtask_info, update_subtask_status
 from instructor_task.tests.test_base import (InstructorTaskTestCase,
                                              TEST_FAILURE_MESSAGE,
                                              TEST_FAILURE_EXCEPTION)
@@ -129,8 +130,13 @@ class InstructorTaskReportTest(InstructorTaskTestCase):
 
     def test_get_status_from_subtasks(self):
         # get status for a task that is in progress, with updates
-        # from subtasks.
-        instructor_task = self._create_email_subtask_entry(skipped=1)
+        # recorded by subtasks.
+        instructor_task = self._create_entry(task_state=PROGRESS)
+        instructor_task.task_input = json.dumps({'email_id': 134})
+        initialize_subtask_info(instructor_task, 'emailed', 5, ['subtask-1', 'subtask-2'])
+        subtask_status = SubtaskStatus.create('subtask-1', succeeded=2, failed=1, skipped=1, state=SUCCESS)
+        update_subtask_status(instructor_task.id, 'subtask-1', subtask_status)
+        update_subtask_status(instructor_task.id, 'subtask-2', SubtaskStatus.create('subtask-2', state=PROGRESS))
         task_id = instructor_task.task_id
         response = self._get_instructor_task_status(task_id)
         output = json.loads(response.content)
@@ -142,11 +148,12 @@ class InstructorTaskReportTest(InstructorTaskTestCase):
         expected_progress = {
             'attempted': 3,
             'succeeded': 2,
+            'failed': 1,
             'skipped': 1,
             'total': 5,
             'action_name': 'emailed',
         }
-        self.assertEquals(output['task_progress'], expected_progress)
+        self.assertDictContainsSubset(expected_progress, output['task_progress'])
 
     def _test_get_status_from_result(self, task_id, mock_result=None):
         """
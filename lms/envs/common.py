@@ -247,6 +247,10 @@ FEATURES = {
     # grades CSV files to S3 and give links for downloads.
     'ENABLE_S3_GRADE_DOWNLOADS': False,
 
+    # Persist grades of subsections and recompute only the subsections whose state has changed.
+    # Note: Delete all rows of courseware_persistentsubsectiongrade before enabling it again once disabled.
+    'ENABLE_PERSISTENT_SUBSECTION_GRADES': False,
+
     # whether to use password policy enforcement or not
     'ENFORCE_PASSWORD_POLICY': True,
 
@@ -419,6 +423,9 @@ DEFAULT_GROUPS = []
 # If this is true, random scores will be generated for the purpose of debugging the profile graphs
 GENERATE_PROFILE_SCORES = False
 
+# Number of students whose scores are fetched at once when grading many students (courseware.grades.iterate_grades_for)
+GRADES_BATCH_SIZE = 100
+
 # Used with XQueue
 XQUEUE_WAITTIME_BETWEEN_REQUESTS = 5  # seconds
 
@@ -576,6 +583,12 @@ AUTHENTICATION_BACKENDS = (
 STUDENT_FILEUPLOAD_MAX_SIZE = 4 * 1024 * 1024  # 4 MB
 MAX_FILEUPLOADS_PER_INPUT = 20
 
+# Scope.user_state fields whose saving to StudentModule is deferred to the end of the request,
+# so that many changes of them in a request are saved once, by block type.
+# Nothing is kept across requests, so changes made by separate requests are saved separately.
+# e.g. {'video': ['saved_video_position'], 'sequential': ['position']}
+STUDENT_MODULE_DEFERRED_FIELDS = {}
+
 # Dev machines shouldn't need the book
 # BOOK_URL = '/static/book/'
 BOOK_URL = 'https://mitxstatic.s3.amazonaws.com/book_images/'  # For AWS deploys
@@ -793,6 +806,14 @@ MODULESTORE = {
     }
 }
 
+# Max total size (bytes of pickled data) of split modulestore structures and definitions
+# kept decoded in the memory of each process, in front of the course_structure_cache.
+# Note: Cached objects are shared among requests, so this must not be set for Studio.
+SPLIT_MONGO_MEMORY_CACHE_MAX_SIZE = {
+    'structures': 128 * 1024 * 1024,
+    'definitions': 32 * 1024 * 1024,
+}
+
 #################### Python sandbox ############################################
 
 CODE_JAIL = {
@@ -1136,6 +1157,8 @@ simplefilter('ignore')
 
 MIDDLEWARE_CLASSES = (
     'request_cache.middleware.RequestCache',
+    # save the user state deferred during the request (must go after RequestCache)
+    'courseware.middleware.FlushUserStateMiddleware',
     'microsite_configuration.middleware.MicrositeMiddleware',
     'django_comment_client.middleware.AjaxExceptionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -1767,6 +1790,18 @@ BULK_EMAIL_LOG_SENT_EMAILS = False
 # parallel, and what the SES rate is.
 BULK_EMAIL_RETRY_DELAY_BETWEEN_SENDS = 0.02
 
+# The delay between individual mail messages adapts to the rate the mail server
+# accepts them: it grows when sending is throttled or when the server takes more than
+# this number of seconds to accept a message, and shrinks otherwise.
+BULK_EMAIL_SEND_LATENCY_TARGET = 1
+
+# Maximum delay in seconds between individual mail messages being sent.
+BULK_EMAIL_MAX_DELAY_BETWEEN_SENDS = 5
+
+# Number of seconds a worker keeps its SMTP connection open to reuse it for
+# the next bulk email tasks it runs.  Set to 0 to close it at the end of each task.
+BULK_EMAIL_CONNECTION_MAX_AGE = 300
+
 ############################# Email Opt In ####################################
 
 # Minimum age for organization-wide email opt in
@@ -2262,6 +2297,9 @@ GRADES_DOWNLOAD = {
     'ROOT_PATH': '/tmp/edx-s3/grades',
 }
 
+# Grade reports of courses with more students are split into subtasks of this number of students
+GRADES_DOWNLOAD_STUDENTS_PER_TASK = 1000
+
 FINANCIAL_REPORTS = {
     'STORAGE_TYPE': 'localfs',
     'BUCKET': 'edx-financial-reports',
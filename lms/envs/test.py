@@ -237,6 +237,9 @@ CACHES = {
     },
 }
 
+# Don't keep modulestore objects among tests
+SPLIT_MONGO_MEMORY_CACHE_MAX_SIZE = {}
+
 # Dummy secret key for dev
 SECRET_KEY = '85920908f28904ed733fe576320db18cabd7b6cd'
 ANONYMOUS_ID_SECRET_KEY = SECRET_KEY
@@ -351,6 +354,9 @@ GIT_REPO_DIR = TEST_ROOT / "course_repos"
 CELERY_ALWAYS_EAGER = True
 CELERY_RESULT_BACKEND = 'djcelery.backends.cache:CacheBackend'
 
+# Do not reuse SMTP connections across bulk email tasks, which tests mock separately
+BULK_EMAIL_CONNECTION_MAX_AGE = 0
+
 ######################### MARKETING SITE ###############################
 
 MKTG_URL_LINK_MAP = {
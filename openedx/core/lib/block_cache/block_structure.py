@@ -4,10 +4,14 @@ Module with family of classes for block structures.
     BlockStructureBlockData - responsible for block & transformer data.
     BlockStructureModulestoreData - responsible for xBlock data.
 
-The following internal data structures are implemented:
-    _BlockRelations - Data structure for a single block's relations.
-    _BlockData - Data structure for a single block's data.
+For compactness of both memory and the cached serialization, blocks
+are interned to integer indices.  Relations are stored as flat arrays
+of indices (CSR-style: an offsets array and an indices array), with
+per-block lists for relations changed after the arrays were built.
+Collected block data are stored column-wise, i.e. as maps of a field
+name to a map of a block index to the value.
 """
+from array import array
 from collections import defaultdict
 from logging import getLogger
 
@@ -23,20 +27,18 @@ logger = getLogger(__name__)  # pylint: disable=invalid-name
 TRANSFORMER_VERSION_KEY = '_version'
 
 
-class _BlockRelations(object):
+def _to_csr(lists):
     """
-    Data structure to encapsulate relationships for a single block,
-    including its children and parents.
+    Converts a list of lists of block indices to a tuple of an offsets
+    array and a flat indices array, where the items of lists[i] are
+    indices[offsets[i]:offsets[i + 1]].
     """
-    def __init__(self):
-
-        # List of usage keys of this block's parents.
-        # list [UsageKey]
-        self.parents = []
-
-        # List of usage keys of this block's children.
-        # list [UsageKey]
-        self.children = []
+    offsets = array('i', [0])
+    indices = array('i')
+    for items in lists:
+        indices.extend(items)
+        offsets.append(len(indices))
+    return offsets, indices
 
 
 class BlockStructure(object):
@@ -55,14 +57,28 @@ class BlockStructure(object):
         # UsageKey
         self.root_block_usage_key = root_block_usage_key
 
-        # Map of a block's usage key to its block relations. The
-        # existence of a block in the structure is determined by its
-        # presence in this map.
-        # defaultdict {UsageKey: _BlockRelations}
-        self._block_relations = defaultdict(_BlockRelations)
+        # List of usage keys of the interned blocks, and the map of a
+        # usage key to its index in the list.
+        # list [UsageKey], dict {UsageKey: int}
+        self._block_keys = []
+        self._block_indices = {}
+
+        # Flags of whether each interned block is in the structure.
+        # bytearray
+        self._block_presence = bytearray()
+
+        # Relations of the blocks as CSR-style arrays of indices.
+        # (array('i'), array('i'))
+        self._children_csr = (array('i', [0]), array('i'))
+        self._parents_csr = (array('i', [0]), array('i'))
+
+        # Relations of the blocks changed after the arrays were built.
+        # dict {int: [int]}
+        self._children_overrides = {}
+        self._parents_overrides = {}
 
         # Add the root block.
-        self._add_block(self._block_relations, root_block_usage_key)
+        self._add_block(root_block_usage_key)
 
     def __iter__(self):
         """
@@ -86,7 +102,9 @@ class BlockStructure(object):
         Returns:
             [UsageKey] - A list of usage keys of the block's parents.
         """
-        return self._block_relations[usage_key].parents if self.has_block(usage_key) else []
+        if not self.has_block(usage_key):
+            return []
+        return [self._block_keys[index] for index in self._get_parent_indices(self._block_indices[usage_key])]
 
     def get_children(self, usage_key):
         """
@@ -100,7 +118,9 @@ class BlockStructure(object):
         Returns:
             [UsageKey] - A list of usage keys of the block's children.
         """
-        return self._block_relations[usage_key].children if self.has_block(usage_key) else []
+        if not self.has_block(usage_key):
+            return []
+        return [self._block_keys[index] for index in self._get_child_indices(self._block_indices[usage_key])]
 
     def has_block(self, usage_key):
         """
@@ -115,7 +135,8 @@ class BlockStructure(object):
             bool - Whether or not a block with the given usage_key
                 is present in this block structure.
         """
-        return usage_key in self._block_relations
+        index = self._block_indices.get(usage_key)
+        return index is not None and bool(self._block_presence[index])
 
     def get_block_keys(self):
         """
@@ -125,7 +146,9 @@ class BlockStructure(object):
             iterator(UsageKey) - An iterator of the usage
             keys of all the blocks in the block structure.
         """
-        return self._block_relations.iterkeys()
+        return (
+            block_key for index, block_key in enumerate(self._block_keys) if self._block_presence[index]
+        )
 
     #--- Block structure traversal methods ---#
 
@@ -146,13 +169,15 @@ class BlockStructure(object):
             generator - A generator object created from the
                 traverse_topologically method.
         """
-        return traverse_topologically(
-            start_node=self.root_block_usage_key,
-            get_parents=self.get_parents,
-            get_children=self.get_children,
-            filter_func=filter_func,
-            yield_descendants_of_unyielded=yield_descendants_of_unyielded,
-        )
+        block_keys = self._block_keys
+        for index in traverse_topologically(
+                start_node=self._block_indices[self.root_block_usage_key],
+                get_parents=self._get_parent_indices,
+                get_children=self._get_child_indices,
+                filter_func=(lambda index: filter_func(block_keys[index])) if filter_func else None,
+                yield_descendants_of_unyielded=yield_descendants_of_unyielded,
+        ):
+            yield block_keys[index]
 
     def post_order_traversal(
             self,
@@ -170,11 +195,13 @@ class BlockStructure(object):
             generator - A generator object created from the
                 traverse_post_order method.
         """
-        return traverse_post_order(
-            start_node=self.root_block_usage_key,
-            get_children=self.get_children,
-            filter_func=filter_func,
-        )
+        block_keys = self._block_keys
+        for index in traverse_post_order(
+                start_node=self._block_indices[self.root_block_usage_key],
+                get_children=self._get_child_indices,
+                filter_func=(lambda index: filter_func(block_keys[index])) if filter_func else None,
+        ):
+            yield block_keys[index]
 
     #--- Internal methods ---#
     # To be used within the block_cache framework or by tests.
@@ -183,29 +210,27 @@ class BlockStructure(object):
         """
         Mutates this block structure by removing any unreachable blocks.
         """
-
-        # Create a new block relations map to store only those blocks
-        # that are still linked
-        pruned_block_relations = defaultdict(_BlockRelations)
-        old_block_relations = self._block_relations
-
-        # Build the structure from the leaves up by doing a post-order
-        # traversal of the old structure, thereby encountering only
-        # reachable blocks.
-        for block_key in self.post_order_traversal():
-            # If the block is in the old structure,
-            if block_key in old_block_relations:
-                # Add it to the new pruned structure
-                self._add_block(pruned_block_relations, block_key)
-
-                # Add a relationship to only those old children that
-                # were also added to the new pruned structure.
-                for child in old_block_relations[block_key].children:
-                    if child in pruned_block_relations:
-                        self._add_to_relations(pruned_block_relations, block_key, child)
-
-        # Replace this structure's relations with the newly pruned one.
-        self._block_relations = pruned_block_relations
+        # Mark the blocks reachable from the root.
+        reachable = bytearray(len(self._block_keys))
+        if self.has_block(self.root_block_usage_key):
+            for index in traverse_post_order(
+                    start_node=self._block_indices[self.root_block_usage_key],
+                    get_children=self._get_child_indices,
+            ):
+                reachable[index] = 1
+
+        # Remove the relations with unreachable parents.  Note that
+        # all the children of a reachable block are reachable.
+        for index, is_reachable in enumerate(reachable):
+            if is_reachable:
+                parents = self._get_parent_indices(index)
+                if not all(reachable[parent] for parent in parents):
+                    self._parents_overrides[index] = [parent for parent in parents if reachable[parent]]
+            elif self._block_presence[index]:
+                self._children_overrides[index] = []
+                self._parents_overrides[index] = []
+
+        self._block_presence = reachable
 
     def _add_relation(self, parent_key, child_key):
         """
@@ -215,55 +240,126 @@ class BlockStructure(object):
             parent_key (UsageKey) - Usage key of the parent block.
             child_key (UsageKey) - Usage key of the child block.
         """
-        self._add_to_relations(self._block_relations, parent_key, child_key)
+        parent_index = self._get_block_index(parent_key, add_to_structure=True)
+        child_index = self._get_block_index(child_key, add_to_structure=True)
+        self._get_children_override(parent_index).append(child_index)
+        self._get_parents_override(child_index).append(parent_index)
 
-    @staticmethod
-    def _add_to_relations(block_relations, parent_key, child_key):
+    def _add_block(self, usage_key):
         """
-        Adds a parent to child relationship in the given block
-        relations map.
+        Adds the given usage_key to this block structure without any
+        relations.
 
         Arguments:
-            block_relations (defaultdict({UsageKey: _BlockRelations})) -
-                Internal map of a block's usage key to its
-                parents/children relations.
+            usage_key (UsageKey) - Usage key of the block that is to
+                be added.
+        """
+        index = self._get_block_index(usage_key, add_to_structure=True)
+        self._children_overrides[index] = []
+        self._parents_overrides[index] = []
 
-            parent_key (UsageKey) - Usage key of the parent block.
+    def _get_block_index(self, usage_key, add_to_structure=False):
+        """
+        Returns the index of the given usage_key, interning it if needed.
 
-            child_key (UsageKey) - Usage key of the child block.
+        Arguments:
+            usage_key (UsageKey) - Usage key of the block.
+
+            add_to_structure (bool) - Whether to mark the block as
+                present in this block structure.
         """
-        block_relations[child_key].parents.append(parent_key)
-        block_relations[parent_key].children.append(child_key)
+        index = self._block_indices.get(usage_key)
+        if index is None:
+            index = len(self._block_keys)
+            self._block_keys.append(usage_key)
+            self._block_indices[usage_key] = index
+            self._block_presence.append(0)
+        if add_to_structure and not self._block_presence[index]:
+            self._block_presence[index] = 1
+        return index
 
     @staticmethod
-    def _add_block(block_relations, usage_key):
+    def _get_csr_items(csr, index):
+        """
+        Returns the items for the given index in the given CSR-style
+        arrays, or an empty list if the index is out of the arrays.
         """
-        Adds the given usage_key to the given block_relations map.
+        offsets, indices = csr
+        if index + 1 >= len(offsets):
+            return []
+        return indices[offsets[index]:offsets[index + 1]]
 
-        Arguments:
-            block_relations (defaultdict({UsageKey: _BlockRelations})) -
-                Internal map of a block's usage key to its
-                parents/children relations.
+    def _get_child_indices(self, index):
+        """
+        Returns the indices of the children of the block at the given index.
+        """
+        children = self._children_overrides.get(index)
+        return self._get_csr_items(self._children_csr, index) if children is None else children
 
-            usage_key (UsageKey) - Usage key of the block that is to
-                be added to the given block_relations.
+    def _get_parent_indices(self, index):
         """
-        block_relations[usage_key] = _BlockRelations()
+        Returns the indices of the parents of the block at the given index.
+        """
+        parents = self._parents_overrides.get(index)
+        return self._get_csr_items(self._parents_csr, index) if parents is None else parents
 
+    def _get_children_override(self, index):
+        """
+        Returns the mutable list of the children indices of the block
+        at the given index.
+        """
+        if index not in self._children_overrides:
+            self._children_overrides[index] = list(self._get_csr_items(self._children_csr, index))
+        return self._children_overrides[index]
 
-class _BlockData(object):
-    """
-    Data structure to encapsulate collected data for a single block.
-    """
-    def __init__(self):
-        # Map of xblock field name to the field's value for this block.
-        # dict {string: any picklable type}
-        self.xblock_fields = {}
+    def _get_parents_override(self, index):
+        """
+        Returns the mutable list of the parents indices of the block
+        at the given index.
+        """
+        if index not in self._parents_overrides:
+            self._parents_overrides[index] = list(self._get_csr_items(self._parents_csr, index))
+        return self._parents_overrides[index]
 
-        # Map of transformer name to the transformer's data for this
-        # block.
-        # defaultdict {string: dict}
-        self.transformer_data = defaultdict(dict)
+    def _compact_relations(self):
+        """
+        Merges the changed relations into the CSR-style arrays.
+        """
+        if not self._children_overrides and not self._parents_overrides:
+            return
+        block_range = range(len(self._block_keys))
+        self._children_csr = _to_csr([self._get_child_indices(index) for index in block_range])
+        self._parents_csr = _to_csr([self._get_parent_indices(index) for index in block_range])
+        self._children_overrides = {}
+        self._parents_overrides = {}
+
+    def _get_relations_data(self):
+        """
+        Returns the picklable data of the blocks and their relations.
+        """
+        self._compact_relations()
+        return (
+            self._block_keys,
+            bytes(self._block_presence),
+            tuple(arr.tostring() for arr in self._children_csr + self._parents_csr),
+        )
+
+    def _set_relations_data(self, relations_data):
+        """
+        Replaces the blocks and their relations with the data returned
+        by _get_relations_data.
+        """
+        block_keys, block_presence, arrays = relations_data
+        child_offsets, child_indices, parent_offsets, parent_indices = [
+            array('i', arr_string) for arr_string in arrays
+        ]
+        self._block_keys = block_keys
+        self._block_indices = {block_key: index for index, block_key in enumerate(block_keys)}
+        self._block_presence = bytearray(block_presence)
+        self._children_csr = (child_offsets, child_indices)
+        self._parents_csr = (parent_offsets, parent_indices)
+        self._children_overrides = {}
+        self._parents_overrides = {}
 
 
 class BlockStructureBlockData(BlockStructure):
@@ -274,10 +370,16 @@ class BlockStructureBlockData(BlockStructure):
     def __init__(self, root_block_usage_key):
         super(BlockStructureBlockData, self).__init__(root_block_usage_key)
 
-        # Map of a block's usage key to its collected data, including
-        # its xBlock fields and block-specific transformer data.
-        # defaultdict {UsageKey: _BlockData}
-        self._block_data_map = defaultdict(_BlockData)
+        # Map of xBlock field name to the map of a block's index to
+        # the field's value for the block.
+        # dict {string: dict {int: any picklable type}}
+        self._xblock_fields = {}
+
+        # Map of transformer name to the map of a key of the
+        # transformer's data to the map of a block's index to the
+        # value for the block.
+        # defaultdict {string: dict {string: dict {int: any picklable type}}}
+        self._transformer_block_data = defaultdict(dict)
 
         # Map of a transformer's name to its non-block-specific data.
         # defaultdict {string: dict}
@@ -299,8 +401,10 @@ class BlockStructureBlockData(BlockStructure):
             default (any type) - The value to return if a field value is
                 not found.
         """
-        block_data = self._block_data_map.get(usage_key)
-        return block_data.xblock_fields.get(field_name, default) if block_data else default
+        index = self._block_indices.get(usage_key)
+        if index is None:
+            return default
+        return self._xblock_fields.get(field_name, {}).get(index, default)
 
     def get_transformer_data(self, transformer, key, default=None):
         """
@@ -351,8 +455,10 @@ class BlockStructureBlockData(BlockStructure):
             default (any type) - The value to return if a dictionary
                 entry is not found.
         """
-        transformer_data = self.get_transformer_block_data(usage_key, transformer)
-        return transformer_data.get(key, default)
+        index = self._block_indices.get(usage_key)
+        if index is None:
+            return default
+        return self._transformer_block_data.get(transformer.name(), {}).get(key, {}).get(index, default)
 
     def set_transformer_block_field(self, usage_key, transformer, key, value):
         """
@@ -372,7 +478,8 @@ class BlockStructureBlockData(BlockStructure):
                 given key for the given transformer's data for the
                 requested block.
         """
-        self._block_data_map[usage_key].transformer_data[transformer.name()][key] = value
+        index = self._get_block_index(usage_key)
+        self._transformer_block_data[transformer.name()].setdefault(key, {})[index] = value
 
     def get_transformer_block_data(self, usage_key, transformer):
         """
@@ -390,12 +497,14 @@ class BlockStructureBlockData(BlockStructure):
             key (string) - A dictionary key to the transformer's data
                 that is requested.
         """
-        default = {}
-        block_data = self._block_data_map.get(usage_key)
-        if not block_data:
-            return default
-        else:
-            return block_data.transformer_data.get(transformer.name(), default)
+        index = self._block_indices.get(usage_key)
+        if index is None:
+            return {}
+        return {
+            key: values[index]
+            for key, values in self._transformer_block_data.get(transformer.name(), {}).iteritems()
+            if index in values
+        }
 
     def remove_transformer_block_field(self, usage_key, transformer, key):
         """
@@ -409,8 +518,9 @@ class BlockStructureBlockData(BlockStructure):
             transformer (BlockStructureTransformer) - The transformer
                 whose data entry is to be deleted.
         """
-        transformer_block_data = self.get_transformer_block_data(usage_key, transformer)
-        transformer_block_data.pop(key, None)
+        index = self._block_indices.get(usage_key)
+        if index is not None:
+            self._transformer_block_data.get(transformer.name(), {}).get(key, {}).pop(index, None)
 
     def remove_block(self, usage_key, keep_descendants):
         """
@@ -432,26 +542,40 @@ class BlockStructureBlockData(BlockStructure):
                 removed block's children become children of the
                 removed block's parents.
         """
-        children = self._block_relations[usage_key].children
-        parents = self._block_relations[usage_key].parents
-
-        # Remove block from its children.
-        for child in children:
-            self._block_relations[child].parents.remove(usage_key)
-
-        # Remove block from its parents.
-        for parent in parents:
-            self._block_relations[parent].children.remove(usage_key)
+        index = self._block_indices.get(usage_key)
+        if index is None:
+            return
 
-        # Remove block.
-        self._block_relations.pop(usage_key, None)
-        self._block_data_map.pop(usage_key, None)
+        if self._block_presence[index]:
+            children = list(self._get_child_indices(index))
+            parents = list(self._get_parent_indices(index))
 
-        # Recreate the graph connections if descendants are to be kept.
-        if keep_descendants:
+            # Remove block from its children.
             for child in children:
-                for parent in parents:
-                    self._add_relation(parent, child)
+                self._get_parents_override(child).remove(index)
+
+            # Remove block from its parents.
+            for parent in parents:
+                self._get_children_override(parent).remove(index)
+
+            # Remove block.
+            self._block_presence[index] = 0
+            self._children_overrides[index] = []
+            self._parents_overrides[index] = []
+
+            # Recreate the graph connections if descendants are to be kept.
+            if keep_descendants:
+                for child in children:
+                    for parent in parents:
+                        self._get_children_override(parent).append(child)
+                        self._get_parents_override(child).append(parent)
+
+        # Remove block data.
+        for values in self._xblock_fields.itervalues():
+            values.pop(index, None)
+        for transformer_block_data in self._transformer_block_data.itervalues():
+            for values in transformer_block_data.itervalues():
+                values.pop(index, None)
 
     def remove_block_if(self, removal_condition, keep_descendants=False, **kwargs):
         """
@@ -488,16 +612,6 @@ class BlockStructureBlockData(BlockStructure):
         for _ in self.topological_traversal(filter_func=filter_func, **kwargs):
             pass
 
-    def get_block_keys(self):
-        """
-        Returns the block keys in the block structure.
-
-        Returns:
-            iterator(UsageKey) - An iterator of the usage
-            keys of all the blocks in the block structure.
-        """
-        return self._block_relations.iterkeys()
-
     #--- Internal methods ---#
     # To be used within the block_cache framework or by tests.
 
@@ -521,6 +635,28 @@ class BlockStructureBlockData(BlockStructure):
             raise TransformerException('VERSION attribute is not set on transformer {0}.', transformer.name())
         self.set_transformer_data(transformer, TRANSFORMER_VERSION_KEY, transformer.VERSION)
 
+    def _get_cache_data(self):
+        """
+        Returns the picklable data of this block structure to be cached.
+        """
+        return (
+            self._get_relations_data(),
+            self._xblock_fields,
+            dict(self._transformer_block_data),
+            dict(self._transformer_data),
+        )
+
+    def _set_cache_data(self, cache_data):
+        """
+        Replaces the data of this block structure with the data returned
+        by _get_cache_data.
+        """
+        relations_data, xblock_fields, transformer_block_data, transformer_data = cache_data
+        self._set_relations_data(relations_data)
+        self._xblock_fields = xblock_fields
+        self._transformer_block_data = defaultdict(dict, transformer_block_data)
+        self._transformer_data = defaultdict(dict, transformer_data)
+
 
 class BlockStructureModulestoreData(BlockStructureBlockData):
     """
@@ -619,4 +755,5 @@ class BlockStructureModulestoreData(BlockStructureBlockData):
                 being collected and stored.
         """
         if hasattr(xblock, field_name):
-            self._block_data_map[usage_key].xblock_fields[field_name] = getattr(xblock, field_name)
+            index = self._get_block_index(usage_key)
+            self._xblock_fields.setdefault(field_name, {})[index] = getattr(xblock, field_name)
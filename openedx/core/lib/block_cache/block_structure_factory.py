@@ -70,7 +70,7 @@ class BlockStructureFactory(object):
         Store a compressed and pickled serialization of the given
         block structure into the given cache.
 
-        The key in the cache is 'root.key.<root_block_usage_key>'.
+        The key in the cache is 'root.key.v2.<root_block_usage_key>'.
         The data stored in the cache includes the structure's
         block relations, transformer data, and block data.
 
@@ -82,12 +82,7 @@ class BlockStructureFactory(object):
                 cache into which cacheable data of the block structure
                 is to be serialized.
         """
-        data_to_cache = (
-            block_structure._block_relations,
-            block_structure._transformer_data,
-            block_structure._block_data_map
-        )
-        zp_data_to_cache = zpickle(data_to_cache)
+        zp_data_to_cache = zpickle(block_structure._get_cache_data())
         cache.set(
             cls._encode_root_cache_key(block_structure.root_block_usage_key),
             zp_data_to_cache
@@ -145,11 +140,8 @@ class BlockStructureFactory(object):
             )
 
         # Deserialize and construct the block structure.
-        block_relations, transformer_data, block_data_map = zunpickle(zp_data_from_cache)
         block_structure = BlockStructureBlockData(root_block_usage_key)
-        block_structure._block_relations = block_relations
-        block_structure._transformer_data = transformer_data
-        block_structure._block_data_map = block_data_map
+        block_structure._set_cache_data(zunpickle(zp_data_from_cache))
 
         # Verify that the cached data for all the given transformers are
         # for their latest versions.
@@ -193,5 +185,8 @@ class BlockStructureFactory(object):
         """
         Returns the cache key to use for storing the block structure
         for the given root_block_usage_key.
+
+        Note: Bump the version in the key whenever the format of the
+        cached data is changed.
         """
-        return "root.key." + unicode(root_block_usage_key)
+        return "root.key.v2." + unicode(root_block_usage_key)
@@ -212,6 +212,27 @@ class TestBlockStructureData(TestCase, ChildrenMapTestMixin):
 
         self.assert_block_structure(block_structure, pruned_children_map, missing_blocks)
 
+    def test_cache_data(self):
+        block_structure = self.create_block_structure(BlockStructureBlockData, ChildrenMapTestMixin.DAG_CHILDREN_MAP)
+        block_structure.set_transformer_block_field(3, MockTransformer, 'key', 'val')
+        block_structure.remove_block(2, keep_descendants=False)
+
+        # re-create from the data to be cached
+        from_cache_block_structure = BlockStructureBlockData(root_block_usage_key=0)
+        from_cache_block_structure._set_cache_data(deepcopy(block_structure._get_cache_data()))
+        self.assert_block_structure(
+            from_cache_block_structure, [[1], [3], [], [5, 6], [], [], []], missing_blocks=[2]
+        )
+        self.assertEquals(from_cache_block_structure.get_transformer_block_field(3, MockTransformer, 'key'), 'val')
+
+        # relations are still mutable after re-created
+        from_cache_block_structure.remove_block(3, keep_descendants=True)
+        from_cache_block_structure._prune_unreachable()
+        self.assert_block_structure(
+            from_cache_block_structure, [[1], [5, 6], [], [], [], [], []], missing_blocks=[2, 3, 4]
+        )
+        self.assertIsNone(from_cache_block_structure.get_transformer_block_field(3, MockTransformer, 'key'))
+
     def test_remove_block_if(self):
         block_structure = self.create_block_structure(BlockStructureBlockData, ChildrenMapTestMixin.LINEAR_CHILDREN_MAP)
         block_structure.remove_block_if(lambda block: block == 2)